@@ -17,57 +17,86 @@
 #     Developer Zhixu Ni zhixu.ni@uni-leipzig.de
 #     Developer Georgia Angelidou georgia.angelidou@uni-leipzig.de
 
+from collections import namedtuple
+from functools import lru_cache
 import re
+from types import MappingProxyType
+
+ELEM_CACHE_SIZE = 50000
+
+PL_CHECKER = re.compile(r'(P[ACEGSI])([(])(.*)([)])')
+LPL_CHECKER = re.compile(r'(LP[ACEGSI])([(])(.*)([)])')
+PIP_CHECKER = re.compile(r'(PIP)([(])(.*)([)])')
+TG_CHECKER = re.compile(r'(TG)([(])(.*)([)])')
+DG_CHECKER = re.compile(r'(DG)([(])(.*)([)])')
+FA_CHECKER = re.compile(r'(FA)(\d{1,2})([:])(\d{1,2})')
+FA_SHORT_CHECKER = re.compile(r'(\d{1,2})([:])(\d{1,2})')
+FA_O_CHECKER = re.compile(r'(O-)(\d{1,2})([:])(\d)')
+FA_P_CHECKER = re.compile(r'(P-)(\d{1,2})([:])(\d)')
+
+# iupac '97 {element: ((exact mass, abundance), ...)}, the first isotope is the monoisotopic one
+PERIODIC_TABLE_DCT = MappingProxyType({'H': ((1.0078250321, 0.999885), (2.0141017780, 0.0001157)),
+                                       'D': ((2.0141017780, 0.0001157),),
+                                       'C': ((12.0, 0.9893), (13.0033548378, 0.0107)),
+                                       'N': ((14.0030740052, 0.99632), (15.0001088984, 0.00368)),
+                                       'O': ((15.9949146221, 0.99757), (16.99913150, 0.00038), (17.9991604, 0.00205)),
+                                       'Na': ((22.98976967, 1.0),),
+                                       'P': ((30.97376151, 1.0),),
+                                       'S': ((31.97207069, 0.9493), (32.97145850, 0.0076),
+                                             (33.96786683, 0.0429), (35.96708088, 0.0002)),
+                                       'K': ((38.9637069, 0.932581), (39.96399867, 0.000117),
+                                             (40.96182597, 0.067302)),
+                                       })
+
+# the shared tables are read only, use .copy() to get a dict to calculate with
+_PA_HG_ELEM = MappingProxyType({'C': 0, 'H': 3, 'O': 4, 'P': 1, 'N': 0})
+_PC_HG_ELEM = MappingProxyType({'C': 5, 'H': 14, 'O': 4, 'P': 1, 'N': 1})
+_PE_HG_ELEM = MappingProxyType({'C': 2, 'H': 8, 'O': 4, 'P': 1, 'N': 1})
+_PG_HG_ELEM = MappingProxyType({'C': 3, 'H': 9, 'O': 6, 'P': 1, 'N': 0})
+_PI_HG_ELEM = MappingProxyType({'C': 6, 'H': 13, 'O': 9, 'P': 1, 'N': 0})
+_PIP_HG_ELEM = MappingProxyType({'C': 6, 'H': 14, 'O': 12, 'P': 2, 'N': 0})
+_PS_HG_ELEM = MappingProxyType({'C': 3, 'H': 8, 'O': 6, 'P': 1, 'N': 1})
+_TG_HG_ELEM = MappingProxyType({'C': 0, 'H': 0, 'O': 0, 'P': 0, 'N': 0})
+_FA_HG_ELEM = MappingProxyType({'C': 0, 'H': 0, 'O': 0, 'P': 0, 'N': 0})
+
+LIPID_HG_ELEM_DCT = MappingProxyType({'PA': _PA_HG_ELEM, 'PC': _PC_HG_ELEM, 'PE': _PE_HG_ELEM, 'PG': _PG_HG_ELEM,
+                                      'PI': _PI_HG_ELEM, 'PS': _PS_HG_ELEM, 'PIP': _PIP_HG_ELEM,
+                                      'LPA': _PA_HG_ELEM, 'LPC': _PC_HG_ELEM, 'LPE': _PE_HG_ELEM, 'LPG': _PG_HG_ELEM,
+                                      'LPI': _PI_HG_ELEM, 'LPS': _PS_HG_ELEM, 'LPIP': _PIP_HG_ELEM,
+                                      'TG': _TG_HG_ELEM, 'FA': _FA_HG_ELEM, 'DG': _TG_HG_ELEM})
+
+GLYCEROL_BONE_ELEM_DCT = MappingProxyType({'C': 3, 'H': 2})
+LINK_O_ELEM_DCT = MappingProxyType({'O': -1, 'H': 2})
+LINK_P_ELEM_DCT = MappingProxyType({'O': -1})
+
+# elements added to the neutral lipid by each adduct
+_HCOO_ELEM = MappingProxyType({'H': 1, 'C': 1, 'O': 2})
+_CH3COO_ELEM = MappingProxyType({'H': 3, 'C': 2, 'O': 2})
+ADDUCT_ELEM_DCT = MappingProxyType({'[M-H]-': MappingProxyType({'H': -1}),
+                                    '[M+HCOO]-': _HCOO_ELEM, '[M+FA-H]-': _HCOO_ELEM,
+                                    '[M+CH3COO]-': _CH3COO_ELEM, '[M+OAc]-': _CH3COO_ELEM,
+                                    '[M+H]+': MappingProxyType({'H': 1}),
+                                    '[M+NH4]+': MappingProxyType({'N': 1, 'H': 4}),
+                                    '[M+Na]+': MappingProxyType({'Na': 1}),
+                                    })
+
+# formula (str), elements as tuple of (element, count) pairs (tuple), exact mass (float)
+ElemInfo = namedtuple('ElemInfo', ['formula', 'elem', 'exactmass'])
 
 
 class ElemCalc:
     def __init__(self):
-
-        pa_hg_elem = {'C': 0, 'H': 3, 'O': 4, 'P': 1, 'N': 0}
-        pc_hg_elem = {'C': 5, 'H': 14, 'O': 4, 'P': 1, 'N': 1}
-        pe_hg_elem = {'C': 2, 'H': 8, 'O': 4, 'P': 1, 'N': 1}
-        pg_hg_elem = {'C': 3, 'H': 9, 'O': 6, 'P': 1, 'N': 0}
-        pi_hg_elem = {'C': 6, 'H': 13, 'O': 9, 'P': 1, 'N': 0}
-        pip_hg_elem = {'C': 6, 'H': 14, 'O': 12, 'P': 2, 'N': 0}
-        ps_hg_elem = {'C': 3, 'H': 8, 'O': 6, 'P': 1, 'N': 1}
-        tg_hg_elem = {'C': 0, 'H': 0, 'O': 0, 'P': 0, 'N': 0}
-        fa_hg_elem = {'C': 0, 'H': 0, 'O': 0, 'P': 0, 'N': 0}
-
-        self.lipid_hg_elem_dct = {'PA': pa_hg_elem, 'PC': pc_hg_elem, 'PE': pe_hg_elem, 'PG': pg_hg_elem,
-                                  'PI': pi_hg_elem, 'PS': ps_hg_elem, 'PIP': pip_hg_elem,
-                                  'LPA': pa_hg_elem, 'LPC': pc_hg_elem, 'LPE': pe_hg_elem, 'LPG': pg_hg_elem,
-                                  'LPI': pi_hg_elem, 'LPS': ps_hg_elem, 'LPIP': pip_hg_elem,
-                                  'TG': tg_hg_elem,'FA': fa_hg_elem, 'DG': tg_hg_elem}
-
-        self.glycerol_bone_elem_dct = {'C': 3, 'H': 2}
-        self.link_o_elem_dct = {'O': -1, 'H': 2}
-        self.link_p_elem_dct = {'O': -1}
-
-        self.periodic_table_dct = {'H': [(1.0078250321, 0.999885), (2.0141017780, 0.0001157)],
-                                   'D': [(2.0141017780, 0.0001157)],
-                                   'C': [(12.0, 0.9893), (13.0033548378, 0.0107)],
-                                   'N': [(14.0030740052, 0.99632), (15.0001088984, 0.00368)],
-                                   'O': [(15.9949146221, 0.99757), (16.99913150, 0.00038), (17.9991604, 0.00205)],
-                                   'Na': [(22.98976967, 1.0)],
-                                   'P': [(30.97376151, 1.0)],
-                                   'S': [(31.97207069, 0.9493), (32.97145850, 0.0076),
-                                         (33.96786683, 0.0429), (35.96708088, 0.0002)],
-                                   'K': [(38.9637069, 0.932581), (39.96399867, 0.000117), (40.96182597, 0.067302)],
-                                   }
+        # the tables are shared by all instances
+        self.lipid_hg_elem_dct = LIPID_HG_ELEM_DCT
+        self.glycerol_bone_elem_dct = GLYCEROL_BONE_ELEM_DCT
+        self.link_o_elem_dct = LINK_O_ELEM_DCT
+        self.link_p_elem_dct = LINK_P_ELEM_DCT
+        self.periodic_table_dct = PERIODIC_TABLE_DCT
+        self.adduct_elem_dct = ADDUCT_ELEM_DCT
 
     @staticmethod
     def decode_abbr(abbr):
 
-        pl_checker = re.compile(r'(P[ACEGSI])([(])(.*)([)])')
-        lpl_checker = re.compile(r'(LP[ACEGSI])([(])(.*)([)])')
-        pip_checker = re.compile(r'(PIP)([(])(.*)([)])')
-        tg_checker = re.compile(r'(TG)([(])(.*)([)])')
-        dg_checker = re.compile(r'(DG)([(])(.*)([)])')
-        fa_checker = re.compile(r'(FA)(\d{1,2})([:])(\d{1,2})')
-        fa_short_checker = re.compile(r'(\d{1,2})([:])(\d{1,2})')
-        fa_o_checker = re.compile(r'(O-)(\d{1,2})([:])(\d)')
-        fa_p_checker = re.compile(r'(P-)(\d{1,2})([:])(\d)')
-
         # Check PL Type
         _pl_typ = ''
         bulk_fa_typ = ''
@@ -76,71 +105,51 @@ class ElemCalc:
         bulk_fa_db = 0
         lyso_fa_linker_dct = {'fa1': '', 'fa2': ''}
 
-        # TODO(georgia.angelidou@uni-leipzig.de): consideration to put se elif statement
-        if pl_checker.match(abbr):
-            # print('PL')
-            pl_re_chk = pl_checker.match(abbr)
-            pl_typ_lst = pl_re_chk.groups()
-            _pl_typ = pl_typ_lst[0]
-            bulk_fa_typ = pl_typ_lst[2]
-        if lpl_checker.match(abbr):
-            # print('PL')
-            lpl_re_chk = lpl_checker.match(abbr)
-            lpl_typ_lst = lpl_re_chk.groups()
-            _pl_typ = lpl_typ_lst[0]
-            bulk_fa_typ = lpl_typ_lst[2]
-        if pip_checker.match(abbr):
-            # print('PIP')
-            pip_re_chk = pip_checker.match(abbr)
-            pip_typ_lst = pip_re_chk.groups()
-            _pl_typ = pip_typ_lst[0]
-            bulk_fa_typ = pip_typ_lst[2]
-        if tg_checker.match(abbr):
-            # print('TG')
-            tg_re_chk = tg_checker.match(abbr)
-            tg_typ_lst = tg_re_chk.groups()
-            _pl_typ = tg_typ_lst[0]
-            bulk_fa_typ = tg_typ_lst[2]
-        if dg_checker.match(abbr):
-            dg_re_chk = dg_checker.match(abbr)
-            dg_typ_lst = dg_re_chk.groups()
-            _pl_typ = dg_typ_lst[0]
-            bulk_fa_typ = dg_typ_lst[2]
-        if fa_checker.match(abbr):
+        # the class checkers are exclusive, only one of them can match the abbr.
+        lipid_re_chk = None
+        for _lipid_checker in [PL_CHECKER, LPL_CHECKER, PIP_CHECKER, TG_CHECKER, DG_CHECKER]:
+            lipid_re_chk = _lipid_checker.match(abbr)
+            if lipid_re_chk:
+                break
+        if lipid_re_chk:
+            lipid_typ_lst = lipid_re_chk.groups()
+            _pl_typ = lipid_typ_lst[0]
+            bulk_fa_typ = lipid_typ_lst[2]
+        elif FA_CHECKER.match(abbr):
             # print('FA')
             _pl_typ = 'FA'
             bulk_fa_typ = abbr
-            fa_chk = fa_checker.match(abbr)
+            fa_chk = FA_CHECKER.match(abbr)
             bulk_fa_lst = fa_chk.groups()
             bulk_fa_c = bulk_fa_lst[1]
             bulk_fa_db = bulk_fa_lst[3]
             bulk_fa_linker = 'A-'
             lyso_fa_linker_dct = {'A': ''}
-        if fa_short_checker.match(abbr):
+        elif FA_SHORT_CHECKER.match(abbr):
             # print('FA')
             _pl_typ = 'FA'
             bulk_fa_typ = abbr
-            fa_chk = fa_checker.match(abbr)
+            fa_chk = FA_SHORT_CHECKER.match(abbr)
             bulk_fa_lst = fa_chk.groups()
             bulk_fa_c = bulk_fa_lst[0]
             bulk_fa_db = bulk_fa_lst[2]
             bulk_fa_linker = 'A-'
             lyso_fa_linker_dct = {'A': ''}
-        if fa_o_checker.match(abbr):
+        elif FA_O_CHECKER.match(abbr):
             # print('FA')
             _pl_typ = 'FA'
             bulk_fa_typ = abbr
-            fa_chk = fa_o_checker.match(abbr)
+            fa_chk = FA_O_CHECKER.match(abbr)
             bulk_fa_lst = fa_chk.groups()
             bulk_fa_c = bulk_fa_lst[1]
             bulk_fa_db = bulk_fa_lst[3]
             bulk_fa_linker = 'O-'
             lyso_fa_linker_dct = {'O': ''}
-        if fa_p_checker.match(abbr):
+        elif FA_P_CHECKER.match(abbr):
             # print('FA')
             _pl_typ = 'FA'
             bulk_fa_typ = abbr
-            fa_chk = fa_p_checker.match(abbr)
+            fa_chk = FA_P_CHECKER.match(abbr)
             bulk_fa_lst = fa_chk.groups()
             bulk_fa_c = bulk_fa_lst[1]
             bulk_fa_db = bulk_fa_lst[3]
@@ -148,99 +157,99 @@ class ElemCalc:
             lyso_fa_linker_dct = {'P': ''}
 
         if _pl_typ in ['PL', 'PA', 'PC', 'PE', 'PG', 'PI', 'PIP', 'PS']:
-            if fa_short_checker.match(bulk_fa_typ):
+            if FA_SHORT_CHECKER.match(bulk_fa_typ):
                 bulk_fa_linker = 'A-A-'
                 lyso_fa_linker_dct = {'A': ''}
-                fa_chk = fa_short_checker.match(bulk_fa_typ)
+                fa_chk = FA_SHORT_CHECKER.match(bulk_fa_typ)
                 bulk_fa_lst = fa_chk.groups()
                 bulk_fa_c = bulk_fa_lst[0]
                 bulk_fa_db = bulk_fa_lst[2]
-            # elif fa_short_checker.match(bulk_fa_typ):
+            # elif FA_SHORT_CHECKER.match(bulk_fa_typ):
             #     bulk_fa_linker = ''
             #     lyso_fa_linker_dct = {'A': ''}
-            #     fa_chk = fa_short_checker.match(bulk_fa_typ)
+            #     fa_chk = FA_SHORT_CHECKER.match(bulk_fa_typ)
             #     bulk_fa_lst = fa_chk.groups()
             #     bulk_fa_c = bulk_fa_lst[0]
             #     bulk_fa_db = bulk_fa_lst[2]
-            elif fa_o_checker.match(bulk_fa_typ):
+            elif FA_O_CHECKER.match(bulk_fa_typ):
                 bulk_fa_linker = 'O-A-'
                 lyso_fa_linker_dct = {'O': '', 'A': 'O-'}  # link of the other sn after NL of this sn
-                fa_chk = fa_o_checker.match(bulk_fa_typ)
+                fa_chk = FA_O_CHECKER.match(bulk_fa_typ)
                 bulk_fa_lst = fa_chk.groups()
                 bulk_fa_c = bulk_fa_lst[1]
                 bulk_fa_db = bulk_fa_lst[3]
-            elif fa_p_checker.match(bulk_fa_typ):
+            elif FA_P_CHECKER.match(bulk_fa_typ):
                 bulk_fa_linker = 'P-A-'
                 lyso_fa_linker_dct = {'P': '', 'A': 'P-'}  # link of the other sn after NL of this sn
-                fa_chk = fa_p_checker.match(bulk_fa_typ)
+                fa_chk = FA_P_CHECKER.match(bulk_fa_typ)
                 bulk_fa_lst = fa_chk.groups()
                 bulk_fa_c = bulk_fa_lst[1]
                 bulk_fa_db = bulk_fa_lst[3]
 
         elif _pl_typ in ['LPL', 'LPA', 'LPC', 'LPE', 'LPG', 'LPI', 'LPIP', 'LPS']:
-            if fa_short_checker.match(bulk_fa_typ):
+            if FA_SHORT_CHECKER.match(bulk_fa_typ):
                 bulk_fa_linker = 'A-'
                 lyso_fa_linker_dct = {'A': ''}
-                fa_chk = fa_short_checker.match(bulk_fa_typ)
+                fa_chk = FA_SHORT_CHECKER.match(bulk_fa_typ)
                 bulk_fa_lst = fa_chk.groups()
                 bulk_fa_c = bulk_fa_lst[0]
                 bulk_fa_db = bulk_fa_lst[2]
-            elif fa_o_checker.match(bulk_fa_typ):
+            elif FA_O_CHECKER.match(bulk_fa_typ):
                 bulk_fa_linker = 'O-'
                 lyso_fa_linker_dct = {'O': ''}  # link of the other sn after NL of this sn
-                fa_chk = fa_o_checker.match(bulk_fa_typ)
+                fa_chk = FA_O_CHECKER.match(bulk_fa_typ)
                 bulk_fa_lst = fa_chk.groups()
                 bulk_fa_c = bulk_fa_lst[1]
                 bulk_fa_db = bulk_fa_lst[3]
-            elif fa_p_checker.match(bulk_fa_typ):
+            elif FA_P_CHECKER.match(bulk_fa_typ):
                 bulk_fa_linker = 'P-'
                 lyso_fa_linker_dct = {'P': ''}  # link of the other sn after NL of this sn
-                fa_chk = fa_p_checker.match(bulk_fa_typ)
+                fa_chk = FA_P_CHECKER.match(bulk_fa_typ)
                 bulk_fa_lst = fa_chk.groups()
                 bulk_fa_c = bulk_fa_lst[1]
                 bulk_fa_db = bulk_fa_lst[3]
 
         elif _pl_typ in ['TG']:
-            if fa_short_checker.match(bulk_fa_typ):
+            if FA_SHORT_CHECKER.match(bulk_fa_typ):
                 bulk_fa_linker = 'A-A-A-'
                 lyso_fa_linker_dct = {'A': ''}
-                fa_chk = fa_short_checker.match(bulk_fa_typ)
+                fa_chk = FA_SHORT_CHECKER.match(bulk_fa_typ)
                 bulk_fa_lst = fa_chk.groups()
                 bulk_fa_c = bulk_fa_lst[0]
                 bulk_fa_db = bulk_fa_lst[2]
-            elif fa_o_checker.match(bulk_fa_typ):
+            elif FA_O_CHECKER.match(bulk_fa_typ):
                 bulk_fa_linker = 'O-A-A-'
                 lyso_fa_linker_dct = {'O': '', 'A': 'O-'}  # link of the other sn after NL of this sn
-                fa_chk = fa_o_checker.match(bulk_fa_typ)
+                fa_chk = FA_O_CHECKER.match(bulk_fa_typ)
                 bulk_fa_lst = fa_chk.groups()
                 bulk_fa_c = bulk_fa_lst[1]
                 bulk_fa_db = bulk_fa_lst[3]
-            elif fa_p_checker.match(bulk_fa_typ):
+            elif FA_P_CHECKER.match(bulk_fa_typ):
                 bulk_fa_linker = 'P-A-A-'
                 lyso_fa_linker_dct = {'P': '', 'A': 'P-'}  # link of the other sn after NL of this sn
-                fa_chk = fa_p_checker.match(bulk_fa_typ)
+                fa_chk = FA_P_CHECKER.match(bulk_fa_typ)
                 bulk_fa_lst = fa_chk.groups()
                 bulk_fa_c = bulk_fa_lst[1]
                 bulk_fa_db = bulk_fa_lst[3]
         elif _pl_typ in ['DG']:
-            if fa_short_checker.match(bulk_fa_typ):
+            if FA_SHORT_CHECKER.match(bulk_fa_typ):
                 bulk_fa_linker = 'A-A-'
                 lyso_fa_linker_dct = {'A': ''}
-                fa_chk = fa_short_checker.match(bulk_fa_typ)
+                fa_chk = FA_SHORT_CHECKER.match(bulk_fa_typ)
                 bulk_fa_lst = fa_chk.groups()
                 bulk_fa_c = bulk_fa_lst[0]
                 bulk_fa_db = bulk_fa_lst[2]
-            elif fa_o_checker.match(bulk_fa_typ):
+            elif FA_O_CHECKER.match(bulk_fa_typ):
                 bulk_fa_linker = 'O-A-'
                 lyso_fa_linker_dct = {'O': '', 'A': 'O-'}  # link of the other sn after NL of this sn
-                fa_chk = fa_o_checker.match(bulk_fa_typ)
+                fa_chk = FA_O_CHECKER.match(bulk_fa_typ)
                 bulk_fa_lst = fa_chk.groups()
                 bulk_fa_c = bulk_fa_lst[1]
                 bulk_fa_db = bulk_fa_lst[3]
-            elif fa_p_checker.match(bulk_fa_typ):
+            elif FA_P_CHECKER.match(bulk_fa_typ):
                 bulk_fa_linker = 'P-A-'
                 lyso_fa_linker_dct = {'P': '', 'A': 'P-'}  # link of the other sn after NL of this sn
-                fa_chk = fa_p_checker.match(bulk_fa_typ)
+                fa_chk = FA_P_CHECKER.match(bulk_fa_typ)
                 bulk_fa_lst = fa_chk.groups()
                 bulk_fa_c = bulk_fa_lst[1]
                 bulk_fa_db = bulk_fa_lst[3]
@@ -342,34 +351,27 @@ class ElemCalc:
     def get_charged_elem(self, abbr, charge='[M-H]-'):
 
         lipid_elem_dct = self.get_neutral_elem(abbr)
-        if charge == '[M-H]-':
-            lipid_elem_dct['H'] += -1
-        elif charge == '[M+HCOO]-' or charge == '[M+FA-H]-':
-            lipid_elem_dct['H'] += 1
-            lipid_elem_dct['C'] += 1
-            lipid_elem_dct['O'] += 2
-        elif charge == '[M+CH3COO]-':
-            lipid_elem_dct['H'] += 3
-            lipid_elem_dct['C'] += 2
-            lipid_elem_dct['O'] += 2
-        elif charge == '[M+OAc]-':
-            lipid_elem_dct['H'] += 3
-            lipid_elem_dct['C'] += 2
-            lipid_elem_dct['O'] += 2
-        elif charge == '[M+H]+':
-            lipid_elem_dct['H'] += 1
-        elif charge == '[M+NH4]+':
-            if 'N' in list(lipid_elem_dct.keys()):
-                lipid_elem_dct['N'] += 1
-            else:
-                lipid_elem_dct['N'] = 1
-            lipid_elem_dct['H'] += 4
-        elif charge == '[M+Na]+':
-            lipid_elem_dct['Na'] = 1
+        if charge in self.adduct_elem_dct:
+            for _elem, _elem_count in self.adduct_elem_dct[charge].items():
+                if _elem in lipid_elem_dct:
+                    lipid_elem_dct[_elem] += _elem_count
+                else:
+                    lipid_elem_dct[_elem] = _elem_count
 
         return lipid_elem_dct
 
-    def get_formula(self, abbr, charge=''):
+    def calc_elem_info(self, abbr, charge=''):
+        """
+        Decode the lipid abbreviation and calculate the formula, elements and exact mass without the cache.
+
+        Args:
+            abbr (str): the lipid abbreviation e.g. 'PC(36:3)' or 'FA18:1'
+            charge (str): the charge mode e.g. '[M-H]-', use '' for the neutral lipid
+
+        Returns:
+            elem_info (ElemInfo): immutable (formula, elem, exactmass), elem as tuple of (element, count) pairs
+
+        """
 
         if charge in ['neutral', 'Neutral', '', None]:
 
@@ -416,15 +418,50 @@ class ElemCalc:
         elif charge in ['[M+H]+', '[M+NH4]+', '[M+Na]+']:
             formula_str += '+'
         # print ('lets see if you manage to get out from this one')
-        return formula_str, elem_dct
+        return ElemInfo(formula_str, tuple(elem_dct.items()), self.get_exactmass(elem_dct))
+
+    @staticmethod
+    def get_elem_info(abbr, charge=''):
+        """
+        Get the formula, elements and exact mass of a lipid from the cache.
 
-    def get_exactmass(self, elem_dct):
+        Args:
+            abbr (str): the lipid abbreviation e.g. 'PC(36:3)' or 'FA18:1'
+            charge (str): the charge mode e.g. '[M-H]-', use '' for the neutral lipid
 
-        mono_mz = 0.0
-        for _elem in list(elem_dct.keys()):
-            mono_mz += elem_dct[_elem] * self.periodic_table_dct[_elem][0][0]
+        Returns:
+            elem_info (ElemInfo): immutable (formula, elem, exactmass), elem as tuple of (element, count) pairs
+
+        """
+
+        return get_elem_info(abbr, charge)
+
+    @staticmethod
+    def get_elem_info_lst(abbr_lst, charge=''):
+        """
+        Get the formula, elements and exact mass of a list of lipids. Each abbreviation is decoded only once.
+
+        Args:
+            abbr_lst (list): the lipid abbreviations e.g. ['PC(36:3)', 'PC(O-36:3)']
+            charge (str): the charge mode e.g. '[M-H]-', use '' for the neutral lipid
+
+        Returns:
+            elem_info_lst (list): list of ElemInfo in the order of abbr_lst
+
+        """
+
+        return [get_elem_info(_abbr, charge) for _abbr in abbr_lst]
+
+    def get_formula(self, abbr, charge=''):
 
-        return round(mono_mz, 6)
+        elem_info = get_elem_info(abbr, charge)
+
+        return elem_info.formula, dict(elem_info.elem)
+
+    @staticmethod
+    def get_exactmass(elem_dct):
+
+        return calc_exactmass(elem_dct)
 
     # Function to calculate the possible precursor of [M+NH4]+ for TG and DG
     # Current step is working for TG
@@ -502,6 +539,46 @@ class ElemCalc:
         return (mz_NH3_pr_H, mz_NH4_H_form, mz_NH3_pr_Na, mz_NH4_Na_form)
 
 
+def calc_exactmass(elem_dct):
+    """
+    Calculate the monoisotopic mass of an elemental composition.
+
+    Args:
+        elem_dct (dict): the elemental composition e.g. {'C': 41, 'H': 79, 'N': 1, 'O': 8, 'P': 1}
+
+    Returns:
+        exactmass (float): the exact mass rounded to 6 decimals
+
+    """
+
+    mono_mz = 0.0
+    for _elem in list(elem_dct.keys()):
+        mono_mz += elem_dct[_elem] * PERIODIC_TABLE_DCT[_elem][0][0]
+
+    return round(mono_mz, 6)
+
+
+# the ElemCalc has no state of its own, one instance is shared in each process
+ELEM_CALC = ElemCalc()
+
+
+@lru_cache(maxsize=ELEM_CACHE_SIZE)
+def get_elem_info(abbr, charge=''):
+    """
+    Calculate the formula, elements and exact mass of a lipid. The results are cached by (abbr, charge).
+
+    Args:
+        abbr (str): the lipid abbreviation e.g. 'PC(36:3)' or 'FA18:1'
+        charge (str): the charge mode e.g. '[M-H]-', use '' for the neutral lipid
+
+    Returns:
+        elem_info (ElemInfo): immutable (formula, elem, exactmass), elem as tuple of (element, count) pairs
+
+    """
+
+    return ELEM_CALC.calc_elem_info(abbr, charge=charge)
+
+
 if __name__ == '__main__':
 
     usr_bulk_abbr_lst = [
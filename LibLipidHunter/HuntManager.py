@@ -19,14 +19,12 @@
 
 import pickle
 
-import math
-import multiprocessing
-from multiprocessing import Pool
 import os
 import time
 
+from LibLipidHunter.HunterPool import HunterPool, TASK_PER_CORE, split_tasks
 from LibLipidHunter.LogPageCreator import LogPageCreator
-from LibLipidHunter.PanelPlotter import gen_plot
+from LibLipidHunter.PanelPlotter import gen_plot, get_plot_cost, save_plot_params
 
 
 def save_hunt(results_pickle_dct, hunt_save_path):
@@ -78,17 +76,20 @@ def recover_hunt(hunter_data):
         gen_html_report(param_dct, output_df, lipid_info_img_lst)
 
 
-def gen_html_report(param_dct, output_df, lipid_info_img_lst):
+def start_html_report(param_dct):
+    """
+    Create the output folders and the report pages, the identifications are added by LogPageCreator.add_info()
+    as the results arrive.
+
+    Args:
+        param_dct (dict): the LipidHunter settings
+
+    Returns:
+        log_pager (LogPageCreator): the report of this run
+
+    """
 
-    usr_vendor = param_dct['vendor']
     output_folder = param_dct['img_output_folder_str']
-    usr_ms1_ppm = param_dct['ms_ppm']
-    usr_ms2_ppm = param_dct['ms2_ppm']
-    usr_ms1_precision = usr_ms1_ppm * 1e-6
-    usr_ms2_precision = usr_ms2_ppm * 1e-6
-    usr_core_num = param_dct['core_number']
-    usr_dpi = param_dct['img_dpi']
-    usr_img_type = param_dct['img_type']
     hunter_start_time_str = param_dct['hunter_start_time']
 
     # keep stay in current working directory
@@ -107,56 +108,128 @@ def gen_html_report(param_dct, output_df, lipid_info_img_lst):
         print('[INFO] --> Output folder created...')
     os.chdir(current_path)
 
-    # generate html files
     log_pager = LogPageCreator(output_folder, hunter_start_time_str, param_dct)
-    log_pager.add_all_info(output_df)
+
+    return log_pager
+
+
+class ImageQueue(object):
+    """
+    Save or render the images of the identifications as soon as the results of each task arrive, so the plot inputs
+    of all identifications are not kept till the end of the run.
+    The plot inputs are saved to the sidecar files for --lazy-img and --preview-img. The images are rendered by the
+    worker processes if core_number > 1, the tasks are weighted by the number of peaks to draw.
+
+    Args:
+        param_dct (dict): the LipidHunter settings
+        hunter_pool (HunterPool): worker processes to render the images, a new pool is started if not set and
+            core_number > 1
+
+    """
+
+    def __init__(self, param_dct: dict, hunter_pool: HunterPool = None):
+
+        self.output_folder = param_dct['img_output_folder_str']
+        self.vendor = param_dct['vendor']
+        self.ms1_precision = param_dct['ms_ppm'] * 1e-6
+        self.core_num = param_dct['core_number']
+        self.dpi = param_dct['img_dpi']
+        self.img_type = param_dct['img_type']
+        self.lazy_img = param_dct.get('lazy_img', False)
+        self.preview_img = param_dct.get('preview_img', False)
+        self.debug_mode = param_dct.get('debug_mode', 'OFF')
+
+        self.img_count = 0
+        self._hunter_pool = hunter_pool
+        self._own_pool = False
+        self._task_count = 0
+        self._result_lst = []
+
+    def add_images(self, img_param_lst: list):
+        """
+        Save or render the images of one result. The output folder must be created by start_html_report() first.
+
+        Args:
+            img_param_lst (list): img_param_dct of each identification from get_lipid_info()
+
+        """
+
+        img_lst = [x for x in img_param_lst if x is not None]
+        if not img_lst:
+            return
+        self.img_count += len(img_lst)
+
+        if self.lazy_img is True:
+            # keep only the plot inputs, the images are rendered on demand
+            save_plot_params(img_lst, img_type=self.img_type, dpi=self.dpi, vendor=self.vendor,
+                             ms1_precision=self.ms1_precision)
+            return
+        if self.preview_img is True:
+            # the report shows the preview images, the full resolution images are rendered on demand
+            save_plot_params(img_lst, img_type=self.img_type, dpi=self.dpi, vendor=self.vendor,
+                             ms1_precision=self.ms1_precision, preview=True)
+
+        if self.core_num > 1:
+            if self._hunter_pool is None:
+                self._hunter_pool = HunterPool(self.core_num)
+                self._own_pool = True
+            # images of dense spectra take much longer, the tasks are weighted by the number of peaks to draw
+            img_task_lst, img_task_cost_lst = split_tasks(img_lst, [get_plot_cost(x) for x in img_lst],
+                                                          self.core_num * TASK_PER_CORE)
+            img_kwargs_lst = []
+            for img_sub_lst in img_task_lst:
+                self._task_count += 1
+                print('[STATUS] >>> Task #%i ==> Generating output images ... image count: %i'
+                      % (self._task_count, len(img_sub_lst)))
+                if self.debug_mode == 'ON':
+                    for img_param_dct in img_sub_lst:
+                        print(img_param_dct['save_img_as'])
+                img_kwargs_lst.append({'param_dct_lst': img_sub_lst, 'core_count': self._task_count,
+                                       'img_type': self.img_type, 'dpi': self.dpi, 'vendor': self.vendor,
+                                       'ms1_precision': self.ms1_precision, 'preview': self.preview_img})
+            self._result_lst.extend(self._hunter_pool.submit_all(gen_plot, img_kwargs_lst,
+                                                                 cost_lst=img_task_cost_lst))
+        else:
+            print('[INFO] --> Using single core mode...')
+            gen_plot(img_lst, 1, self.img_type, self.dpi, self.vendor, self.ms1_precision, preview=self.preview_img)
+
+    def close(self):
+        """
+        Wait for all images to be rendered.
+
+        """
+
+        for img_result in self._result_lst:
+            img_result.wait()
+        self._result_lst = []
+        if self._own_pool is True:
+            self._hunter_pool.close()
+            self._hunter_pool = None
+            self._own_pool = False
+
+        if self.lazy_img is True:
+            print('[INFO] --> Images are not generated, render them by: python cmd_lipidhunter.py --render %s'
+                  % self.output_folder)
+        elif self.preview_img is True:
+            print('[INFO] --> Preview images only, render the full resolution images by: '
+                  'python cmd_lipidhunter.py --render %s' % self.output_folder)
+
+
+def gen_html_report(param_dct, output_df, lipid_info_img_lst, hunter_pool=None, log_pager=None, img_queue=None):
+
+    # generate html files, the report of a running hunt has all results added already
+    if log_pager is None:
+        log_pager = start_html_report(param_dct)
+        log_pager.add_all_info(output_df)
     log_pager.close_page()
     # del log_pager
-    print('[STATUS] >>> start to generate images: image count %i' % len(lipid_info_img_lst))
-
-    if usr_core_num > 1:
-        parallel_pool = Pool(usr_core_num)
-        img_num = len(lipid_info_img_lst)
-        img_sub_len = int(math.ceil(img_num / usr_core_num))
-        img_sub_key_lst = [lipid_info_img_lst[k: k + img_sub_len] for k in range(0, img_num, img_sub_len)]
-
-        worker_count = 1
-        for img_sub_lst in img_sub_key_lst:
-            if isinstance(img_sub_lst, tuple) or isinstance(img_sub_lst, list):
-                if None in img_sub_lst:
-                    img_sub_lst = [x for x in img_sub_lst if x is not None]
-                else:
-                    pass
-                # img_params_dct = {'lipid_info_img_lst': img_sub_lst, 'usr_core_num': usr_core_num,
-                #                   'usr_img_type': usr_img_type, 'usr_dpi': usr_dpi, 'usr_vendor': usr_vendor,
-                #                   'usr_ms1_precision': usr_ms1_precision, 'worker_count': worker_count}
-
-                if len(img_sub_lst) > 0:
-                    print('[STATUS] >>> Core #%i ==> Generating output images ... image count: %i'
-                          % (worker_count, len(img_sub_lst)))
-                    if 'debug_mode' in list(param_dct.keys()):
-                        if param_dct['debug_mode'] == 'ON':
-                            for img_param_dct in img_sub_lst:
-                                print(img_param_dct['save_img_as'])
-                    parallel_pool.apply_async(gen_plot, args=(img_sub_lst, worker_count, usr_img_type,
-                                                              usr_dpi, usr_vendor, usr_ms1_precision))
-                    worker_count += 1
-        # del img_sub_key_lst
-        # del img_sub_lst
-        parallel_pool.close()
-        parallel_pool.join()
 
-    else:
-        worker_count = 1
-        print('[INFO] --> Using single core mode...')
-        if isinstance(lipid_info_img_lst, tuple) or isinstance(lipid_info_img_lst, list):
-            if None in lipid_info_img_lst:
-                lipid_info_img_lst = [x for x in lipid_info_img_lst if x is not None]
-            else:
-                pass
-            if len(lipid_info_img_lst) > 0:
-                gen_plot(lipid_info_img_lst, worker_count, usr_img_type, usr_dpi,
-                         usr_vendor, usr_ms1_precision)
+    # the images of a running hunt are saved or rendered as the results arrive
+    if img_queue is None:
+        img_queue = ImageQueue(param_dct, hunter_pool=hunter_pool)
+        print('[STATUS] >>> start to generate images: image count %i' % len(lipid_info_img_lst))
+        img_queue.add_images(lipid_info_img_lst)
+    img_queue.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2019  SysMedOs_team @ AG Bioanalytik, University of Leipzig:
+# SysMedOs_team: Zhixu Ni, Georgia Angelidou, Mike Lange, Maria Fedorova
+# LipidHunter is Dual-licensed
+#     For academic and non-commercial use: `GPLv2 License` Please read more information by the following link:
+#         [The GNU General Public License version 2] (https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html)
+#     For commercial use:
+#         please contact the SysMedOs_team by email.
+# Please cite our publication in an appropriate form.
+# Ni, Zhixu, Georgia Angelidou, Mike Lange, Ralf Hoffmann, and Maria Fedorova.
+# "LipidHunter identifies phospholipids by high-throughput processing of LC-MS and shotgun lipidomics datasets."
+# Analytical Chemistry (2017).
+# DOI: 10.1021/acs.analchem.7b01126
+#
+# For more info please contact:
+#     Developer Zhixu Ni zhixu.ni@uni-leipzig.de
+#     Developer Georgia Angelidou georgia.angelidou@uni-leipzig.de
+
+from functools import partial
+import os
+import pickle
+import queue
+import shutil
+import tempfile
+from multiprocessing import Pool
+from multiprocessing.pool import AsyncResult
+from typing import Callable, Iterator, List, Tuple
+
+import numpy as np
+
+# number of tasks planned for each worker process, smaller tasks keep all workers busy till the end
+TASK_PER_CORE = 4
+
+# static data of the current run, loaded once in each worker process
+_worker_static_file = ''
+_worker_static_dct = {}
+
+
+def call_with_task_idx(callback: Callable, task_idx: int, result):
+    """
+    Call the callback of HunterPool.submit_all() with the index of the task instead of its result.
+
+    Args:
+        callback (Callable): called with the index of the task
+        task_idx (int): the index of the task in kwargs_lst
+        result: the result or the exception of the task, not used
+
+    """
+
+    callback(task_idx)
+
+
+def init_worker():
+    """
+    Import the modules used by the tasks once when the worker process starts.
+    The numba functions of ParallelFunc are compiled during the import.
+
+    """
+
+    import LibLipidHunter.ParallelFunc
+    import LibLipidHunter.PrecursorHunter
+    import LibLipidHunter.SpectraReader
+    import LibLipidHunter.ScoreHunter
+    import LibLipidHunter.PanelPlotter
+
+
+def load_static(static_file: str) -> dict:
+    """
+    Load the static data of a run in the worker process. The file is only read when the run changed.
+
+    Args:
+        static_file (str): the pickle file saved by HunterPool.set_static()
+
+    Returns:
+        static_dct (dict)
+
+    """
+
+    global _worker_static_file
+    global _worker_static_dct
+
+    if static_file != _worker_static_file:
+        with open(static_file, 'rb') as static_obj:
+            _worker_static_dct = pickle.load(static_obj)
+        _worker_static_file = static_file
+
+    return _worker_static_dct
+
+
+def run_task(func: Callable, kwargs: dict, static_file: str = '', static_key_lst: List[str] = None):
+    """
+    Run one task in the worker process. The static data listed in static_key_lst are added to the kwargs.
+
+    Args:
+        func (Callable): the function to run
+        kwargs (dict): keyword arguments of the function
+        static_file (str): the pickle file of the static data
+        static_key_lst (list): names of the static data to be used as keyword arguments
+
+    Returns:
+        the return value of func
+
+    """
+
+    if static_file and static_key_lst:
+        static_dct = load_static(static_file)
+        kwargs = dict(kwargs)
+        for _key in static_key_lst:
+            kwargs[_key] = static_dct[_key]
+
+    return func(**kwargs)
+
+
+def split_tasks(key_lst: list, cost_lst: list, task_num: int) -> Tuple[List[list], List[float]]:
+    """
+    Split the keys into tasks of about the same estimated cost. The keys stay in the same order and each task
+    contains the next keys in key_lst, a key costs more than the average task is planned as its own task.
+
+    Args:
+        key_lst (list): the keys to process e.g. the group keys of the precursors
+        cost_lst (list): the estimated cost of each key e.g. number of candidates x number of MS2 peaks
+        task_num (int): the number of tasks to plan
+
+    Returns:
+        task_lst (list): list of key lists
+        task_cost_lst (list): the estimated cost of each task
+
+    """
+
+    task_lst = []
+    task_cost_lst = []
+    key_count = len(key_lst)
+    if key_count == 0:
+        return task_lst, task_cost_lst
+
+    cost_arr = np.maximum(np.array(cost_lst, dtype=np.float64), 1.0)
+    task_num = max(1, min(int(task_num), key_count))
+    task_cost = cost_arr.sum() / task_num
+
+    task_key_lst = []
+    task_sum = 0.0
+    for _key, _cost in zip(key_lst, cost_arr):
+        if task_key_lst and task_sum + _cost > task_cost:
+            task_lst.append(task_key_lst)
+            task_cost_lst.append(task_sum)
+            task_key_lst = []
+            task_sum = 0.0
+        task_key_lst.append(_key)
+        task_sum += _cost
+    task_lst.append(task_key_lst)
+    task_cost_lst.append(task_sum)
+
+    return task_lst, task_cost_lst
+
+
+def iter_done(result_lst: List[AsyncResult], done_queue: queue.Queue) -> Iterator[Tuple[int, AsyncResult]]:
+    """
+    Yield the finished tasks in the order of completion.
+
+    Args:
+        result_lst (list): AsyncResult of each task
+        done_queue (queue.Queue): receives the index of each finished task
+
+    Returns:
+        Iterator of (task index, finished AsyncResult)
+
+    """
+
+    for _count in range(len(result_lst)):
+        _idx = done_queue.get()
+        yield _idx, result_lst[_idx]
+
+
+class HunterPool(object):
+    """
+    Long lived worker processes shared by all multiprocessing steps of one run or of a batch of runs.
+    The workers are started once, the static data of each run e.g. FA table, score weights and key fragments
+    are sent once by set_static() and then loaded once per worker process instead of sent with every task.
+
+    Args:
+        core_num (int): number of worker processes
+
+    """
+
+    def __init__(self, core_num: int):
+
+        self.core_num = core_num
+        self._pool = Pool(core_num, initializer=init_worker)
+        self._static_folder = tempfile.mkdtemp(prefix='lipidhunter_static_')
+        self._static_file = ''
+        self._static_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def set_static(self, static_dct: dict) -> str:
+        """
+        Publish the static data of a run to all workers.
+
+        Args:
+            static_dct (dict): {argument name: data}
+
+        Returns:
+            static_file (str): the pickle file of the static data
+
+        """
+
+        self._static_count += 1
+        static_file = os.path.join(self._static_folder, 'static_%i.pkl' % self._static_count)
+        with open(static_file, 'wb') as static_obj:
+            pickle.dump(static_dct, static_obj, protocol=pickle.HIGHEST_PROTOCOL)
+        self._static_file = static_file
+
+        return static_file
+
+    def submit(self, func: Callable, kwargs: dict, static_key_lst: List[str] = None,
+               callback: Callable = None) -> AsyncResult:
+        """
+        Submit one task to the workers.
+
+        Args:
+            func (Callable): a function defined on module level
+            kwargs (dict): keyword arguments of the function
+            static_key_lst (list): names of the static data from set_static() to be added to kwargs
+            callback (Callable): called in the main process with the return value of func or with the exception
+                of the failed task
+
+        Returns:
+            AsyncResult: use .get() to receive the return value of func
+
+        """
+
+        if static_key_lst and not self._static_file:
+            raise ValueError('No static data published, use set_static() first.')
+
+        return self._pool.apply_async(run_task, args=(func, kwargs, self._static_file, static_key_lst),
+                                      callback=callback, error_callback=callback)
+
+    def submit_all(self, func: Callable, kwargs_lst: List[dict], cost_lst: list = None,
+                   static_key_lst: List[str] = None, callback: Callable = None) -> List[AsyncResult]:
+        """
+        Submit all tasks to the shared task queue at once. Each idle worker takes the next task from the queue,
+        the most expensive tasks are submitted first so that the small tasks fill the gaps at the end.
+
+        Args:
+            func (Callable): a function defined on module level
+            kwargs_lst (list): keyword arguments of each task
+            cost_lst (list): the estimated cost of each task, the tasks are submitted in the given order if not set
+            static_key_lst (list): names of the static data from set_static() to be added to kwargs
+            callback (Callable): called in the main process with the index of the task in kwargs_lst once the task
+                is finished or failed
+
+        Returns:
+            result_lst (list): AsyncResult of each task in the same order as kwargs_lst
+
+        """
+
+        task_idx_lst = list(range(len(kwargs_lst)))
+        if cost_lst is not None:
+            task_idx_lst = sorted(task_idx_lst, key=lambda _idx: cost_lst[_idx], reverse=True)
+
+        result_dct = {}
+        for _idx in task_idx_lst:
+            _callback = None
+            if callback is not None:
+                _callback = partial(call_with_task_idx, callback, _idx)
+            result_dct[_idx] = self.submit(func, kwargs_lst[_idx], static_key_lst=static_key_lst,
+                                           callback=_callback)
+
+        return [result_dct[_idx] for _idx in range(len(kwargs_lst))]
+
+    def submit_all_unordered(self, func: Callable, kwargs_lst: List[dict], cost_lst: list = None,
+                             static_key_lst: List[str] = None) -> Iterator[Tuple[int, AsyncResult]]:
+        """
+        Submit all tasks like submit_all() and receive each result as soon as its task is finished.
+
+        Args:
+            func (Callable): a function defined on module level
+            kwargs_lst (list): keyword arguments of each task
+            cost_lst (list): the estimated cost of each task, the tasks are submitted in the given order if not set
+            static_key_lst (list): names of the static data from set_static() to be added to kwargs
+
+        Returns:
+            Iterator of (task index in kwargs_lst, finished AsyncResult) in the order of completion
+
+        """
+
+        done_queue = queue.Queue()
+        result_lst = self.submit_all(func, kwargs_lst, cost_lst=cost_lst, static_key_lst=static_key_lst,
+                                     callback=done_queue.put)
+
+        return iter_done(result_lst, done_queue)
+
+    def close(self):
+        """
+        Wait for all submitted tasks, then stop the workers and remove the static data.
+
+        """
+
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        shutil.rmtree(self._static_folder, ignore_errors=True)
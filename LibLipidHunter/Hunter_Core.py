@@ -17,10 +17,8 @@
 #     Developer Zhixu Ni zhixu.ni@uni-leipzig.de
 #     Developer Georgia Angelidou georgia.angelidou@uni-leipzig.de
 
-import math
-import multiprocessing
-from multiprocessing import Pool
 import os
+import re
 import sys
 from sys import platform
 import time
@@ -29,17 +27,28 @@ from typing import Tuple, Union
 from numpy import int64
 import pandas as pd
 
+from LibLipidHunter.HunterPool import HunterPool, TASK_PER_CORE, split_tasks
+from LibLipidHunter.IsotopeHunter import ISOTOPE_HUNTER
 from LibLipidHunter.LipidComposer import LipidComposer
+from LibLipidHunter.LipidMasterCache import LipidMasterCache, DEFAULT_LM_CACHE_FOLDER, DEFAULT_LM_CACHE_SIZE
+from LibLipidHunter.SpectraCache import SpectraCache, DEFAULT_CACHE_FOLDER, DEFAULT_CACHE_SIZE
 from LibLipidHunter.SpectraReader import extract_mzml
 from LibLipidHunter.SpectraReader import get_spectra
 from LibLipidHunter.SpectraReader import get_xic_from_pl
 from LibLipidHunter.SpectraReader import get_spec_info
 from LibLipidHunter.LogPageCreator import LogPageCreator
 from LibLipidHunter.PrecursorHunter import PrecursorHunter
+from LibLipidHunter.ScoreHunter import compile_key_frag
 from LibLipidHunter.ScoreHunter import get_lipid_info
 from LibLipidHunter.PanelPlotter import gen_plot
 from LibLipidHunter.HuntManager import save_hunt
-from LibLipidHunter.HuntManager import gen_html_report
+from LibLipidHunter.HuntManager import ImageQueue, gen_html_report, start_html_report
+
+# platforms with multiprocessing support, other systems are forced to use single core mode
+MULTI_PLATFORM_LST = ['linux', 'linux2', 'win32', 'darwin']
+# the TG [M+Na]+ weight factors are not in the TG file of score_cfg_tg, use the bundled file if not defined
+DEFAULT_SCORE_CFG_TG_NA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                       'ConfigurationFiles', '2-Score_weight_TG_Na.xlsx')
 
 
 def save_output(output_path: str, output_df: pd.DataFrame, output_name: str = 'output'):
@@ -82,8 +91,8 @@ def save_output(output_path: str, output_df: pd.DataFrame, output_name: str = 'o
 
 
 def huntlipids(param_dct: dict, error_lst: list,
-               save_fig: bool = True, save_session: bool = False) \
-        -> Tuple[Union[float, bool], list, Union[pd.DataFrame, bool]]:
+               save_fig: bool = True, save_session: bool = False, spectra_data: tuple = None,
+               hunter_pool: HunterPool = None) -> Tuple[Union[float, bool], list, Union[pd.DataFrame, bool]]:
     """
     This is the core workflow of lipidhunter.
     The cmd_lipidhunter and LipidHunter GUI transfer the parsed Lipidhunter configurations as param_dct.
@@ -111,6 +120,40 @@ def huntlipids(param_dct: dict, error_lst: list,
         error_lst (list): All errors collected before this function.
         save_fig (bool): Can be set to False to skip image generation (not recommended).
         save_session (bool): Can be set to True to save session as a file using pickle.
+        spectra_data (tuple): Already extracted spectra from the same mzML as (scan_info_df, spectra_store,
+            ms1_xic_df) returned by extract_mzml. The mzML will not be parsed again if this is set.
+        hunter_pool (HunterPool): Worker processes to be used by all multiprocessing steps.
+            A new pool is started and closed for this run if not set and core_number > 1.
+
+    Returns:
+        tot_run_time (float): The total run time as float or False if error occurs.
+        error_lst (list): List of errors collected during the run.
+        output_df (pd.DataFrame, bool): The output DataFame or False if error occurs.
+
+    """
+
+    if hunter_pool is None and param_dct['core_number'] > 1 and platform in MULTI_PLATFORM_LST:
+        with HunterPool(param_dct['core_number']) as run_pool:
+            return run_huntlipids(param_dct, error_lst, save_fig=save_fig, save_session=save_session,
+                                  spectra_data=spectra_data, hunter_pool=run_pool)
+    else:
+        return run_huntlipids(param_dct, error_lst, save_fig=save_fig, save_session=save_session,
+                              spectra_data=spectra_data, hunter_pool=hunter_pool)
+
+
+def run_huntlipids(param_dct: dict, error_lst: list, save_fig: bool = True, save_session: bool = False,
+                   spectra_data: tuple = None, hunter_pool: HunterPool = None) \
+        -> Tuple[Union[float, bool], list, Union[pd.DataFrame, bool]]:
+    """
+    The workflow of huntlipids using the worker processes of hunter_pool.
+
+    Args:
+        param_dct (dict): The overall parameters received for processing.
+        error_lst (list): All errors collected before this function.
+        save_fig (bool): Can be set to False to skip image generation (not recommended).
+        save_session (bool): Can be set to True to save session as a file using pickle.
+        spectra_data (tuple): Already extracted spectra as (scan_info_df, spectra_store, ms1_xic_df).
+        hunter_pool (HunterPool): Worker processes, required if core_number > 1.
 
     Returns:
         tot_run_time (float): The total run time as float or False if error occurs.
@@ -164,6 +207,14 @@ def huntlipids(param_dct: dict, error_lst: list,
     usr_core_num = param_dct['core_number']
     usr_max_ram = param_dct['max_ram']
 
+    # spectra cache is used by default, set spectra_cache to False to always parse the mzML
+    if param_dct.get('spectra_cache', True) is False:
+        usr_spectra_cache = None
+        print('[INFO] --> Spectra cache disabled ...')
+    else:
+        usr_spectra_cache = SpectraCache(param_dct.get('spectra_cache_folder', DEFAULT_CACHE_FOLDER),
+                                         max_size=param_dct.get('spectra_cache_size', DEFAULT_CACHE_SIZE))
+
     # usr_dpi = param_dct['img_dpi']
     # usr_img_type = param_dct['img_type']
 
@@ -209,26 +260,38 @@ def huntlipids(param_dct: dict, error_lst: list,
     composer_param_dct = {'fa_whitelist': usr_fa_xlsx, 'lipid_class': usr_lipid_class,
                           'charge_mode': usr_charge, 'exact_position': 'FALSE'}
 
-    existed_lipid_master_path = ''  # reserved to load existing lipid master table for later development
-    use_existed_lipid_master = False  # reserved to re-use lipid master table
     save_lipid_master_table = False
     if 'debug_mode' in list(param_dct.keys()):
         if param_dct['debug_mode'] == 'ON':
-            if 'lipid_master_table' in list(param_dct.keys()):
-                existed_lipid_master_path = param_dct['lipid_master_table']
-                if os.path.isfile(existed_lipid_master_path):
-                    use_existed_lipid_master = True
-                else:
-                    print('[ERROR] !!! Failed to load existed Lipid Master table: %s', existed_lipid_master_path)
-            else:
-                save_lipid_master_table = True
-
-        # reserved to re-use lipid master table
-        # if 'save_lipid_master_table' in list(param_dct.keys()):
-        #     if param_dct['save_lipid_master_table'] == 'CSV':
-        #         save_lipid_master_table = True
-
-    if use_existed_lipid_master is False:
+            save_lipid_master_table = True
+
+    # lipid master cache is used by default, set lipid_master_cache to False to always compose the lipid master table
+    usr_lipid_master_df = False
+    usr_fa_df = False
+    lipid_master_key = ''
+    if param_dct.get('lipid_master_cache', True) is False:
+        usr_lipid_master_cache = None
+        print('[INFO] --> Lipid Master cache disabled ...')
+    else:
+        usr_lipid_master_cache = LipidMasterCache(param_dct.get('lipid_master_cache_folder', DEFAULT_LM_CACHE_FOLDER),
+                                                  max_size=param_dct.get('lipid_master_cache_size',
+                                                                         DEFAULT_LM_CACHE_SIZE))
+        try:
+            lipid_master_key = usr_lipid_master_cache.get_key(usr_fa_xlsx, lipid_class=usr_lipid_class,
+                                                              charge_mode=usr_charge,
+                                                              exact_position=composer_param_dct['exact_position'],
+                                                              ms2_ppm=usr_ms2_ppm)
+        except (IOError, OSError) as _e:
+            # the FA whitelist error is reported by the LipidComposer below
+            print('[WARNING] !!! Failed to read FA whitelist for Lipid Master cache ...', _e)
+            usr_lipid_master_cache = None
+        if usr_lipid_master_cache is not None:
+            cached_lipid_master = usr_lipid_master_cache.load(lipid_master_key)
+            if cached_lipid_master is not False:
+                usr_lipid_master_df, usr_fa_df = cached_lipid_master
+                print('[INFO] --> Lipid Master table loaded >>>', usr_lipid_master_df.shape[0])
+
+    if usr_lipid_master_df is False:
         try:
             print('[INFO] --> Start to generate Lipid Master Table ...')
             t_lm_0 = time.time()
@@ -241,15 +304,6 @@ def huntlipids(param_dct: dict, error_lst: list,
             error_lst.append('[ERROR] !!! Some files missing...')
             error_lst.append('... ... Please check your settings in the configuration file ...')
             return False, error_lst, False
-    else:
-        try:
-            print('[INFO] --> Try to use existed Lipid Master table: %s' % existed_lipid_master_path)
-            usr_lipid_master_df = pd.read_csv(existed_lipid_master_path)
-            print('[INFO] --> Lipid Master table loaded >>>', usr_lipid_master_df.shape[0])
-        except Exception as e:
-            print(e)
-            error_lst.append(e)
-            return False, error_lst, False
 
     if isinstance(usr_lipid_master_df, pd.DataFrame):
 
@@ -274,13 +328,29 @@ def huntlipids(param_dct: dict, error_lst: list,
     else:
         pass
 
-    # for TG has the fragment of neutral loss of the FA and the fragments for the MG
-    usr_fa_df = lipidcomposer.calc_fa_query(usr_lipid_class, usr_fa_xlsx, ms2_ppm=usr_ms2_ppm)
-    # del lipidcomposer
     if usr_fa_df is False:
-        print('[ERROR] !!! Failed to generate FA info table ...\n')
-        error_lst.append('[ERROR] !!! Failed to generate FA info table ...\n')
-        return False, error_lst, False
+        # for TG has the fragment of neutral loss of the FA and the fragments for the MG
+        usr_fa_df = lipidcomposer.calc_fa_query(usr_lipid_class, usr_fa_xlsx, ms2_ppm=usr_ms2_ppm)
+        # del lipidcomposer
+        if usr_fa_df is False:
+            print('[ERROR] !!! Failed to generate FA info table ...\n')
+            error_lst.append('[ERROR] !!! Failed to generate FA info table ...\n')
+            return False, error_lst, False
+        if usr_lipid_master_cache is not None:
+            usr_lipid_master_cache.save(lipid_master_key, usr_lipid_master_df, usr_fa_df,
+                                        info_dct={'fa_whitelist': os.path.abspath(usr_fa_xlsx),
+                                                  'lipid_class': usr_lipid_class, 'charge_mode': usr_charge,
+                                                  'exact_position': composer_param_dct['exact_position'],
+                                                  'ms2_ppm': usr_ms2_ppm})
+
+    # isotope patterns of all formulas in the lipid master table are calculated once and sent to each worker
+    # set isotope_pattern_table to False to calculate the patterns only on demand
+    usr_isotope_ratio_dct = {}
+    usr_formula_col = '%s_FORMULA' % usr_charge
+    if param_dct.get('isotope_pattern_table', True) is not False and usr_formula_col in usr_lipid_master_df.columns:
+        usr_isotope_ratio_dct = ISOTOPE_HUNTER.precompute_isotope_ratio(
+            usr_lipid_master_df[usr_formula_col].unique().tolist(), only_c=param_dct['fast_isotope'])
+        print('[INFO] --> Isotope patterns calculated: %i' % len(usr_isotope_ratio_dct))
 
     lipid_info_df = usr_lipid_master_df  # make a copy to avoid pandas warning when modify it later
 
@@ -342,17 +412,35 @@ def huntlipids(param_dct: dict, error_lst: list,
     # Lipid identification workflow start.
 
     # Extract all spectra from mzML to pandas DataFrame
-    usr_scan_info_df, usr_spectra_pl, ms1_xic_df = extract_mzml(usr_mzml, usr_rt_range, dda_top=usr_dda_top,
-                                                                ms1_threshold=usr_ms1_threshold,
-                                                                ms2_threshold=usr_ms2_threshold,
-                                                                ms1_precision=usr_ms1_precision,
-                                                                ms2_precision=usr_ms2_precision,
-                                                                vendor=usr_vendor, ms1_max=usr_ms1_max)
+    if isinstance(spectra_data, tuple) and len(spectra_data) == 3:
+        print('[INFO] --> Use spectra already extracted from mzML ...')
+        usr_scan_info_df, usr_spectra_pl, ms1_xic_df = spectra_data
+        # scan_checker column is added later, keep the shared scan info unchanged
+        usr_scan_info_df = usr_scan_info_df.copy()
+    else:
+        try:
+            usr_scan_info_df, usr_spectra_pl, ms1_xic_df = extract_mzml(usr_mzml, usr_rt_range, dda_top=usr_dda_top,
+                                                                        ms1_threshold=usr_ms1_threshold,
+                                                                        ms2_threshold=usr_ms2_threshold,
+                                                                        ms1_precision=usr_ms1_precision,
+                                                                        ms2_precision=usr_ms2_precision,
+                                                                        vendor=usr_vendor, ms1_max=usr_ms1_max,
+                                                                        max_ram=usr_max_ram,
+                                                                        spectra_cache=usr_spectra_cache)
+        except MemoryError as _mem_e:
+            print('[ERROR] !!! Not enough RAM to extract mzML !!!', _mem_e)
+            error_lst.append('!! Not enough RAM to extract mzML: %s !!\n' % _mem_e)
+            return False, error_lst, False
 
     print('[INFO] --> MS1_XIC_df.shape', ms1_xic_df.shape)
+    # lookup tables of DDA events generated during extraction
+    usr_dda_index = usr_spectra_pl.dda_index
+    if usr_core_num > 1:
+        # peaks are memory mapped and shared by all worker processes
+        usr_spectra_pl.share()
     # Find all possible precursor according to lipid master table
     ms1_obs_pr_df = pr_hunter.get_matched_pr(usr_scan_info_df, usr_spectra_pl, ms1_max=usr_ms1_max,
-                                             core_num=usr_core_num, max_ram=usr_max_ram)
+                                             core_num=usr_core_num, hunter_pool=hunter_pool)
 
     if ms1_obs_pr_df is False:
         print('[WARNING] !!! NO suitable precursor --> Check settings!!\n')
@@ -392,102 +480,10 @@ def huntlipids(param_dct: dict, error_lst: list,
     print(ms1_xic_mz_lst)
     print('[INFO] --> Start to extract XIC')
 
-    # Distribute task according to core numbers
-    if len(ms1_xic_mz_lst) >= 3 * usr_core_num:
-        sub_len = int(math.ceil(len(ms1_xic_mz_lst) / usr_core_num))
-        core_key_list = [ms1_xic_mz_lst[k: k + sub_len] for k in range(0, len(ms1_xic_mz_lst), sub_len)]
-    else:
-        core_key_list = [ms1_xic_mz_lst]
-
-    # Start multiprocessing to get XIC according to precursor m/z found above
-    print('[STATUS] >>> Start multiprocessing to get XIC ==> ==> ==> Number of Cores: %i' % usr_core_num)
-    xic_dct = {}
-
-    if usr_core_num > 1:
-        xic_results_lst = []
-
-        if os_typ == 'windows':
-            parallel_pool = Pool(usr_core_num)
-            queue = ''
-            worker_count = 1
-            for core_list in core_key_list:
-                if isinstance(core_list, tuple) or isinstance(core_list, list):
-                    if None in core_list:
-                        core_list = [x for x in core_list if x is not None]
-                    else:
-                        pass
-                    print('[STATUS] >>> Core #%i ==> ...... processing ......' % worker_count)
-                    print(core_list)
-                    # TODO (georgia.angelidou@uni-leipzig.de): maybe can be combine or stay like this????
-                    xic_result = parallel_pool.apply_async(get_xic_from_pl, args=(core_list, ms1_xic_df, usr_xic_ppm,
-                                                                                  os_typ, queue))
-                    worker_count += 1
-                    xic_results_lst.append(xic_result)
-
-            parallel_pool.close()
-            parallel_pool.join()
-            # del ms1_xic_df
-            # TODO (georgia.angelidou@uni-leipzig.de): can be done before the join??????
-            for xic_result in xic_results_lst:
-                try:
-                    sub_xic_dct = xic_result.get()
-                    if len(list(sub_xic_dct.keys())) > 0:
-                        xic_dct.update(sub_xic_dct)
-
-                except (KeyError, SystemError, ValueError):
-                    pass
-            del xic_results_lst
-
-        else:  # for linux
-            jobs = []
-            queue = multiprocessing.Queue()
-            worker_count = 1
-            for core_list in core_key_list:
-                if isinstance(core_list, tuple) or isinstance(core_list, list):
-                    if None in core_list:
-                        core_list = [x for x in core_list if x is not None]
-                    else:
-                        pass
-                    print('[STATUS] >>> Core #%i ==> ...... processing ......' % worker_count)
-                    print(core_list)
-                    job = multiprocessing.Process(target=get_xic_from_pl, args=(core_list, ms1_xic_df, usr_xic_ppm,
-                                                                                os_typ, queue))
-                    worker_count += 1
-                    jobs.append(job)
-                    job.start()
-                    xic_results_lst.append(queue.get())
-            del ms1_xic_df
-
-            for j in jobs:
-                j.join()
-
-            # TODO (georgia,angelidou@uni-leipzig.de):
-            #  question does these part can be move before the different jobs are join?????
-            for xic_result in xic_results_lst:
-                try:
-                    if len(list(xic_result.keys())) > 0:
-                        xic_dct.update(xic_result)
-                except (KeyError, SystemError, ValueError):
-                    pass
-            del xic_results_lst
-    else:
-        print('[INFO] --> Using single core mode...')
-        queue = ''
-        worker_count = 1
-        for core_list in core_key_list:
-            if isinstance(core_list, tuple) or isinstance(core_list, list):
-                if None in core_list:
-                    core_list = [x for x in core_list if x is not None]
-                else:
-                    pass
-                print('[STATUS] >>> Core #1 Part %i ==> ...... processing ......' % worker_count)
-                print(core_list)
-                sub_xic_dct = get_xic_from_pl(core_list, ms1_xic_df, usr_xic_ppm, os_typ, queue)
-                worker_count += 1
-
-                if len(list(sub_xic_dct.keys())) > 0:
-                    xic_dct.update(sub_xic_dct)
-        del ms1_xic_df
+    # All XIC are extracted in one pass over the m/z sorted MS1 XIC table, no need to send the table to each core
+    print('[STATUS] >>> Start to get XIC ==> ==> ==> Number of XIC: %i' % len(ms1_xic_mz_lst))
+    xic_dct = get_xic_from_pl(ms1_xic_mz_lst, ms1_xic_df, usr_xic_ppm, 'linux_single')
+    del ms1_xic_df
 
     if len(list(xic_dct.keys())) == 0:
         print('[ERROR] !!! No precursor for XIC found !!')
@@ -505,171 +501,48 @@ def huntlipids(param_dct: dict, error_lst: list,
 
     target_ident_lst = []
     lipid_spec_info_dct = {}
-    spec_part_key_lst = []
-    split_seg = 1
     lipid_all_scan_num = checked_info_df['scan_checker'].nunique()
 
-    # Checked_info_df may become very large for TG in Thermo files, need to be divided for Multiprocessing
     checked_info_df_groups = checked_info_df.groupby(['Formula', 'scan_checker'])
     checked_info_key_lst = list(checked_info_df_groups.groups.keys())
     checked_info_key_num = len(checked_info_key_lst)
     print('[INFO] --> Total number of spectra features: %i | Number of proposed Formula: %i'
           % (lipid_all_scan_num, checked_info_key_num))
 
-    if lipid_all_scan_num > (usr_core_num * 100):
-
-        # Split tasks into few parts to avoid core waiting in multiprocessing
-        if usr_core_num * 200 < lipid_all_scan_num <= usr_core_num * 400:
-            split_seg = 2
-        elif usr_core_num * 400 < lipid_all_scan_num:
-            split_seg = 3
-        else:
-            split_seg = 2
-
-        spec_part_len = int(math.ceil(lipid_all_scan_num / split_seg))  # Number of scan in each part
-        if spec_part_len > 200:
-            spec_part_len = 200
-
-        spec_part_lst = [list(checked_info_df['scan_checker'].unique())[k: k + spec_part_len]
-                         for k in range(0, lipid_all_scan_num, spec_part_len)]
-
-        for part_lst in spec_part_lst:
-            if None in part_lst:
-                part_lst = [x for x in part_lst if x is not None]
-            spec_sub_len = int(math.ceil(len(part_lst) / usr_core_num))
-            scan_sub_lst = [part_lst[k: k + spec_sub_len] for k in range(0, len(part_lst), spec_sub_len)]
-            for scan_lst in scan_sub_lst:
-                _tmp_lipid_info_df = checked_info_df[checked_info_df['scan_checker'].isin(scan_lst)]
-                _tmp_info_groups = _tmp_lipid_info_df.groupby(['Formula', 'scan_checker'])
-                _tmp_group_key_lst = list(_tmp_info_groups.groups.keys())
-                _tmp_group_key_num = len(_tmp_group_key_lst)
-                # chk_info_df_lst.append([_tmp_lipid_info_df, _tmp_info_groups])
-                spec_sub_key_lst = [_tmp_group_key_lst[k: k + spec_sub_len]
-                                    for k in range(0, _tmp_group_key_num, spec_sub_len)]
-                spec_part_key_lst.append((spec_sub_key_lst, _tmp_info_groups))
-
-        print(
-            '[INFO] --> Distributed tasks into %i parts with max %i features ...' % (len(spec_part_lst), spec_part_len))
-
-    else:
-
-        spec_sub_len = int(math.ceil(checked_info_key_num / usr_core_num))
-        spec_sub_key_lst = [checked_info_key_lst[k: k + spec_sub_len] for k in
-                            range(0, checked_info_key_num, spec_sub_len)]
-        spec_part_key_lst.append((spec_sub_key_lst, checked_info_df_groups))
-    del checked_info_df_groups
-
     if usr_core_num > 1:
-        part_tot = len(spec_part_key_lst)
-        part_counter = 1
-        queue = ''
-
-        for spec_sub_lst in spec_part_key_lst:
-
-            spec_sub_key_lst = spec_sub_lst[0]
-            sub_info_groups = spec_sub_lst[1]
-
-            if part_tot == 1:
-                print('[STATUS] >>> Start multiprocessing to get Spectra info ==> Max Number of Cores: %i'
-                      % usr_core_num)
-            else:
-                print('[STATUS] >>> Start multiprocessing to get Spectra info ==> Part %i / %i '
-                      '--> Max Number of Cores: %i'
-                      % (part_counter, part_tot, usr_core_num))
-
-            spec_results_lst = []
-
-            if os_typ == 'windows':
-                parallel_pool = Pool(usr_core_num)
-                # usr_queue = ''
-                worker_count = 1
-                for _sub_lst in spec_sub_key_lst:
-                    if isinstance(_sub_lst, tuple) or isinstance(_sub_lst, list):
-                        if None in _sub_lst:
-                            _sub_lst = [x for x in _sub_lst if x is not None]
-                        else:
-                            pass
-                        print('[STATUS] >>> Core #%i ==> ...... processing ......' % worker_count)
-                        spec_result = parallel_pool.apply_async(get_spec_info, args=(_sub_lst, sub_info_groups,
-                                                                                     usr_scan_info_df, os_typ, queue))
-                        worker_count += 1
-                        if worker_count > usr_core_num:
-                            worker_count = 1
-                        spec_results_lst.append(spec_result)
-
-                parallel_pool.close()
-                parallel_pool.join()
-
-            else:  # for linux
-                jobs = []
-                queue_spec = multiprocessing.Queue()
-                worker_count = 1
-                for _sub_lst in spec_sub_key_lst:
-                    if isinstance(_sub_lst, tuple) or isinstance(_sub_lst, list):
-                        if None in _sub_lst:
-                            _sub_lst = [x for x in _sub_lst if x is not None]
-                        else:
-                            pass
-                        print('[STATUS] >>> Core #%i ==> ...... processing ......' % worker_count)
-                        job = multiprocessing.Process(target=get_spec_info, args=(_sub_lst, sub_info_groups,
-                                                                                  usr_scan_info_df, os_typ, queue_spec))
-                        worker_count += 1
-                        jobs.append(job)
-                        job.start()
-                        spec_results_lst.append(queue_spec.get())
-                for j in jobs:
-                    j.join()
-            del sub_info_groups
-            #  Merge multiprocessing results
-            for spec_result in spec_results_lst:
-
-                if os_typ == 'windows':
-                    try:
-                        sub_spec_dct = spec_result.get()
-                        # print(sub_spec_dct)
-                        if len(list(sub_spec_dct.keys())) > 0:
-                            lipid_spec_info_dct.update(sub_spec_dct)
-                    except (KeyError, SystemError, ValueError):
-                        print('[ValueError] !!! must supply a tuple to get_group with multiple grouping keys ...')
-                else:  # for linux
-                    try:
-                        if len(list(spec_result.keys())) > 0:
-                            lipid_spec_info_dct.update(spec_result)
-                    except (KeyError, SystemError, ValueError):
-                        print('[ValueError] !!! must supply a tuple to get_group with multiple grouping keys ...')
-            # del spec_result
-            # del spec_results_lst
-            if part_tot == 1:
-                print('[STATUS] >>> multiprocessing results merged')
-            else:
-                print('[STATUS] >>> multiprocessing results merged ==> Part %i / %i '
-                      % (part_counter, part_tot))
-            part_counter += 1
+        # Small tasks weighted by the number of candidates are taken by the next idle worker
+        spec_cost_lst = [len(checked_info_df_groups.indices[_key]) for _key in checked_info_key_lst]
+        spec_task_lst, spec_task_cost_lst = split_tasks(checked_info_key_lst, spec_cost_lst,
+                                                        usr_core_num * TASK_PER_CORE)
+        spec_kwargs_lst = []
+        for _sub_lst in spec_task_lst:
+            # only the rows of this task are sent to the worker
+            _sub_row_lst = sorted([_row for _key in _sub_lst for _row in checked_info_df_groups.indices[_key]])
+            _sub_info_groups = checked_info_df.iloc[_sub_row_lst].groupby(['Formula', 'scan_checker'])
+            spec_kwargs_lst.append({'lpp_all_group_key_lst': _sub_lst, 'checked_info_groups': _sub_info_groups})
+        del checked_info_df_groups
+
+        print('[STATUS] >>> Start multiprocessing to get Spectra info ==> Max Number of Cores: %i | %i tasks'
+              % (usr_core_num, len(spec_kwargs_lst)))
+        hunter_pool.set_static({'scans_info_df': usr_scan_info_df, 'dda_index': usr_dda_index})
+        spec_results_lst = hunter_pool.submit_all(get_spec_info, spec_kwargs_lst, cost_lst=spec_task_cost_lst,
+                                                  static_key_lst=['scans_info_df', 'dda_index'])
+        del spec_kwargs_lst
+        #  Merge multiprocessing results
+        for spec_result in spec_results_lst:
+            try:
+                sub_spec_dct = spec_result.get()
+                if len(list(sub_spec_dct.keys())) > 0:
+                    lipid_spec_info_dct.update(sub_spec_dct)
+            except (KeyError, SystemError, ValueError):
+                print('[ValueError] !!! must supply a tuple to get_group with multiple grouping keys ...')
+        print('[STATUS] >>> multiprocessing results merged')
     else:
         print('[INFO] --> Using single core mode...')
         queue = ''
-        worker_count = 1
-        for spec_sub_lst in spec_part_key_lst:
-            spec_sub_key_lst = spec_sub_lst[0]
-            sub_info_groups = spec_sub_lst[1]
-            for _sub_lst in spec_sub_key_lst:
-                if isinstance(_sub_lst, tuple) or isinstance(_sub_lst, list):
-                    if None in _sub_lst:
-                        _sub_lst = [x for x in _sub_lst if x is not None]
-                    else:
-                        if isinstance(_sub_lst[0], float):
-                            _sub_lst3 = ()
-                            _sub_lst3 = _sub_lst3 + (_sub_lst,)
-                            _sub_lst = _sub_lst3
-
-                    print('[STATUS] >>> Core #%i ==> ...... processing ......' % worker_count)
-                    sub_spec_dct = get_spec_info(_sub_lst, sub_info_groups, usr_scan_info_df, os_typ, queue)
-
-                    if len(list(sub_spec_dct.keys())) > 0:
-                        lipid_spec_info_dct.update(sub_spec_dct)
-
-                else:
-                    pass
+        lipid_spec_info_dct = get_spec_info(checked_info_key_lst, checked_info_df_groups, usr_scan_info_df, os_typ,
+                                            queue, dda_index=usr_dda_index)
+        del checked_info_df_groups
 
     print('lipid_spec_info_dct', len(list(lipid_spec_info_dct.keys())))
 
@@ -692,12 +565,12 @@ def huntlipids(param_dct: dict, error_lst: list,
 
         usr_spec_info_dct = get_spectra(_usr_ms2_pr_mz, _usr_mz_lib, _usr_ms2_dda_rank, _usr_ms2_scan_id,
                                         ms1_xic_mz_lst, usr_scan_info_df, usr_spectra_pl,
-                                        dda_top=usr_dda_top, ms1_precision=usr_ms1_precision, vendor=usr_vendor)
+                                        dda_top=usr_dda_top, ms1_precision=usr_ms1_precision, vendor=usr_vendor,
+                                        dda_index=usr_dda_index)
         lipid_spec_dct[_spec_group_key] = usr_spec_info_dct
 
     found_spec_key_lst = list(lipid_spec_dct.keys())
     found_spec_key_lst = sorted(found_spec_key_lst, key=lambda x: x[0])
-    spec_key_num = len(found_spec_key_lst)
 
     # Peak info matched
     # Parse specific peak info
@@ -786,245 +659,111 @@ def huntlipids(param_dct: dict, error_lst: list,
     else:
         key_frag_dct = {}
 
+    if key_frag_dct:
+        # m/z windows of the key fragments are calculated once for all MS/MS spectra
+        key_frag_dct = compile_key_frag(key_frag_dct, ms2_ppm=usr_ms2_ppm)
+
     print('[INFO] --> Key FRAG Dict Generated ...')
 
     # Start to get rank score using get_lipid_info with multiprocessing
 
+    # the plot inputs are only kept to save the session
     lipid_info_img_lst = []
-    lipid_part_key_lst = []
-    split_seg = 1
-
-    if spec_key_num > (usr_core_num * 24):
-
-        # Split tasks into few parts to avoid core waiting in multiprocessing
-        # Problem with the 1 Core run. Temporary solution
-        if usr_core_num * 24 < spec_key_num <= usr_core_num * 48 and usr_core_num != 1:
-            split_seg = 2
-        elif usr_core_num * 48 < spec_key_num <= usr_core_num * 96 and usr_core_num != 1:
-            split_seg = 3
-        elif usr_core_num * 96 < spec_key_num and usr_core_num != 1:
-            split_seg = 4
-        else:
-            split_seg = 1
-        lipid_part_len = int(math.ceil(spec_key_num / split_seg))
-        lipid_part_lst = [found_spec_key_lst[k: k + lipid_part_len] for k in range(0, spec_key_num,
-                                                                                   lipid_part_len)]
-        print('[INFO] --> lipid_part_number: ', len(lipid_part_lst), ' lipid_part_len:', lipid_part_len)
-
-        for part_lst in lipid_part_lst:
-            if None in part_lst:
-                part_lst = [x for x in part_lst if x is not None]
-            lipid_sub_len = int(math.ceil(len(part_lst) / usr_core_num))
-            # print('lipid_sub_len', lipid_sub_len)
-            pre_lipid_sub_key_lst = [part_lst[k: k + lipid_sub_len] for k in range(0, len(part_lst), lipid_sub_len)]
-            lipid_sub_key_lst = []
-            for _core_key_lst in pre_lipid_sub_key_lst:
-                _core_key_df = pd.DataFrame(_core_key_lst, columns=['Formula', 'scan_checker'])
-                _core_scan_lst = _core_key_df['scan_checker'].tolist()
-                _core_chk_info_df = checked_info_df[checked_info_df['scan_checker'].isin(_core_scan_lst)]
-                _core_chk_groups = _core_chk_info_df.groupby(['Formula', 'scan_checker'])
-
-                lipid_sub_key_lst.append((_core_key_lst, _core_chk_info_df, _core_chk_groups))
-
-            lipid_part_key_lst.append(lipid_sub_key_lst)
-
+    # the identifications are written to the HTML report and the images are saved as soon as they arrive
+    log_pager = None
+    if save_fig is True:
+        img_queue = ImageQueue(param_dct, hunter_pool=hunter_pool)
     else:
-        lipid_sub_len = int(math.ceil(spec_key_num / usr_core_num))
-        pre_lipid_sub_key_lst = [found_spec_key_lst[k: k + lipid_sub_len] for k in
-                                 range(0, spec_key_num, lipid_sub_len)]
-        lipid_sub_key_lst = []
-        for _core_key_lst in pre_lipid_sub_key_lst:
-            _core_key_df = pd.DataFrame(_core_key_lst, columns=['Formula', 'scan_checker'])
-            _core_scan_lst = _core_key_df['scan_checker'].tolist()
-            _core_chk_info_df = checked_info_df[checked_info_df['scan_checker'].isin(_core_scan_lst)]
-            _core_chk_groups = _core_chk_info_df.groupby(['Formula', 'scan_checker'])
-
-            # TODO (georgia.angelidou@uni-leipzig.de):  unnecesary decleration of new parameter
-            #  It can directly be save in the destination parameter:
-            #  lipid_part_key_lst.append((_core_key_lst, _core_chk_info_df, _core_chk_groups))
-            lipid_sub_key_lst.append((_core_key_lst, _core_chk_info_df, _core_chk_groups))
-
-        lipid_part_key_lst.append(lipid_sub_key_lst)
-
-    part_tot = len(lipid_part_key_lst)
-    part_counter = 1
-    queue = ''
+        img_queue = None
 
     if usr_core_num > 1:
-
-        for lipid_sub_key_lst in lipid_part_key_lst:
-
-            lipid_info_results_lst = []
-
-            if part_tot == 1:
-                print('[STATUS] >>> Start multiprocessing to get Score ==> Max Number of Cores: %i' % usr_core_num)
-                try:
-                    worker_feature_count = len(lipid_sub_key_lst[0][0])
-                    print('[STATUS] >>> Start multiprocessing to get Score ==> Max Number of Cores: %i | '
-                          'x%i Features each'
-                          % (usr_core_num, worker_feature_count))
-                except Exception as _e:
-                    print('[STATUS] >>> Start multiprocessing to get Score ==> Max Number of Cores: %i' % usr_core_num)
-                    print('[Exception] Can not get the number of features distributed to each core...', _e)
+        # The cost of each feature is estimated as number of candidates x number of MS2 peaks
+        # Small tasks are taken by the next idle worker, heavy features do not block the other cores
+        lipid_cost_lst = []
+        found_spec_count_dct = checked_info_df.groupby(['Formula', 'scan_checker']).size().to_dict()
+        for _spec_key in found_spec_key_lst:
+            _ms2_df = lipid_spec_dct[_spec_key].get('ms2_df', None)
+            if isinstance(_ms2_df, pd.DataFrame):
+                _ms2_peak_count = _ms2_df.shape[0]
             else:
-                try:
-                    worker_feature_count = len(lipid_sub_key_lst[0][0])
-                    print('[STATUS] >>> Start multiprocessing to get Score ==> Part %i / %i '
-                          '--> Max Number of Cores: %i | x%i Features each'
-                          % (part_counter, part_tot, usr_core_num, worker_feature_count))
-                except Exception as _e:
-                    print('[STATUS] >>> Start multiprocessing to get Score ==> Part %i / %i --> Max Number of Cores: %i'
-                          % (part_counter, part_tot, usr_core_num))
-                    print('[Exception] ... Can not get the number of features distributed to each core...', _e)
-
-            if os_typ == 'windows':
-                parallel_pool = Pool(usr_core_num)
-
-                worker_count = 1
-                for lipid_sub in lipid_sub_key_lst:
-                    if isinstance(lipid_sub, tuple) or isinstance(lipid_sub, list):
-
-                        lipid_sub_lst = lipid_sub[0]
-                        _chk_info_df = lipid_sub[1]
-                        _chk_info_gp = lipid_sub[2]
-
-                        if None in lipid_sub_lst:
-                            lipid_sub_lst = [x for x in lipid_sub_lst if x is not None]
-                        else:
-                            pass
-                        if isinstance(lipid_sub_lst[0], tuple) or isinstance(lipid_sub_lst[0], list):
-                            lipid_sub_dct = {k: lipid_spec_dct[k] for k in lipid_sub_lst}
-                        else:
-                            lipid_sub_dct = {lipid_sub_lst: lipid_spec_dct[lipid_sub_lst]}
-                            lipid_sub_lst = tuple([lipid_sub_lst])
-                        print('[STATUS] >>> Core #%i ==> ...... processing ......' % worker_count)
-                        if len(list(lipid_sub_dct.keys())) > 0:
-                            lipid_info_result = parallel_pool.apply_async(get_lipid_info,
-                                                                          args=(param_dct, usr_fa_df, _chk_info_df,
-                                                                                _chk_info_gp, lipid_sub_lst,
-                                                                                usr_weight_df, key_frag_dct,
-                                                                                lipid_sub_dct, xic_dct,
-                                                                                worker_count,
-                                                                                save_fig, os_typ, queue))
-
-                            lipid_info_results_lst.append(lipid_info_result)
-                            worker_count += 1
-
-                parallel_pool.close()
-                parallel_pool.join()
-
-            else:  # for linux
-                jobs = []
-                queue = multiprocessing.Queue()
-                worker_count = 1
-                for lipid_sub in lipid_sub_key_lst:
-                    if isinstance(lipid_sub, tuple) or isinstance(lipid_sub, list):
-
-                        lipid_sub_lst = lipid_sub[0]
-                        _chk_info_df = lipid_sub[1]
-                        _chk_info_gp = lipid_sub[2]
-                        if None in lipid_sub_lst:
-                            lipid_sub_lst = [x for x in lipid_sub_lst if x is not None]
-                        else:
-                            pass
-                        if isinstance(lipid_sub_lst[0], tuple) or isinstance(lipid_sub_lst[0], list):
-                            lipid_sub_dct = {k: lipid_spec_dct[k] for k in lipid_sub_lst}
-                        else:
-                            lipid_sub_dct = {lipid_sub_lst: lipid_spec_dct[lipid_sub_lst]}
-                            lipid_sub_lst = tuple([lipid_sub_lst])
-                        print('[STATUS] >>> Core #%i ==> ...... processing ......' % worker_count)
-                        job = multiprocessing.Process(target=get_lipid_info, args=(param_dct, usr_fa_df,
-                                                                                   _chk_info_df,
-                                                                                   _chk_info_gp, lipid_sub_lst,
-                                                                                   usr_weight_df, key_frag_dct,
-                                                                                   lipid_sub_dct, xic_dct,
-                                                                                   worker_count,
-                                                                                   save_fig, os_typ, queue))
-
-                        worker_count += 1
-                        jobs.append(job)
-                        job.start()
-                        lipid_info_results_lst.append(queue.get())
-
-                for j in jobs:
-                    j.join()
-
-            # Merge multiprocessing results
-            for lipid_info_result in lipid_info_results_lst:
-                # TODO (georgia.angelidou@uni-leipzig.de):
-                #  need to change the following part. The differnt sections can be combine
-
-                if os_typ == 'windows':
-                    try:
-                        tmp_lipid_info = lipid_info_result.get()
-                        # TODO (georgia.angelidou@uni-leipzig.de): can be avoided
-                        tmp_lipid_info_df = tmp_lipid_info[0]
-                        tmp_lipid_img_lst = tmp_lipid_info[1]
-
-                        # TODO (georgia.angelidou@uni-leipzig.de): when above remove this need to be activated
-                        # if isinstance(tmp_lipid_info[0], pd.DataFrame):
-                        #     if not  tmp_lipid_info[0].empty:
-                        #         output_df = output_df.append(tmp_lipid_info[0])
-                        #         lipid_info_img_lst.extend(tmp_lipid_info[1])
-                    except (KeyError, SystemError, ValueError, TypeError):
-                        tmp_lipid_info_df = 'error'
-                        tmp_lipid_img_lst = []
-                        print('[ERROR] !!! This segment receive no Lipid identified.')
-                else:  # for linux
-                    try:
-                        tmp_lipid_info_df = lipid_info_result[0]
-                        tmp_lipid_img_lst = lipid_info_result[1]
-                        # TODO (georgia.angelidou@uni-leipzig.de):
-                        #  need to be activated when the above 2 lines are removed
-                        # if isinstance(lipid_info_result[0], pd.DataFrame):
-                        #     if not lipid_info_result[0].empty:
-                        #         output_df = output_df.append(lipid_info_result[0])
-                        #         lipid_info_img_lst.extend(lipid_info_result[1])
-
-                    except (KeyError, SystemError, ValueError, TypeError):
-                        tmp_lipid_info_df = 'error'
-                        tmp_lipid_img_lst = []
-                        print('[ERROR] !!! This segment receive no Lipid identified.')
-
-                # TODO (georgia.angelidou@uni-leipzig.de):
-                #  when new section are activate all the below if/else statement cant go away
-                if isinstance(tmp_lipid_info_df, str):
-                    pass
-                else:
-                    if isinstance(tmp_lipid_info_df, pd.DataFrame):
-                        if not tmp_lipid_info_df.empty:
-                            output_df = output_df.append(tmp_lipid_info_df)
-                            lipid_info_img_lst.extend(tmp_lipid_img_lst)
-            if part_tot == 1:
-                print('[STATUS] >>> multiprocessing results merged')
-            else:
-                print('[STATUS] >>> multiprocessing results merged ==> Part %i / %i '
-                      % (part_counter, part_tot))
-            part_counter += 1
+                _ms2_peak_count = 1
+            lipid_cost_lst.append(found_spec_count_dct.get(_spec_key, 1) * _ms2_peak_count)
+        lipid_task_lst, lipid_task_cost_lst = split_tasks(found_spec_key_lst, lipid_cost_lst,
+                                                          usr_core_num * TASK_PER_CORE)
+        lipid_kwargs_lst = []
+        for worker_count, lipid_sub_lst in enumerate(lipid_task_lst, start=1):
+            _core_scan_lst = [_key[1] for _key in lipid_sub_lst]
+            _chk_info_df = checked_info_df[checked_info_df['scan_checker'].isin(_core_scan_lst)]
+            _chk_info_gp = _chk_info_df.groupby(['Formula', 'scan_checker'])
+            lipid_sub_dct = {k: lipid_spec_dct[k] for k in lipid_sub_lst}
+            # only the XIC of this task are sent
+            sub_xic_dct = {k: xic_dct[k] for k in set(_chk_info_df['MS1_XIC_mz'].values.tolist()) if k in xic_dct}
+            lipid_kwargs_lst.append({'checked_info_df': _chk_info_df, 'checked_info_groups': _chk_info_gp,
+                                     'core_list': lipid_sub_lst, 'core_spec_dct': lipid_sub_dct,
+                                     'xic_dct': sub_xic_dct, 'core_count': worker_count, 'save_fig': save_fig})
+
+        print('[STATUS] >>> Start multiprocessing to get Score ==> Max Number of Cores: %i | %i tasks'
+              % (usr_core_num, len(lipid_kwargs_lst)))
+        hunter_pool.set_static({'param_dct': param_dct, 'fa_df': usr_fa_df, 'usr_weight_df': usr_weight_df,
+                                'key_frag_dct': key_frag_dct, 'isotope_ratio_dct': usr_isotope_ratio_dct})
+        lipid_info_results_itr = hunter_pool.submit_all_unordered(get_lipid_info, lipid_kwargs_lst,
+                                                                  cost_lst=lipid_task_cost_lst,
+                                                                  static_key_lst=['param_dct', 'fa_df',
+                                                                                  'usr_weight_df', 'key_frag_dct',
+                                                                                  'isotope_ratio_dct'])
+        del lipid_kwargs_lst
+
+        # Merge multiprocessing results in the order the tasks are finished
+        lipid_info_df_dct = {}
+        for task_idx, lipid_info_result in lipid_info_results_itr:
+            try:
+                tmp_lipid_info = lipid_info_result.get()
+                tmp_lipid_info_df = tmp_lipid_info[0]
+                tmp_lipid_img_lst = tmp_lipid_info[1]
+            except (KeyError, SystemError, ValueError, TypeError):
+                tmp_lipid_info_df = 'error'
+                tmp_lipid_img_lst = []
+                print('[ERROR] !!! This segment receive no Lipid identified.')
+
+            if isinstance(tmp_lipid_info_df, pd.DataFrame):
+                if not tmp_lipid_info_df.empty:
+                    lipid_info_df_dct[task_idx] = tmp_lipid_info_df
+                    if save_session is True:
+                        lipid_info_img_lst.extend(tmp_lipid_img_lst)
+                    if save_fig is True:
+                        if log_pager is None:
+                            log_pager = start_html_report(param_dct)
+                        log_pager.add_info(tmp_lipid_info_df)
+                        img_queue.add_images(tmp_lipid_img_lst)
+            del tmp_lipid_img_lst
+        # the output table does not depend on the order the tasks are finished
+        for task_idx in sorted(lipid_info_df_dct.keys()):
+            output_df = output_df.append(lipid_info_df_dct[task_idx])
+        del lipid_info_df_dct
+        print('[STATUS] >>> multiprocessing results merged')
 
     else:
         print('[INFO] --> Using single core mode...')
-        for lipid_sub_key_lst in lipid_part_key_lst:
-            for lipid_sub in lipid_sub_key_lst:
-                if isinstance(lipid_sub, tuple) or isinstance(lipid_sub, list):
-
-                    lipid_sub_lst = lipid_sub[0]
-                    _chk_info_df = lipid_sub[1]
-                    _chk_info_gp = lipid_sub[2]
-
-                    worker_count = 1
-                    lipid_info_results_lst = get_lipid_info(param_dct, usr_fa_df, _chk_info_df,
-                                                            _chk_info_gp, found_spec_key_lst, usr_weight_df,
-                                                            key_frag_dct, lipid_spec_dct, xic_dct, worker_count)
-
-                    # TODO (georgia.angelidou@uni-leipzig.de): unnecessary declaration of values can be avoided
-                    tmp_lipid_info_df = lipid_info_results_lst[0]
-                    tmp_lipid_img_lst = lipid_info_results_lst[1]
-                    if isinstance(tmp_lipid_info_df, pd.DataFrame):
-                        if not tmp_lipid_info_df.empty:
-                            output_df = output_df.append(tmp_lipid_info_df)
-                            lipid_info_img_lst = tmp_lipid_img_lst
-                    # TODO (georgia.angelidou@uni-leipzig.de): code can change as below
+        _core_scan_lst = [_key[1] for _key in found_spec_key_lst]
+        _chk_info_df = checked_info_df[checked_info_df['scan_checker'].isin(_core_scan_lst)]
+        _chk_info_gp = _chk_info_df.groupby(['Formula', 'scan_checker'])
+
+        worker_count = 1
+        lipid_info_results_lst = get_lipid_info(param_dct, usr_fa_df, _chk_info_df, _chk_info_gp, found_spec_key_lst,
+                                                usr_weight_df, key_frag_dct, lipid_spec_dct, xic_dct, worker_count,
+                                                isotope_ratio_dct=usr_isotope_ratio_dct)
+
+        tmp_lipid_info_df = lipid_info_results_lst[0]
+        tmp_lipid_img_lst = lipid_info_results_lst[1]
+        if isinstance(tmp_lipid_info_df, pd.DataFrame):
+            if not tmp_lipid_info_df.empty:
+                output_df = output_df.append(tmp_lipid_info_df)
+                if save_session is True:
+                    lipid_info_img_lst = tmp_lipid_img_lst
+                if save_fig is True:
+                    log_pager = start_html_report(param_dct)
+                    log_pager.add_info(tmp_lipid_info_df)
+                    img_queue.add_images(tmp_lipid_img_lst)
 
     print('[OUTPUT] ==> Generate the output table')
     if isinstance(output_df, pd.DataFrame):
@@ -1172,7 +911,8 @@ def huntlipids(param_dct: dict, error_lst: list,
 
     # Start multiprocessing to save img for HTML report
     if save_fig is True:
-        gen_html_report(param_dct, output_df, lipid_info_img_lst)
+        gen_html_report(param_dct, output_df, lipid_info_img_lst, hunter_pool=hunter_pool, log_pager=log_pager,
+                        img_queue=img_queue)
     else:
         print('[WARNING] !!! User skip image generation !!!!!!')
     print('Time', time.clock(), start_time)
@@ -1181,3 +921,149 @@ def huntlipids(param_dct: dict, error_lst: list,
     print('[STATUS] >>> >>> >>> FINISHED in %s sec <<< <<< <<<' % tot_run_time)
 
     return tot_run_time, error_lst, output_df
+
+
+def get_target_score_cfg(lipid_class: str, charge: str, param_dct: dict) -> str:
+    """
+    Select the weight factor file for one lipid class using the class specific settings of LipidHunter GUI
+    (score_cfg_pl, score_cfg_lpl, score_cfg_tg, score_cfg_tg_na, score_cfg_dg).
+
+    Args:
+        lipid_class (str): lipid class e.g. 'PC'
+        charge (str): charge mode e.g. '[M+HCOO]-'
+        param_dct (dict): the overall parameters
+
+    Returns:
+        score_cfg (str): file path of the weight factor file, use param_dct['score_cfg'] if not defined.
+            For TG [M+Na]+ the bundled ConfigurationFiles/2-Score_weight_TG_Na.xlsx is used if not defined.
+
+    Raises:
+        FileNotFoundError: score_cfg_tg_na is not defined for TG [M+Na]+ and the bundled file is missing.
+
+    """
+
+    if lipid_class in ['PA', 'PC', 'PE', 'PG', 'PI', 'PIP', 'PS']:
+        score_cfg_key = 'score_cfg_pl'
+    elif lipid_class in ['LPA', 'LPC', 'LPE', 'LPG', 'LPI', 'LPIP', 'LPS']:
+        score_cfg_key = 'score_cfg_lpl'
+    elif lipid_class in ['TG'] and charge in ['[M+Na]+']:
+        score_cfg_key = 'score_cfg_tg_na'
+    elif lipid_class in ['TG']:
+        score_cfg_key = 'score_cfg_tg'
+    elif lipid_class in ['DG']:
+        score_cfg_key = 'score_cfg_dg'
+    else:
+        score_cfg_key = 'score_cfg'
+
+    if score_cfg_key in list(param_dct.keys()):
+        score_cfg = param_dct[score_cfg_key]
+    elif score_cfg_key == 'score_cfg_tg_na':
+        # the TG [M+NH4]+ weight factors in score_cfg have no [M+Na]+ keys and would identify nothing
+        if os.path.isfile(DEFAULT_SCORE_CFG_TG_NA):
+            score_cfg = DEFAULT_SCORE_CFG_TG_NA
+            print('[INFO] --> score_cfg_tg_na not defined, use %s for TG [M+Na]+' % score_cfg)
+        else:
+            raise FileNotFoundError('score_cfg_tg_na is not defined for TG [M+Na]+ and the default weight factor '
+                                    'file %s does not exist' % DEFAULT_SCORE_CFG_TG_NA)
+    else:
+        score_cfg = param_dct['score_cfg']
+
+    return score_cfg
+
+
+def huntlipids_multi(param_dct: dict, target_lst: list, error_lst: list,
+                     save_fig: bool = True, save_session: bool = False) -> Tuple[float, list, dict]:
+    """
+    Identify several lipid classes from the same mzML file. The mzML is parsed only once and the extracted spectra
+    are shared by all lipid classes. One output table is saved for each lipid class and charge mode.
+
+    Examples:
+        huntlipids_multi(param_dct, [('PC', '[M+HCOO]-'), ('PE', '[M-H]-')], error_lst=[])
+        huntlipids_multi(param_dct, [('TG', '[M+NH4]+'),
+                                     ('TG', '[M+Na]+', {'score_cfg': r'ConfigurationFiles/2-Score_weight_TG_Na.xlsx'})],
+                         error_lst=[])
+
+    Args:
+        param_dct (dict): The overall parameters as used for huntlipids.
+        target_lst (list): List of (lipid_class, charge_mode) or (lipid_class, charge_mode, param_dct) tuples.
+            The optional param_dct replace the overall parameters for this lipid class only.
+        error_lst (list): All errors collected before this function.
+        save_fig (bool): Can be set to False to skip image generation (not recommended).
+        save_session (bool): Can be set to True to save session as a file using pickle.
+
+    Returns:
+        tot_run_time (float): The total run time.
+        error_lst (list): List of errors collected during the run.
+        output_dct (dict): The output DataFrame of each (lipid_class, charge_mode) or False if error occurs.
+
+    """
+
+    print('[INFO] --> Hunter Core Start for %i lipid classes ...' % len(target_lst))
+    start_time = time.time()
+
+    usr_ms1_precision = param_dct['ms_ppm'] * 1e-6
+    usr_ms2_precision = param_dct['ms2_ppm'] * 1e-6
+    if param_dct.get('spectra_cache', True) is False:
+        usr_spectra_cache = None
+    else:
+        usr_spectra_cache = SpectraCache(param_dct.get('spectra_cache_folder', DEFAULT_CACHE_FOLDER),
+                                         max_size=param_dct.get('spectra_cache_size', DEFAULT_CACHE_SIZE))
+
+    try:
+        spectra_data = extract_mzml(param_dct['mzml_path_str'], [param_dct['rt_start'], param_dct['rt_end']],
+                                    dda_top=param_dct['dda_top'], ms1_threshold=param_dct['ms_th'],
+                                    ms2_threshold=param_dct['ms2_th'], ms1_precision=usr_ms1_precision,
+                                    ms2_precision=usr_ms2_precision, vendor=param_dct['vendor'],
+                                    ms1_max=param_dct['ms_max'], max_ram=param_dct['max_ram'],
+                                    spectra_cache=usr_spectra_cache)
+    except MemoryError as _mem_e:
+        print('[ERROR] !!! Not enough RAM to extract mzML !!!', _mem_e)
+        error_lst.append('!! Not enough RAM to extract mzML: %s !!\n' % _mem_e)
+        return time.time() - start_time, error_lst, {}
+
+    output_dct = {}
+    output_xlsx_base, output_xlsx_ext = os.path.splitext(param_dct['xlsx_output_path_str'])
+    # the worker processes are started once and shared by all lipid classes
+    if param_dct['core_number'] > 1 and platform in MULTI_PLATFORM_LST:
+        hunter_pool = HunterPool(param_dct['core_number'])
+    else:
+        hunter_pool = None
+    try:
+        for _target in target_lst:
+            _lipid_class = _target[0]
+            _charge = _target[1]
+            _target_tag = '%s_%s' % (_lipid_class, re.sub(r'[^\w+-]', '', _charge))
+
+            _target_param_dct = param_dct.copy()
+            _target_param_dct['lipid_class'] = _lipid_class
+            _target_param_dct['charge_mode'] = _charge
+            if not (len(_target) > 2 and isinstance(_target[2], dict) and 'score_cfg' in _target[2]):
+                try:
+                    _target_param_dct['score_cfg'] = get_target_score_cfg(_lipid_class, _charge, param_dct)
+                except FileNotFoundError as _e:
+                    print('[ERROR] !!! Skip %s %s ...' % (_lipid_class, _charge), _e)
+                    error_lst.append('%s %s: %s' % (_lipid_class, _charge, _e))
+                    output_dct[(_lipid_class, _charge)] = False
+                    continue
+            _target_param_dct['xlsx_output_path_str'] = '%s_%s%s' % (output_xlsx_base, _target_tag, output_xlsx_ext)
+            # separated HTML report for each lipid class
+            _target_param_dct['hunter_start_time'] = '%s_%s' % (param_dct['hunter_start_time'], _target_tag)
+            if len(_target) > 2 and isinstance(_target[2], dict):
+                _target_param_dct.update(_target[2])
+
+            print('[STATUS] >>> Start to identify %s %s' % (_lipid_class, _charge))
+            _target_error_lst = []
+            _run_time, _target_error_lst, _output_df = huntlipids(_target_param_dct, _target_error_lst,
+                                                                  save_fig=save_fig, save_session=save_session,
+                                                                  spectra_data=spectra_data, hunter_pool=hunter_pool)
+            output_dct[(_lipid_class, _charge)] = _output_df
+            for _err in _target_error_lst:
+                error_lst.append('%s %s: %s' % (_lipid_class, _charge, _err))
+    finally:
+        if hunter_pool is not None:
+            hunter_pool.close()
+
+    tot_run_time = time.time() - start_time
+    print('[STATUS] >>> >>> >>> ALL %i lipid classes FINISHED in %s sec <<< <<< <<<' % (len(target_lst), tot_run_time))
+
+    return tot_run_time, error_lst, output_dct
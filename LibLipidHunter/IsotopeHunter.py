@@ -17,27 +17,196 @@
 #     Developer Zhixu Ni zhixu.ni@uni-leipzig.de
 #     Developer Georgia Angelidou georgia.angelidou@uni-leipzig.de
 
+from functools import lru_cache
 import re
 
+import numpy as np
 from numpy.polynomial.polynomial import Polynomial
 import pandas as pd
 from scipy import stats
 
+from LibLipidHunter.AbbrElemCalc import PERIODIC_TABLE_DCT
+from LibLipidHunter.ParallelFunc import get_query_bounds
+
+# number of isotope patterns kept in the LRU cache of each process
+ISOTOPE_CACHE_SIZE = 20000
+
+# precomputed isotope patterns of the lipid master table of the current run
+# {(elemental composition, only_c, isotope_number): ratio}, replaced by load_isotope_ratio() for each run
+_isotope_ratio_table = {}
+
+
+@lru_cache(maxsize=ISOTOPE_CACHE_SIZE)
+def calc_isotope_ratio(elem_key, only_c=False, isotope_number=2):
+    """
+    Calculate the isotope distribution of an elemental composition, the result is kept in a LRU cache.
+
+    Args:
+        elem_key (tuple): the elemental composition as sorted (element, count) pairs
+        only_c (bool): consider 13C only
+        isotope_number (int): calculate M+0 to M+isotope_number
+
+    Returns:
+        isotope_ratio_tpl (tuple): the ratio of each isotope to M+0 rounded to 2 decimals
+
+    """
+
+    elem_dct = dict(elem_key)
+
+    # consider C only
+    c_count = elem_dct['C']
+    ration_13c12c = 0.011
+
+    # calc distribution by selected algorithms
+    if only_c is True:
+        # consider C only --> binomial expansion 3x faster
+        isotope_pattern = stats.binom.pmf(list(range(0, isotope_number + 1)), c_count, ration_13c12c)
+
+    else:
+        try:
+            # consider more elements --> binomial/polynomial and McLaurin expansion [doi:10.1038/nmeth.3393]
+            h_count = elem_dct['H']
+            o_count = elem_dct['O']
+
+            c_ploy = Polynomial((0.9893, 0.0107))
+            h_ploy = Polynomial((0.999885, 0.0001157))
+            o_ploy = Polynomial((0.99757, 0.00038, 0.00205))
+
+            isotope_pattern_calc = c_ploy ** c_count * h_ploy ** h_count * o_ploy ** o_count
+
+            if 'N' in list(elem_dct.keys()):
+                n_count = elem_dct['N']
+                if n_count > 0:
+                    n_ploy = Polynomial((0.99632, 0.00368))
+                    isotope_pattern_calc *= n_ploy
+
+            if 'S' in list(elem_dct.keys()):
+                s_count = elem_dct['S']
+                if s_count > 0:
+                    s_ploy = Polynomial((0.9493, 0.0076, 0.0429, 0.0002))
+                    isotope_pattern_calc *= s_ploy
+
+            if 'K' in list(elem_dct.keys()):
+                k_count = elem_dct['K']
+                if k_count > 0:
+                    k_ploy = Polynomial((0.932581, 0.000117, 0.067302))
+                    isotope_pattern_calc *= k_ploy
+            isotope_pattern = list(isotope_pattern_calc.coef)[:isotope_number + 1]
+        except ValueError:
+            # print(_e)
+            print('[INFO] --> Too large to use full elements for isotope pattern ... '
+                  'use 13C only mode for this compound...')
+            # consider C only --> binomial expansion 3x faster
+            isotope_pattern = stats.binom.pmf(list(range(0, isotope_number + 1)), c_count, ration_13c12c)
+
+    m0_i = isotope_pattern[0]
+    isotope_pattern = [x / m0_i for x in isotope_pattern]
+
+    return tuple(np.round(np.array(isotope_pattern, dtype=np.float64), 2).tolist())
+
+
+class SortedSpectrum(object):
+    """
+    The peaks of a MS spectrum sorted by m/z, the peaks in a m/z window are found by np.searchsorted instead of
+    a DataFrame query. Create it once and use it for all isotope peaks of a precursor.
+
+    Args:
+        spec_df (pd.DataFrame): the spectrum with columns mz and i
+
+    """
+
+    def __init__(self, spec_df):
+
+        mz_arr = spec_df['mz'].values
+        # position of each peak in spec_df, used to keep the first peak if the intensity is the same
+        self.pos_arr = np.argsort(mz_arr, kind='mergesort')
+        self.mz_arr = mz_arr[self.pos_arr]
+        self.i_arr = spec_df['i'].values[self.pos_arr]
+
+    def get_window(self, low_mz, high_mz):
+        """
+        Find the peaks with low_mz <= mz <= high_mz, the bounds are rounded the same way as a query string.
+
+        Args:
+            low_mz (float): the lower m/z bound
+            high_mz (float): the upper m/z bound
+
+        Returns:
+            start (int), end (int): the peaks are self.mz_arr[start:end]
+
+        """
+
+        low_arr, high_arr = get_query_bounds([low_mz], [high_mz], dtype=self.mz_arr.dtype)
+        start = np.searchsorted(self.mz_arr, low_arr[0], side='left')
+        end = np.searchsorted(self.mz_arr, high_arr[0], side='right')
+
+        return start, max(start, end)
+
+    def get_top_peak(self, low_mz, high_mz):
+        """
+        Get the most intense peak in the m/z window, the first one in the order of spec_df if the intensity is
+        the same.
+
+        Args:
+            low_mz (float): the lower m/z bound
+            high_mz (float): the upper m/z bound
+
+        Returns:
+            top_peak (tuple): (i, mz) of the peak or None if no peak is found
+
+        """
+
+        start, end = self.get_window(low_mz, high_mz)
+        if end == start:
+            return None
+        win_i_arr = self.i_arr[start:end]
+        top_idx_arr = np.where(win_i_arr == win_i_arr.max())[0] + start
+        top_idx = top_idx_arr[np.argmin(self.pos_arr[top_idx_arr])]
+
+        return self.i_arr[top_idx], self.mz_arr[top_idx]
+
+    def get_max_i(self, low_mz, high_mz):
+        """
+        Get the max intensity in the m/z window.
+
+        Args:
+            low_mz (float): the lower m/z bound
+            high_mz (float): the upper m/z bound
+
+        Returns:
+            max_i: the max intensity or None if no peak is found
+
+        """
+
+        start, end = self.get_window(low_mz, high_mz)
+        if end == start:
+            return None
+
+        return self.i_arr[start:end].max()
+
+
+def get_sorted_spectrum(spec_df):
+    """
+    Get the SortedSpectrum of a spectrum, a SortedSpectrum is used as it is.
+
+    Args:
+        spec_df (pd.DataFrame or SortedSpectrum): the spectrum with columns mz and i
+
+    Returns:
+        sorted_spec (SortedSpectrum)
+
+    """
+
+    if isinstance(spec_df, SortedSpectrum):
+        return spec_df
+    else:
+        return SortedSpectrum(spec_df)
+
 
 class IsotopeHunter(object):
     def __init__(self):
-        # iupac '97
-        self.periodic_table_dct = {'H': [(1.0078250321, 0.999885), (2.0141017780, 0.0001157)],
-                                   'D': [(2.0141017780, 0.0001157)],
-                                   'C': [(12.0, 0.9893), (13.0033548378, 0.0107)],
-                                   'N': [(14.0030740052, 0.99632), (15.0001088984, 0.00368)],
-                                   'O': [(15.9949146221, 0.99757), (16.99913150, 0.00038), (17.9991604, 0.00205)],
-                                   'Na': [(22.98976967, 1.0)],
-                                   'P': [(30.97376151, 1.0)],
-                                   'S': [(31.97207069, 0.9493), (32.97145850, 0.0076),
-                                         (33.96786683, 0.0429), (35.96708088, 0.0002)],
-                                   'K': [(38.9637069, 0.932581), (39.96399867, 0.000117), (40.96182597, 0.067302)],
-                                   }
+        # iupac '97, shared by all instances
+        self.periodic_table_dct = PERIODIC_TABLE_DCT
 
     def get_elements(self, formula):
         elem_dct = {}
@@ -68,6 +237,29 @@ class IsotopeHunter(object):
 
         return mono_mz
 
+    def get_isotope_ratio(self, elem_dct, only_c=False, isotope_number=2):
+        """
+        Get the isotope distribution from the precomputed table or the LRU cache, calculate it only for new
+        elemental compositions.
+
+        Args:
+            elem_dct (dict): the elemental composition e.g. {'C': 41, 'H': 79, 'N': 1, 'O': 8, 'P': 1}
+            only_c (bool): consider 13C only
+            isotope_number (int): calculate M+0 to M+isotope_number
+
+        Returns:
+            isotope_ratio_tpl (tuple): the ratio of each isotope to M+0 rounded to 2 decimals
+
+        """
+
+        ratio_key = (tuple(sorted(elem_dct.items())), only_c, isotope_number)
+        if ratio_key in _isotope_ratio_table:
+            isotope_ratio_tpl = _isotope_ratio_table[ratio_key]
+        else:
+            isotope_ratio_tpl = calc_isotope_ratio(*ratio_key)
+
+        return isotope_ratio_tpl
+
     def get_isotope_mz(self, elem_dct, only_c=False, isotope_number=2):
 
         # calc M+0 --> M+2
@@ -79,66 +271,64 @@ class IsotopeHunter(object):
         # Calclulates the elemenatl mass from the elemental composition
         mono_mz = self.get_mono_mz(elem_dct)
 
-        # consider C only
-        c_count = elem_dct['C']
-
         delta_13c = 1.0033548378
-        ration_13c12c = 0.011
         isotope_mz_lst = [mono_mz]
         for _i_count in isotope_count_lst:
             _isotope_mz = mono_mz + delta_13c * _i_count
             isotope_mz_lst.append(_isotope_mz)
 
-        # calc distribution by selected algorithms
-        if only_c is True:
-            # consider C only --> binomial expansion 3x faster
-            isotope_pattern = stats.binom.pmf(list(range(0, isotope_number + 1)), c_count, ration_13c12c)
-
-        else:
-            try:
-                # consider more elements --> binomial/polynomial and McLaurin expansion [doi:10.1038/nmeth.3393]
-                h_count = elem_dct['H']
-                o_count = elem_dct['O']
-
-                c_ploy = Polynomial((0.9893, 0.0107))
-                h_ploy = Polynomial((0.999885, 0.0001157))
-                o_ploy = Polynomial((0.99757, 0.00038, 0.00205))
-
-                isotope_pattern_calc = c_ploy ** c_count * h_ploy ** h_count * o_ploy ** o_count
-
-                if 'N' in list(elem_dct.keys()):
-                    n_count = elem_dct['N']
-                    if n_count > 0:
-                        n_ploy = Polynomial((0.99632, 0.00368))
-                        isotope_pattern_calc *= n_ploy
-
-                if 'S' in list(elem_dct.keys()):
-                    s_count = elem_dct['S']
-                    if s_count > 0:
-                        s_ploy = Polynomial((0.9493, 0.0076, 0.0429, 0.0002))
-                        isotope_pattern_calc *= s_ploy
-
-                if 'K' in list(elem_dct.keys()):
-                    k_count = elem_dct['K']
-                    if k_count > 0:
-                        k_ploy = Polynomial((0.932581, 0.000117, 0.067302))
-                        isotope_pattern_calc *= k_ploy
-                isotope_pattern = list(isotope_pattern_calc.coef)[:isotope_number + 1]
-            except ValueError:
-                # print(_e)
-                print('[INFO] --> Too large to use full elements for isotope pattern ... '
-                      'use 13C only mode for this compound...')
-                # consider C only --> binomial expansion 3x faster
-                isotope_pattern = stats.binom.pmf(list(range(0, isotope_number + 1)), c_count, ration_13c12c)
-
-        m0_i = isotope_pattern[0]
-        isotope_pattern = [x / m0_i for x in isotope_pattern]
+        isotope_pattern = list(self.get_isotope_ratio(elem_dct, only_c=only_c, isotope_number=isotope_number))
 
         isotope_distribution_df = pd.DataFrame(data={'mz': isotope_mz_lst, 'ratio': isotope_pattern})
-        isotope_distribution_df = isotope_distribution_df.round({'ratio': 2})
 
         return isotope_distribution_df
 
+    def precompute_isotope_ratio(self, formula_lst, only_c=False):
+        """
+        Calculate the isotope distributions used by get_isotope_score for all formulas of the lipid master table,
+        e.g. at the start of a run. The table can be sent to the worker processes and added by load_isotope_ratio().
+
+        Args:
+            formula_lst (list): the charged formulas e.g. ['C41H79NO8P-']
+            only_c (bool): consider 13C only
+
+        Returns:
+            isotope_ratio_dct (dict): {(elemental composition, only_c, isotope_number): ratio}
+
+        """
+
+        isotope_ratio_dct = {}
+        for _formula in set(formula_lst):
+            _elem_dct = self.get_elements(_formula)
+            _pre2_elem_dct = dict(_elem_dct)
+            _pre2_elem_dct['H'] = _pre2_elem_dct.get('H', 0) - 2
+            # deconvolution of M-2 and M+0, isotope score of M+0 and M+2H
+            for _calc_elem_dct, _isotope_number in [(_pre2_elem_dct, 3), (_elem_dct, 3), (_elem_dct, 2),
+                                                    (self.get_elements(_formula + 'H2'), 2)]:
+                _ratio_key = (tuple(sorted(_calc_elem_dct.items())), only_c, _isotope_number)
+                if _ratio_key not in isotope_ratio_dct:
+                    try:
+                        isotope_ratio_dct[_ratio_key] = calc_isotope_ratio(*_ratio_key)
+                    except (KeyError, IndexError, ValueError):
+                        # not a valid formula for the isotope pattern, calculated on demand
+                        pass
+
+        return isotope_ratio_dct
+
+    @staticmethod
+    def load_isotope_ratio(isotope_ratio_dct):
+        """
+        Use the isotope distributions from precompute_isotope_ratio() as the table of the current process.
+        The table of the previous run is replaced, so the persistent worker processes keep one table only.
+
+        Args:
+            isotope_ratio_dct (dict): {(elemental composition, only_c, isotope_number): ratio}, {} to remove the table
+
+        """
+
+        global _isotope_ratio_table
+        _isotope_ratio_table = isotope_ratio_dct
+
     @staticmethod
     def peak_top_checker(ms1_pr_mz, spec_df, core_count=1, ms1_precision=50e-6):
 
@@ -153,14 +343,14 @@ class IsotopeHunter(object):
             top_precision = min(ms1_precision * 2, 500e-6)
         pr_delta = ms1_pr_mz * ms1_precision
 
-        ms_pr_df = spec_df.query('%f <= mz <= %f' % (ms1_pr_mz - pr_delta, ms1_pr_mz + pr_delta))
-        if not ms_pr_df.empty:
-            _i_df = ms_pr_df.sort_values(by='i', ascending=False)
-            pr_obs_i = _i_df['i'].values.tolist()[0]
-            pr_obs_mz = _i_df['mz'].values.tolist()[0]
+        sorted_spec = get_sorted_spectrum(spec_df)
+        pr_peak = sorted_spec.get_top_peak(ms1_pr_mz - pr_delta, ms1_pr_mz + pr_delta)
+        if pr_peak is not None:
+            pr_obs_i = pr_peak[0].item()
+            pr_obs_mz = pr_peak[1].item()
             top_delta = pr_obs_mz * top_precision
-            peak_top_df = spec_df.query('%f <= mz <= %f' % (ms1_pr_mz - top_delta, ms1_pr_mz + top_delta))
-            top_obs_i = max(peak_top_df['i'].values.tolist())
+            top_start, top_end = sorted_spec.get_window(ms1_pr_mz - top_delta, ms1_pr_mz + top_delta)
+            top_obs_i = max(sorted_spec.i_arr[top_start:top_end].tolist())
         else:
             pr_obs_i = 0
             pr_obs_mz = 0
@@ -192,18 +382,19 @@ class IsotopeHunter(object):
         # obs_pr_mz = 0
         # ms1_theo_mz = isotope_pattern_df.at[0, 'mz']
 
+        sorted_spec = get_sorted_spectrum(spec_df)
+
         if ms1_pr_i > 0:
-            for _i, _se in isotope_pattern_df.iterrows():
+            for _i, (_mz, _ratio) in enumerate(zip(isotope_pattern_df['mz'].values,
+                                                   isotope_pattern_df['ratio'].values)):
                 if len(deconv) == 3:
                     _base_i = deconv[_i]
                 else:
                     _base_i = 0
 
                 # [M+0] has _i == 0
-                _mz = _se['mz']
-                _ratio = _se['ratio']
                 _mz_delta = _mz * ms1_precision
-                _i_df = spec_df.query('%f <= mz <= %f' % (_mz - _mz_delta, _mz + _mz_delta))
+                _top_peak = sorted_spec.get_top_peak(_mz - _mz_delta, _mz + _mz_delta)
 
                 if _i < 2:
                     theo_i = ms1_pr_i * _ratio + _base_i
@@ -211,10 +402,8 @@ class IsotopeHunter(object):
                     theo_i = ms1_pr_i * _ratio
                 _i_info_dct = {'theo_mz': _mz, 'theo_i': theo_i, 'theo_ratio': _ratio}
 
-                if not _i_df.empty:
-                    _i_df = _i_df.sort_values(by='i', ascending=False).head(1)
-                    _i_max = _i_df['i'].max()
-                    _mz_max = _i_df['mz'].max()
+                if _top_peak is not None:
+                    _i_max, _mz_max = _top_peak
                     _i_info_dct['obs_i'] = _i_max
                     _i_info_dct['obs_mz'] = _mz_max
                 else:
@@ -256,7 +445,7 @@ class IsotopeHunter(object):
 
         if mode == 'm':
             if score_filter > 0:
-                peak_top, top_obs_i = self.peak_top_checker(theo_pr_mz, spec_df,
+                peak_top, top_obs_i = self.peak_top_checker(theo_pr_mz, sorted_spec,
                                                             core_count=core_count, ms1_precision=ms1_precision)
                 if peak_top is True:
                     isotope_calc_dct = {'isotope_checker_dct': isotope_checker_dct, 'isotope_score': isotope_score,
@@ -284,7 +473,7 @@ class IsotopeHunter(object):
 
         """
         :param elem_dct: (dict)
-        :param spec_df:
+        :param spec_df: (pd.DataFrame or SortedSpectrum)
         :param mz_delta:
         :param base_i:
         :param only_c:
@@ -295,18 +484,16 @@ class IsotopeHunter(object):
         base_m2_i = 0
         base_m3_i = 0
 
-        m_pre1_isotope_pattern_df = self.get_isotope_mz(elem_dct, only_c=only_c, isotope_number=3)
-        m_pre1_mz = m_pre1_isotope_pattern_df.at[0, 'mz']
-        pre_i_df = spec_df.query('%f <= mz <= %f' %
-                                 (m_pre1_mz - mz_delta, m_pre1_mz + mz_delta))
+        m_pre1_mz = self.get_mono_mz(elem_dct)
+        m_pre1_ratio_tpl = self.get_isotope_ratio(elem_dct, only_c=only_c, isotope_number=3)
+        max_m_pre1_i = get_sorted_spectrum(spec_df).get_max_i(m_pre1_mz - mz_delta, m_pre1_mz + mz_delta)
 
-        if not pre_i_df.empty:
-            max_m_pre1_i = pre_i_df['i'].max()
+        if max_m_pre1_i is not None:
             max_m_pre1_i -= base_i
             if max_m_pre1_i > 0:
-                base_m1_i += max_m_pre1_i * m_pre1_isotope_pattern_df.at[1, 'ratio']
-                base_m2_i += max_m_pre1_i * m_pre1_isotope_pattern_df.at[2, 'ratio']
-                base_m3_i += max_m_pre1_i * m_pre1_isotope_pattern_df.at[3, 'ratio']
+                base_m1_i += max_m_pre1_i * m_pre1_ratio_tpl[1]
+                base_m2_i += max_m_pre1_i * m_pre1_ratio_tpl[2]
+                base_m3_i += max_m_pre1_i * m_pre1_ratio_tpl[3]
 
         return base_m1_i, base_m2_i, base_m3_i
 
@@ -316,6 +503,8 @@ class IsotopeHunter(object):
 
         mz_delta = ms1_pr_mz * ms1_precision
         delta_13c = 1.0033548378
+        # all m/z windows of this precursor are searched in the same sorted spectrum
+        sorted_spec = get_sorted_spectrum(spec_df)
         obs_pr_mz = 0
         obs_pr_i = 0
 
@@ -329,13 +518,13 @@ class IsotopeHunter(object):
             # M-2
             deconv_elem_dct['H'] += -2
             base_i = 0
-            pre2_base_m1_i, pre2_base_m2_i, pre2_base_m3_i = self.get_deconvolution(spec_df, mz_delta, base_i,
+            pre2_base_m1_i, pre2_base_m2_i, pre2_base_m3_i = self.get_deconvolution(sorted_spec, mz_delta, base_i,
                                                                                     deconv_elem_dct, only_c=only_c)
 
             # M+0
             # m0_base_abs = pre2_base_m2_i + pre1_base_m1_i
             m0_base_abs = pre2_base_m2_i
-            base_m1_i, base_m2_i, base_m3_i = self.get_deconvolution(spec_df, mz_delta, m0_base_abs,
+            base_m1_i, base_m2_i, base_m3_i = self.get_deconvolution(sorted_spec, mz_delta, m0_base_abs,
                                                                      self.get_elements(formula), only_c=only_c)
             # M+1
             m1_base_abs = pre2_base_m3_i
@@ -357,11 +546,10 @@ class IsotopeHunter(object):
 
             deconv_lst = [m0_base_abs, m1_base_abs, m2_base_abs, m3_base_abs]
 
-        i_df = spec_df.query('%f <= mz <= %f' % (ms1_pr_mz - delta_13c - mz_delta, ms1_pr_mz - delta_13c + mz_delta))
+        max_pre_m_i = sorted_spec.get_max_i(ms1_pr_mz - delta_13c - mz_delta, ms1_pr_mz - delta_13c + mz_delta)
 
-        if not i_df.empty:
-            max_pre_m_i = i_df['i'].max()
-            peak_top, top_obs_i = self.peak_top_checker(ms1_pr_mz - delta_13c, spec_df,
+        if max_pre_m_i is not None:
+            peak_top, top_obs_i = self.peak_top_checker(ms1_pr_mz - delta_13c, sorted_spec,
                                                         core_count=core_count, ms1_precision=ms1_precision)
             if peak_top is True:
                 pass
@@ -374,14 +562,14 @@ class IsotopeHunter(object):
         if ms1_pr_i > max_pre_m_i or pseudo_pr_check == 0:
             elem_dct = self.get_elements(formula)
             mono_mz = self.get_mono_mz(elem_dct)
-            pr_range_top, range_top_obs_i = self.peak_top_checker(ms1_pr_mz, spec_df, core_count=core_count,
+            pr_range_top, range_top_obs_i = self.peak_top_checker(ms1_pr_mz, sorted_spec, core_count=core_count,
                                                                   ms1_precision=ms1_precision * 2.5)
             if pr_range_top and abs((ms1_pr_mz - mono_mz)) <= ms1_precision * ms1_pr_mz:
                 isotope_pattern_df = self.get_isotope_mz(elem_dct, only_c=only_c)
                 # print(isotope_pattern_df)
                 ms1_pr_i -= m0_base_abs
                 m0_deconv_lst = [m0_base_abs, m1_base_abs, m2_base_abs]
-                isotope_calc_dct = self.calc_isotope_score(isotope_pattern_df, spec_df, ms1_precision, ms1_pr_i,
+                isotope_calc_dct = self.calc_isotope_score(isotope_pattern_df, sorted_spec, ms1_precision, ms1_pr_i,
                                                            core_count=core_count, deconv=m0_deconv_lst, mode='m',
                                                            score_filter=score_filter)
 
@@ -406,12 +594,12 @@ class IsotopeHunter(object):
                     # get exact M+2 pr i, especially for ppm < 10
                     m2_mz_df = m2_isotope_pattern_df.head(1)
                     m2_mz = m2_mz_df['mz'].tolist()[0]
-                    m2_i_df = spec_df.query('%f <= mz <= %f' % (m2_mz * (1 - ms1_precision),
-                                                                m2_mz * (1 + ms1_precision)))
-                    m2_i = m2_i_df['i'].max()
+                    m2_i = sorted_spec.get_max_i(m2_mz * (1 - ms1_precision), m2_mz * (1 + ms1_precision))
+                    if m2_i is None:
+                        m2_i = float('nan')
                     m2_i -= m2_base_abs
                     m2_deconv_lst = [m2_base_abs, m3_base_abs, 0]
-                    m2_calc_dct = self.calc_isotope_score(m2_isotope_pattern_df, spec_df, ms1_precision, m2_i,
+                    m2_calc_dct = self.calc_isotope_score(m2_isotope_pattern_df, sorted_spec, ms1_precision, m2_i,
                                                           core_count=core_count, deconv=m2_deconv_lst, mode='m+2',
                                                           score_filter=score_filter)
 
@@ -467,6 +655,8 @@ class IsotopeHunter(object):
         # TODO (georgia.angelidou@uni-leipzig.de): Need to check the reason why we do not get any output
         mz_delta = ms1_pr_mz * ms1_precision
         delta_13c = 1.0033548378
+        # all m/z windows of this precursor are searched in the same sorted spectrum
+        sorted_spec = get_sorted_spectrum(spec_df)
 
         if exp_mode == 'Shotgun':
             pseudo_pr_check = 0
@@ -477,10 +667,10 @@ class IsotopeHunter(object):
 
             deconv_elem_dct['H'] += -2
             base_i = 0
-            pre2_base_m1_i, pre2_base_m2_i, pre2_base_m3_i = self.get_deconvolution(spec_df, mz_delta, base_i,
+            pre2_base_m1_i, pre2_base_m2_i, pre2_base_m3_i = self.get_deconvolution(sorted_spec, mz_delta, base_i,
                                                                                     deconv_elem_dct, only_c=only_c)
             m0_base_abs = pre2_base_m2_i
-            base_m1_i, base_m2_i, base_m3_i = self.get_deconvolution(spec_df, mz_delta, m0_base_abs,
+            base_m1_i, base_m2_i, base_m3_i = self.get_deconvolution(sorted_spec, mz_delta, m0_base_abs,
                                                                      self.get_elements(formula), only_c=only_c)
 
             m1_base_abs = pre2_base_m3_i
@@ -504,10 +694,9 @@ class IsotopeHunter(object):
 
             deconv_lst = [m0_base_abs, m1_base_abs, m2_base_abs, m3_base_abs]
 
-        i_df = spec_df.query('%f <= mz <= %f' % (ms1_pr_mz - delta_13c - mz_delta, ms1_pr_mz - delta_13c + mz_delta))
+        max_pre_m_i = sorted_spec.get_max_i(ms1_pr_mz - delta_13c - mz_delta, ms1_pr_mz - delta_13c + mz_delta)
         isotope_flag = 0
-        if not i_df.empty:
-            max_pre_m_i = i_df['i'].max()
+        if max_pre_m_i is not None:
 
             if ms1_pr_i > max_pre_m_i or pseudo_pr_check == 0:
                 elem_dct = self.get_elements(formula)
@@ -528,6 +717,8 @@ class IsotopeHunter(object):
 
         mz_delta = ms1_pr_mz * ms1_precision
         delta_13c = 1.0033548378
+        # all m/z windows of this precursor are searched in the same sorted spectrum
+        sorted_spec = get_sorted_spectrum(spec_df)
 
         if exp_mode == 'Shotgun':
             pseudo_pr_check = 0
@@ -538,10 +729,10 @@ class IsotopeHunter(object):
 
             deconv_elem_dct['H'] += -2
             base_i = 0
-            pre2_base_m1_i, pre2_base_m2_i, pre2_base_m3_i = self.get_deconvolution(spec_df, mz_delta, base_i,
+            pre2_base_m1_i, pre2_base_m2_i, pre2_base_m3_i = self.get_deconvolution(sorted_spec, mz_delta, base_i,
                                                                                     deconv_elem_dct, only_c=only_c)
             m0_base_abs = pre2_base_m2_i
-            base_m1_i, base_m2_i, base_m3_i = self.get_deconvolution(spec_df, mz_delta, m0_base_abs,
+            base_m1_i, base_m2_i, base_m3_i = self.get_deconvolution(sorted_spec, mz_delta, m0_base_abs,
                                                                      self.get_elements(formula), only_c=only_c)
 
             m1_base_abs = pre2_base_m3_i
@@ -565,10 +756,9 @@ class IsotopeHunter(object):
 
             deconv_lst = [m0_base_abs, m1_base_abs, m2_base_abs, m3_base_abs]
 
-        i_df = spec_df.query('%f <= mz <= %f' % (ms1_pr_mz - delta_13c - mz_delta, ms1_pr_mz - delta_13c + mz_delta))
+        max_pre_m_i = sorted_spec.get_max_i(ms1_pr_mz - delta_13c - mz_delta, ms1_pr_mz - delta_13c + mz_delta)
         isotope_flag = 0
-        if not i_df.empty:
-            max_pre_m_i = i_df['i'].max()
+        if max_pre_m_i is not None:
 
             if ms1_pr_i > max_pre_m_i or pseudo_pr_check == 0:
                 elem_dct = self.get_elements(formula)
@@ -585,6 +775,10 @@ class IsotopeHunter(object):
         return isotope_flag
 
 
+# the IsotopeHunter has no state of its own, one instance is shared in each process
+ISOTOPE_HUNTER = IsotopeHunter()
+
+
 if __name__ == '__main__':
     # f = 'C39H67NO8P'  # PE(34:5)
     # f_lst = [f, f + 'K', f + 'Na', f + 'NH4', f + 'S', f + 'D']
@@ -19,44 +19,44 @@
 
 import itertools
 
+import numpy as np
 import pandas as pd
 from natsort import natsorted, ns
 
-from LibLipidHunter.LipidNomenclature import NameParserFA
-from LibLipidHunter.AbbrElemCalc import ElemCalc
+from LibLipidHunter.LipidNomenclature import FA_ELEM_DCT, FA_NAME_PARSER
+from LibLipidHunter.AbbrElemCalc import ELEM_CALC, GLYCEROL_BONE_ELEM_DCT, LINK_O_ELEM_DCT, LINK_P_ELEM_DCT
+from LibLipidHunter.AbbrElemCalc import LIPID_HG_ELEM_DCT
 from LibLipidHunter.ParallelFunc import ppm_window_para
 
 
+def round_mz(mz_arr, decimals=6):
+    """
+    Round the m/z values the same way as the built-in round() of the single values.
+
+    Args:
+        mz_arr (np.ndarray): the m/z values
+        decimals (int): the number of decimals
+
+    Returns:
+        mz_arr (np.ndarray)
+
+    """
+
+    return np.array([round(_mz, decimals) for _mz in mz_arr.tolist()], dtype=np.float64)
+
+
 class LipidComposer:
 
     def __init__(self):
-        pa_hg_elem = {'C': 0, 'H': 3, 'O': 4, 'P': 1, 'N': 0}
-        pc_hg_elem = {'C': 5, 'H': 14, 'O': 4, 'P': 1, 'N': 1}
-        pe_hg_elem = {'C': 2, 'H': 8, 'O': 4, 'P': 1, 'N': 1}
-        pg_hg_elem = {'C': 3, 'H': 9, 'O': 6, 'P': 1, 'N': 0}
-        pi_hg_elem = {'C': 6, 'H': 13, 'O': 9, 'P': 1, 'N': 0}
-        pip_hg_elem = {'C': 6, 'H': 14, 'O': 12, 'P': 2, 'N': 0}
-        ps_hg_elem = {'C': 3, 'H': 8, 'O': 6, 'P': 1, 'N': 1}
-        tg_hg_elem = {'C': 0, 'H': 0, 'O': 0, 'P': 0, 'N': 0}
 
         self.lipid_hg_lst = ['PA', 'PC', 'PE', 'PG', 'PI', 'PS', 'PIP', 'TG']
 
-        self.lipid_hg_elem_dct = {'PA': pa_hg_elem, 'PC': pc_hg_elem, 'PE': pe_hg_elem, 'PG': pg_hg_elem,
-                                  'PI': pi_hg_elem, 'PS': ps_hg_elem, 'PIP': pip_hg_elem, 'TG': tg_hg_elem,
-                                  'DG': tg_hg_elem}
-
-        self.glycerol_bone_elem_dct = {'C': 3, 'H': 2}
-        self.link_o_elem_dct = {'O': -1, 'H': 2}
-        self.link_p_elem_dct = {'O': -1}
-        self.elem_dct = {'H': [1.0078250321, 0.999885],
-                         'D': [2.0141017780, 0.0001157],
-                         'C': [12.0, 0.9893],
-                         'N': [14.0030740052, 0.99632],
-                         'O': [15.9949146221, 0.99757],
-                         'Na': [22.98976967, 1.0],
-                         'P': [30.97376151, 1.0],
-                         'S': [31.97207069, 0.9493],
-                         'K': [38.9637069, 0.932581]}
+        # the tables are shared by all instances
+        self.lipid_hg_elem_dct = LIPID_HG_ELEM_DCT
+        self.glycerol_bone_elem_dct = GLYCEROL_BONE_ELEM_DCT
+        self.link_o_elem_dct = LINK_O_ELEM_DCT
+        self.link_p_elem_dct = LINK_P_ELEM_DCT
+        self.elem_dct = FA_ELEM_DCT
 
     @staticmethod
     def calc_fa_df(lipid_class, fa_df):
@@ -157,8 +157,8 @@ class LipidComposer:
             fa_abbr_lst.extend(_s)  # Compine all the FA in one list
         fa_abbr_lst = sorted(list(set(fa_abbr_lst)))
 
-        abbr_parser = NameParserFA()
-        elem_calc = ElemCalc()
+        abbr_parser = FA_NAME_PARSER
+        elem_calc = ELEM_CALC
         usr_fa_dct = {}
         for _fa_abbr in fa_abbr_lst:
             if _fa_abbr:
@@ -191,7 +191,7 @@ class LipidComposer:
             lyso_type_dct = {'[L%s-H]-' % lipid_class: 'EXACTMASS', '[L%s-H2O-H]-' % lipid_class: '[FA-H2O]_MZ'}
 
             # backbone creation for the different PL
-            lyso_base_elem_dct = self.lipid_hg_elem_dct[lipid_class]
+            lyso_base_elem_dct = self.lipid_hg_elem_dct[lipid_class].copy()
             for _e in list(self.glycerol_bone_elem_dct.keys()):
                 lyso_base_elem_dct[_e] += self.glycerol_bone_elem_dct[_e]
 
@@ -234,7 +234,7 @@ class LipidComposer:
             # and we dont know the cobination of the remaining 2
             # TODO(georgia.angelidou@uni-leipzig.de): create the section for theuniue fragments when there is TG
             mg_type_dct = {'[MG-H2O+H]+': 'EXACTMASS'}
-            mg_base_elem_dct = self.lipid_hg_elem_dct[lipid_class]
+            mg_base_elem_dct = self.lipid_hg_elem_dct[lipid_class].copy()
 
             for _e in self.glycerol_bone_elem_dct.keys():
                 mg_base_elem_dct[_e] += self.glycerol_bone_elem_dct[_e]
@@ -252,7 +252,7 @@ class LipidComposer:
                     '%s_MZ_HIGH' % _mg_ion].astype(str))
         elif lipid_class in ['DG']:
             mg_type_dct = {'[MG-H2O+H]+': 'EXACTMASS'}
-            mg_base_elem_dct = self.lipid_hg_elem_dct[lipid_class]
+            mg_base_elem_dct = self.lipid_hg_elem_dct[lipid_class].copy()
 
             for _e in self.glycerol_bone_elem_dct.keys():
                 mg_base_elem_dct[_e] += self.glycerol_bone_elem_dct[_e]
@@ -275,6 +275,18 @@ class LipidComposer:
 
     def gen_all_comb(self, lipid_class, usr_fa_df, position=False):
 
+        fa_combo_lite_df = self.gen_all_comb_df(lipid_class, usr_fa_df, position=position)
+
+        # fa_combo_lite_df.is_copy = False
+        fa_combo_lite_df['idx'] = fa_combo_lite_df['DISCRETE_ABBR']
+        fa_combo_lite_df.set_index('idx', drop=True, inplace=True)
+
+        lipid_comb_dct = fa_combo_lite_df.to_dict(orient='index')
+
+        return lipid_comb_dct
+
+    def gen_all_comb_df(self, lipid_class, usr_fa_df, position=False):
+
         fa_units_lst = self.calc_fa_df(lipid_class, usr_fa_df)
 
         if lipid_class in ['PA', 'PC', 'PE', 'PG', 'PI', 'PS', 'DG', 'SM'] and len(fa_units_lst) == 2:
@@ -469,276 +481,148 @@ class LipidComposer:
         else:
             fa_combo_lite_df = fa_combo_df.copy()
 
-        # fa_combo_lite_df.is_copy = False
-        fa_combo_lite_df['idx'] = fa_combo_lite_df['DISCRETE_ABBR']
-        fa_combo_lite_df.set_index('idx', drop=True, inplace=True)
+        return fa_combo_lite_df
 
-        lipid_comb_dct = fa_combo_lite_df.to_dict(orient='index')
+    @staticmethod
+    def add_ppm_query(lipid_df, ion, mz_arr, ms2_ppm=100):
+        """
+        Add the m/z window and the query string of a fragment to the lipid master table.
 
-        return lipid_comb_dct
+        Args:
+            lipid_df (pd.DataFrame): the lipid master table
+            ion (str): the name of the fragment e.g. '[M-(FA1)+H]+'
+            mz_arr (np.ndarray): the m/z of the fragment for each lipid
+            ms2_ppm (int): the MS2 tolerance in ppm
+
+        Returns:
+            lipid_df (pd.DataFrame)
+
+        """
+
+        lipid_df['%s_MZ_LOW' % ion] = ppm_window_para(mz_arr, ms2_ppm * -1)
+        lipid_df['%s_MZ_HIGH' % ion] = ppm_window_para(mz_arr, ms2_ppm)
+        lipid_df['%s_Q' % ion] = (lipid_df['%s_MZ_LOW' % ion].astype(str) + ' <= mz <= '
+                                  + lipid_df['%s_MZ_HIGH' % ion].astype(str))
+
+        return lipid_df
 
     @staticmethod
-    def calc_fragments(lipid_dct, charge='', ms2_ppm=100):
+    def calc_fragments(lipid_df, charge='', ms2_ppm=100):
+        """
+        Calculate the class specific fragments of all lipids in the lipid master table column by column.
+
+        Args:
+            lipid_df (pd.DataFrame): the lipid master table with the EXACTMASS and the FA information
+            charge (str): the precursor charge mode e.g. '[M+NH4]+'
+            ms2_ppm (int): the MS2 tolerance in ppm
 
-        # m_formula = lipid_dct['FORMULA']
-        m_exactmass = lipid_dct['EXACTMASS']
-        m_class = lipid_dct['CLASS']
+        Returns:
+            lipid_df (pd.DataFrame)
+
+        """
+
+        m_exactmass = lipid_df['EXACTMASS'].values
+        m_class = lipid_df['CLASS'].iloc[0]
 
         h_exactmass = 1.0078250321
         na_exactmass = 22.98976967
-        nh3_exactmass = 3 * 1.0078250321 + 14.0030740052
         ch3_exactmass = 12.0 + 3 * 1.0078250321
         nl_water = 2 * 1.0078250321 + 15.9949146221
         gly_mg_base_exactmass = 3 * 12.0 + 5 * 1.0078250321 + 15.9949146221
-        fa1_abbr = lipid_dct['FA1'].strip('FA')
-        fa2_abbr = lipid_dct['FA2'].strip('FA')
 
-        fa1_exactmass = lipid_dct['FA1_EXACTMASS']
-        if 'FA2_EXACTMASS' in list(lipid_dct.keys()):
-            fa2_exactmass = lipid_dct['FA2_EXACTMASS']
+        fa_lst = [_fa for _fa in ['FA1', 'FA2', 'FA3'] if '%s_EXACTMASS' % _fa in lipid_df.columns]
+        fa_abbr_dct = {_fa: lipid_df[_fa].str.strip('FA') for _fa in fa_lst}
+        fa_exactmass_dct = {_fa: lipid_df['%s_EXACTMASS' % _fa].values for _fa in fa_lst}
 
-        if m_class in ['PA', 'PE', 'PG', 'PI', 'PS', 'PIP', 'PL']:
+        if m_class in ['PA', 'PE', 'PG', 'PI', 'PS', 'PIP', 'PL', 'PC']:
 
             lyso_str = 'L' + m_class
+            # the other FA is lost from the lipid. The abbr. for PC is not exactly correct due to the compatibility
+            # issues with rank score calc functions
+            lyso_fa_dct = {'FA1': 'FA2', 'FA2': 'FA1'}
+            if m_class in ['PC']:
+                lyso_loss_exactmass = ch3_exactmass
+                lyso_abbr_lst = [('[LPL(%s)-H]-', '-CH3]-'), ('[LPL(%s)-H2O-H]-', '-H2O-CH3]-')]
+            else:
+                lyso_loss_exactmass = h_exactmass
+                lyso_abbr_lst = [('[LPL(%s)-H]-', '-H]-'), ('[LPL(%s)-H2O-H]-', '-H2O-H]-')]
 
             # create the abbreviation name for the Lyso fragments eg. LPE(18:0)-H]-_ABBR
-            # without the loss of water
-            lipid_dct['[LPL(FA1)-H]-_ABBR'] = '[%s(%s)-H]-' % (lyso_str, fa1_abbr)
-            lipid_dct['[LPL(FA2)-H]-_ABBR'] = '[%s(%s)-H]-' % (lyso_str, fa2_abbr)
-            # with the loss of water
-            lipid_dct['[LPL(FA1)-H2O-H]-_ABBR'] = '[%s(%s)-H2O-H]-' % (lyso_str, fa1_abbr)
-            lipid_dct['[LPL(FA2)-H2O-H]-_ABBR'] = '[%s(%s)-H2O-H]-' % (lyso_str, fa2_abbr)
+            for _lyso_ion, _lyso_abbr in lyso_abbr_lst:
+                for _fa in ['FA1', 'FA2']:
+                    lipid_df['%s_ABBR' % (_lyso_ion % _fa)] = '[%s(' % lyso_str + fa_abbr_dct[_fa] + ')' + _lyso_abbr
 
             # calculation of the exact mass for the different lyso fragments
-            lipid_dct['[LPL(FA1)-H]-_MZ'] = round(m_exactmass - (fa2_exactmass - nl_water) - h_exactmass, 6)
-            lipid_dct['[LPL(FA2)-H]-_MZ'] = round(m_exactmass - (fa1_exactmass - nl_water) - h_exactmass, 6)
-            lipid_dct['[LPL(FA1)-H2O-H]-_MZ'] = round(m_exactmass - fa2_exactmass - h_exactmass, 6)
-            lipid_dct['[LPL(FA2)-H2O-H]-_MZ'] = round(m_exactmass - fa1_exactmass - h_exactmass, 6)
-
-        elif m_class in ['PC']:
-
-            lyso_str = 'L' + m_class
-            # The abbr. here is not exactly correct due to the compatibility issues with ranks core calc functions
-            lipid_dct['[LPL(FA1)-H]-_ABBR'] = '[%s(%s)-CH3]-' % (lyso_str, fa1_abbr)
-            lipid_dct['[LPL(FA2)-H]-_ABBR'] = '[%s(%s)-CH3]-' % (lyso_str, fa2_abbr)
-            lipid_dct['[LPL(FA1)-H2O-H]-_ABBR'] = '[%s(%s)-H2O-CH3]-' % (lyso_str, fa1_abbr)
-            lipid_dct['[LPL(FA2)-H2O-H]-_ABBR'] = '[%s(%s)-H2O-CH3]-' % (lyso_str, fa2_abbr)
-
-            lipid_dct['[LPL(FA1)-H]-_MZ'] = round(m_exactmass - (fa2_exactmass - nl_water) - ch3_exactmass, 6)
-            lipid_dct['[LPL(FA2)-H]-_MZ'] = round(m_exactmass - (fa1_exactmass - nl_water) - ch3_exactmass, 6)
-            lipid_dct['[LPL(FA1)-H2O-H]-_MZ'] = round(m_exactmass - fa2_exactmass - ch3_exactmass, 6)
-            lipid_dct['[LPL(FA2)-H2O-H]-_MZ'] = round(m_exactmass - fa1_exactmass - ch3_exactmass, 6)
-
-        elif m_class in ['LPA', 'LPE', 'LPG', 'LPI', 'LPS', 'LPIP', 'LPL']:
-            pass
-
-        elif m_class in ['LPC']:
-            pass
+            for _fa in ['FA1', 'FA2']:
+                lipid_df['[LPL(%s)-H]-_MZ' % _fa] = round_mz(m_exactmass - (fa_exactmass_dct[lyso_fa_dct[_fa]]
+                                                                            - nl_water) - lyso_loss_exactmass)
+            for _fa in ['FA1', 'FA2']:
+                lipid_df['[LPL(%s)-H2O-H]-_MZ' % _fa] = round_mz(m_exactmass - fa_exactmass_dct[lyso_fa_dct[_fa]]
+                                                                 - lyso_loss_exactmass)
 
         elif m_class in ['TG']:
-            # Here maybe should get the DG fragments
-            # TODO(georgia.angelidou@uni-leipzig.de): create the section for theuniue fragments when there is TG
-            #   Missing the fragments for the sodium adduct
-
-            # The different frgments for triacylglycerol names when neutral loss of the FA
-            # Take the correspond information of the 3 FA
-            fa3_abbr = lipid_dct['FA3'].strip('FA')
-            fa3_exactmass = lipid_dct['FA3_EXACTMASS']
+            # The different fragments for triacylglycerol names when neutral loss of the FA
             dg_str = 'M'
             if charge in ['[M+Na]+']:
-                fa1_Na_exactmass = lipid_dct['FA1_[FA-H+Na]_MZ']
-                fa2_Na_exactmass = lipid_dct['FA2_[FA-H+Na]_MZ']
-                fa3_Na_exactmass = lipid_dct['FA3_[FA-H+Na]_MZ']
-
-                lipid_dct['[M-(FA1)+Na]+_ABBR'] = '[%s-FA%s+Na]+' % (dg_str, fa1_abbr)
-                lipid_dct['[M-(FA2)+Na]+_ABBR'] = '[%s-FA%s+Na]+' % (dg_str, fa2_abbr)
-                lipid_dct['[M-(FA3)+Na]+_ABBR'] = '[%s-FA%s+Na]+' % (dg_str, fa3_abbr)
-
-                lipid_dct['[M-(FA1-H+Na)+H]+_ABBR'] = '[%s-(FA%s-H+Na)+H]+' % (dg_str, fa1_abbr)
-                lipid_dct['[M-(FA2-H+Na)+H]+_ABBR'] = '[%s-(FA%s-H+Na)+H]+' % (dg_str, fa2_abbr)
-                lipid_dct['[M-(FA3-H+Na)+H]+_ABBR'] = '[%s-(FA%s-H+Na)+H]+' % (dg_str, fa3_abbr)
-
-                lipid_dct['[M-(FA1)+Na]+_MZ'] = round(m_exactmass - fa1_exactmass + na_exactmass, 6)
-                lipid_dct['[M-(FA2)+Na]+_MZ'] = round(m_exactmass - fa2_exactmass + na_exactmass, 6)
-                lipid_dct['[M-(FA3)+Na]+_MZ'] = round(m_exactmass - fa3_exactmass + na_exactmass, 6)
-
-                lipid_dct['[M-(FA1-H+Na)+H]+_MZ'] = round(m_exactmass - fa1_Na_exactmass + na_exactmass, 6)
-                lipid_dct['[M-(FA2-H+Na)+H]+_MZ'] = round(m_exactmass - fa2_Na_exactmass + na_exactmass, 6)
-                lipid_dct['[M-(FA3-H+Na)+H]+_MZ'] = round(m_exactmass - fa3_Na_exactmass + na_exactmass, 6)
-
-                lipid_dct['[M-(FA1)+Na]+_MZ_LOW'] = ppm_window_para((m_exactmass - (fa1_exactmass) + na_exactmass),
-                                                                    ms2_ppm * -1)
-                lipid_dct['[M-(FA1)+Na]+_MZ_HIGH'] = ppm_window_para((m_exactmass - (fa1_exactmass) + na_exactmass),
-                                                                     ms2_ppm)
-                lipid_dct['[M-(FA1)+Na]+_Q'] = (
-                        lipid_dct['[M-(FA1)+Na]+_MZ_LOW'].astype(str) + ' <= mz <= ' + lipid_dct[
-                    '[M-(FA1)+Na]+_MZ_HIGH'].astype(str))
-
-                lipid_dct['[M-(FA2)+Na]+_MZ_LOW'] = ppm_window_para((m_exactmass - (fa2_exactmass) + na_exactmass),
-                                                                    ms2_ppm * -1)
-                lipid_dct['[M-(FA2)+Na]+_MZ_HIGH'] = ppm_window_para((m_exactmass - (fa2_exactmass) + na_exactmass),
-                                                                     ms2_ppm)
-                lipid_dct['[M-(FA2)+Na]+_Q'] = (
-                        lipid_dct['[M-(FA2)+Na]+_MZ_LOW'].astype(str) + ' <= mz <= ' + lipid_dct[
-                    '[M-(FA2)+Na]+_MZ_HIGH'].astype(str))
-
-                lipid_dct['[M-(FA3)+Na]+_MZ_LOW'] = ppm_window_para((m_exactmass - (fa3_exactmass) + na_exactmass),
-                                                                    ms2_ppm * -1)
-                lipid_dct['[M-(FA3)+Na]+_MZ_HIGH'] = ppm_window_para((m_exactmass - (fa3_exactmass) + na_exactmass),
-                                                                     ms2_ppm)
-                lipid_dct['[M-(FA3)+Na]+_Q'] = (
-                        lipid_dct['[M-(FA3)+Na]+_MZ_LOW'].astype(str) + ' <= mz <= ' + lipid_dct[
-                    '[M-(FA3)+Na]+_MZ_HIGH'].astype(str))
-
-                lipid_dct['[M-(FA1-H+Na)+H]+_MZ_LOW'] = ppm_window_para(
-                    (m_exactmass - (fa1_Na_exactmass) + na_exactmass), ms2_ppm * -1)
-                lipid_dct['[M-(FA1-H+Na)+H]+_MZ_HIGH'] = ppm_window_para(
-                    (m_exactmass - (fa1_Na_exactmass) + na_exactmass), ms2_ppm)
-                lipid_dct['[M-(FA1-H+Na)+H]+_Q'] = (
-                        lipid_dct['[M-(FA1-H+Na)+H]+_MZ_LOW'].astype(str) + ' <= mz <= ' + lipid_dct[
-                    '[M-(FA1-H+Na)+H]+_MZ_HIGH'].astype(str))
-
-                lipid_dct['[M-(FA2-H+Na)+H]+_MZ_LOW'] = ppm_window_para(
-                    (m_exactmass - (fa2_Na_exactmass) + na_exactmass), ms2_ppm * -1)
-                lipid_dct['[M-(FA2-H+Na)+H]+_MZ_HIGH'] = ppm_window_para(
-                    (m_exactmass - (fa2_Na_exactmass) + na_exactmass), ms2_ppm)
-                lipid_dct['[M-(FA2-H+Na)+H]+_Q'] = (
-                        lipid_dct['[M-(FA2-H+Na)+H]+_MZ_LOW'].astype(str) + ' <= mz <= ' + lipid_dct[
-                    '[M-(FA2-H+Na)+H]+_MZ_HIGH'].astype(str))
-
-                lipid_dct['[M-(FA3-H+Na)+H]+_MZ_LOW'] = ppm_window_para(
-                    (m_exactmass - (fa3_Na_exactmass) + na_exactmass), ms2_ppm * -1)
-                lipid_dct['[M-(FA3-H+Na)+H]+_MZ_HIGH'] = ppm_window_para(
-                    (m_exactmass - (fa3_Na_exactmass) + na_exactmass), ms2_ppm)
-                lipid_dct['[M-(FA3-H+Na)+H]+_Q'] = (
-                        lipid_dct['[M-(FA3-H+Na)+H]+_MZ_LOW'].astype(str) + ' <= mz <= ' + lipid_dct[
-                    '[M-(FA3-H+Na)+H]+_MZ_HIGH'].astype(str))
+                fa_na_exactmass_dct = {_fa: lipid_df['%s_[FA-H+Na]_MZ' % _fa].values for _fa in fa_lst}
+
+                for _fa in fa_lst:
+                    lipid_df['[M-(%s)+Na]+_ABBR' % _fa] = '[%s-FA' % dg_str + fa_abbr_dct[_fa] + '+Na]+'
+                for _fa in fa_lst:
+                    lipid_df['[M-(%s-H+Na)+H]+_ABBR' % _fa] = '[%s-(FA' % dg_str + fa_abbr_dct[_fa] + '-H+Na)+H]+'
+
+                nl_mz_dct = {}
+                for _fa in fa_lst:
+                    nl_mz_dct['[M-(%s)+Na]+' % _fa] = m_exactmass - fa_exactmass_dct[_fa] + na_exactmass
+                for _fa in fa_lst:
+                    nl_mz_dct['[M-(%s-H+Na)+H]+' % _fa] = m_exactmass - fa_na_exactmass_dct[_fa] + na_exactmass
             else:
-                # Neutral loss of a FA with a water
-                lipid_dct['[M-(FA1)+H]+_ABBR'] = '[%s-FA%s+H]+' % (dg_str, fa1_abbr)
-                lipid_dct['[M-(FA2)+H]+_ABBR'] = '[%s-FA%s+H]+' % (dg_str, fa2_abbr)
-                lipid_dct['[M-(FA3)+H]+_ABBR'] = '[%s-FA%s+H]+' % (dg_str, fa3_abbr)
-                # Neutral loss of a FA minus a water
-                lipid_dct['[M-(FA1-H2O)+H]+_ABBR'] = '[%s-(FA%s-H2O)+H]+' % (dg_str, fa1_abbr)
-                lipid_dct['[M-(FA2-H2O)+H]+_ABBR'] = '[%s-(FA%s-H2O)+H]+' % (dg_str, fa2_abbr)
-                lipid_dct['[M-(FA3-H2O)+H]+_ABBR'] = '[%s-(FA%s-H2O)+H]+' % (dg_str, fa3_abbr)
-
-                lipid_dct['[M-(FA1)+H]+_MZ'] = round(m_exactmass - fa1_exactmass + h_exactmass, 6)
-                lipid_dct['[M-(FA2)+H]+_MZ'] = round(m_exactmass - fa2_exactmass + h_exactmass, 6)
-                lipid_dct['[M-(FA3)+H]+_MZ'] = round(m_exactmass - fa3_exactmass + h_exactmass, 6)
-
-                lipid_dct['[M-(FA1-H2O)+H]+_MZ'] = round(m_exactmass - (fa1_exactmass - nl_water) + h_exactmass, 6)
-                lipid_dct['[M-(FA2-H2O)+H]+_MZ'] = round(m_exactmass - (fa2_exactmass - nl_water) + h_exactmass, 6)
-                lipid_dct['[M-(FA3-H2O)+H]+_MZ'] = round(m_exactmass - (fa3_exactmass - nl_water) + h_exactmass, 6)
-
-                lipid_dct['[MG(FA1)-H2O+H]+_MZ_LOW'] = ppm_window_para((fa1_exactmass + gly_mg_base_exactmass),
-                                                                       ms2_ppm * -1)
-                lipid_dct['[MG(FA1)-H2O+H]+_MZ_HIGH'] = ppm_window_para((fa1_exactmass + gly_mg_base_exactmass),
-                                                                        ms2_ppm)
-                lipid_dct['[MG(FA1)-H2O+H]+_Q'] = (
-                        lipid_dct['[MG(FA1)-H2O+H]+_MZ_LOW'].astype(str) + ' <= mz <= ' +
-                        lipid_dct['[MG(FA1)-H2O+H]+_MZ_HIGH'].astype(str))
-
-                lipid_dct['[MG(FA2)-H2O+H]+_MZ_LOW'] = ppm_window_para((fa2_exactmass + gly_mg_base_exactmass),
-                                                                       ms2_ppm * -1)
-                lipid_dct['[MG(FA2)-H2O+H]+_MZ_HIGH'] = ppm_window_para((fa2_exactmass + gly_mg_base_exactmass),
-                                                                        ms2_ppm)
-                lipid_dct['[MG(FA2)-H2O+H]+_Q'] = (
-                        lipid_dct['[MG(FA2)-H2O+H]+_MZ_LOW'].astype(str) + ' <= mz <= ' +
-                        lipid_dct['[MG(FA2)-H2O+H]+_MZ_HIGH'].astype(str))
-
-                lipid_dct['[MG(FA3)-H2O+H]+_MZ_LOW'] = ppm_window_para((fa3_exactmass + gly_mg_base_exactmass),
-                                                                       ms2_ppm * -1)
-                lipid_dct['[MG(FA3)-H2O+H]+_MZ_HIGH'] = ppm_window_para((fa3_exactmass + gly_mg_base_exactmass),
-                                                                        ms2_ppm)
-                lipid_dct['[MG(FA3)-H2O+H]+_Q'] = (
-                        lipid_dct['[MG(FA3)-H2O+H]+_MZ_LOW'].astype(str) + ' <= mz <= ' +
-                        lipid_dct['[MG(FA3)-H2O+H]+_MZ_HIGH'].astype(str))
-
-                lipid_dct['[M-(FA1)+H]+_MZ_LOW'] = ppm_window_para((m_exactmass - fa1_exactmass + h_exactmass),
-                                                                   ms2_ppm * -1)
-                lipid_dct['[M-(FA1)+H]+_MZ_HIGH'] = ppm_window_para((m_exactmass - fa1_exactmass + h_exactmass),
-                                                                    ms2_ppm)
-                lipid_dct['[M-(FA1)+H]+_Q'] = (lipid_dct['[M-(FA1)+H]+_MZ_LOW'].astype(str) + ' <= mz <= ' + lipid_dct[
-                    '[M-(FA1)+H]+_MZ_HIGH'].astype(str))
+                # Neutral loss of a FA with a water and neutral loss of a FA minus a water
+                for _fa in fa_lst:
+                    lipid_df['[M-(%s)+H]+_ABBR' % _fa] = '[%s-FA' % dg_str + fa_abbr_dct[_fa] + '+H]+'
+                for _fa in fa_lst:
+                    lipid_df['[M-(%s-H2O)+H]+_ABBR' % _fa] = '[%s-(FA' % dg_str + fa_abbr_dct[_fa] + '-H2O)+H]+'
+
+                nl_mz_dct = {}
+                for _fa in fa_lst:
+                    nl_mz_dct['[M-(%s)+H]+' % _fa] = m_exactmass - fa_exactmass_dct[_fa] + h_exactmass
+                for _fa in fa_lst:
+                    nl_mz_dct['[M-(%s-H2O)+H]+' % _fa] = (m_exactmass - (fa_exactmass_dct[_fa] - nl_water)
+                                                          + h_exactmass)
+
+            for _nl_ion in list(nl_mz_dct.keys()):
+                lipid_df['%s_MZ' % _nl_ion] = round_mz(nl_mz_dct[_nl_ion])
+
+            if charge not in ['[M+Na]+']:
+                for _fa in fa_lst:
+                    LipidComposer.add_ppm_query(lipid_df, '[MG(%s)-H2O+H]+' % _fa,
+                                                fa_exactmass_dct[_fa] + gly_mg_base_exactmass, ms2_ppm=ms2_ppm)
+            for _nl_ion in list(nl_mz_dct.keys()):
+                LipidComposer.add_ppm_query(lipid_df, _nl_ion, nl_mz_dct[_nl_ion], ms2_ppm=ms2_ppm)
 
-                lipid_dct['[M-(FA2)+H]+_MZ_LOW'] = ppm_window_para((m_exactmass - fa2_exactmass + h_exactmass),
-                                                                   ms2_ppm * -1)
-                lipid_dct['[M-(FA2)+H]+_MZ_HIGH'] = ppm_window_para((m_exactmass - fa2_exactmass + h_exactmass),
-                                                                    ms2_ppm)
-                lipid_dct['[M-(FA2)+H]+_Q'] = (lipid_dct['[M-(FA2)+H]+_MZ_LOW'].astype(str) + ' <= mz <= ' + lipid_dct[
-                    '[M-(FA2)+H]+_MZ_HIGH'].astype(str))
-
-                lipid_dct['[M-(FA3)+H]+_MZ_LOW'] = ppm_window_para((m_exactmass - fa3_exactmass + h_exactmass),
-                                                                   ms2_ppm * -1)
-                lipid_dct['[M-(FA3)+H]+_MZ_HIGH'] = ppm_window_para((m_exactmass - fa3_exactmass + h_exactmass),
-                                                                    ms2_ppm)
-                lipid_dct['[M-(FA3)+H]+_Q'] = (lipid_dct['[M-(FA3)+H]+_MZ_LOW'].astype(str) + ' <= mz <= ' + lipid_dct[
-                    '[M-(FA3)+H]+_MZ_HIGH'].astype(str))
-
-                lipid_dct['[M-(FA1-H2O)+H]+_MZ_LOW'] = ppm_window_para(
-                    (m_exactmass - (fa1_exactmass - nl_water) + h_exactmass), ms2_ppm * -1)
-                lipid_dct['[M-(FA1-H2O)+H]+_MZ_HIGH'] = ppm_window_para(
-                    (m_exactmass - (fa1_exactmass - nl_water) + h_exactmass), ms2_ppm)
-                lipid_dct['[M-(FA1-H2O)+H]+_Q'] = (
-                        lipid_dct['[M-(FA1-H2O)+H]+_MZ_LOW'].astype(str) + ' <= mz <= ' + lipid_dct[
-                    '[M-(FA1-H2O)+H]+_MZ_HIGH'].astype(str))
-
-                lipid_dct['[M-(FA2-H2O)+H]+_MZ_LOW'] = ppm_window_para(
-                    (m_exactmass - (fa2_exactmass - nl_water) + h_exactmass), ms2_ppm * -1)
-                lipid_dct['[M-(FA2-H2O)+H]+_MZ_HIGH'] = ppm_window_para(
-                    (m_exactmass - (fa2_exactmass - nl_water) + h_exactmass), ms2_ppm)
-                lipid_dct['[M-(FA2-H2O)+H]+_Q'] = (
-                        lipid_dct['[M-(FA2-H2O)+H]+_MZ_LOW'].astype(str) + ' <= mz <= ' + lipid_dct[
-                    '[M-(FA2-H2O)+H]+_MZ_HIGH'].astype(str))
-
-                lipid_dct['[M-(FA3-H2O)+H]+_MZ_LOW'] = ppm_window_para(
-                    (m_exactmass - (fa3_exactmass - nl_water) + h_exactmass), ms2_ppm * -1)
-                lipid_dct['[M-(FA3-H2O)+H]+_MZ_HIGH'] = ppm_window_para(
-                    (m_exactmass - (fa3_exactmass - nl_water) + h_exactmass), ms2_ppm)
-                lipid_dct['[M-(FA3-H2O)+H]+_Q'] = (
-                        lipid_dct['[M-(FA3-H2O)+H]+_MZ_LOW'].astype(str) + ' <= mz <= ' + lipid_dct[
-                    '[M-(FA3-H2O)+H]+_MZ_HIGH'].astype(str))
             # Fragments names when can occur 2 neutral losses of FA. 1 FA with the water and other without
             mg_str = 'MG'
-            lipid_dct['[MG(FA1)-H2O+H]+_ABBR'] = '[%s(%s)-H2O+H]+' % (mg_str, fa1_abbr)
-            lipid_dct['[MG(FA2)-H2O+H]+_ABBR'] = '[%s(%s)-H2O+H]+' % (mg_str, fa2_abbr)
-            lipid_dct['[MG(FA3)-H2O+H]+_ABBR'] = '[%s(%s)-H2O+H]+' % (mg_str, fa3_abbr)
-
-            lipid_dct['[MG(FA1)-H2O+H]+_MZ'] = round(fa1_exactmass + gly_mg_base_exactmass, 6)
-            lipid_dct['[MG(FA2)-H2O+H]+_MZ'] = round(fa2_exactmass + gly_mg_base_exactmass, 6)
-            lipid_dct['[MG(FA3)-H2O+H]+_MZ'] = round(fa3_exactmass + gly_mg_base_exactmass, 6)
-
-            # TODO (georgia.angelidou@uni-leipzig.de): add the fragments of Na [sodium]
-            # Fragments when there only 1 neutral loss from the TG.
+            for _fa in fa_lst:
+                lipid_df['[MG(%s)-H2O+H]+_ABBR' % _fa] = '[%s(' % mg_str + fa_abbr_dct[_fa] + ')-H2O+H]+'
+            for _fa in fa_lst:
+                lipid_df['[MG(%s)-H2O+H]+_MZ' % _fa] = round_mz(fa_exactmass_dct[_fa] + gly_mg_base_exactmass)
 
         elif m_class in ['DG']:
             mg_str = 'MG'
-            lipid_dct['[MG(FA1)-H2O+H]+_ABBR'] = '[%s(%s)-H2O+H]+' % (mg_str, fa1_abbr)
-            lipid_dct['[MG(FA2)-H2O+H]+_ABBR'] = '[%s(%s)-H2O+H]+' % (mg_str, fa2_abbr)
-
-            lipid_dct['[MG(FA1)-H2O+H]+_MZ'] = round(fa1_exactmass + gly_mg_base_exactmass, 6)
-            lipid_dct['[MG(FA2)-H2O+H]+_MZ'] = round(fa2_exactmass + gly_mg_base_exactmass, 6)
-
-            lipid_dct['[MG(FA1)-H2O+H]+_MZ_LOW'] = ppm_window_para((fa1_exactmass + gly_mg_base_exactmass),
-                                                                   ms2_ppm * -1)
-            lipid_dct['[MG(FA1)-H2O+H]+_MZ_HIGH'] = ppm_window_para((fa1_exactmass + gly_mg_base_exactmass), ms2_ppm)
-            lipid_dct['[MG(FA1)-H2O+H]+_Q'] = (
-                    lipid_dct['[MG(FA1)-H2O+H]+_MZ_LOW'].astype(str) + ' <= mz <= ' +
-                    lipid_dct['[MG(FA1)-H2O+H]+_MZ_HIGH'].astype(str))
-
-            lipid_dct['[MG(FA2)-H2O+H]+_MZ_LOW'] = ppm_window_para((fa2_exactmass + gly_mg_base_exactmass),
-                                                                   ms2_ppm * -1)
-            lipid_dct['[MG(FA2)-H2O+H]+_MZ_HIGH'] = ppm_window_para((fa2_exactmass + gly_mg_base_exactmass), ms2_ppm)
-            lipid_dct['[MG(FA2)-H2O+H]+_Q'] = (
-                    lipid_dct['[MG(FA2)-H2O+H]+_MZ_LOW'].astype(str) + ' <= mz <= ' +
-                    lipid_dct['[MG(FA2)-H2O+H]+_MZ_HIGH'].astype(str))
+            for _fa in fa_lst:
+                lipid_df['[MG(%s)-H2O+H]+_ABBR' % _fa] = '[%s(' % mg_str + fa_abbr_dct[_fa] + ')-H2O+H]+'
+            for _fa in fa_lst:
+                lipid_df['[MG(%s)-H2O+H]+_MZ' % _fa] = round_mz(fa_exactmass_dct[_fa] + gly_mg_base_exactmass)
+            for _fa in fa_lst:
+                LipidComposer.add_ppm_query(lipid_df, '[MG(%s)-H2O+H]+' % _fa,
+                                            fa_exactmass_dct[_fa] + gly_mg_base_exactmass, ms2_ppm=ms2_ppm)
 
         else:
+            # No specific fragments for lyso PL
             # TODO (georgia.angelidou@uni-leipzig.de: Info for sphingomyelins
             pass
 
-        return lipid_dct
+        return lipid_df
 
     def compose_lipid(self, param_dct, ms2_ppm=100):
 
@@ -779,119 +663,64 @@ class LipidComposer:
         else:
             return False
         print('[INFO] --> FA white list loaded ...')
-        lipid_comb_dct = self.gen_all_comb(lipid_class, usr_fa_df, position=position_set)
-
-        lipid_info_dct = {}
-
-        abbr_parser = NameParserFA()
-        elem_calc = ElemCalc()
-        for _lipid in list(lipid_comb_dct.keys()):
-            _lipid_dct = lipid_comb_dct[_lipid]
-
-            _fa1_abbr = _lipid_dct['FA1']
-            if _fa1_abbr:
-                _fa1_info_dct = abbr_parser.get_fa_info(_fa1_abbr)
-                for _fa1_k in list(_fa1_info_dct.keys()):
-                    _lipid_dct['FA1_' + _fa1_k] = _fa1_info_dct[_fa1_k]
-            else:
-                if 'FA2' in list(_lipid_dct.keys()):
-                    if _lipid_dct['FA2']:
-                        _lipid_dct['FA1'], _lipid_dct['FA2'] = _lipid_dct['FA2'], _lipid_dct['FA1']
-                        _fa1_abbr = _lipid_dct['FA1']
-                        _fa1_info_dct = abbr_parser.get_fa_info(_fa1_abbr)
-                        for _fa1_k in list(_fa1_info_dct.keys()):
-                            _lipid_dct['FA1_' + _fa1_k] = _fa1_info_dct[_fa1_k]
-                else:
-                    _fa1_info_dct = {}
-
-            if 'FA2' in list(_lipid_dct.keys()):
-                _fa2_abbr = _lipid_dct['FA2']
-                if _fa2_abbr:
-                    _fa2_info_dct = abbr_parser.get_fa_info(_fa2_abbr)
-                    for _fa2_k in list(_fa2_info_dct.keys()):
-                        _lipid_dct['FA2_' + _fa2_k] = _fa2_info_dct[_fa2_k]
-            else:
-                _fa2_abbr = ''
-                _fa2_info_dct = {}
-
-            # TODO (georgia.angelidou@uni-leipzig.de): SM, Cer
-            if lipid_class in ['PA', 'PC', 'PE', 'PG', 'PI', 'PS', 'DG']:
-                _lipid_dct['M_DB'] = _fa1_info_dct['DB'] + _fa2_info_dct['DB']
-                # TODO(georgia.angelidou@uni-leipzig.de): not important (just keep in mind for future correction)
-                # consideration the case if the user choose the fa2 position for the different link types
-                # or in that they may mistype something
-                if _fa1_info_dct['LINK'] in ['FA', 'A']:
-                    lipid_bulk_str = '{pl}({c}:{db})'.format(pl=lipid_class,
-                                                             c=_fa1_info_dct['C'] + _fa2_info_dct['C'],
-                                                             db=lipid_comb_dct[_lipid]['M_DB'])
-                else:
-                    lipid_bulk_str = '{pl}({lk}{c}:{db})'.format(pl=lipid_class, lk=_fa1_info_dct['LINK'],
-                                                                 c=_fa1_info_dct['C'] + _fa2_info_dct['C'],
-                                                                 db=lipid_comb_dct[_lipid]['M_DB'])
-            elif lipid_class in ['LPA', 'LPC', 'LPE', 'LPG', 'LPI', 'LPS']:
-                _lipid_dct['M_DB'] = _fa1_info_dct['DB']
-                # TODO(georgia.angelidou@uni-leipzig.de): not important (just keep in mind for future correction)
-                # consideration the case if the user choose the fa2 position for the different link types
-                # or in that they may mistype something
-                if _fa1_info_dct['LINK'] in ['FA', 'A']:
-                    lipid_bulk_str = '{pl}({c}:{db})'.format(pl=lipid_class,
-                                                             c=_fa1_info_dct['C'],
-                                                             db=lipid_comb_dct[_lipid]['M_DB'])
-                else:
-                    lipid_bulk_str = '{pl}({lk}{c}:{db})'.format(pl=lipid_class, lk=_fa1_info_dct['LINK'],
-                                                                 c=_fa1_info_dct['C'],
-                                                                 db=lipid_comb_dct[_lipid]['M_DB'])
-            elif lipid_class in ['TG']:
-                _fa3_abbr = _lipid_dct['FA3']
-                _fa3_info_dct = abbr_parser.get_fa_info(_fa3_abbr)
-
-                for _fa3_k in _fa3_info_dct.keys():
-                    _lipid_dct['FA3_' + _fa3_k] = _fa3_info_dct[_fa3_k]
-
-                _lipid_dct['M_DB'] = _fa3_info_dct['DB'] + _fa2_info_dct['DB'] + _fa1_info_dct['DB']
-                # Note: For TG in the current default not consider the different lipids with other type of bond
-                # If stay like this need to be mention in somewhere for the user
-                if _fa1_info_dct['LINK'] in ['FA', 'A']:
-                    lipid_bulk_str = '{tg}({c}:{db})'.format(tg=lipid_class,
-                                                             c=(_fa1_info_dct['C'] + _fa2_info_dct['C']
-                                                                + _fa3_info_dct['C']),
-                                                             db=lipid_comb_dct[_lipid]['M_DB'])
-                else:
-                    lipid_bulk_str = '{tg}({lk}{c}:{db})'.format(tg=lipid_class, lk=_fa1_info_dct['LINK'],
-                                                                 c=(_fa1_info_dct['C'] + _fa2_info_dct['C']
-                                                                    + _fa3_info_dct['C']),
-                                                                 db=lipid_comb_dct[_lipid]['M_DB'])
-            elif lipid_class in ['SM']:
-                # TODO(georgia.angelidou@uni-leipzi.de): sphingomyelin support
-                lipid_bulk_str = '{sm}({c}:{db})'.format(sm=lipid_class,
-                                                         c=_fa1_info_dct['C'] + _fa2_info_dct['C'],
-                                                         db=lipid_comb_dct[_lipid]['M_DB'])
-            else:
-                lipid_bulk_str = ''
-
-            _lipid_dct['BULK_ABBR'] = lipid_bulk_str
-
-            _lipid_formula, _lipid_elem_dct = elem_calc.get_formula(lipid_bulk_str)
-
-            _lipid_dct['FORMULA'] = _lipid_formula
-            _lipid_dct['EXACTMASS'] = elem_calc.get_exactmass(_lipid_elem_dct)
-            for _elem_k in list(_lipid_elem_dct.keys()):
-                _lipid_dct['M_' + _elem_k] = _lipid_elem_dct[_elem_k]
-
-            # charged
-            _chg_lipid_formula, _chg_lipid_elem_dct = elem_calc.get_formula(lipid_bulk_str, charge=lipid_charge)
-            _lipid_dct[lipid_charge + '_FORMULA'] = _chg_lipid_formula
-            _lipid_dct[lipid_charge + '_MZ'] = elem_calc.get_exactmass(_chg_lipid_elem_dct)
-
-            # fragments
-
-            _lipid_dct = self.calc_fragments(_lipid_dct, charge=lipid_charge, ms2_ppm=ms2_ppm)
-
-            lipid_info_dct[_lipid] = _lipid_dct
-            del _lipid_dct
-
-        lipid_master_df = pd.DataFrame(lipid_comb_dct).T
-        lipid_master_df.reset_index(drop=True, inplace=True)
+        lipid_comb_df = self.gen_all_comb_df(lipid_class, usr_fa_df, position=position_set)
+        # the same FA on both positions gives the same discrete abbr. also in the exact position mode
+        lipid_comb_df = lipid_comb_df.drop_duplicates(subset=['DISCRETE_ABBR'], keep='first')
+        lipid_comb_df.reset_index(drop=True, inplace=True)
+
+        if lipid_comb_df.empty:
+            return pd.DataFrame()
+
+        # information of each FA is calculated only once and taken for all combinations
+        fa_lst = [_fa for _fa in ['FA1', 'FA2', 'FA3'] if _fa in lipid_comb_df.columns
+                  and lipid_comb_df[_fa].astype(bool).all()]
+        fa_abbr_lst = sorted(set(itertools.chain.from_iterable(lipid_comb_df[_fa].tolist() for _fa in fa_lst)))
+
+        abbr_parser = FA_NAME_PARSER
+        fa_info_lst = [abbr_parser.get_fa_info(_fa_abbr) for _fa_abbr in fa_abbr_lst]
+        fa_info_df = pd.DataFrame(fa_info_lst, index=fa_abbr_lst, columns=list(fa_info_lst[0].keys()))
+
+        lipid_col_dct = {}
+        for _fa in fa_lst:
+            _fa_idx_arr = fa_info_df.index.get_indexer(lipid_comb_df[_fa])
+            for _fa_k in fa_info_df.columns.tolist():
+                lipid_col_dct['%s_%s' % (_fa, _fa_k)] = fa_info_df[_fa_k].values.take(_fa_idx_arr)
+        lipid_df = pd.concat([lipid_comb_df, pd.DataFrame(lipid_col_dct, columns=list(lipid_col_dct.keys()))],
+                             axis=1)
+
+        # TODO (georgia.angelidou@uni-leipzig.de): SM, Cer
+        lipid_df['M_DB'] = sum([lipid_df['%s_DB' % _fa] for _fa in fa_lst])
+        lipid_c_s = sum([lipid_df['%s_C' % _fa] for _fa in fa_lst])
+        # Note: For TG in the current default not consider the different lipids with other type of bond
+        # If stay like this need to be mention in somewhere for the user
+        lipid_link_s = lipid_df['FA1_LINK'].where(~lipid_df['FA1_LINK'].isin(['FA', 'A']), '')
+        lipid_df['BULK_ABBR'] = (lipid_class + '(' + lipid_link_s + lipid_c_s.astype(str) + ':'
+                                 + lipid_df['M_DB'].astype(str) + ')')
+
+        # the elemental composition is decoded once for each bulk structure
+        bulk_code_arr, bulk_abbr_idx = pd.factorize(lipid_df['BULK_ABBR'])
+        elem_calc = ELEM_CALC
+        bulk_abbr_lst = bulk_abbr_idx.tolist()
+        bulk_elem_info_lst = elem_calc.get_elem_info_lst(bulk_abbr_lst)
+        # charged
+        chg_elem_info_lst = elem_calc.get_elem_info_lst(bulk_abbr_lst, charge=lipid_charge)
+        bulk_info_lst = []
+        for _elem_info, _chg_elem_info in zip(bulk_elem_info_lst, chg_elem_info_lst):
+            _bulk_info_dct = {'FORMULA': _elem_info.formula, 'EXACTMASS': _elem_info.exactmass}
+            for _elem_k, _elem_count in _elem_info.elem:
+                _bulk_info_dct['M_' + _elem_k] = _elem_count
+            _bulk_info_dct[lipid_charge + '_FORMULA'] = _chg_elem_info.formula
+            _bulk_info_dct[lipid_charge + '_MZ'] = _chg_elem_info.exactmass
+            bulk_info_lst.append(_bulk_info_dct)
+        bulk_info_df = pd.DataFrame(bulk_info_lst, columns=list(bulk_info_lst[0].keys()))
+        for _bulk_k in bulk_info_df.columns.tolist():
+            lipid_df[_bulk_k] = bulk_info_df[_bulk_k].values.take(bulk_code_arr)
+
+        # fragments
+        lipid_df = self.calc_fragments(lipid_df, charge=lipid_charge, ms2_ppm=ms2_ppm)
+
+        # keep the object columns of the lipid master table as it was composed from the dict of each lipid
+        lipid_master_df = lipid_df.astype(object)
 
         return lipid_master_df
 
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2019  SysMedOs_team @ AG Bioanalytik, University of Leipzig:
+# SysMedOs_team: Zhixu Ni, Georgia Angelidou, Mike Lange, Maria Fedorova
+# LipidHunter is Dual-licensed
+#     For academic and non-commercial use: `GPLv2 License` Please read more information by the following link:
+#         [The GNU General Public License version 2] (https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html)
+#     For commercial use:
+#         please contact the SysMedOs_team by email.
+# Please cite our publication in an appropriate form.
+# Ni, Zhixu, Georgia Angelidou, Mike Lange, Ralf Hoffmann, and Maria Fedorova.
+# "LipidHunter identifies phospholipids by high-throughput processing of LC-MS and shotgun lipidomics datasets."
+# Analytical Chemistry (2017).
+# DOI: 10.1021/acs.analchem.7b01126
+#
+# For more info please contact:
+#     Developer Zhixu Ni zhixu.ni@uni-leipzig.de
+#     Developer Georgia Angelidou georgia.angelidou@uni-leipzig.de
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Tuple, Union
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from LibLipidHunter.SpectraCache import SpectraCache
+
+DEFAULT_LM_CACHE_FOLDER = os.path.join(os.path.expanduser('~'), '.lipidhunter', 'lipid_master_cache')
+DEFAULT_LM_CACHE_SIZE = 1  # GB
+
+LM_TABLE_LST = ['lipid_master', 'fa_info']
+
+# increase LM_CACHE_VERSION if the format of the cached tables is changed
+LM_CACHE_VERSION = 2
+# numeric and bool columns are saved as .npy in the .npz file, all other columns as JSON, no pickle is used
+LM_ARR_KINDS = 'biuf'
+# the lipid class definitions and the composer code of the cached tables, all cached tables are invalid once changed
+LM_CODE_FILE_LST = [os.path.join(os.path.dirname(os.path.abspath(__file__)), _code_file)
+                    for _code_file in ['LipidComposer.py', 'AbbrElemCalc.py', 'LipidNomenclature.py',
+                                       'ParallelFunc.py']]
+
+
+def hash_files(file_lst: list) -> str:
+    """
+    Hash the content of files.
+
+    Args:
+        file_lst (list): the file paths, missing files are hashed by the file name only
+
+    Returns:
+        file_hash (str): sha1 hex digest
+
+    """
+
+    file_hash = hashlib.sha1()
+    for _file in file_lst:
+        if os.path.isfile(_file):
+            with open(_file, 'rb') as _file_obj:
+                for _chunk in iter(lambda: _file_obj.read(1024 * 1024), b''):
+                    file_hash.update(_chunk)
+        else:
+            # the source code is not available in the packed executable
+            file_hash.update(os.path.basename(_file).encode('utf-8'))
+
+    return file_hash.hexdigest()
+
+
+def dump_table(table_path: str, table_df: pd.DataFrame):
+    """
+    Write one table to <table_path>.npz and <table_path>.json without pickle.
+
+    Args:
+        table_path (str): the file path without extension
+        table_df (pd.DataFrame): the table, the columns are either numeric, bool or JSON compatible e.g. str
+
+    """
+
+    arr_dct = {}
+    col_lst = []
+    for _col_idx in range(table_df.shape[1]):
+        _col_arr = table_df.iloc[:, _col_idx].values
+        if _col_arr.dtype.kind in LM_ARR_KINDS:
+            arr_dct['col_%i' % _col_idx] = _col_arr
+            col_lst.append({'arr': 'col_%i' % _col_idx})
+        elif _col_arr.dtype.kind == 'O':
+            col_lst.append({'obj': _col_arr.tolist()})
+        else:
+            raise TypeError('Column %s of type %s can not be saved' % (table_df.columns[_col_idx], _col_arr.dtype))
+
+    table_index = table_df.index
+    if isinstance(table_index, pd.RangeIndex):
+        index_dct = {'range': [table_index.start, table_index.stop, table_index.step]}
+    elif table_index.dtype.kind in LM_ARR_KINDS:
+        arr_dct['index'] = table_index.values
+        index_dct = {'arr': 'index'}
+    else:
+        index_dct = {'obj': table_index.tolist()}
+    index_dct['name'] = table_index.name
+
+    with open('%s.json' % table_path, 'w') as _json_obj:
+        json.dump({'columns': table_df.columns.tolist(), 'data': col_lst, 'index': index_dct}, _json_obj)
+    with open('%s.npz' % table_path, 'wb') as _npz_obj:
+        np.savez(_npz_obj, **arr_dct)
+
+
+def load_table(table_path: str) -> pd.DataFrame:
+    """
+    Read one table saved by dump_table() without unpickling any data.
+
+    Args:
+        table_path (str): the file path without extension
+
+    Returns:
+        table_df (pd.DataFrame): the table
+
+    """
+
+    with open('%s.json' % table_path, 'r') as _json_obj:
+        table_dct = json.load(_json_obj)
+
+    def _get_values(value_dct: dict, npz_obj) -> np.ndarray:
+        if 'arr' in value_dct:
+            return npz_obj[value_dct['arr']]
+        obj_arr = np.empty(len(value_dct['obj']), dtype=object)
+        obj_arr[:] = value_dct['obj']
+        return obj_arr
+
+    with np.load('%s.npz' % table_path, allow_pickle=False) as _npz_obj:
+        col_arr_lst = [_get_values(_col_dct, _npz_obj) for _col_dct in table_dct['data']]
+        index_dct = table_dct['index']
+        if 'range' in index_dct:
+            table_index = pd.RangeIndex(*index_dct['range'], name=index_dct['name'])
+        else:
+            table_index = pd.Index(_get_values(index_dct, _npz_obj), name=index_dct['name'])
+
+    if col_arr_lst:
+        table_df = pd.DataFrame(dict(enumerate(col_arr_lst)), index=table_index, columns=range(len(col_arr_lst)))
+    else:
+        table_df = pd.DataFrame(index=table_index)
+    table_df.columns = table_dct['columns']
+
+    return table_df
+
+
+class LipidMasterCache(SpectraCache):
+    """
+    On disk cache of the lipid master table and the FA table from LipidComposer.calc_fa_query. Each pair of tables
+    is saved as a folder of .npz and .json files named by the hash of the FA whitelist content, all composer parameters,
+    the cache format version and the lipid class definitions in the code,
+    so the tables are reused by all runs and batch jobs with the same settings and the same LipidHunter code.
+    The least recently used tables are removed once the cache is larger than max_size.
+
+    Args:
+        cache_folder (str): folder to save the cache, use ~/.lipidhunter/lipid_master_cache by default
+        max_size (float): max size of the cache folder in GB
+
+    """
+
+    cache_name = 'Lipid Master'
+
+    def __init__(self, cache_folder: str = DEFAULT_LM_CACHE_FOLDER, max_size: float = DEFAULT_LM_CACHE_SIZE):
+
+        super(LipidMasterCache, self).__init__(cache_folder=cache_folder, max_size=max_size)
+
+    @staticmethod
+    def get_key(fa_whitelist: str, **compose_params) -> str:
+        """
+        Generate the cache key of one lipid master table.
+
+        Args:
+            fa_whitelist (str): the file path of the FA whitelist
+            **compose_params: lipid_class, charge_mode, exact_position and ms2_ppm used to compose the table
+
+        Returns:
+            key (str): sha1 hex digest
+
+        """
+
+        if not os.path.isfile(fa_whitelist):
+            raise IOError('FA whitelist not found: %s' % fa_whitelist)
+        key_dct = {'cache_version': LM_CACHE_VERSION, 'fa_whitelist': hash_files([fa_whitelist]),
+                   'lipid_class_code': hash_files(LM_CODE_FILE_LST)}
+        key_dct.update(compose_params)
+        key_str = json.dumps(key_dct, sort_keys=True, default=str)
+
+        return hashlib.sha1(key_str.encode('utf-8')).hexdigest()
+
+    def load(self, key: str) -> Union[Tuple[pd.DataFrame, pd.DataFrame], bool]:
+        """
+        Load cached lipid master table.
+
+        Args:
+            key (str): the cache key from get_key()
+
+        Returns:
+            lipid_master_df (pd.DataFrame), fa_df (pd.DataFrame) or False if not cached
+
+        """
+
+        key_folder = os.path.join(self.cache_folder, key)
+        if not os.path.isfile(os.path.join(key_folder, 'info.json')):
+            return False
+
+        try:
+            lipid_master_df, fa_df = [load_table(os.path.join(key_folder, _table)) for _table in LM_TABLE_LST]
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as _e:
+            print('[WARNING] !!! Failed to load Lipid Master cache, the cache is removed ...', _e)
+            shutil.rmtree(key_folder, ignore_errors=True)
+            return False
+
+        # update the modification time to track the last usage
+        os.utime(os.path.join(key_folder, 'info.json'))
+        print('[INFO] --> Lipid Master table loaded from cache: %s' % key_folder)
+
+        return lipid_master_df, fa_df
+
+    def save(self, key: str, lipid_master_df: pd.DataFrame, fa_df: pd.DataFrame, info_dct: dict = None):
+        """
+        Save one lipid master table to the cache and remove old tables if the cache is too large.
+
+        Args:
+            key (str): the cache key from get_key()
+            lipid_master_df (pd.DataFrame): the lipid master table from LipidComposer.compose_lipid
+            fa_df (pd.DataFrame): the FA table from LipidComposer.calc_fa_query
+            info_dct (dict): additional information to save, e.g. the composer parameters
+
+        """
+
+        key_folder = os.path.join(self.cache_folder, key)
+        # write to a temp folder first, unfinished cache will never be loaded
+        tmp_folder = os.path.join(self.cache_folder, '%s_tmp%i' % (key, os.getpid()))
+
+        try:
+            os.makedirs(tmp_folder, exist_ok=True)
+            for _table, _table_df in zip(LM_TABLE_LST, [lipid_master_df, fa_df]):
+                dump_table(os.path.join(tmp_folder, _table), _table_df)
+            if info_dct is None:
+                info_dct = {}
+            info_dct['created'] = time.strftime("%Y-%m-%d_%H-%M-%S", time.localtime())
+            info_dct['cache_version'] = LM_CACHE_VERSION
+            with open(os.path.join(tmp_folder, 'info.json'), 'w') as _info_obj:
+                json.dump(info_dct, _info_obj, default=str)
+            if os.path.isdir(key_folder):
+                shutil.rmtree(key_folder, ignore_errors=True)
+            os.rename(tmp_folder, key_folder)
+            print('[OUTPUT] ==> Lipid Master table saved to cache: %s' % key_folder)
+        except (OSError, TypeError, ValueError) as _e:
+            print('[WARNING] !!! Failed to save Lipid Master cache ...', _e)
+            shutil.rmtree(tmp_folder, ignore_errors=True)
+            return False
+
+        self.evict(keep_key=key)
+
+        return True
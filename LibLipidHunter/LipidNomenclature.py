@@ -18,25 +18,29 @@
 #     Developer Georgia Angelidou georgia.angelidou@uni-leipzig.de
 
 import re
+from types import MappingProxyType
+
+from LibLipidHunter.AbbrElemCalc import PERIODIC_TABLE_DCT
+
+# {element: (monoisotopic mass, abundance)}
+FA_ELEM_DCT = MappingProxyType({_elem: _isotope_tpl[0] for _elem, _isotope_tpl in PERIODIC_TABLE_DCT.items()})
+
+FA_RGX = re.compile(r'(FA)(\d{1,2})(:)(\d)')
+O_RGX = re.compile(r'(O-)(\d{1,2})(:)(\d)')
+P_RGX = re.compile(r'(P-)(\d{1,2})(:)(\d)')
+FA_RGX_TPL = (FA_RGX, O_RGX, P_RGX)
 
 
 class NameParserFA:
 
     def __init__(self):
-        self.elem_dct = {'H': [1.0078250321, 0.999885],
-                         'D': [2.0141017780, 0.0001157],
-                         'C': [12.0, 0.9893],
-                         'N': [14.0030740052, 0.99632],
-                         'O': [15.9949146221, 0.99757],
-                         'Na': [22.98976967, 1.0],
-                         'P': [30.97376151, 1.0],
-                         'S': [31.97207069, 0.9493],
-                         'K': [38.9637069, 0.932581]}
-
-        self.fa_rgx = re.compile(r'(FA)(\d{1,2})(:)(\d)')
-        self.o_rgx = re.compile(r'(O-)(\d{1,2})(:)(\d)')
-        self.p_rgx = re.compile(r'(P-)(\d{1,2})(:)(\d)')
-        self.fa_rgx_lst = [self.fa_rgx, self.o_rgx, self.p_rgx]
+        # the tables are shared by all instances
+        self.elem_dct = FA_ELEM_DCT
+
+        self.fa_rgx = FA_RGX
+        self.o_rgx = O_RGX
+        self.p_rgx = P_RGX
+        self.fa_rgx_lst = FA_RGX_TPL
 
     def calc_fa_mass(self, fa_info_dct):
 
@@ -67,8 +71,8 @@ class NameParserFA:
         fa_info_lst = []
 
         for _rgx in self.fa_rgx_lst:
-            if re.match(_rgx, fa_str):
-                _fa_match = re.match(_rgx, fa_str)
+            _fa_match = _rgx.match(fa_str)
+            if _fa_match:
                 fa_info_lst = _fa_match.groups()
                 break
 
@@ -114,6 +118,10 @@ class NameParserFA:
         return fa_info_dct
 
 
+# the NameParserFA has no state of its own, one instance is shared in each process
+FA_NAME_PARSER = NameParserFA()
+
+
 if __name__ == '__main__':
 
     from test.test_LipidNomenclature import test_get_fa_info
@@ -101,6 +101,7 @@ class LogPageCreator(object):
                            'core_number': 'Run with max CPU core number =',
                            'max_ram': 'Run with max RAM (GB) =',
                            'img_type': 'Save image format:', 'img_dpi': 'Save image with dpi =',
+                           'preview_img': 'Save preview images only:',
                            'tag_all_sn': 'Prefer all sn identified for TAGs:'}
 
             cfg_sum_lst = ['lipid_class', 'charge_mode', 'vendor', 'experiment_mode', 'hunter_start_time',
@@ -112,7 +113,7 @@ class LogPageCreator(object):
                            'ms_ppm', 'ms_th', 'pr_window',
                            'ms2_ppm', 'ms2_th', 'ms2_infopeak_threshold',
                            'hg_ppm', 'hg_th', 'ms2_hginfopeak_threshold',
-                           'core_number', 'max_ram', 'img_type', 'img_dpi', 'ms_max', 'tag_all_sn']
+                           'core_number', 'max_ram', 'img_type', 'img_dpi', 'preview_img', 'ms_max', 'tag_all_sn']
 
             param_key_lst = list(params.keys())
             disp_cfg_lst = []
@@ -214,13 +215,33 @@ class LogPageCreator(object):
         except IOError:
             pass
 
+        # the entries are appended after the page headers as the results arrive and sorted in close_page()
+        self.img_page_header_size = os.path.getsize(self.image_lst_page)
+        self.idx_page_header_size = os.path.getsize(self.idx_lst_page)
+        self.entry_count = 0
+        self.entry_lst = []
+
     def add_all_info(self, ident_info_df):
 
-        with open(self.image_lst_page, 'a') as img_page:
+        self.add_info(ident_info_df)
+
+    def add_info(self, ident_info_df):
+        """
+        Append the identifications of one part of the results to the report pages e.g. the results of one worker.
+        The pages are written to the disk after each part, the report of an interrupted run can be opened as well.
+        Only the sort key and the position of each entry are kept, the entries are sorted in close_page().
+
+        Args:
+            ident_info_df (pd.DataFrame): the identifications with the columns of the output table
+
+        """
+
+        with open(self.image_lst_page, 'ab') as img_page:
             with open(self.idx_lst_page, 'a') as idx_page:
 
-                _log_info_df = ident_info_df.copy()
-                # _log_info_df.is_copy = False
+                # the same precision as in the output table
+                _log_info_df = ident_info_df.drop_duplicates(keep='first')
+                _log_info_df = _log_info_df.round({'MS1_obs_mz': 4, 'MS2_scan_time': 3})
                 _log_info_df['MS1_log_mz'] = _log_info_df['MS1_obs_mz'].round(1)
                 _log_info_df = _log_info_df.sort_values(by=['MS1_log_mz', 'Proposed_structures', 'MS2_scan_time',
                                                             'RANK_SCORE'], ascending=[True, True, True, False])
@@ -232,8 +253,8 @@ class LogPageCreator(object):
                 _log_info_groups_key_lst = sorted(_log_info_groups_key_lst, key=itemgetter(0, 1, 3))
                 # _log_info_groups_key_lst = sorted(_log_info_groups_key_lst, key=lambda x: x[0])
 
-                for _idx in range(len(_log_info_groups_key_lst)):
-                    _subgroup_df = _log_info_groups.get_group(_log_info_groups_key_lst[_idx])
+                for _log_info_key in _log_info_groups_key_lst:
+                    _subgroup_df = _log_info_groups.get_group(_log_info_key)
 
                     img_path = str(_subgroup_df['img_name'].values.tolist()[0])
                     ms1_pr_mz = _subgroup_df['MS1_obs_mz'].values.tolist()[0]
@@ -320,17 +341,36 @@ class LogPageCreator(object):
                         table_buf_code = peak_info_df.to_html(index=False)
                     table_buf_code = table_buf_code.replace('NaN', '')
 
-                    _idx += 1  # set start from 0 to 1
+                    self.entry_count += 1
+                    _idx = self.entry_count
 
                     img_title_str = ('{mz}_RT{rt:.3}_DDArank{dda}_Scan{scan}_{ident}_{f}_{chg}_score{score}'
                                      .format(mz='%.4f' % ms1_pr_mz, rt=ms2_rt, dda=dda, scan=ms2_scan_id,
                                              ident=ident_abbr, score=score, f=formula_ion, chg=charge))
-                    img_info_lst = ['<a name="', '%i' % _idx, '"><h3>', '<a href="', img_path, '" target="blank">',
+                    img_info_lst = ['<a href="', img_path, '" target="blank">',
                                     img_title_str, '</a></h3></a>', '<a href="', img_path, '" target="blank">',
                                     '<img src="', img_path, '" height="800" /></a>', table_buf_code, '\n<hr>\n']
-                    img_page.write(''.join(img_info_lst))
+                    # the anchor is written separately to number the entry again in close_page()
+                    img_page.write(self.get_img_anchor_str(_idx).encode())
+                    _entry_start = img_page.tell()
+                    img_page.write(''.join(img_info_lst).encode())
+                    idx_page.write(self.get_idx_str(_idx, ms1_pr_mz, ms2_rt, ident_abbr, score))
+
+                    _entry_key = (_log_info_key[0], _log_info_key[1], _log_info_key[3], _log_info_key[2])
+                    self.entry_lst.append((_entry_key, _entry_start, img_page.tell(), ms1_pr_mz, ms2_rt, ident_abbr,
+                                           score))
+
+            print('[INFO] --> Result info added to report html -->')
+
+    @staticmethod
+    def get_img_anchor_str(idx):
+
+        return '<a name="%i"><h3>' % idx
 
-                    idx_str = ('''
+    @staticmethod
+    def get_idx_str(idx, ms1_pr_mz, ms2_rt, ident_abbr, score):
+
+        idx_str = ('''
                             <tr>\n<td>
                             <a href ="LipidHunter_Results_Figures_list.html#{id}" target ="results_frame">{id}
                             </td>\n<td>
@@ -342,16 +382,51 @@ class LogPageCreator(object):
                             </td>\n<td>
                             <a href ="LipidHunter_Results_Figures_list.html#{id}" target ="results_frame">{score}
                             </td>\n</tr>\n
-                            '''.format(id='%i' % _idx, mz='%.4f' % ms1_pr_mz, rt='%.1f' % ms2_rt,
+                            '''.format(id='%i' % idx, mz='%.4f' % ms1_pr_mz, rt='%.1f' % ms2_rt,
                                        ident=ident_abbr, score=score))
-                    idx_page.write(idx_str)
 
-            print('[INFO] --> Result info added to report html -->')
+        return idx_str
+
+    def sort_entries(self):
+        """
+        Sort the entries of the image list and the identification list by m/z, identification and scan time
+        and number them again, as if all results were added at once.
+        The entries are copied from the image list page one by one.
+
+        """
+
+        sorted_entry_lst = []
+
+        sorted_img_page = self.image_lst_page + '.sorted'
+        with open(self.image_lst_page, 'rb') as img_page:
+            with open(sorted_img_page, 'wb') as _sorted_img_page:
+                _sorted_img_page.write(img_page.read(self.img_page_header_size))
+                for _idx, _entry in enumerate(sorted(self.entry_lst, key=itemgetter(0)), start=1):
+                    img_page.seek(_entry[1])
+                    _sorted_img_page.write(self.get_img_anchor_str(_idx).encode())
+                    _entry_start = _sorted_img_page.tell()
+                    _sorted_img_page.write(img_page.read(_entry[2] - _entry[1]))
+                    sorted_entry_lst.append((_entry[0], _entry_start, _sorted_img_page.tell()) + _entry[3:])
+        os.replace(sorted_img_page, self.image_lst_page)
+
+        sorted_idx_page = self.idx_lst_page + '.sorted'
+        with open(self.idx_lst_page, 'rb') as idx_page:
+            with open(sorted_idx_page, 'wb') as _sorted_idx_page:
+                _sorted_idx_page.write(idx_page.read(self.idx_page_header_size))
+        with open(sorted_idx_page, 'a') as _sorted_idx_page:
+            for _idx, _entry in enumerate(sorted_entry_lst, start=1):
+                _sorted_idx_page.write(self.get_idx_str(_idx, *_entry[3:]))
+        os.replace(sorted_idx_page, self.idx_lst_page)
+
+        self.entry_count = len(sorted_entry_lst)
+        self.entry_lst = sorted_entry_lst
 
     def close_page(self):
         with open(self.main_page, 'a') as _m_page:
             _m_page.write('\n</body></html>\n')
 
+        self.sort_entries()
+
         with open(self.image_lst_page, 'a') as _img_page:
             _img_page.write('\n</body></html>\n')
 
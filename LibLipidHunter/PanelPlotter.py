@@ -17,6 +17,11 @@
 #     Developer Zhixu Ni zhixu.ni@uni-leipzig.de
 #     Developer Georgia Angelidou georgia.angelidou@uni-leipzig.de
 
+import json
+import os
+import zipfile
+
+import numpy as np
 import pandas as pd
 import matplotlib
 matplotlib.use('agg')
@@ -33,10 +38,91 @@ import matplotlib.patches as patches
 
 from concurrent.futures import ThreadPoolExecutor
 
+# the plot inputs of each image are saved next to the image path with this extension if the rendering is postponed
+# the numeric arrays are saved as .npy in the .npz file and the rest of the plot inputs as JSON, no pickle is used
+PLOT_PARAMS_EXT = '.plot.npz'
+PLOT_PARAMS_ARR_KINDS = 'biufcmMSU'
+# preview images are saved with low resolution and only the top peaks of dense MS and MS/MS spectra
+PREVIEW_DPI = 72
+PREVIEW_PEAK_COUNT = 200
+
+# the A4 figure with the 3x2 panels is created only once in each process and reused for all images
+_FIG_TEMPLATE_LST = []
+
+
+def get_figure_template():
+    """
+    Get the A4 landscape figure with 3x2 panels of the current process and clear the panels for the next image.
+    The figure is created and its spacing is adjusted only at the first call.
+
+    Returns:
+        fig (matplotlib.figure.Figure): the reused figure
+        pic_array (numpy.ndarray): the 3x2 array of the panels
+
+    """
+
+    if _FIG_TEMPLATE_LST:
+        fig, pic_array = _FIG_TEMPLATE_LST[0]
+        for _pic in pic_array.flat:
+            _pic.cla()
+    else:
+        # Generate A4 image in landscape
+        fig, pic_array = plt.subplots(nrows=3, ncols=2, figsize=(11.692, 8.267), sharex='none', sharey='none')
+        # Make better spacing between subplots
+        fig.tight_layout()
+        _FIG_TEMPLATE_LST.append((fig, pic_array))
+
+    return fig, pic_array
+
+
+def get_peak_envelope(mz_lst, i_lst, mz_range, pixel_count, keep_profile=False):
+    """
+    Reduce a dense spectrum to the peaks that can be seen in each pixel column of a full range panel.
+    For stems only the highest peak of each pixel column is kept, for a profile line the first, lowest, highest and
+    last point of each pixel column are kept, so that the line looks the same.
+    The peaks with the lowest and highest m/z are always kept to keep the automatic axis limits,
+    peaks outside of mz_range are not reduced.
+
+    Args:
+        mz_lst (list): m/z of the peaks, sorted by m/z if keep_profile is True
+        i_lst (list): intensity of the peaks
+        mz_range (tuple): the m/z range of the panel e.g. (400.0, 1000.0)
+        pixel_count (int): the number of pixel columns of the panel
+        keep_profile (bool): keep the points of a profile line instead of stems
+
+    Returns:
+        mz_lst (list): m/z of the kept peaks in the original order
+        i_lst (list): intensity of the kept peaks
+
+    """
+
+    mz_arr = np.array(mz_lst, dtype=float)
+    i_arr = np.array(i_lst, dtype=float)
+    mz_min, mz_max = mz_range
+    in_range_arr = np.nonzero((mz_arr >= mz_min) & (mz_arr <= mz_max))[0]
+    if pixel_count < 1 or mz_max <= mz_min or in_range_arr.shape[0] <= pixel_count:
+        return mz_lst, i_lst
+
+    col_arr = ((mz_arr[in_range_arr] - mz_min) * (pixel_count / (mz_max - mz_min))).astype(int)
+    col_arr = np.minimum(col_arr, pixel_count - 1)
+    # sorted by pixel column and then by intensity
+    sort_arr = np.lexsort((i_arr[in_range_arr], col_arr))
+    sorted_col_arr = col_arr[sort_arr]
+    start_arr = np.concatenate(([0], np.nonzero(np.diff(sorted_col_arr))[0] + 1))
+    end_arr = np.concatenate((start_arr[1:] - 1, [sorted_col_arr.shape[0] - 1]))
+    keep_lst = [in_range_arr[sort_arr[end_arr]], np.nonzero(mz_arr < mz_min)[0], np.nonzero(mz_arr > mz_max)[0],
+                [mz_arr.argmin(), mz_arr.argmax()]]
+    if keep_profile is True:
+        # the first and last points of each pixel column connect the line to the next columns
+        keep_lst.extend([in_range_arr[sort_arr[start_arr]], in_range_arr[start_arr], in_range_arr[end_arr]])
+    keep_arr = np.unique(np.concatenate(keep_lst).astype(int))
+
+    return mz_arr[keep_arr].tolist(), i_arr[keep_arr].tolist()
+
 
 def plot_spectra(abbr, mz_se, xic_df, ident_info_dct, spec_info_dct, isotope_score_info_dct, specific_dct,
                  formula_charged, charge, core_count, save_img_as=None, img_type='png', dpi=300, vendor='waters',
-                 ms1_precision=50e-6):
+                 ms1_precision=50e-6, preview=False):
     ms2_pr_mz = mz_se['MS2_PR_mz']
     ms1_obs = mz_se['MS1_obs_mz']
     ms1_xic_mz = mz_se['MS1_XIC_mz']
@@ -126,6 +212,11 @@ def plot_spectra(abbr, mz_se, xic_df, ident_info_dct, spec_info_dct, isotope_sco
     # if ms_zoom_bp_i > 0 and len(xic_rt_lst) > 0 and len(xic_i_lst) > 0:
 
     # cut lower peaks to accelerate plotting time
+    if preview is True:
+        dpi = min(dpi, PREVIEW_DPI)
+        plot_peak_count = PREVIEW_PEAK_COUNT
+    else:
+        plot_peak_count = 500
     try:
         m1_dct = isotope_checker_dct[1]
         m1_theo_mz = m1_dct['theo_mz']
@@ -140,20 +231,20 @@ def plot_spectra(abbr, mz_se, xic_df, ident_info_dct, spec_info_dct, isotope_sco
         ms1_pr_mz = ms1_obs
         ms_zoom_bp_i = ms1_df['i'].max()
 
-    if ms1_df['i'].max() >= 10000 and ms1_df.shape[0] >= 500:
+    if ms1_df['i'].max() >= 10000 and ms1_df.shape[0] >= plot_peak_count:
         ms1_min = ms1_df['i'].min()
         ms1_max = ms1_df['i'].max()
-        ms1_top1000_i = sorted(ms1_df['i'].values.tolist(), reverse=True)[499]
+        ms1_top1000_i = sorted(ms1_df['i'].values.tolist(), reverse=True)[plot_peak_count - 1]
         ms1_plot_th = min(m1_obs_i, 3 * ms1_min, ms1_max * 0.01, 1000, ms1_top1000_i)
         ms1_plot_th = max(ms1_plot_th, ms1_top1000_i)
         # print(core_count, m1_obs_i, 3 * ms1_min, ms1_max * 0.01, 1000, ms1_top1000_i)
         ms1_df = ms1_df.query('i >= %f' % ms1_plot_th)
         print(core_count, '[INFO] --> Plot full MS1 with abs intensity filter > %f' % ms1_plot_th)
-    if ms2_df['i'].max() >= 1000 and ms2_df.shape[0] >= 500:
+    if ms2_df['i'].max() >= 1000 and ms2_df.shape[0] >= plot_peak_count:
         ms2_min = ms2_df['i'].min()
         ms2_max = ms2_df['i'].max()
 
-        ms2_top1000_i = sorted(ms2_df['i'].values.tolist(), reverse=True)[499]
+        ms2_top1000_i = sorted(ms2_df['i'].values.tolist(), reverse=True)[plot_peak_count - 1]
         ms2_min_lst = [3 * ms2_min, ms2_max * 0.01, 10, ms2_top1000_i]
         ms2_plot_th = max(min(ms2_min_lst), ms2_top1000_i)
 
@@ -167,10 +258,7 @@ def plot_spectra(abbr, mz_se, xic_df, ident_info_dct, spec_info_dct, isotope_sco
     _msms_high_df = ms2_df.query('mz > 400')
     _msms_high_df = _msms_high_df.query('mz < %.4f' % (ms2_pr_mz + 1))
 
-    # Generate A4 image in landscape
-    fig, pic_array = plt.subplots(nrows=3, ncols=2, figsize=(11.692, 8.267), sharex='none', sharey='none')
-    # Make better spacing between subplots
-    plt.tight_layout()
+    fig, pic_array = get_figure_template()
 
     _msms_max = ms2_df['i'].max()
 
@@ -295,11 +383,17 @@ def plot_spectra(abbr, mz_se, xic_df, ident_info_dct, spec_info_dct, isotope_sco
         ms_pic = pic_array[1, 0]
         ms_pic.tick_params(axis='both', which='major', labelsize=10)
 
+        # draw only the visible peaks of each pixel column for dense spectra
+        ms_pixel_count = int(ms_pic.get_position().width * fig.get_figwidth() * dpi)
+        ms_mz_range = (ms1_df['mz'].min(), ms1_df['mz'].max())
         if ms1_df.shape[0] > 700:
-            ms_pic.plot(ms1_df['mz'].values.tolist(), ms1_df['i'].values.tolist(), 'grey', lw=0.6)
+            ms_mz_lst, ms_i_lst = get_peak_envelope(ms1_df['mz'].values.tolist(), ms1_df['i'].values.tolist(),
+                                                    ms_mz_range, ms_pixel_count, keep_profile=True)
+            ms_pic.plot(ms_mz_lst, ms_i_lst, 'grey', lw=0.6)
         else:
-            marker_l, stem_l, base_l = ms_pic.stem(ms1_df['mz'].values.tolist(), ms1_df['i'].values.tolist(),
-                                                   markerfmt=' ', use_line_collection=True)
+            ms_mz_lst, ms_i_lst = get_peak_envelope(ms1_df['mz'].values.tolist(), ms1_df['i'].values.tolist(),
+                                                    ms_mz_range, ms_pixel_count)
+            marker_l, stem_l, base_l = ms_pic.stem(ms_mz_lst, ms_i_lst, markerfmt=' ', use_line_collection=True)
             plt.setp(stem_l, color='grey', lw=0.6)
             plt.setp(base_l, visible=False)
         _marker_l, _stem_l, _base_l = ms_pic.stem([ms1_pr_mz], dash_i, markerfmt=' ', use_line_collection=True)
@@ -541,20 +635,25 @@ def plot_spectra(abbr, mz_se, xic_df, ident_info_dct, spec_info_dct, isotope_sco
                                      colLabels=ident_col_labels, loc='upper center', cellLoc='center')
         ident_table.set_fontsize(8)
 
-        # plot MS/MS
-        marker_l, stem_l, base_l = msms_pic.stem(ms2_df['mz'].values.tolist(), ms2_df['i'].values.tolist(),
+        if min(ms2_df['mz'].values.tolist()) > 400:
+            msms_xlim_lst = [min(ms2_df['mz'].values.tolist()) - 100, ms2_pr_mz + 20]
+        elif min(ms2_df['mz'].values.tolist()) - 10 > 0:
+            msms_xlim_lst = [min(ms2_df['mz'].values.tolist()) - 10, ms2_pr_mz + 20]
+        else:
+            msms_xlim_lst = [min(ms2_df['mz'].values.tolist()) - 1, ms2_pr_mz + 20]
+
+        # plot MS/MS, only the visible peaks of each pixel column for dense spectra
+        msms_pixel_count = int(msms_pic.get_position().width * fig.get_figwidth() * dpi)
+        msms_mz_lst, msms_i_lst = get_peak_envelope(ms2_df['mz'].values.tolist(), ms2_df['i'].values.tolist(),
+                                                    msms_xlim_lst, msms_pixel_count)
+        marker_l, stem_l, base_l = msms_pic.stem(msms_mz_lst, msms_i_lst,
                                                  markerfmt=' ', basefmt='k-', use_line_collection=True)  # zorder=10
         plt.setp(stem_l, color='grey', linewidth=0.6)
         plt.setp(base_l, visible=False)
         msms_pic.ticklabel_format(style='sci', axis='y', scilimits=(0, 0))
         msms_pic.set_xlabel("m/z", fontsize=7, labelpad=-1)
         msms_pic.set_ylabel("Intensity", fontsize=7)
-        if min(ms2_df['mz'].values.tolist()) > 400:
-            msms_pic.set_xlim([min(ms2_df['mz'].values.tolist()) - 100, ms2_pr_mz + 20])
-        elif min(ms2_df['mz'].values.tolist()) - 10 > 0:
-            msms_pic.set_xlim([min(ms2_df['mz'].values.tolist()) - 10, ms2_pr_mz + 20])
-        else:
-            msms_pic.set_xlim([min(ms2_df['mz'].values.tolist()) - 1, ms2_pr_mz + 20])
+        msms_pic.set_xlim(msms_xlim_lst)
         msms_pic.set_ylim([0, _msms_max * 1.5])
 
         if obs_ident_df is not False:
@@ -1138,23 +1237,40 @@ def plot_spectra(abbr, mz_se, xic_df, ident_info_dct, spec_info_dct, isotope_sco
             for _task in tasks:
                 executor.submit(_task)
 
-        plt.savefig(save_img_as, type=img_type, dpi=dpi)
+        fig.savefig(save_img_as, type=img_type, dpi=dpi)
         print(core_count, '[OUTPUT] ==> Image saved as: %s' % save_img_as)
-        plt.close()
     except Exception as e:
         print('[INFO] --> Use single thread and try again ...', e)
+        fig, pic_array = get_figure_template()
         plot_msms()
         plot_msms_low()
         plot_msms_high()
         plot_xic()
         plot_ms()
         plot_ms_zoom()
-        plt.savefig(save_img_as, type=img_type, dpi=dpi)
+        fig.savefig(save_img_as, type=img_type, dpi=dpi)
         print(core_count, '[INFO] --> Image saved as: %s' % save_img_as)
-        plt.close()
 
 
-def gen_plot(param_dct_lst, core_count, img_type='png', dpi=300, vendor='waters', ms1_precision=50e-6):
+def get_plot_cost(param_dct):
+    """
+    Estimate the cost to plot one image by the number of MS1 and MS2 peaks to draw.
+
+    Args:
+        param_dct (dict): the plot inputs of one identification
+
+    Returns:
+        cost (int): the number of MS1 and MS2 peaks
+
+    """
+
+    spec_info_dct = param_dct['spec_info_dct']
+
+    return spec_info_dct['ms1_df'].shape[0] + spec_info_dct['ms2_df'].shape[0]
+
+
+def gen_plot(param_dct_lst, core_count, img_type='png', dpi=300, vendor='waters', ms1_precision=50e-6,
+             preview=False):
     core_count = 'Core #{core}'.format(core=core_count)
 
     if isinstance(param_dct_lst, list):
@@ -1176,7 +1292,7 @@ def gen_plot(param_dct_lst, core_count, img_type='png', dpi=300, vendor='waters'
             try:
                 plot_spectra(abbr, mz_se, xic_df, ident_info_dct, spec_info_dct, isotope_score_info_dct, specific_dct,
                              formula_charged, charge, core_count, save_img_as=save_img_as, img_type=img_type,
-                             dpi=dpi, vendor=vendor, ms1_precision=ms1_precision)
+                             dpi=dpi, vendor=vendor, ms1_precision=ms1_precision, preview=preview)
             except Exception as e:
                 print(core_count, '[EXCEPTION] !!! gen_plot failed to save images from data list ...', e)
 
@@ -1198,6 +1314,272 @@ def gen_plot(param_dct_lst, core_count, img_type='png', dpi=300, vendor='waters'
             try:
                 plot_spectra(abbr, mz_se, xic_df, ident_info_dct, spec_info_dct, isotope_score_info_dct, specific_dct,
                              formula_charged, charge, core_count, save_img_as=save_img_as, img_type=img_type,
-                             dpi=dpi, vendor=vendor, ms1_precision=ms1_precision)
+                             dpi=dpi, vendor=vendor, ms1_precision=ms1_precision, preview=preview)
             except Exception as e:
                 print(core_count, '[EXCEPTION] !!! gen_plot failed to save image ...', e)
+
+
+def get_plot_params_path(save_img_as):
+    """
+    Get the path of the sidecar file with the plot inputs of an image.
+
+    Args:
+        save_img_as (str): the path of the image e.g. 'results/figures/798.5410_rt27.667_..._PC(36-3).png'
+
+    Returns:
+        plot_params_path (str): the image path with PLOT_PARAMS_EXT as extension
+
+    """
+
+    return os.path.splitext(save_img_as)[0] + PLOT_PARAMS_EXT
+
+
+def save_plot_params(param_dct_lst, img_type='png', dpi=300, vendor='waters', ms1_precision=50e-6,
+                     preview=False):
+    """
+    Save the plot inputs of each identification to a sidecar file instead of rendering the image.
+    The images can be rendered later by render_plot_params().
+
+    Args:
+        param_dct_lst (list): list of img_param_dct from get_lipid_info()
+        img_type (str): the image format e.g. 'png'
+        dpi (int): the image resolution
+        vendor (str): the instrument vendor
+        ms1_precision (float): the MS1 tolerance e.g. 20e-6 for 20 ppm
+        preview (bool): a preview image is saved at the image path and is replaced by render_plot_params()
+
+    Returns:
+        plot_params_path_lst (list): the paths of the saved sidecar files
+
+    """
+
+    plot_params_path_lst = []
+    for param_dct in param_dct_lst:
+        if param_dct is None:
+            continue
+        plot_params_path = get_plot_params_path(param_dct['save_img_as'])
+        plot_params_dct = {'img_param_dct': param_dct, 'img_type': img_type, 'dpi': dpi, 'vendor': vendor,
+                           'ms1_precision': ms1_precision, 'preview': preview}
+        dump_plot_params(plot_params_path, plot_params_dct)
+        plot_params_path_lst.append(plot_params_path)
+
+    print('[OUTPUT] ==> Plot inputs of %i images saved ...' % len(plot_params_path_lst))
+
+    return plot_params_path_lst
+
+
+def encode_plot_params(value, arr_lst):
+    """
+    Convert the plot inputs to JSON compatible values. The numeric arrays are replaced by their position in arr_lst.
+    The types of the values are kept, e.g. np.float32, the dtypes of the DataFrame columns and the int dict keys.
+
+    Args:
+        value: the plot inputs, the dicts, lists, DataFrames and Series are converted recursively
+        arr_lst (list): the numeric arrays are appended to this list
+
+    Returns:
+        json_value: a JSON compatible value
+
+    """
+
+    if value is None or type(value) in [bool, int, float, str]:
+        json_value = value
+    elif isinstance(value, np.generic):
+        json_value = {'np': value.dtype.str, 'val': value.item()}
+    elif isinstance(value, (list, tuple)):
+        json_value = {type(value).__name__: [encode_plot_params(_val, arr_lst) for _val in value]}
+    elif isinstance(value, dict):
+        json_value = {'dict': [[encode_plot_params(_key, arr_lst), encode_plot_params(_val, arr_lst)]
+                               for _key, _val in value.items()]}
+    elif isinstance(value, np.ndarray):
+        if value.dtype.kind in PLOT_PARAMS_ARR_KINDS:
+            json_value = {'arr': len(arr_lst)}
+            arr_lst.append(value)
+        else:
+            json_value = {'obj_arr': [encode_plot_params(_val, arr_lst) for _val in value.tolist()]}
+    elif isinstance(value, pd.RangeIndex):
+        json_value = {'range_idx': [value.start, value.stop, value.step],
+                      'name': encode_plot_params(value.name, arr_lst)}
+    elif isinstance(value, pd.MultiIndex):
+        json_value = {'multi_idx': [encode_plot_params(value.get_level_values(_lv).values, arr_lst)
+                                    for _lv in range(value.nlevels)],
+                      'names': encode_plot_params(list(value.names), arr_lst)}
+    elif isinstance(value, pd.Index):
+        json_value = {'idx': encode_plot_params(value.values, arr_lst), 'name': encode_plot_params(value.name, arr_lst)}
+    elif isinstance(value, pd.DataFrame):
+        json_value = {'df': [encode_plot_params(value.iloc[:, _col].values, arr_lst)
+                             for _col in range(value.shape[1])],
+                      'columns': encode_plot_params(value.columns, arr_lst),
+                      'index': encode_plot_params(value.index, arr_lst)}
+    elif isinstance(value, pd.Series):
+        json_value = {'se': encode_plot_params(value.values, arr_lst),
+                      'index': encode_plot_params(value.index, arr_lst),
+                      'name': encode_plot_params(value.name, arr_lst)}
+    else:
+        raise TypeError('Plot input of type %s can not be saved' % type(value).__name__)
+
+    return json_value
+
+
+def decode_plot_params(json_value, arr_dct):
+    """
+    Restore the plot inputs converted by encode_plot_params().
+
+    Args:
+        json_value: the JSON compatible value
+        arr_dct (dict): the numeric arrays with the keys arr_<position>
+
+    Returns:
+        value: the plot inputs
+
+    """
+
+    if not isinstance(json_value, dict):
+        return json_value
+
+    if 'np' in json_value:
+        value = np.dtype(json_value['np']).type(json_value['val'])
+    elif 'list' in json_value:
+        value = [decode_plot_params(_val, arr_dct) for _val in json_value['list']]
+    elif 'tuple' in json_value:
+        value = tuple([decode_plot_params(_val, arr_dct) for _val in json_value['tuple']])
+    elif 'dict' in json_value:
+        value = {decode_plot_params(_key, arr_dct): decode_plot_params(_val, arr_dct)
+                 for _key, _val in json_value['dict']}
+    elif 'arr' in json_value:
+        value = arr_dct['arr_%i' % json_value['arr']]
+    elif 'obj_arr' in json_value:
+        value = np.empty(len(json_value['obj_arr']), dtype=object)
+        for _idx, _val in enumerate(json_value['obj_arr']):
+            value[_idx] = decode_plot_params(_val, arr_dct)
+    elif 'range_idx' in json_value:
+        value = pd.RangeIndex(*json_value['range_idx'], name=decode_plot_params(json_value['name'], arr_dct))
+    elif 'multi_idx' in json_value:
+        value = pd.MultiIndex.from_arrays([decode_plot_params(_lv, arr_dct) for _lv in json_value['multi_idx']],
+                                          names=decode_plot_params(json_value['names'], arr_dct))
+    elif 'idx' in json_value:
+        value = pd.Index(decode_plot_params(json_value['idx'], arr_dct),
+                         name=decode_plot_params(json_value['name'], arr_dct))
+    elif 'df' in json_value:
+        col_arr_lst = [decode_plot_params(_col, arr_dct) for _col in json_value['df']]
+        index = decode_plot_params(json_value['index'], arr_dct)
+        if col_arr_lst:
+            value = pd.DataFrame(dict(enumerate(col_arr_lst)), index=index, columns=range(len(col_arr_lst)))
+        else:
+            value = pd.DataFrame(index=index)
+        value.columns = decode_plot_params(json_value['columns'], arr_dct)
+    elif 'se' in json_value:
+        value = pd.Series(decode_plot_params(json_value['se'], arr_dct),
+                          index=decode_plot_params(json_value['index'], arr_dct),
+                          name=decode_plot_params(json_value['name'], arr_dct))
+    else:
+        raise ValueError('Unknown plot input %s' % list(json_value.keys()))
+
+    return value
+
+
+def dump_plot_params(plot_params_path, plot_params_dct):
+    """
+    Write the plot inputs of one image to its sidecar file.
+
+    Args:
+        plot_params_path (str): the path of the sidecar file
+        plot_params_dct (dict): the img_param_dct and the image settings
+
+    """
+
+    arr_lst = []
+    json_str = json.dumps(encode_plot_params(plot_params_dct, arr_lst))
+    arr_dct = {'arr_%i' % _idx: _arr for _idx, _arr in enumerate(arr_lst)}
+    with open(plot_params_path, 'wb') as _plot_params_obj:
+        np.savez(_plot_params_obj, plot_params=np.frombuffer(json_str.encode('utf-8'), dtype=np.uint8), **arr_dct)
+
+
+def load_plot_params(plot_params_path):
+    """
+    Read the plot inputs of one image from its sidecar file without unpickling any data.
+
+    Args:
+        plot_params_path (str): the path of the sidecar file
+
+    Returns:
+        plot_params_dct (dict): the img_param_dct and the image settings
+
+    """
+
+    with np.load(plot_params_path, allow_pickle=False) as _plot_params_npz:
+        json_str = _plot_params_npz['plot_params'].tobytes().decode('utf-8')
+        plot_params_dct = decode_plot_params(json.loads(json_str), _plot_params_npz)
+
+    return plot_params_dct
+
+
+def find_plot_params(path):
+    """
+    Find the sidecar files with the plot inputs in a results folder.
+
+    Args:
+        path (str): a sidecar file or a folder to search in, including the sub folders
+
+    Returns:
+        plot_params_path_lst (list): the sorted paths of the sidecar files
+
+    """
+
+    plot_params_path_lst = []
+    if os.path.isfile(path):
+        if path.endswith(PLOT_PARAMS_EXT):
+            plot_params_path_lst.append(path)
+    elif os.path.isdir(path):
+        for _root, _dirs, _files in os.walk(path):
+            for _file in _files:
+                if _file.endswith(PLOT_PARAMS_EXT):
+                    plot_params_path_lst.append(os.path.join(_root, _file))
+
+    return sorted(plot_params_path_lst)
+
+
+def render_plot_params(plot_params_path_lst, core_count=1, overwrite=False):
+    """
+    Render the images from the sidecar files saved by save_plot_params() in full resolution.
+    Preview images are always replaced by the full resolution images.
+
+    Args:
+        plot_params_path_lst (list): the paths of the sidecar files
+        core_count (int): the number of the worker, only used for the printed messages
+        overwrite (bool): render the full resolution images that already exist again
+
+    Returns:
+        img_count (int): the number of rendered images
+
+    """
+
+    core_count = 'Core #{core}'.format(core=core_count)
+    img_count = 0
+    tot_img_count = len(plot_params_path_lst)
+    for _idx, _plot_params_path in enumerate(plot_params_path_lst):
+        try:
+            plot_params_dct = load_plot_params(_plot_params_path)
+        except (IOError, KeyError, TypeError, ValueError, zipfile.BadZipFile) as e:
+            print(core_count, '[WARNING] !!! Failed to load plot inputs from %s ...' % _plot_params_path, e)
+            continue
+        param_dct = plot_params_dct['img_param_dct']
+        is_preview = plot_params_dct.get('preview', False)
+        if overwrite is False and is_preview is False and os.path.isfile(param_dct['save_img_as']):
+            continue
+        print('%s [STATUS] >>> image: %i / %i' % (core_count, _idx + 1, tot_img_count))
+        try:
+            plot_spectra(param_dct['abbr'], param_dct['mz_se'], param_dct['xic_df'], param_dct['ident_info_dct'],
+                         param_dct['spec_info_dct'], param_dct['isotope_score_info_dct'], param_dct['specific_dct'],
+                         param_dct['formula_charged'], param_dct['charge'], core_count,
+                         save_img_as=param_dct['save_img_as'], img_type=plot_params_dct['img_type'],
+                         dpi=plot_params_dct['dpi'], vendor=plot_params_dct['vendor'],
+                         ms1_precision=plot_params_dct['ms1_precision'])
+            img_count += 1
+            if is_preview is True:
+                plot_params_dct['preview'] = False
+                dump_plot_params(_plot_params_path, plot_params_dct)
+        except Exception as e:
+            print(core_count, '[EXCEPTION] !!! render_plot_params failed to save image ...', e)
+
+    return img_count
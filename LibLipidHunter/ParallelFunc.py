@@ -19,6 +19,7 @@
 
 import configparser
 from numba import int32, int64, int16, float32, float64, vectorize
+import numpy as np
 
 # setup weight factor
 # load configurations
@@ -83,3 +84,23 @@ def ppm_calc_para(mz_obs, mz_lib):
 @vectorize(([float64(float64, float64)]), target=para_target)
 def wfactor_calc_para(mz, i):
     return (mz ** mz_factor) * (i ** intensity_factor)
+
+
+def get_query_bounds(low_arr, high_arr, dtype=np.float32):
+    """
+    Round the m/z windows the same way as a query string '%f <= mz <= %f' compared in the precision of the peaks.
+
+    Args:
+        low_arr (np.ndarray): the lower m/z bounds
+        high_arr (np.ndarray): the upper m/z bounds
+        dtype (np.dtype): the dtype of the m/z of the peaks
+
+    Returns:
+        low_arr (np.ndarray), high_arr (np.ndarray)
+
+    """
+
+    low_arr = np.array(['%f' % _mz for _mz in low_arr], dtype=np.float64).astype(dtype)
+    high_arr = np.array(['%f' % _mz for _mz in high_arr], dtype=np.float64).astype(dtype)
+
+    return low_arr, high_arr
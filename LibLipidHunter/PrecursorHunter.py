@@ -18,101 +18,192 @@
 #     Developer Georgia Angelidou georgia.angelidou@uni-leipzig.de
 
 import math
-import multiprocessing
-from multiprocessing import Pool
 from sys import platform
 
+import numpy as np
 import pandas as pd
 
-from LibLipidHunter.ParallelFunc import ppm_calc_para, ppm_window_para, pr_window_calc_para
+from LibLipidHunter.HunterPool import HunterPool, TASK_PER_CORE, split_tasks
+from LibLipidHunter.ParallelFunc import get_query_bounds, ppm_calc_para, ppm_window_para, pr_window_calc_para
+from LibLipidHunter.SpectraReader import sort_peaks_by_i
+from LibLipidHunter.SpectraStore import DDAIndex, SpectraStore
+
+
+def match_ms1_peaks(mz_arr, i_arr, low_arr, high_arr, lib_mz_arr, ms1_th, ms1_max, ms1_ppm):
+    """
+    Match many MS1 windows to the peaks of one MS1 survey scan at once.
+    For each window the peaks in the m/z window, in the intensity range and in the ppm range of its library m/z are
+    selected, the best peak is the one with highest intensity.
+
+    Args:
+        mz_arr (np.ndarray): mz of the MS1 peaks
+        i_arr (np.ndarray): i of the MS1 peaks
+        low_arr (np.ndarray): the lower m/z bounds of the windows
+        high_arr (np.ndarray): the upper m/z bounds of the windows
+        lib_mz_arr (np.ndarray): the library m/z of the windows
+        ms1_th (float): MS1 threshold
+        ms1_max (float): MS1 max intensity, set 0 to disable
+        ms1_ppm (int): MS1 ppm
+
+    Returns:
+        best_mz_arr (np.ndarray): mz of the best peak of each window, NaN if not found
+        best_ppm_arr (np.ndarray): ppm of the best peak of each window, NaN if not found
+
+    """
+
+    best_mz_arr = np.full(lib_mz_arr.size, np.nan)
+    best_ppm_arr = np.full(lib_mz_arr.size, np.nan)
+
+    # the windows and the thresholds are compared in the dtype of the peaks as in DataFrame.query
+    _i_type = i_arr.dtype.type
+    if ms1_max > ms1_th:
+        _i_mask = (_i_type(ms1_th) <= i_arr) & (i_arr <= _i_type(ms1_max))
+    else:
+        _i_mask = _i_type(ms1_th) <= i_arr
+    peak_pos_arr = np.flatnonzero(_i_mask)
+    peak_pos_arr = peak_pos_arr[np.argsort(mz_arr[peak_pos_arr], kind='mergesort')]
+    peak_mz_arr = mz_arr[peak_pos_arr]
+    start_arr = np.searchsorted(peak_mz_arr, low_arr.astype(mz_arr.dtype), side='left')
+    count_arr = np.maximum(np.searchsorted(peak_mz_arr, high_arr.astype(mz_arr.dtype), side='right') - start_arr, 0)
+    if count_arr.sum() == 0:
+        return best_mz_arr, best_ppm_arr
+
+    # all candidate peaks of all windows
+    _cand_pos_arr = np.arange(count_arr.sum()) - np.repeat(np.cumsum(count_arr) - count_arr, count_arr)
+    cand_win_arr = np.repeat(np.arange(lib_mz_arr.size), count_arr)
+    cand_peak_arr = peak_pos_arr[np.repeat(start_arr, count_arr) + _cand_pos_arr]
+    cand_ppm_arr = ppm_calc_para(mz_arr[cand_peak_arr], lib_mz_arr[cand_win_arr])
+    _ppm_mask = np.abs(cand_ppm_arr) <= int(ms1_ppm)
+    cand_win_arr = cand_win_arr[_ppm_mask]
+    cand_peak_arr = cand_peak_arr[_ppm_mask]
+    cand_ppm_arr = cand_ppm_arr[_ppm_mask]
+    if cand_win_arr.size == 0:
+        return best_mz_arr, best_ppm_arr
+
+    # highest intensity first, peaks with same intensity in the order of the spectrum
+    cand_i_arr = i_arr[cand_peak_arr]
+    _cand_order_arr = np.lexsort((cand_peak_arr, -cand_i_arr, cand_win_arr))
+    cand_win_arr = cand_win_arr[_cand_order_arr]
+    cand_peak_arr = cand_peak_arr[_cand_order_arr]
+    cand_ppm_arr = cand_ppm_arr[_cand_order_arr]
+    cand_i_arr = cand_i_arr[_cand_order_arr]
+    win_arr, first_arr, win_count_arr = np.unique(cand_win_arr, return_index=True, return_counts=True)
+    best_arr = first_arr.copy()
+    # windows with more than one peak of the top intensity are rare, they keep the order of sort_values(by='i')
+    _tie_arr = np.flatnonzero((win_count_arr > 1) & (cand_i_arr[np.minimum(first_arr + 1, cand_i_arr.size - 1)]
+                                                     == cand_i_arr[first_arr]))
+    for _win_idx in _tie_arr.tolist():
+        _cand_arr = np.arange(first_arr[_win_idx], first_arr[_win_idx] + win_count_arr[_win_idx])
+        _cand_arr = _cand_arr[np.argsort(cand_peak_arr[_cand_arr], kind='mergesort')]
+        best_arr[_win_idx] = sort_peaks_by_i(_cand_arr, cand_i_arr[_cand_arr])[0][0]
+
+    best_mz_arr[win_arr] = mz_arr[cand_peak_arr[best_arr]]
+    best_ppm_arr[win_arr] = cand_ppm_arr[best_arr]
+
+    return best_mz_arr, best_ppm_arr
 
 
 def find_pr_info(scan_info_df, spectra_pl, lpp_info_groups, sub_group_list, ms1_th, ms1_ppm, ms1_max, core=1,
-                 os_type='windows', queue=None):
+                 os_type='windows', queue=None, dda_index=None):
+    """
+    Match the lipid master table to the MS2 precursors and find the corresponding MS1 peaks.
+    The precursor windows of all groups are joined to the sorted MS2_PR_mz by searchsorted, then the MS1 windows of all
+    matched pairs are joined to the peaks of their MS1 survey scan in one step per DDA event by match_ms1_peaks.
+
+    Args:
+        scan_info_df (pd.DataFrame): the scan info from extract_mzml
+        spectra_pl (SpectraStore): spectra to be searched, can also be dict of {spec_index: pd.DataFrame}
+        lpp_info_groups (pd.core.groupby.DataFrameGroupBy): lipid master table grouped by ['Lib_mz', 'Formula']
+        sub_group_list (list): the group keys to be searched
+        ms1_th (int): MS1 threshold
+        ms1_ppm (int): MS1 ppm
+        ms1_max (int): MS1 max intensity, set 0 to disable
+        core (int): core number to be printed
+        os_type (str): 'windows', 'linux_single' or 'linux_multi'
+        queue (multiprocessing.Queue): put the results to the queue for 'linux_multi'
+        dda_index (DDAIndex): lookup tables of scan_info_df, taken from spectra_pl or generated if not set
+
+    Returns:
+        core_results_df (pd.DataFrame): the matched rows of lipid master table with scan info and MS1 obs mz
+
+    """
+
     core_count = 'Core #{core}'.format(core=core)
     print(core_count, '[STATUS] >>> ... Matching precursors ...')
     core_results_df = pd.DataFrame()
-    for group_key in sub_group_list:
-        subgroup_df = lpp_info_groups.get_group(group_key).copy()
-        # subgroup_df.is_copy = False
-
-        same_mz_se = subgroup_df.iloc[0, :].squeeze()
-        _pr_code = '%f<= MS2_PR_mz <= %f' % (same_mz_se['PR_MZ_LOW'], same_mz_se['PR_MZ_HIGH'])
-
-        _tmp_scan_info_df = scan_info_df.query(_pr_code).copy()
-
-        if not _tmp_scan_info_df.empty:
-
-            for idx, row in _tmp_scan_info_df.iterrows():
-                ms2_pr = row['MS2_PR_mz']
-                ms2_dda_idx = row['dda_event_idx']
-                ms2_dda_rank = row['DDA_rank']
-                ms2_spec_idx = row['spec_index']
-                ms2_scan_time = row['scan_time']
-                ms2_scan_number = row['scan_number']
-                _ms1_query_code = 'dda_event_idx == %i and DDA_rank == 0' % ms2_dda_idx
-                tmp_ms1_info_df = scan_info_df.query(_ms1_query_code).copy()
-
-                if not tmp_ms1_info_df.empty:
-
-                    ms1_spec_idx = tmp_ms1_info_df['spec_index'].values.tolist()[0]
-
-                    if ms1_spec_idx in spectra_pl:
-                        ms1_df = spectra_pl[ms1_spec_idx]
-                        if ms1_max > ms1_th:
-                            pr_ms1_df = ms1_df.query('%f <= i <= %f and %f <= mz <= %f'
-                                                     % (ms1_th, ms1_max,
-                                                        same_mz_se['MS1_MZ_LOW'],same_mz_se['MS1_MZ_HIGH']
-                                                        )
-                                                     ).copy()
-                        else:
-                            pr_ms1_df = ms1_df.query('%f <= i and %f <= mz <= %f'
-                                                     % (ms1_th,
-                                                        same_mz_se['MS1_MZ_LOW'],same_mz_se['MS1_MZ_HIGH']
-                                                        )
-                                                     ).copy()
-
-                        # pr_ms1_df.is_copy = False
-
-                        if not pr_ms1_df.empty:
-
-                            pr_ms1_df.loc[:, 'ppm'] = ppm_calc_para(pr_ms1_df['mz'].values, same_mz_se['Lib_mz'])
-                            pr_ms1_df.loc[:, 'abs_ppm'] = abs(pr_ms1_df.loc[:, 'ppm'])
-                            pr_info_df = pr_ms1_df.query('abs_ppm <= %i' % ms1_ppm).copy()
-                            if not pr_info_df.empty:
-                                pr_info_df.sort_values(by='i', ascending=False, inplace=True)
-                                pr_info_df.reset_index(drop=True, inplace=True)
-                                _ms1_mz = pr_info_df['mz'].values.tolist()[0]
-                                _ppm = pr_info_df['ppm'].values.tolist()[0]
-                                len_df = subgroup_df.shape[0]
-                                subgroup_df.loc[:, 'MS1_obs_mz'] = [_ms1_mz] * len_df
-                                subgroup_df.loc[:, 'dda_event_idx'] = [ms2_dda_idx] * len_df
-                                subgroup_df.loc[:, 'spec_index'] = [ms2_spec_idx] * len_df
-                                subgroup_df.loc[:, 'scan_time'] = [ms2_scan_time] * len_df
-                                subgroup_df.loc[:, 'DDA_rank'] = [ms2_dda_rank] * len_df
-                                subgroup_df.loc[:, 'scan_number'] = [ms2_scan_number] * len_df
-                                subgroup_df.loc[:, 'MS2_PR_mz'] = [ms2_pr] * len_df
-                                subgroup_df.loc[:, 'MS1_XIC_mz'] = [round(_ms1_mz, 4)] * len_df
-                                subgroup_df.loc[:, 'ppm'] = [_ppm] * len_df
-                                subgroup_df.loc[:, 'abs_ppm'] = [abs(_ppm)] * len_df
-
-                                core_results_df = core_results_df.append(subgroup_df, sort=False)
-                                # print('core_results_df.shape', core_results_df.shape)
-                            else:
-                                pass
-                                # print('pr_info_df.shape[0] == 0')
-                        else:
-                            pass
-                            # print('pr_ms1_df.shape[0] == 0')
-                    else:
-                        pass
-                        # print('ms1_spec_idx not in list')
-                else:
-                    pass
-                    # print('tmp_ms1_info_df.shape[0] = 0')
+
+    lpp_info_df = lpp_info_groups.obj
+    lpp_group_idx_dct = lpp_info_groups.indices
+    group_row_lst = [lpp_group_idx_dct[_group_key] for _group_key in sub_group_list]
+    group_info_df = lpp_info_df.iloc[[_row_arr[0] for _row_arr in group_row_lst]]
+    lib_mz_arr = group_info_df['Lib_mz'].values.astype(np.float64)
+
+    # the windows are compared as in the former query strings with '%f'
+    ms1_th = float('%f' % ms1_th)
+    ms1_max = float('%f' % ms1_max)
+    pr_low_arr, pr_high_arr = get_query_bounds(group_info_df['PR_MZ_LOW'].values, group_info_df['PR_MZ_HIGH'].values,
+                                               dtype=np.float64)
+    ms1_low_arr, ms1_high_arr = get_query_bounds(group_info_df['MS1_MZ_LOW'].values,
+                                                 group_info_df['MS1_MZ_HIGH'].values, dtype=np.float64)
+
+    # interval join of the precursor windows and the MS2 precursors sorted by m/z
+    scan_pr_mz_arr = scan_info_df['MS2_PR_mz'].values
+    scan_pr_order_arr = np.argsort(scan_pr_mz_arr, kind='mergesort')
+    scan_pr_sorted_arr = scan_pr_mz_arr[scan_pr_order_arr]
+    pr_start_arr = np.searchsorted(scan_pr_sorted_arr, pr_low_arr, side='left')
+    pr_count_arr = np.maximum(np.searchsorted(scan_pr_sorted_arr, pr_high_arr, side='right') - pr_start_arr, 0)
+    pair_group_arr = np.repeat(np.arange(lib_mz_arr.size), pr_count_arr)
+    _pair_pos_arr = np.arange(pr_count_arr.sum()) - np.repeat(np.cumsum(pr_count_arr) - pr_count_arr, pr_count_arr)
+    pair_scan_arr = scan_pr_order_arr[np.repeat(pr_start_arr, pr_count_arr) + _pair_pos_arr]
+    # pairs are ordered by group, then by the position in scan_info_df
+    _pair_order_arr = np.lexsort((pair_scan_arr, pair_group_arr))
+    pair_group_arr = pair_group_arr[_pair_order_arr]
+    pair_scan_arr = pair_scan_arr[_pair_order_arr]
+
+    # the first MS1 survey scan of each DDA event
+    if not isinstance(dda_index, DDAIndex):
+        if isinstance(spectra_pl, SpectraStore) and isinstance(spectra_pl.dda_index, DDAIndex):
+            dda_index = spectra_pl.dda_index
         else:
-            pass
-            # print('_tmp_scan_info_df.shape[0] = 0')
+            dda_index = DDAIndex(scan_info_df)
+    pair_ms1_arr = dda_index.get_ms1_spec_index_arr(scan_info_df['dda_event_idx'].values[pair_scan_arr])
+
+    # the best MS1 peak of each pair, NaN if not found
+    pair_ms1_mz_arr = np.full(pair_group_arr.size, np.nan)
+    pair_ppm_arr = np.full(pair_group_arr.size, np.nan)
+    _ms1_order_arr = np.argsort(pair_ms1_arr, kind='mergesort')
+    _ms1_arr, _ms1_start_arr = np.unique(pair_ms1_arr[_ms1_order_arr], return_index=True)
+    for ms1_spec_idx, _ms1_pair_arr in zip(_ms1_arr.tolist(), np.split(_ms1_order_arr, _ms1_start_arr[1:])):
+        if ms1_spec_idx not in spectra_pl:
+            continue
+        if isinstance(spectra_pl, SpectraStore):
+            _mz_arr, _i_arr = spectra_pl.get_arrays(ms1_spec_idx)
+        else:
+            _mz_arr = spectra_pl[ms1_spec_idx]['mz'].values
+            _i_arr = spectra_pl[ms1_spec_idx]['i'].values
+        _pair_ms1_mz_arr, _pair_ppm_arr = match_ms1_peaks(_mz_arr, _i_arr, ms1_low_arr[pair_group_arr[_ms1_pair_arr]],
+                                                          ms1_high_arr[pair_group_arr[_ms1_pair_arr]],
+                                                          lib_mz_arr[pair_group_arr[_ms1_pair_arr]],
+                                                          ms1_th, ms1_max, ms1_ppm)
+        pair_ms1_mz_arr[_ms1_pair_arr] = _pair_ms1_mz_arr
+        pair_ppm_arr[_ms1_pair_arr] = _pair_ppm_arr
+
+    match_pair_arr = np.flatnonzero(~np.isnan(pair_ms1_mz_arr))
+    if match_pair_arr.size > 0:
+        match_row_lst = [group_row_lst[_group] for _group in pair_group_arr[match_pair_arr].tolist()]
+        _row_count_arr = np.array([_row_arr.size for _row_arr in match_row_lst])
+        core_results_df = lpp_info_df.iloc[np.concatenate(match_row_lst)].copy()
+        _ms1_mz_arr = pair_ms1_mz_arr[match_pair_arr]
+        _ppm_arr = pair_ppm_arr[match_pair_arr]
+        _scan_val_arr = scan_info_df[['dda_event_idx', 'spec_index', 'scan_time', 'DDA_rank', 'scan_number',
+                                      'MS2_PR_mz']].values[pair_scan_arr[match_pair_arr]].astype(np.float64)
+        match_val_arr = np.column_stack([_ms1_mz_arr, _scan_val_arr, [round(_mz, 4) for _mz in _ms1_mz_arr.tolist()],
+                                         _ppm_arr, np.abs(_ppm_arr)])
+        match_val_arr = np.repeat(match_val_arr, _row_count_arr, axis=0)
+        match_col_lst = ['MS1_obs_mz', 'dda_event_idx', 'spec_index', 'scan_time', 'DDA_rank', 'scan_number',
+                         'MS2_PR_mz', 'MS1_XIC_mz', 'ppm', 'abs_ppm']
+        for _col_idx, _col in enumerate(match_col_lst):
+            core_results_df[_col] = match_val_arr[:, _col_idx]
 
     print(core_count, '[INFO] --> core_results_count', core_results_df.shape[0])
 
@@ -129,14 +220,10 @@ class PrecursorHunter(object):
         self.param_dct = param_dct
         self.os_typ = os_type
 
-    def get_matched_pr(self, scan_info_df, spectra_dct, ms1_max=0, core_num=4, max_ram=8):
+    def get_matched_pr(self, scan_info_df, spectra_dct, ms1_max=0, core_num=4, hunter_pool=None):
 
         print('[STATUS] >>>  Start match precursors ...')
 
-        if core_num > 4:
-            core_num = 4
-            print('[INFO] --> Temporarily reduce to 4 cores to enhance the performance in this step...')
-
         pr_window = self.param_dct['pr_window']
 
         ms1_ppm = self.param_dct['ms_ppm']
@@ -181,155 +268,82 @@ class PrecursorHunter(object):
         lpp_info_groups = self.lpp_info_df.groupby(['Lib_mz', 'Formula'])
         # TODO (georgia.angelidou@uni-leipzig.de): can also be reduced
         all_group_key_lst = list(lpp_info_groups.groups.keys())
-        sub_len = int(math.ceil(len(all_group_key_lst) / core_num))
-        core_key_list = [all_group_key_lst[k: k + sub_len] for k in range(0, len(all_group_key_lst), sub_len)]
-        del all_group_key_lst
-        spectra_pl_idx_lst = sorted(list(spectra_dct.keys()))
-
-        if (max_ram * 64) <= len(spectra_pl_idx_lst) < (max_ram * 128):
-            print('[INFO] --> Spectra is too large for the RAM settings, split to few segments ...')
-            sub_group_len = int(math.ceil(len(spectra_pl_idx_lst) * 0.5))
-        elif (max_ram * 128) <= len(spectra_pl_idx_lst) < (max_ram * 256):
-            print('[INFO] --> Spectra is too large for the RAM settings, split to few segments ...')
-            sub_group_len = int(math.ceil(len(spectra_pl_idx_lst) * 0.25))
-        elif len(spectra_pl_idx_lst) >= (max_ram * 256):
-            print('[INFO] --> Spectra is too large for the RAM settings, split to few segments ...')
-            sub_group_len = int(math.ceil(len(spectra_pl_idx_lst) * 0.1))
-
+        if self.param_dct['core_number'] > 1:
+            # the cost of each precursor is estimated by the number of MS2 scans in its precursor window
+            pr_mz_arr = np.sort(scan_info_df['MS2_PR_mz'].values, kind='mergesort')
+            group_window_df = lpp_info_groups[['PR_MZ_LOW', 'PR_MZ_HIGH']].first().loc[all_group_key_lst, :]
+            group_cost_arr = (np.searchsorted(pr_mz_arr, group_window_df['PR_MZ_HIGH'].values, side='right')
+                              - np.searchsorted(pr_mz_arr, group_window_df['PR_MZ_LOW'].values, side='left'))
+            core_key_list, core_cost_lst = split_tasks(all_group_key_lst, group_cost_arr, core_num * TASK_PER_CORE)
         else:
-            sub_group_len = len(spectra_pl_idx_lst)
-
-        print('[INFO] --> Total Scans:', len(spectra_pl_idx_lst), 'Sub part scans:', sub_group_len)
-        if sub_group_len > 500:
-            print('[INFO] --> Set sub part scans to 500 to avoid Memory error ...')
-            sub_group_len = 500
-        elif sub_group_len == 0:
+            sub_len = int(math.ceil(len(all_group_key_lst) / core_num))
+            core_key_list = [all_group_key_lst[k: k + sub_len] for k in range(0, len(all_group_key_lst), sub_len)]
+            core_cost_lst = []
+        del all_group_key_lst
+        if len(spectra_dct) == 0:
             print('[WARNING] !!!  Not enough MS spectra')
             return False
-        sub_pl_group_lst = [spectra_pl_idx_lst[s: (s + sub_group_len)] for s in range(0, len(spectra_pl_idx_lst),
-                                                                                      sub_group_len)]
+        print('[INFO] --> Total Scans:', len(spectra_dct))
+
+        # the shared spectra are mapped by each worker, the scans are not split into parts by the max RAM setting
+        local_pool = False
+        if self.param_dct['core_number'] > 1:
+            if hunter_pool is None:
+                hunter_pool = HunterPool(core_num)
+                local_pool = True
+            if isinstance(spectra_dct, SpectraStore):
+                spectra_dct.share()
+                dda_index = spectra_dct.dda_index
+            else:
+                dda_index = None
+            if not isinstance(dda_index, DDAIndex):
+                dda_index = DDAIndex(scan_info_df)
+            # the tables are sent once to each worker, the tasks only carry the spectra handle and group keys
+            hunter_pool.set_static({'scan_info_df': scan_info_df, 'lpp_info_groups': lpp_info_groups,
+                                    'dda_index': dda_index})
 
-        part_tot = len(sub_pl_group_lst)
-        part_counter = 1
-        # opt_sub_pl_group_lst = []
         pr_info_results_lst = []
-        for sub_idx_lst in sub_pl_group_lst:
-
-            if isinstance(sub_idx_lst, tuple) or isinstance(sub_idx_lst, list):
-                sub_idx_lst = [x for x in sub_idx_lst if x is not None]
-                # opt_sub_pl_group_lst.append(sub_idx_lst)
-                # sub_dct = spectra_dct.loc[sub_idx_lst, :, :]
-                sub_dct = {k: spectra_dct[k] for k in sub_idx_lst if k in spectra_dct}
-                # print(sub_dct.items)
-
-                # Start multiprocessing
-                if part_tot == 1:
-                    print('[STATUS] >>> Start multiprocessing for precursor matching ==> Number of Cores: %i'
-                          % core_num)
-                else:
-                    print('[STATUS] >>> Start multiprocessing for precursor matching '
-                          '==> Part %i / %i --> Number of Cores: %i' %
-                          (part_counter, part_tot, core_num))
-
-                if self.param_dct['core_number'] > 1:
-                    if self.os_typ == 'windows':
-                        parallel_pool = Pool(core_num)
-
-                        core_worker_count = 1
-                        for core_list in core_key_list:
-                            if isinstance(core_list, tuple) or isinstance(core_list, list):
-                                if None in core_list:
-                                    core_list = [x for x in core_list if x is not None]
-                                else:
-                                    pass
-                                print('[STATUS] >>> Core #%i ==> processing ......' % core_worker_count)
-                                pr_info_result = parallel_pool.apply_async(find_pr_info, args=(scan_info_df,
-                                                                                               sub_dct,
-                                                                                               lpp_info_groups,
-                                                                                               core_list, ms1_th,
-                                                                                               ms1_ppm, ms1_max,
-                                                                                               core_worker_count,
-                                                                                               self.os_typ))
-                                core_worker_count += 1
-                                pr_info_results_lst.append(pr_info_result)
-                        del core_list
-                        parallel_pool.close()
-                        parallel_pool.join()
-                    else:
-                        jobs = []
-                        queue = multiprocessing.Queue()
-                        core_worker_count = 1
-                        for core_list in core_key_list:
-                            if isinstance(core_list, tuple) or isinstance(core_list, list):
-                                if None in core_list:
-                                    core_list = [x for x in core_list if x is not None]
-                                else:
-                                    pass
-                                print('[STATUS] >>> Core #%i ==> processing ......' % core_worker_count)
-                                job = multiprocessing.Process(target=find_pr_info, args=(scan_info_df, sub_dct,
-                                                                                         lpp_info_groups, core_list,
-                                                                                         ms1_th, ms1_ppm, ms1_max,
-                                                                                         core_worker_count,
-                                                                                         self.os_typ, queue,))
-                                core_worker_count += 1
-                                jobs.append(job)
-                                job.start()
-                                pr_info_results_lst.append(queue.get())
-                        del core_list
-                        for j in jobs:
-                            j.join()
+        if self.param_dct['core_number'] > 1:
+            print('[STATUS] >>> Start multiprocessing for precursor matching ==> Number of Cores: %i' % core_num)
+            task_kwargs_lst = []
+            for core_worker_count, core_list in enumerate(core_key_list, start=1):
+                task_kwargs_lst.append({'spectra_pl': spectra_dct, 'sub_group_list': core_list,
+                                        'ms1_th': ms1_th, 'ms1_ppm': ms1_ppm, 'ms1_max': ms1_max,
+                                        'core': core_worker_count})
+            print('[STATUS] >>> %i tasks submitted ......' % len(task_kwargs_lst))
+            pr_info_results_lst.extend(hunter_pool.submit_all(find_pr_info, task_kwargs_lst, cost_lst=core_cost_lst,
+                                                              static_key_lst=['scan_info_df', 'lpp_info_groups',
+                                                                              'dda_index']))
 
-                else:
-                    print('[INFO] --> Using single core mode...')
-                    core_worker_count = 1
-                    for core_list in core_key_list:
-                        if isinstance(core_list, tuple) or isinstance(core_list, list):
-                            if None in core_list:
-                                core_list = [x for x in core_list if x is not None]
-                            else:
-                                pass
-                            print('[STATUS] >>> processing ......Part: %i subset: %i '
-                                  % (part_counter, core_worker_count))
-                            sub_df = find_pr_info(scan_info_df, sub_dct, lpp_info_groups, core_list, ms1_th,
-                                                  ms1_ppm, ms1_max, core_worker_count)
-                            if not sub_df.empty:
-                                pr_info_results_lst.append(sub_df)
-                    del core_list
-                part_counter += 1
+        else:
+            print('[INFO] --> Using single core mode...')
+            for core_worker_count, core_list in enumerate(core_key_list, start=1):
+                if isinstance(core_list, tuple) or isinstance(core_list, list):
+                    if None in core_list:
+                        core_list = [x for x in core_list if x is not None]
+                    print('[STATUS] >>> processing ......subset: %i ' % core_worker_count)
+                    sub_df = find_pr_info(scan_info_df, spectra_dct, lpp_info_groups, core_list, ms1_th, ms1_ppm,
+                                          ms1_max, core_worker_count)
+                    if not sub_df.empty:
+                        pr_info_results_lst.append(sub_df)
         del core_key_list
         del lpp_info_groups
         #  Merge multiprocessing results
-        result_counter = 0
-        result_part_counter = 1
         for pr_info_result in pr_info_results_lst:
             if self.param_dct['core_number'] > 1:
-                if self.os_typ == 'windows':
-                    try:
-                        sub_df = pr_info_result.get()
-                        if not sub_df.empty:
-                            ms1_obs_pr_df = ms1_obs_pr_df.append(sub_df, sort=False)
-                    except (KeyError, SystemError, ValueError, TypeError):
-                        pass
-                else:
-                    try:
-                        if not pr_info_result.empty:
-                            ms1_obs_pr_df = ms1_obs_pr_df.append(pr_info_result, sort=False)
-                    except (KeyError, SystemError, ValueError, TypeError):
-                        pass
+                try:
+                    sub_df = pr_info_result.get()
+                    if not sub_df.empty:
+                        ms1_obs_pr_df = ms1_obs_pr_df.append(sub_df, sort=False)
+                except (KeyError, SystemError, ValueError, TypeError):
+                    pass
             else:
                 if not pr_info_result.empty:
                     ms1_obs_pr_df = ms1_obs_pr_df.append(pr_info_result, sort=False)
+        print('[STATUS] >>> Multiprocessing results merged ...')
 
-            result_counter += 1
-            if result_counter > core_num * result_part_counter:
-                result_part_counter += 1
-
-            if part_tot == 1:
-                print('[STATUS] >>> Multiprocessing results merged ...')
-            else:
-                print('[STATUS] >>> Multiprocessing results merged ... Part %i / %i ...'
-                      % (result_part_counter, part_tot))
-
+        if local_pool:
+            hunter_pool.close()
         # End multiprocessing
 
         # print('ms1_obs_pr_df.shape', ms1_obs_pr_df.shape)
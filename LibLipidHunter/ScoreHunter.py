@@ -20,393 +20,510 @@
 import os
 import re
 
+import numpy as np
 import pandas as pd
 
-from LibLipidHunter.IsotopeHunter import IsotopeHunter
-from LibLipidHunter.AbbrElemCalc import ElemCalc
+from LibLipidHunter.IsotopeHunter import ISOTOPE_HUNTER
+from LibLipidHunter.AbbrElemCalc import ELEM_CALC, calc_exactmass, get_elem_info
+from LibLipidHunter.ParallelFunc import get_query_bounds
 from LibLipidHunter.PanelPlotter import plot_spectra
 from LibLipidHunter.PanelPlotter import gen_plot
 
 
+# key fragment tables of key_frag_dct and the keys in specific_ion_dct, NL windows depend on the precursor m/z
+KEY_FRAG_TYPE_LST = [('target_frag_df', 'TARGET_FRAG', False), ('target_nl_df', 'TARGET_NL', True),
+                     ('other_frag_df', 'OTHER_FRAG', False), ('other_nl_df', 'OTHER_NL', True)]
+
+
+def compile_key_frag(key_frag_dct, ms2_ppm=100):
+    """
+    Convert the key fragment tables of one charge mode into arrays. The m/z windows of the fragments are fixed
+    for the run, the neutral loss windows are calculated for each precursor m/z by get_specific_peaks.
+
+    Args:
+        key_frag_dct (dict): the key fragment tables target_frag_df, target_nl_df, other_frag_df and other_nl_df
+        ms2_ppm (int): the MS/MS ppm of the run
+
+    Returns:
+        key_frag_dct (dict): a copy of key_frag_dct with the arrays of each table in 'compiled_dct' and 'ms2_ppm'
+
+    """
+
+    ms2_precision = ms2_ppm * 0.000001
+    compiled_dct = {}
+    for _frag_df_key, _ion_key, _is_nl in KEY_FRAG_TYPE_LST:
+        _frag_df = key_frag_dct.get(_frag_df_key, pd.DataFrame())
+        if _frag_df.empty:
+            continue
+        _mass_arr = _frag_df['EXACTMASS'].values.astype(np.float64)
+        _compiled_dct = {'EXACTMASS': _mass_arr, 'CLASS': _frag_df['CLASS'].values,
+                         'LABEL': _frag_df['LABEL'].values, 'IS_NL': _is_nl}
+        if not _is_nl:
+            _mz_low, _mz_high = get_query_bounds(_mass_arr * (1 - ms2_precision), _mass_arr * (1 + ms2_precision),
+                                                 dtype=np.float64)
+            _compiled_dct['MZ_LOW'], _compiled_dct['MZ_HIGH'] = _mz_low, _mz_high
+        compiled_dct[_ion_key] = _compiled_dct
+
+    key_frag_dct = dict(key_frag_dct)
+    key_frag_dct['compiled_dct'] = compiled_dct
+    key_frag_dct['ms2_ppm'] = ms2_ppm
+
+    return key_frag_dct
+
+
 def get_specific_peaks(key_frag_dct, mz_lib, ms2_df, ms2_ppm=100, vendor='waters', exp_mode='LC-MS'):
-    ms2_max_i = ms2_df['i'].max()
+    """
+    Find the most intense peak in the m/z window of each class specific fragment and neutral loss.
+    All windows are matched against the m/z sorted peaks by np.searchsorted.
+
+    Args:
+        key_frag_dct (dict): the key fragment tables, compiled by compile_key_frag if not done for this ms2_ppm
+        mz_lib (float): the m/z of the precursor used for the neutral losses
+        ms2_df (pd.DataFrame): the MS/MS spectrum with columns mz and i
+        ms2_ppm (int): the MS/MS ppm
+        vendor (str): the vendor of the instrument
+        exp_mode (str): the experiment mode
+
+    Returns:
+        specific_ion_dct (dict): the found peaks of TARGET_FRAG, TARGET_NL, OTHER_FRAG and OTHER_NL
+
+    """
+
+    if key_frag_dct.get('ms2_ppm', None) != ms2_ppm or 'compiled_dct' not in key_frag_dct:
+        key_frag_dct = compile_key_frag(key_frag_dct, ms2_ppm=ms2_ppm)
     ms2_precision = ms2_ppm * 0.000001
-    target_frag_df = key_frag_dct['target_frag_df']
-    target_nl_df = key_frag_dct['target_nl_df']
-    other_frag_df = key_frag_dct['other_frag_df']
-    other_nl_df = key_frag_dct['other_nl_df']
-
-    _target_frag_df = pd.DataFrame()
-    _target_nl_df = pd.DataFrame()
-    _other_frag_df = pd.DataFrame()
-    _other_nl_df = pd.DataFrame()
-
-    for _i, _frag_se in target_frag_df.iterrows():
-
-        _frag_mz = _frag_se['EXACTMASS']
-        _frag_class = _frag_se['CLASS']
-        _frag_label = _frag_se['LABEL']
-        _frag_mz_query_code = '%f <= mz <= %f' % (_frag_mz * (1 - ms2_precision), _frag_mz * (1 + ms2_precision))
-
-        _frag_df = ms2_df.query(_frag_mz_query_code)
-
-        if not _frag_df.empty:
-            _frag_df = _frag_df.sort_values(by='i', ascending=False)
-            _frag_df.loc[:, 'CLASS'] = _frag_class
-            _frag_df.loc[:, 'LABEL'] = _frag_label
-            _frag_df.loc[:, _frag_label] = 100 * _frag_df['i'] / ms2_max_i
-            _target_frag_df = _target_frag_df.append(_frag_df.head(1))
-
-    if not other_frag_df.empty:
-        for _i, _frag_se in other_frag_df.iterrows():
-
-            _frag_mz = _frag_se['EXACTMASS']
-            _frag_class = _frag_se['CLASS']
-            _frag_label = _frag_se['LABEL']
-            _frag_mz_query_code = '%f <= mz <= %f' % (_frag_mz * (1 - ms2_precision), _frag_mz * (1 + ms2_precision))
-
-            _frag_df = ms2_df.query(_frag_mz_query_code)
-
-            if not _frag_df.empty:
-                _frag_df = _frag_df.sort_values(by='i', ascending=False)
-                _frag_df.loc[:, 'CLASS'] = _frag_class
-                _frag_df.loc[:, 'LABEL'] = _frag_label
-                _frag_df.loc[:, _frag_label] = 100 * _frag_df['i'] / ms2_max_i
-                _other_frag_df = _other_frag_df.append(_frag_df.head(1))
-
-    for _i, _nl_se in target_nl_df.iterrows():
-
-        _nl_mz = _nl_se['EXACTMASS']
-        _nl_class = _nl_se['CLASS']
-        _nl_label = _nl_se['LABEL']
-        _nl_mz_query_code = '%f <= mz <= %f' % ((mz_lib - _nl_mz) * (1 - ms2_precision),
-                                                (mz_lib - _nl_mz) * (1 + ms2_precision))
-
-        _nl_df = ms2_df.query(_nl_mz_query_code)
-
-        if not _nl_df.empty:
-            _nl_df = _nl_df.sort_values(by='i', ascending=False)
-            _nl_df.loc[:, 'CLASS'] = _nl_class
-            _nl_df.loc[:, 'LABEL'] = _nl_label
-            _nl_df.loc[:, _nl_label] = 100 * _nl_df['i'] / ms2_max_i
-            _target_nl_df = _target_nl_df.append(_nl_df.head(1))
-
-    for _i, _nl_se in other_nl_df.iterrows():
-
-        _nl_mz = _nl_se['EXACTMASS']
-        _nl_class = _nl_se['CLASS']
-        _nl_label = _nl_se['LABEL']
-        _nl_mz_query_code = '%f <= mz <= %f' % ((mz_lib - _nl_mz) * (1 - ms2_precision),
-                                                (mz_lib - _nl_mz) * (1 + ms2_precision))
-        _nl_df = ms2_df.query(_nl_mz_query_code)
-
-        if not _nl_df.empty:
-            _nl_df = _nl_df.sort_values(by='i', ascending=False)
-            _nl_df.loc[:, 'CLASS'] = _nl_class
-            _nl_df.loc[:, 'LABEL'] = _nl_label
-            _nl_df.loc[:, _nl_label] = 100 * _nl_df['i'] / ms2_max_i
-            _other_nl_df = _other_nl_df.append(_nl_df.head(1))
 
     specific_ion_dct = {}
-    if not _target_frag_df.empty:
-        specific_ion_dct['TARGET_FRAG'] = _target_frag_df
-    if not _target_nl_df.empty:
-        specific_ion_dct['TARGET_NL'] = _target_nl_df
-    if not _other_frag_df.empty:
-        specific_ion_dct['OTHER_FRAG'] = _other_frag_df
-    if not _other_nl_df.empty:
-        specific_ion_dct['OTHER_NL'] = _other_nl_df
+    if ms2_df.empty:
+        return specific_ion_dct
+
+    ms2_max_i = ms2_df['i'].max()
+    mz_arr = ms2_df['mz'].values
+    i_arr = ms2_df['i'].values
+    mz_order_arr = np.argsort(mz_arr, kind='mergesort')
+    sorted_mz_arr = mz_arr[mz_order_arr]
+
+    for _frag_df_key, _ion_key, _is_nl in KEY_FRAG_TYPE_LST:
+        if _ion_key not in key_frag_dct['compiled_dct']:
+            continue
+        _compiled_dct = key_frag_dct['compiled_dct'][_ion_key]
+        if _is_nl:
+            _nl_mz_arr = mz_lib - _compiled_dct['EXACTMASS']
+            _low_arr, _high_arr = get_query_bounds(_nl_mz_arr * (1 - ms2_precision),
+                                                   _nl_mz_arr * (1 + ms2_precision), dtype=mz_arr.dtype)
+        else:
+            _low_arr = _compiled_dct['MZ_LOW'].astype(mz_arr.dtype)
+            _high_arr = _compiled_dct['MZ_HIGH'].astype(mz_arr.dtype)
+
+        _start_arr = np.searchsorted(sorted_mz_arr, _low_arr, side='left')
+        _count_arr = np.maximum(np.searchsorted(sorted_mz_arr, _high_arr, side='right') - _start_arr, 0)
+        _match_count = _count_arr.sum()
+        if _match_count == 0:
+            continue
+
+        # the most intense peak of each window, the first one in ms2_df if the intensity is the same
+        _offset_arr = np.arange(_match_count) - np.repeat(np.cumsum(_count_arr) - _count_arr, _count_arr)
+        _window_arr = np.repeat(np.arange(len(_count_arr)), _count_arr)
+        _peak_pos_arr = mz_order_arr[np.repeat(_start_arr, _count_arr) + _offset_arr]
+        _best_order_arr = np.lexsort((_peak_pos_arr, -i_arr[_peak_pos_arr], _window_arr))
+        _first_idx_arr = np.unique(_window_arr[_best_order_arr], return_index=True)[1]
+        _best_idx_arr = _best_order_arr[_first_idx_arr]
+        _found_window_arr = _window_arr[_best_idx_arr]
+        _found_pos_arr = _peak_pos_arr[_best_idx_arr]
+
+        _found_df = ms2_df.iloc[_found_pos_arr].copy()
+        _label_arr = _compiled_dct['LABEL'][_found_window_arr]
+        _found_df['CLASS'] = _compiled_dct['CLASS'][_found_window_arr]
+        _found_df['LABEL'] = _label_arr
+        _i_r_arr = (100 * i_arr[_found_pos_arr] / ms2_max_i).astype(np.float64)
+        # one relative intensity column per label, NaN for the peaks of the other labels
+        for _label in pd.unique(_label_arr):
+            _found_df[_label] = np.where(_label_arr == _label, _i_r_arr, np.nan)
+        specific_ion_dct[_ion_key] = _found_df
 
     return specific_ion_dct
 
 
 def get_all_fa_nl(fa_df, ms2_df, peak_type_lst, lipid_type='LPL'):
+    """
+    Match the fragments of all FA (or residues for TG) against one MS/MS spectrum.
+    The m/z windows of all rows and peak types are taken from the columns <peak_type>_MZ_LOW and
+    <peak_type>_MZ_HIGH and matched against the m/z sorted peaks by np.searchsorted.
+
+    !! IMPORTANT HERE !!
+    TG use lite_info_df for get_all_fa_nl, peak_typ with FA1/FA2/FA3 e.g. ['[M-(FA1)+H]+', '[M-(FA2)+H]+']
+    PL use fa_df for get_all_fa_nl, peak_typ with NO FA assignment e.g. ['[FA-H]-', '[LPE-H]-', '[LPE-H2O-H]-']
+
+    Args:
+        fa_df (pd.DataFrame): the FA table from LipidComposer.calc_fa_query or the lipid master table for TG
+        ms2_df (pd.DataFrame): the MS/MS spectrum with columns mz and i
+        peak_type_lst (list): the peak types to search
+        lipid_type (str): the lipid class
+
+    Returns:
+        obs_peaks_df (pd.DataFrame): the most intense peak of each obs_abbr, top 10 ranked by intensity
+
+    """
+
     dg_fa_rgx = re.compile(r'\[M-\(*(FA\d{1,2}:\d)')
     # \[M\-(?:(FA\d{1,2}\:\d)|\((FA\d{1,2}\:\d).*\))\+(?:H|Na)\]\+    More strict regular expression
     obs_peaks_df = pd.DataFrame()
     bp_i = ms2_df['i'].max()
 
-    for _idx, _fa_se in fa_df.iterrows():
-        for peak_typ in peak_type_lst:
-
-            # !! IMPORTANT HERE !!
-            # TG use lite_info_df for get_all_fa_nl
-            # PL use fa_df for get_all_fa_nl
-
-            # default peak_typ for TG is with FA1/FA2/FA3
-            # e.g. ['[M-(FA1)+H]+', '[M-(FA2)+H]+', '[M-(FA3)+H]+']
-            # default peak_typ for PL is with NO FA assignment
-            # e.g. ['[FA-H]-', '[LPE-H]-', '[LPE-H2O-H]-']
-
-            _q_str = _fa_se['%s_Q' % peak_typ]
-            _q_tmp_df = ms2_df.query(_q_str).copy()
-            # _q_tmp_df.is_copy = False
-            if not _q_tmp_df.empty:
-                _q_tmp_df.loc[:, 'lib_mz'] = _fa_se['%s_MZ' % peak_typ]
-                _q_tmp_df.loc[:, 'obs_mz'] = _q_tmp_df['mz']
-                _q_tmp_df.loc[:, 'obs_i_r'] = 100 * _q_tmp_df['i'] / bp_i
-                _q_tmp_df.loc[:, 'obs_ppm'] = 1e6 * (_q_tmp_df['mz'] - _q_tmp_df['lib_mz']) / _q_tmp_df['lib_mz']
-                _q_tmp_df.loc[:, 'obs_ppm'] = _q_tmp_df['obs_ppm'].astype(int)
-                _q_tmp_df.loc[:, 'obs_ppm_abs'] = _q_tmp_df['obs_ppm'].abs()
-                _q_tmp_df.loc[:, 'obs_abbr'] = _fa_se['%s_ABBR' % peak_typ]
-                _q_tmp_df.loc[:, 'obs_type'] = peak_typ
-                _q_tmp_df.loc[:, 'obs_label'] = _q_tmp_df['obs_mz']
-                _q_tmp_df = _q_tmp_df.round({'obs_mz': 4, 'obs_i_r': 1, 'obs_label': 2})
-                _q_tmp_df.loc[:, 'obs_label'] = _q_tmp_df['obs_label'].astype(str)
-                if lipid_type in ['TG'] and re.match(dg_fa_rgx, _fa_se['%s_ABBR' % peak_typ]):
-                    _fa_abbr_match = re.match(dg_fa_rgx, _fa_se['%s_ABBR' % peak_typ])
-                    _fa_abbr_lst = _fa_abbr_match.groups()
-                    _q_tmp_df.loc[:, 'fa_abbr'] = _fa_abbr_lst[0]
-                else:
-                    _q_tmp_df.loc[:, 'fa_abbr'] = _idx
-
-                obs_peaks_df = obs_peaks_df.append(_q_tmp_df)
+    if fa_df.empty or ms2_df.empty:
+        return obs_peaks_df
 
-    if not obs_peaks_df.empty:
-        obs_peaks_df.sort_values(by=['obs_abbr', 'i', 'obs_ppm_abs'], ascending=[False, False, True], inplace=True)
-        obs_peaks_df.drop_duplicates(subset=['obs_abbr'], keep='first', inplace=True)
-        obs_peaks_df.sort_values(by=['i', 'obs_ppm_abs'], ascending=[False, True], inplace=True)
-        obs_peaks_df.reset_index(inplace=True, drop=True)
-        obs_peaks_df['obs_rank'] = obs_peaks_df.index + 1
-        return obs_peaks_df.head(10)
-    else:
+    mz_arr = ms2_df['mz'].values
+    i_arr = ms2_df['i'].values
+    mz_order_arr = np.argsort(mz_arr, kind='mergesort')
+    sorted_mz_arr = mz_arr[mz_order_arr]
+
+    fa_pos_lst = []
+    typ_pos_lst = []
+    peak_pos_lst = []
+    for _typ_pos, peak_typ in enumerate(peak_type_lst):
+        # the windows are compared in the same precision as the peaks
+        _low_arr = fa_df['%s_MZ_LOW' % peak_typ].values.astype(mz_arr.dtype)
+        _high_arr = fa_df['%s_MZ_HIGH' % peak_typ].values.astype(mz_arr.dtype)
+        _start_arr = np.searchsorted(sorted_mz_arr, _low_arr, side='left')
+        _count_arr = np.maximum(np.searchsorted(sorted_mz_arr, _high_arr, side='right') - _start_arr, 0)
+        _match_count = _count_arr.sum()
+        if _match_count > 0:
+            _offset_arr = np.arange(_match_count) - np.repeat(np.cumsum(_count_arr) - _count_arr, _count_arr)
+            fa_pos_lst.append(np.repeat(np.arange(fa_df.shape[0]), _count_arr))
+            typ_pos_lst.append(np.full(_match_count, _typ_pos))
+            peak_pos_lst.append(mz_order_arr[np.repeat(_start_arr, _count_arr) + _offset_arr])
+
+    if not peak_pos_lst:
         # no identification
         return obs_peaks_df
 
+    fa_pos_arr = np.concatenate(fa_pos_lst)
+    typ_pos_arr = np.concatenate(typ_pos_lst)
+    peak_pos_arr = np.concatenate(peak_pos_lst)
+    # same order as matching FA by FA and peak type by peak type
+    match_order_arr = np.lexsort((peak_pos_arr, typ_pos_arr, fa_pos_arr))
+    fa_pos_arr = fa_pos_arr[match_order_arr]
+    typ_pos_arr = typ_pos_arr[match_order_arr]
+    peak_pos_arr = peak_pos_arr[match_order_arr]
+
+    lib_mz_arr = np.zeros(len(peak_pos_arr))
+    abbr_arr = np.empty(len(peak_pos_arr), dtype=object)
+    for _typ_pos, peak_typ in enumerate(peak_type_lst):
+        _typ_idx_arr = np.where(typ_pos_arr == _typ_pos)[0]
+        if len(_typ_idx_arr) > 0:
+            lib_mz_arr[_typ_idx_arr] = fa_df['%s_MZ' % peak_typ].values[fa_pos_arr[_typ_idx_arr]]
+            abbr_arr[_typ_idx_arr] = fa_df['%s_ABBR' % peak_typ].values[fa_pos_arr[_typ_idx_arr]]
+    obs_i_arr = i_arr[peak_pos_arr]
+    ppm_abs_arr = np.abs((1e6 * (mz_arr[peak_pos_arr] - lib_mz_arr) / lib_mz_arr).astype(int))
+
+    # keep the most intense peak with lowest ppm of each obs_abbr, then rank by intensity
+    abbr_code_arr = np.unique(abbr_arr, return_inverse=True)[1]
+    best_order_arr = np.lexsort((np.arange(len(peak_pos_arr)), ppm_abs_arr, -obs_i_arr, -abbr_code_arr))
+    first_idx_arr = np.unique(abbr_code_arr[best_order_arr], return_index=True)[1]
+    best_idx_arr = best_order_arr[np.sort(first_idx_arr)]
+    rank_order_arr = np.lexsort((np.arange(len(best_idx_arr)), ppm_abs_arr[best_idx_arr], -obs_i_arr[best_idx_arr]))
+    top_idx_arr = best_idx_arr[rank_order_arr][:10]
+
+    obs_peaks_df = ms2_df.iloc[peak_pos_arr[top_idx_arr]].copy()
+    obs_peaks_df.loc[:, 'lib_mz'] = lib_mz_arr[top_idx_arr]
+    obs_peaks_df.loc[:, 'obs_mz'] = obs_peaks_df['mz']
+    obs_peaks_df['obs_i_r'] = 100 * obs_peaks_df['i'] / bp_i
+    obs_peaks_df.loc[:, 'obs_ppm'] = 1e6 * (obs_peaks_df['mz'] - obs_peaks_df['lib_mz']) / obs_peaks_df['lib_mz']
+    obs_peaks_df.loc[:, 'obs_ppm'] = obs_peaks_df['obs_ppm'].astype(int)
+    obs_peaks_df.loc[:, 'obs_ppm_abs'] = obs_peaks_df['obs_ppm'].abs()
+    obs_peaks_df.loc[:, 'obs_abbr'] = abbr_arr[top_idx_arr]
+    obs_peaks_df.loc[:, 'obs_type'] = [peak_type_lst[_typ_pos] for _typ_pos in typ_pos_arr[top_idx_arr]]
+    obs_peaks_df.loc[:, 'obs_label'] = obs_peaks_df['obs_mz']
+    obs_peaks_df = obs_peaks_df.round({'obs_mz': 4, 'obs_i_r': 1, 'obs_label': 2})
+    obs_peaks_df.loc[:, 'obs_label'] = obs_peaks_df['obs_label'].astype(str)
+    # rounded in the precision of the peaks, then always kept as float64
+    obs_peaks_df['obs_i_r'] = obs_peaks_df['obs_i_r'].astype(np.float64)
+    # the FA of the DG like fragments of TG, or the index of the FA table
+    fa_idx_arr = fa_df.index.values[fa_pos_arr]
+    fa_abbr_lst = []
+    for _idx in top_idx_arr:
+        _dg_fa_match = re.match(dg_fa_rgx, abbr_arr[_idx]) if lipid_type in ['TG'] else None
+        if _dg_fa_match:
+            fa_abbr_lst.append(_dg_fa_match.groups()[0])
+        else:
+            fa_abbr_lst.append(fa_idx_arr[_idx])
+    obs_peaks_df.loc[:, 'fa_abbr'] = fa_abbr_lst
+    obs_peaks_df.reset_index(inplace=True, drop=True)
+    obs_peaks_df['obs_rank'] = obs_peaks_df.index + 1
 
-def prep_rankscore(obs_dct, origin_info_df, sliced_info_df, weight_dct, lipid_class='DG'):
-    ident_obs_peak_df = pd.DataFrame()
+    return obs_peaks_df
 
-    for _idx, _lite_se in sliced_info_df.iterrows():
 
-        _lipid_abbr = _lite_se['DISCRETE_ABBR']
-        _rank_score = 0.0
+def get_spec_fa_nl(fa_df, ms2_df, peak_type_lst, lipid_type, spec_idx, fa_nl_cache_dct=None):
+    """
+    Get the FA and lyso fragments of one MS/MS spectrum by get_all_fa_nl, the result is saved in fa_nl_cache_dct.
+    The matches only depend on the spectrum and the FA table of the run, all bulk and discrete candidates of the
+    same MS/MS scan use the same result.
 
-        # check if FA contribute to multiple sn --> i needs to be divided accordingly
-        _ident_fa_abbr_lst = []
-        _ident_peak_count = 0
-        _sum_fa_abbr_lst = []
-        _sum_fa_abbr_dct = {}
-        unique_fa_abbr_dct = {}
-        fa_multi_dct = {}  # store multiple FA
+    Args:
+        fa_df (pd.DataFrame): the FA table from LipidComposer.calc_fa_query, must be the same for the whole cache
+        ms2_df (pd.DataFrame): the filtered MS/MS spectrum of spec_idx with columns mz and i
+        peak_type_lst (list): the peak types to search
+        lipid_type (str): the lipid class
+        spec_idx (int): the spec_index of the MS/MS spectrum
+        fa_nl_cache_dct (dict): {(spec_idx, peak types): obs_peaks_df}, no cache is used if not set
 
-        if lipid_class in ['TG']:
-            _fa1_abbr = _lite_se['FA1_ABBR']
-            _fa2_abbr = _lite_se['FA2_ABBR']
-            _fa3_abbr = _lite_se['FA3_ABBR']
-
-            _sum_fa_abbr_lst.append(_fa1_abbr)
-            _sum_fa_abbr_lst.append(_fa2_abbr)
-            _sum_fa_abbr_lst.append(_fa3_abbr)
-            _sum_fa_abbr_dct['FA1'] = _fa1_abbr
-            _sum_fa_abbr_dct['FA2'] = _fa2_abbr
-            _sum_fa_abbr_dct['FA3'] = _fa3_abbr
-            _fa_sn_lst = ['FA1', 'FA2', 'FA3']
-            _unique_fa_abbr_lst = list(set(_sum_fa_abbr_lst))
-
-        elif lipid_class in ['PA', 'PC', 'PE', 'PG', 'PS', 'PI', 'PIP', 'DG']:
-            _fa1_abbr = _lite_se['FA1_ABBR']
-            _fa2_abbr = _lite_se['FA2_ABBR']
-
-            _sum_fa_abbr_lst.append(_fa1_abbr)
-            _sum_fa_abbr_lst.append(_fa2_abbr)
-            _sum_fa_abbr_dct['FA1'] = _fa1_abbr
-            _sum_fa_abbr_dct['FA2'] = _fa2_abbr
-            _fa_sn_lst = ['FA1', 'FA2']
-            _unique_fa_abbr_lst = list(set(_sum_fa_abbr_lst))
-
-        elif lipid_class in ['LPA', 'LPC', 'LPE', 'LPG', 'LPS', 'LPI', 'LPIP', 'LPS']:
-
-            _fa1_abbr = _lite_se['FA1_ABBR']
-
-            if _fa1_abbr in ['H2O', '0:0']:
-                try:
-                    _fa2_abbr = _lite_se['FA2_ABBR']
-                    _fa1_abbr, _fa2_abbr = _fa2_abbr, _fa1_abbr
-                except Exception as _e:
-                    print(_e)
+    Returns:
+        obs_peaks_df (pd.DataFrame): a copy of the cached result that can be modified by the caller
 
-            _sum_fa_abbr_lst.append(_fa1_abbr)
-            _sum_fa_abbr_dct['FA1'] = _fa1_abbr
-            _fa_sn_lst = ['FA1']
-            _unique_fa_abbr_lst = list(set(_sum_fa_abbr_lst))
+    """
 
-        else:
-            _fa1_abbr = _lite_se['FA1_ABBR']
-            _fa2_abbr = _lite_se['FA2_ABBR']
+    if fa_nl_cache_dct is None:
+        return get_all_fa_nl(fa_df, ms2_df, peak_type_lst, lipid_type)
 
-            _sum_fa_abbr_lst.append(_fa1_abbr)
-            _sum_fa_abbr_lst.append(_fa2_abbr)
-            _sum_fa_abbr_dct['FA1'] = _fa1_abbr
-            _sum_fa_abbr_dct['FA2'] = _fa2_abbr
-            _fa_sn_lst = ['FA1', 'FA2']
-            _unique_fa_abbr_lst = list(set(_sum_fa_abbr_lst))
+    cache_key = (spec_idx, tuple(peak_type_lst))
+    if cache_key not in fa_nl_cache_dct:
+        fa_nl_cache_dct[cache_key] = get_all_fa_nl(fa_df, ms2_df, peak_type_lst, lipid_type)
 
-        for _fa_abbr in _unique_fa_abbr_lst:
+    return fa_nl_cache_dct[cache_key].copy()
 
-            _fa_count = _sum_fa_abbr_lst.count(_fa_abbr)
-            _fa_abbr_sn_lst = []
 
-            for _fa_sn in _fa_sn_lst:
-                if _sum_fa_abbr_dct[_fa_sn] == _fa_abbr:
-                    _fa_abbr_sn_lst.append(_fa_sn)
-            if _fa_count > 1:
-                fa_multi_dct[_fa_abbr] = _fa_count
+def rank_obs_peaks(i_arr, ppm_abs_arr, match_arr, div_arr, order_arr):
+    """
+    Rank the observed peaks of one fragment type for many candidates at once.
+    For each candidate the first matched peak in the current order is divided by the number of sn positions of the
+    FA, then the peaks are sorted by intensity (descending) and abs ppm, ties keep the current order of the candidate.
 
-            unique_fa_abbr_dct[_fa_abbr] = sorted(_fa_abbr_sn_lst)
+    Args:
+        i_arr (np.ndarray): intensity of the n observed peaks
+        ppm_abs_arr (np.ndarray): abs ppm of the n observed peaks
+        match_arr (np.ndarray): bool array of L candidates x n peaks, the peaks of the FA of each candidate
+        div_arr (np.ndarray): the number of sn positions of the FA of each candidate, 1 for FA at one sn
+        order_arr (np.ndarray): L x n peak positions, the current order of the peaks of each candidate
 
-        fa_multi_lst = list(fa_multi_dct.keys())
-        unique_fa_abbr_lst = list(unique_fa_abbr_dct.keys())
+    Returns:
+        order_arr (np.ndarray): L x n peak positions, the new order of the peaks of each candidate
+        i_mod_arr (np.ndarray): L x n intensities after the division
+        div_peak_arr (np.ndarray): the position of the divided peak of each candidate
 
-        for obs_typ in list(obs_dct.keys()):
-            obs_df = obs_dct[obs_typ][0]
-            obs_site_dct = obs_dct[obs_typ][1]
-            if not obs_df.empty:
-                post_obs_df = pd.DataFrame(obs_df.copy())
-                # post_obs_df.is_copy = False
-            else:
-                post_obs_df = pd.DataFrame()
+    """
 
-            fa_to_site_dct = {}
-            for _obs_site in list(obs_site_dct.keys()):
-                # _obs_abbr = _lite_se['%s_ABBR' % obs_site_dct[_obs_site]]
-                _fa_abbr = _lite_se['%s_ABBR' % _obs_site]
+    cand_count, peak_count = match_arr.shape
+    cand_arr = np.arange(cand_count)
+    # same as DataFrame.at set of the divided value to the column of i
+    div_peak_arr = order_arr[cand_arr, np.argmax(np.take_along_axis(match_arr, order_arr, axis=1), axis=1)]
+    i_mod_arr = np.repeat(i_arr[np.newaxis, :], cand_count, axis=0)
+    i_mod_arr[cand_arr, div_peak_arr] = (i_arr[div_peak_arr].astype(np.float64) / div_arr).astype(i_arr.dtype)
 
-                if _fa_abbr not in list(fa_to_site_dct.keys()):
-                    fa_to_site_dct[_fa_abbr] = [obs_site_dct[_obs_site]]
-                else:
-                    _tmp_site_lst = fa_to_site_dct[_fa_abbr]
-                    _tmp_site_lst.append(obs_site_dct[_obs_site])
-                    fa_to_site_dct[_fa_abbr] = _tmp_site_lst
-
-            # !! IMPORTANT HERE !!
-            if lipid_class in ['TG', 'DG']:
-                # default obs_type in post_obs_df for TG is with FA1/FA2/FA3
-                # e.g. ['[M-(FA1)+H]+', '[M-(FA2)+H]+', '[M-(FA3)+H]+']
-                # TG use lite_info_df for get_all_fa_nl
-                post_obs_df['obs_type_calc'] = obs_typ
-            else:
-                # default obs_type in post_obs_df for PL is with NO FA assignment
-                # e.g. ['[FA-H]-', '[LPE-H]-', '[LPE-H2O-H]-']
-                # PL use fa_df for get_all_fa_nl
+    # stable sort of all candidates in one step, the candidate is the primary key
+    flat_peak_arr = order_arr.ravel()
+    flat_cand_arr = np.repeat(cand_arr, peak_count)
+    sort_arr = np.lexsort((np.tile(np.arange(peak_count), cand_count), ppm_abs_arr[flat_peak_arr],
+                           -i_mod_arr[flat_cand_arr, flat_peak_arr], flat_cand_arr))
+    order_arr = flat_peak_arr[sort_arr].reshape(cand_count, peak_count)
 
-                if not post_obs_df.empty:
-                    if 'obs_type' in post_obs_df.columns.values.tolist():
-                        post_obs_df['obs_type_calc'] = post_obs_df['obs_type']
-                    else:
-                        # print(obs_typ, 'post_obs_df["obs_type"].empty')
-                        break
-                else:
-                    # print(obs_typ, 'post_obs_df.empty')
-                    break
-
-            for _fa_abbr in unique_fa_abbr_lst:
-                _fa_ident = False
-                # print(_fa_abbr, list(fa_to_site_dct.keys()))
-
-                if not post_obs_df.empty and _fa_abbr in list(fa_to_site_dct.keys()):
-
-                    _pos_df = post_obs_df.query('fa_abbr == "%s" and obs_type_calc == "%s"'
-                                                % (_fa_abbr, obs_typ)).copy()
-                    # _pos_df.is_copy = False
-
-                    if not _pos_df.empty and _fa_abbr in post_obs_df['fa_abbr'].values.tolist():
-                        post_obs_df['i_mod'] = post_obs_df['i']
-                        post_obs_df['obs_i_r_mod'] = post_obs_df['obs_i_r']
-
-                        _ident_fa_abbr_lst.extend(unique_fa_abbr_dct[_fa_abbr])  # confirm identification
-                        _fa_ident = True
-
-                        if _fa_abbr in fa_multi_lst:
-                            _fa_count = fa_multi_dct[_fa_abbr]
-
-                            if _fa_count == 2:
-                                post_obs_df.at[_pos_df.index[0], 'i_mod'] = post_obs_df.loc[_pos_df.index[0], 'i'] / 2
-                                post_obs_df.at[_pos_df.index[0], 'obs_i_r_mod'] = (post_obs_df.loc[_pos_df.index[0],
-                                                                                                   'obs_i_r'] / 2)
-                            elif _fa_count == 3:
-                                post_obs_df.at[_pos_df.index[0], 'i_mod'] = post_obs_df.loc[_pos_df.index[0], 'i'] / 3
-                                post_obs_df.at[_pos_df.index[0], 'obs_i_r_mod'] = (post_obs_df.loc[_pos_df.index[0],
-                                                                                                   'obs_i_r'] / 3)
-                            else:
-                                pass
-                            # print(_fa_abbr, ' identified', _fa_count, 'times as: ', obs_typ,
-                            #       '@', fa_to_site_dct[_fa_abbr],
-                            #       'in', _lipid_abbr, '\ni:', post_obs_df.at[_pos_df.index[0], 'i'], '>>',
-                            #       'i_mod:', post_obs_df.at[_pos_df.index[0], 'i_mod'])
-                        else:
-                            pass
+    return order_arr, i_mod_arr, div_peak_arr
 
-                        post_obs_df.sort_values(by=['i_mod', 'obs_ppm_abs'], ascending=[False, True], inplace=True)
-                        post_obs_df.reset_index(inplace=True, drop=True)
-                        post_obs_df['obs_rank'] = post_obs_df.index + 1
 
-                    else:
-                        pass
-                        # print(_fa_abbr, 'Not identified as: ', obs_type)
-                else:
-                    pass
+def prep_rankscore(obs_dct, origin_info_df, sliced_info_df, weight_dct, lipid_class='DG'):
+    """
+    Calculate the rank score of all discrete structures in sliced_info_df.
+    Each FA of a structure found in the observed peaks of a fragment type adds (11 - rank) * 0.1 * weight of each
+    sn position of the FA. If the FA is at multiple sn positions, the intensity of its peak is divided by the number
+    of positions before ranking. The FA are processed in the same order for each structure as the previous row by
+    row calculation, the peaks are ranked by rank_obs_peaks for all structures at once.
+
+    Args:
+        obs_dct (dict): {fragment type: [observed peaks, {sn: weight name}]}
+        origin_info_df (pd.DataFrame): the output table of calc_rankscore with RANK_SCORE and OBS_RESIDUES
+        sliced_info_df (pd.DataFrame): the structures with at least one observed FA
+        weight_dct (dict): the weight table from the Score_weight xlsx
+        lipid_class (str): the lipid class
+
+    Returns:
+        ident_obs_peak_df (pd.DataFrame): the observed peaks used for the score of each structure
+        origin_info_df (pd.DataFrame): with the rank score and the intensity, rank and score of each fragment
+
+    """
+
+    if lipid_class in ['TG']:
+        fa_sn_lst = ['FA1', 'FA2', 'FA3']
+    elif lipid_class in ['LPA', 'LPC', 'LPE', 'LPG', 'LPS', 'LPI', 'LPIP']:
+        fa_sn_lst = ['FA1']
+    else:
+        fa_sn_lst = ['FA1', 'FA2']
+
+    lipid_count = sliced_info_df.shape[0]
+    lipid_abbr_arr = sliced_info_df['DISCRETE_ABBR'].values
+    sn_abbr_arr = sliced_info_df[['%s_ABBR' % _fa_sn for _fa_sn in fa_sn_lst]].values
+    if len(fa_sn_lst) == 1:
+        # lyso PL with the FA at sn2
+        sn_abbr_arr = sn_abbr_arr.copy()
+        for _idx in np.where(np.isin(sn_abbr_arr[:, 0], ['H2O', '0:0']))[0]:
+            try:
+                sn_abbr_arr[_idx, 0] = sliced_info_df['FA2_ABBR'].values[_idx]
+            except Exception as _e:
+                print(_e)
+
+    # the FA of each structure in the order of a set of the FA, e.g. ['18:0', '16:0'] and the sn of each FA
+    slot_count = len(fa_sn_lst)
+    slot_abbr_arr = np.full((lipid_count, slot_count), None, dtype=object)
+    slot_div_arr = np.ones((lipid_count, slot_count), dtype=np.int64)
+    slot_sn_arr = np.zeros((lipid_count, slot_count), dtype=np.int64)
+    for _idx, _sum_fa_abbr_lst in enumerate(sn_abbr_arr.tolist()):
+        for _slot, _fa_abbr in enumerate(list(set(_sum_fa_abbr_lst))):
+            slot_abbr_arr[_idx, _slot] = _fa_abbr
+            _fa_count = _sum_fa_abbr_lst.count(_fa_abbr)
+            if _fa_count in [2, 3]:
+                slot_div_arr[_idx, _slot] = _fa_count
+            slot_sn_arr[_idx, _slot] = sum([2 ** _sn for _sn, _abbr in enumerate(_sum_fa_abbr_lst)
+                                            if _abbr == _fa_abbr])
+
+    lipid_sn_arr = np.zeros(lipid_count, dtype=np.int64)
+    event_lst = []  # (lipid, type, slot, site, rank, weight, i_mod, i_r_mod, peak row)
+    obs_peak_df_lst = []
+    obs_peak_offset = 0
+    for _typ_idx, obs_typ in enumerate(list(obs_dct.keys())):
+        obs_df = obs_dct[obs_typ][0]
+        obs_site_dct = obs_dct[obs_typ][1]
+
+        # !! IMPORTANT HERE !!
+        if lipid_class in ['TG', 'DG']:
+            # default obs_type in obs_df for TG is with FA1/FA2/FA3
+            # e.g. ['[M-(FA1)+H]+', '[M-(FA2)+H]+', '[M-(FA3)+H]+']
+            if obs_df.empty:
+                continue
+            post_obs_df = pd.DataFrame(obs_df.copy())
+            post_obs_df['obs_type_calc'] = obs_typ
+        else:
+            # default obs_type in obs_df for PL is with NO FA assignment
+            # e.g. ['[FA-H]-', '[LPE-H]-', '[LPE-H2O-H]-'], the following fragment types are not used
+            if obs_df.empty or 'obs_type' not in obs_df.columns.values.tolist():
+                break
+            post_obs_df = pd.DataFrame(obs_df.copy())
+            post_obs_df['obs_type_calc'] = post_obs_df['obs_type']
+        post_obs_df['i_mod'] = post_obs_df['i']
+        post_obs_df['obs_i_r_mod'] = post_obs_df['obs_i_r']
+
+        peak_count = post_obs_df.shape[0]
+        peak_fa_arr = post_obs_df['fa_abbr'].values
+        peak_typ_chk_arr = post_obs_df['obs_type_calc'].values == obs_typ
+        i_arr = post_obs_df['i'].values
+        i_r_arr = post_obs_df['obs_i_r'].values
+        ppm_abs_arr = post_obs_df['obs_ppm_abs'].values
+        site_lst = list(obs_site_dct.keys())
+        site_abbr_arr = sliced_info_df[['%s_ABBR' % _site for _site in site_lst]].values
+
+        order_arr = np.repeat(np.arange(peak_count)[np.newaxis, :], lipid_count, axis=0)
+        typ_event_count = len(event_lst)
+        for _slot in range(slot_count):
+            _fa_abbr_arr = slot_abbr_arr[:, _slot]
+            _site_chk_arr = site_abbr_arr == _fa_abbr_arr[:, np.newaxis]
+            _match_arr = (peak_fa_arr[np.newaxis, :] == _fa_abbr_arr[:, np.newaxis]) & peak_typ_chk_arr
+            _found_arr = np.where(_match_arr.any(axis=1) & _site_chk_arr.any(axis=1))[0]
+            if len(_found_arr) == 0:
+                continue
+            lipid_sn_arr[_found_arr] |= slot_sn_arr[_found_arr, _slot]
+
+            _order_arr, _i_mod_arr, _div_peak_arr = rank_obs_peaks(i_arr, ppm_abs_arr, _match_arr[_found_arr],
+                                                                   slot_div_arr[_found_arr, _slot],
+                                                                   order_arr[_found_arr])
+            order_arr[_found_arr] = _order_arr
+            _i_r_mod_arr = i_r_arr[_div_peak_arr] / slot_div_arr[_found_arr, _slot]
+
+            # all peaks of the FA in the new order, the first one is used for the score
+            _found_idx_arr, _pos_arr = np.where(np.take_along_axis(_match_arr[_found_arr], _order_arr, axis=1))
+            _peak_arr = _order_arr[_found_idx_arr, _pos_arr]
+            _first_arr = np.r_[True, _found_idx_arr[1:] != _found_idx_arr[:-1]]
+            _rank_arr = np.zeros(len(_found_arr), dtype=np.int64)
+            _rank_arr[_found_idx_arr[_first_arr]] = _pos_arr[_first_arr] + 1
+            _peak_i_mod_arr = _i_mod_arr[_found_idx_arr, _peak_arr]
+            _peak_i_r_mod_arr = np.where(_peak_arr == _div_peak_arr[_found_idx_arr],
+                                         _i_r_mod_arr[_found_idx_arr], i_r_arr[_peak_arr])
+            # _found_idx_arr is sorted, the peaks of each structure are in [_peak_start_arr, _peak_end_arr)
+            _peak_start_arr = np.searchsorted(_found_idx_arr, np.arange(len(_found_arr)), side='left')
+            _peak_end_arr = np.searchsorted(_found_idx_arr, np.arange(len(_found_arr)), side='right')
+
+            for _site_idx, _site in enumerate(site_lst):
+                _site_found_arr = np.where(_site_chk_arr[_found_arr, _site_idx])[0]
+                if len(_site_found_arr) == 0:
+                    continue
+                try:
+                    _weight = weight_dct['%s' % obs_site_dct[_site]]['Weight']
+                except KeyError:
+                    raise KeyError('Cannot get fa_wfactor of %s for %s from weight_dct, please check the weight '
+                                   'factor file' % (obs_site_dct[_site], lipid_class))
+                for _found_idx in _site_found_arr:
+                    _first_idx = _peak_start_arr[_found_idx]
+                    event_lst.append((_found_arr[_found_idx], _typ_idx, _slot, _site_idx, _rank_arr[_found_idx],
+                                      _weight, _site, _peak_i_mod_arr[_first_idx], _peak_i_r_mod_arr[_first_idx],
+                                      [(obs_peak_offset + _peak_arr[_p], _pos_arr[_p] + 1, _peak_i_mod_arr[_p],
+                                        _peak_i_r_mod_arr[_p]) for _p in range(_first_idx, _peak_end_arr[_found_idx])]))
+
+        if len(event_lst) > typ_event_count:
+            obs_peak_df_lst.append(post_obs_df)
+            obs_peak_offset += peak_count
 
-                if _fa_ident is True and not post_obs_df.empty and fa_to_site_dct[_fa_abbr]:
-                    _score_obs_df = post_obs_df[post_obs_df['fa_abbr'].isin(_unique_fa_abbr_lst)]
-                    _score_obs_df = _score_obs_df.query('fa_abbr == "%s" and obs_type_calc == "%s"'
-                                                        % (_fa_abbr, obs_typ)).copy()
-                    # if _score_obs_df.shape[0] > 1:
-                    #     # print('_score_obs_df shape > 1')
-                    #     # print(_score_obs_df)
-                    #     pass
-                    # _score_obs_df.is_copy = False
-                    fa_site_lst = fa_to_site_dct[_fa_abbr]
-
-                    for _obs_peak in fa_site_lst:
-
-                        try:
-                            _fa_wfactor = weight_dct['%s' % _obs_peak]['Weight']
-                        except Exception as _e:
-                            print('[Exception] !!! Cannot get fa_wfactor from weight_dct ...', _e)
-                            _fa_wfactor = 0
-                            exit()
-
-                        if not _score_obs_df.empty:
-                            _score_obs_df['fragment_abbr'] = _score_obs_df['obs_abbr']
-                            _score_obs_df['discrete_abbr'] = _lipid_abbr
-                            _score_obs_df['lipid_discrete_abbr'] = _lipid_abbr
-                            _score_obs_df.set_index(['fragment_abbr', 'lipid_discrete_abbr'], inplace=True)
-                            ident_obs_peak_df = ident_obs_peak_df.append(_score_obs_df)
-
-                            _score_obs_type_lst = _score_obs_df['obs_type_calc'].values.tolist()
-                            _score_obs_rank_lst = _score_obs_df['obs_rank'].values.tolist()
-                            _score_obs_i_lst = _score_obs_df['i_mod'].values.tolist()
-                            _score_obs_i_r_lst = _score_obs_df['obs_i_r_mod'].values.tolist()
-
-                            _obs_idx = _score_obs_type_lst.index(obs_typ)
-                            _obs_rank = _score_obs_rank_lst[_obs_idx]
-
-                            # print(_lipid_abbr, _fa_abbr, 'Weight Info', _obs_peak, fa_site_lst, _fa_wfactor,
-                            #       '_obs_rank', _obs_rank, 'idx', _obs_idx,
-                            #       'i', _score_obs_i_lst[_obs_idx],
-                            #       'i_r', _score_obs_i_r_lst[_obs_idx],
-                            #       ((11 - _obs_rank) * 0.1 * _fa_wfactor))
-
-                            _rank_score += ((11 - _obs_rank) * 0.1 * _fa_wfactor)
-                            _ident_peak_count += 1
-
-                            origin_info_df.at[_idx, '%s_i' % _obs_peak] = _score_obs_i_lst[_obs_idx]
-                            origin_info_df.at[_idx, '%s_i_per' % _obs_peak] = _score_obs_i_r_lst[_obs_idx]
-                            origin_info_df.at[_idx, '%s_RANK' % _obs_peak] = _obs_rank
-                            origin_info_df.at[_idx, '%s_SCORE' % _obs_peak] = ((11 - _obs_rank) * 0.1 * _fa_wfactor)
-
-        _ident_fa_abbr_lst = list(set(_ident_fa_abbr_lst))
-        # print(_lipid_abbr, 'rank_score', _rank_score)
-        if _rank_score > 0 and len(_ident_fa_abbr_lst) > 0:
-            # print(_lipid_abbr, _rank_score)
-            origin_info_df.at[_idx, 'RANK_SCORE'] = _rank_score
-            origin_info_df.at[_idx, 'OBS_PEAKS'] = int(_ident_peak_count)
-            origin_info_df.at[_idx, 'OBS_RESIDUES'] = len(_ident_fa_abbr_lst)
-        # else:
-        #     ident_obs_peak_df = pd.DataFrame({'i': [], 'mz': [], 'lib_mz': [], 'obs_mz': [], 'obs_i_r': [],
-        #                             'obs_ppm': [], 'obs_ppm_abs': [], 'obs_abbr': [], 'obs_label': [],
-        #                             'fa_abbr': [], 'obs_rank': [], 'obs_type_calc': []})
+    ident_obs_peak_df = pd.DataFrame()
+    if not event_lst:
+        return ident_obs_peak_df, origin_info_df
+
+    # same order as the previous loop over structures, fragment types, FA and sn
+    event_lst = sorted(event_lst, key=lambda _event: _event[:4])
+    event_lipid_arr = np.array([_event[0] for _event in event_lst])
+    event_rank_arr = np.array([_event[4] for _event in event_lst])
+    event_weight_arr = np.array([_event[5] for _event in event_lst])
+    event_score_arr = (11 - event_rank_arr) * 0.1 * event_weight_arr
+
+    # sum up the scores in the same order for each structure
+    event_col_arr = np.arange(len(event_lst)) - np.searchsorted(event_lipid_arr, event_lipid_arr, side='left')
+    score_mtx = np.zeros((lipid_count, event_col_arr.max() + 1))
+    score_mtx[event_lipid_arr, event_col_arr] = event_score_arr
+    rank_score_arr = np.cumsum(score_mtx, axis=1)[:, -1]
+    peak_count_arr = np.bincount(event_lipid_arr, minlength=lipid_count)
+    residue_count_arr = np.array([bin(_sn).count('1') for _sn in lipid_sn_arr])
+    score_chk_arr = (rank_score_arr > 0) & (residue_count_arr > 0)
+
+    # the intensity, relative intensity, rank and score of each fragment at each sn position, one column each
+    # in the order of the fragment types in obs_dct and of the sn positions, OBS_PEAKS is added last
+    origin_pos_arr = origin_info_df.index.get_indexer(sliced_info_df.index)
+    event_typ_arr = np.array([_event[1] for _event in event_lst])
+    event_site_arr = np.array([_event[3] for _event in event_lst])
+    event_val_arr = np.array([(_event[7], _event[8], _event[4]) for _event in event_lst], dtype=np.float64)
+    obs_typ_lst = list(obs_dct.keys())
+    col_key_arr = event_typ_arr * (event_site_arr.max() + 1) + event_site_arr
+    for _col_key in np.unique(col_key_arr):
+        _col_event_arr = np.where(col_key_arr == _col_key)[0]
+        _obs_site_dct = obs_dct[obs_typ_lst[event_typ_arr[_col_event_arr[0]]]][1]
+        _obs_peak = _obs_site_dct[list(_obs_site_dct.keys())[event_site_arr[_col_event_arr[0]]]]
+        _pos_arr = origin_pos_arr[event_lipid_arr[_col_event_arr]]
+        for _col, _val_arr in [('%s_i' % _obs_peak, event_val_arr[_col_event_arr, 0]),
+                               ('%s_i_per' % _obs_peak, event_val_arr[_col_event_arr, 1]),
+                               ('%s_RANK' % _obs_peak, event_val_arr[_col_event_arr, 2]),
+                               ('%s_SCORE' % _obs_peak, event_score_arr[_col_event_arr])]:
+            _col_arr = np.full(origin_info_df.shape[0], np.nan)
+            _col_arr[_pos_arr] = _val_arr
+            origin_info_df[_col] = _col_arr
+    if score_chk_arr.any():
+        _col_arr = np.full(origin_info_df.shape[0], np.nan)
+        _col_arr[origin_pos_arr[score_chk_arr]] = peak_count_arr[score_chk_arr]
+        origin_info_df['OBS_PEAKS'] = _col_arr
+
+    score_pos_arr = origin_pos_arr[score_chk_arr]
+    for _col, _val_arr in [('RANK_SCORE', rank_score_arr), ('OBS_RESIDUES', residue_count_arr)]:
+        _col_arr = origin_info_df[_col].values.copy()
+        _col_arr[score_pos_arr] = _val_arr[score_chk_arr]
+        origin_info_df[_col] = _col_arr
+
+    # the observed peaks of each structure, the same peak is listed for each sn of the FA
+    obs_peak_df = pd.concat(obs_peak_df_lst)
+    peak_row_lst = [_peak for _event in event_lst for _peak in _event[9]]
+    peak_lipid_lst = [_event[0] for _event in event_lst for _peak in _event[9]]
+    ident_obs_peak_df = obs_peak_df.iloc[[_peak[0] for _peak in peak_row_lst]].copy()
+    ident_obs_peak_df['obs_rank'] = np.array([_peak[1] for _peak in peak_row_lst], dtype=np.int64)
+    for _col, _peak_idx in [('i_mod', 2), ('obs_i_r_mod', 3)]:
+        ident_obs_peak_df[_col] = np.array([_peak[_peak_idx] for _peak in peak_row_lst],
+                                           dtype=ident_obs_peak_df[_col].dtype)
+    ident_obs_peak_df['discrete_abbr'] = lipid_abbr_arr[peak_lipid_lst]
+    ident_obs_peak_df.index = pd.MultiIndex.from_arrays([ident_obs_peak_df['obs_abbr'].values,
+                                                         ident_obs_peak_df['discrete_abbr'].values],
+                                                        names=['fragment_abbr', 'lipid_discrete_abbr'])
 
     return ident_obs_peak_df, origin_info_df
 
@@ -467,8 +584,8 @@ def calc_rankscore(obs_dct, lite_info_df, lipid_class, weight_dct, rankscore_fil
         pass
 
     if obs_slice_dct:
-        bool_isin_df = lite_info_df.isin(obs_slice_dct)
-        bool_isin_df['RESI_CHK'] = bool_isin_df[resi_site_lst].sum(1)
+        bool_isin_df = lite_info_df[resi_site_lst].isin(obs_slice_dct)
+        bool_isin_df['RESI_CHK'] = bool_isin_df.sum(1)
         lite_info_df['RESI_CHK'] = bool_isin_df['RESI_CHK']
         sliced_info_df = lite_info_df[lite_info_df['RESI_CHK'] > 0]
         lite_info_df.drop('RESI_CHK', axis=1, inplace=True)
@@ -502,7 +619,7 @@ def calc_rankscore(obs_dct, lite_info_df, lipid_class, weight_dct, rankscore_fil
 
 
 def get_rankscore(fa_df, master_info_df, abbr_bulk, charge, ms2_df, _ms2_idx, lipid_class, weight_dct, core_count,
-                  rankscore_filter=27.5, all_sn=True):
+                  rankscore_filter=27.5, all_sn=True, fa_nl_cache_dct=None):
     lite_info_df = master_info_df.query('BULK_ABBR == "%s" and spec_index == %f' % (abbr_bulk, _ms2_idx)).copy()
 
     # lite_info_df.is_copy = False
@@ -580,11 +697,11 @@ def get_rankscore(fa_df, master_info_df, abbr_bulk, charge, ms2_df, _ms2_idx, li
     # TODO (georgia.angelidou@uni-leipzig.de): put the MG and the FA in the same dataframe and the DG in another one
     # this way will avoid to many unecessary dataframes
     if frag_lst_fa:
-        obs_fa_frag_df = pd.DataFrame(get_all_fa_nl(fa_df, ms2_df, frag_lst_fa, lipid_class))
+        obs_fa_frag_df = get_spec_fa_nl(fa_df, ms2_df, frag_lst_fa, lipid_class, _ms2_idx, fa_nl_cache_dct)
     else:
         obs_fa_frag_df = pd.DataFrame()
     if frag_lst:
-        obs_fa_nl_df = pd.DataFrame(get_all_fa_nl(fa_df, ms2_df, frag_lst, lipid_class))
+        obs_fa_nl_df = get_spec_fa_nl(fa_df, ms2_df, frag_lst, lipid_class, _ms2_idx, fa_nl_cache_dct)
     else:
         obs_fa_nl_df = pd.DataFrame()
     obs_dg_frag_df = pd.DataFrame()
@@ -600,8 +717,8 @@ def get_rankscore(fa_df, master_info_df, abbr_bulk, charge, ms2_df, _ms2_idx, li
             elif lipid_class in ['PC'] and charge in ['[M+HCOO]-', '[M+CH3COO]-']:
                 frag_lst = ['[L%s-H]-' % lipid_class, '[L%s-H2O-H]-' % lipid_class]
                 frag_lst_fa = ['[FA-H]-']
-                obs_fa_frag_df = get_all_fa_nl(fa_df, ms2_df, frag_lst_fa, lipid_class)
-                obs_fa_nl_df = get_all_fa_nl(fa_df, ms2_df, frag_lst, lipid_class)
+                obs_fa_frag_df = get_spec_fa_nl(fa_df, ms2_df, frag_lst_fa, lipid_class, _ms2_idx, fa_nl_cache_dct)
+                obs_fa_nl_df = get_spec_fa_nl(fa_df, ms2_df, frag_lst, lipid_class, _ms2_idx, fa_nl_cache_dct)
                 obs_dct = {'[FA-H]-': [obs_fa_frag_df, {'FA1': 'FA1_[FA-H]-', 'FA2': 'FA2_[FA-H]-'}],
                            '[L%s-H]-' % lipid_class: [obs_fa_nl_df, {'FA1': '[LPL(FA1)-H]-', 'FA2': '[LPL(FA2)-H]-'}],
                            '[L%s-H2O-H]-' % lipid_class: [obs_fa_nl_df, {'FA1': '[LPL(FA1)-H2O-H]-',
@@ -742,7 +859,8 @@ def get_rankscore(fa_df, master_info_df, abbr_bulk, charge, ms2_df, _ms2_idx, li
 
 
 def get_lipid_info(param_dct, fa_df, checked_info_df, checked_info_groups, core_list, usr_weight_df,
-                   key_frag_dct, core_spec_dct, xic_dct, core_count, save_fig=True, os_type='windows', queue=None):
+                   key_frag_dct, core_spec_dct, xic_dct, core_count, save_fig=True, os_type='windows', queue=None,
+                   isotope_ratio_dct=None):
     core_count = 'Core_#%i' % core_count
 
     usr_lipid_type = param_dct['lipid_class']
@@ -764,7 +882,9 @@ def get_lipid_info(param_dct, fa_df, checked_info_df, checked_info_groups, core_
     usr_tag_all_sn = param_dct['tag_all_sn']
 
     hunter_start_time_str = param_dct['hunter_start_time']
-    isotope_hunter = IsotopeHunter()
+    isotope_hunter = ISOTOPE_HUNTER
+    # the same table is sent with each task of a run, the table of a previous run is replaced
+    isotope_hunter.load_isotope_ratio(isotope_ratio_dct if isotope_ratio_dct else {})
 
     # score_calc = ScoreGenerator(param_dct, usr_weight_df, usr_key_frag_df, usr_lipid_type,
     #                             checked_info_df, ion_charge=charge_mode, ms2_ppm=usr_ms2_ppm)
@@ -774,6 +894,8 @@ def get_lipid_info(param_dct, fa_df, checked_info_df, checked_info_groups, core_
     tmp_df = pd.DataFrame()
 
     img_plt_lst = []
+    # FA and lyso fragments of each MS/MS scan, shared by all candidates of the same scan
+    fa_nl_cache_dct = {}
 
     for group_key in core_list:
         _subgroup_df = checked_info_groups.get_group(group_key)
@@ -859,12 +981,14 @@ def get_lipid_info(param_dct, fa_df, checked_info_df, checked_info_groups, core_
                     print(core_count, '[INFO] --> Now check_proposed_structure:', _usr_abbr_bulk)
                     _mz_amm_iso_flag2 = ''
                     if charge_mode in ['[M+H]+', '[M+Na]+']:
-                        _mz_amm_formula, _mz_amm_elem_dct = ElemCalc().get_formula(_usr_abbr_bulk, charge='neutral')
+                        _mz_amm_elem_info = get_elem_info(_usr_abbr_bulk, '')
+                        _mz_amm_formula = _mz_amm_elem_info.formula
+                        _mz_amm_elem_dct = dict(_mz_amm_elem_info.elem)
                         _mz_amm_elem_dct['N'] += 1
                         _mz_amm_elem_dct['H'] += 4
                         _mz_df_amm = pd.DataFrame()
-                        _mz_amm_mz = ElemCalc().get_exactmass(_mz_amm_elem_dct)
-                        _mz_amm_mz2, _mz_amm_form, _mz_amm_Na_mz2, _mz_amm_Na_form = ElemCalc().get_NH3_pos_mode(
+                        _mz_amm_mz = calc_exactmass(_mz_amm_elem_dct)
+                        _mz_amm_mz2, _mz_amm_form, _mz_amm_Na_mz2, _mz_amm_Na_form = ELEM_CALC.get_NH3_pos_mode(
                                                                                                     charge_mode,
                                                                                                     _ms1_pr_mz,
                                                                                                     _mz_amm_elem_dct)
@@ -930,7 +1054,8 @@ def get_lipid_info(param_dct, fa_df, checked_info_df, checked_info_groups, core_
                                                                       _score_ms2_df, _ms2_idx, usr_lipid_type,
                                                                       usr_weight_dct, core_count,
                                                                       rankscore_filter=usr_rankscore_filter,
-                                                                      all_sn=usr_tag_all_sn)
+                                                                      all_sn=usr_tag_all_sn,
+                                                                      fa_nl_cache_dct=fa_nl_cache_dct)
                         if matched_checker > 0:
                             obs_info_df = obs_info_dct['INFO']
                             rank_score = obs_info_df['RANK_SCORE'].values.tolist()
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2019  SysMedOs_team @ AG Bioanalytik, University of Leipzig:
+# SysMedOs_team: Zhixu Ni, Georgia Angelidou, Mike Lange, Maria Fedorova
+# LipidHunter is Dual-licensed
+#     For academic and non-commercial use: `GPLv2 License` Please read more information by the following link:
+#         [The GNU General Public License version 2] (https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html)
+#     For commercial use:
+#         please contact the SysMedOs_team by email.
+# Please cite our publication in an appropriate form.
+# Ni, Zhixu, Georgia Angelidou, Mike Lange, Ralf Hoffmann, and Maria Fedorova.
+# "LipidHunter identifies phospholipids by high-throughput processing of LC-MS and shotgun lipidomics datasets."
+# Analytical Chemistry (2017).
+# DOI: 10.1021/acs.analchem.7b01126
+#
+# For more info please contact:
+#     Developer Zhixu Ni zhixu.ni@uni-leipzig.de
+#     Developer Georgia Angelidou georgia.angelidou@uni-leipzig.de
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from LibLipidHunter.SpectraStore import SpectraStore
+
+DEFAULT_CACHE_FOLDER = os.path.join(os.path.expanduser('~'), '.lipidhunter', 'spectra_cache')
+DEFAULT_CACHE_SIZE = 10  # GB
+
+SCAN_INFO_COL_LST = ['dda_event_idx', 'spec_index', 'scan_time', 'DDA_rank', 'scan_number', 'MS2_PR_mz']
+STORE_ARR_LST = ['spec_index', 'mz', 'i', 'offsets', 'rt', 'ms_level']
+
+
+class SpectraCache(object):
+    """
+    On disk cache of the extracted spectra. Each extraction is saved as a folder of .npy files named by the hash of
+    the mzML file path, size, modification time and all extraction parameters.
+    The cached arrays are loaded as read only memory maps.
+    The least recently used extractions are removed once the cache is larger than max_size.
+
+    Args:
+        cache_folder (str): folder to save the cache, use ~/.lipidhunter/spectra_cache by default
+        max_size (float): max size of the cache folder in GB
+
+    """
+
+    cache_name = 'Spectra'
+
+    def __init__(self, cache_folder: str = DEFAULT_CACHE_FOLDER, max_size: float = DEFAULT_CACHE_SIZE):
+
+        self.cache_folder = os.path.abspath(cache_folder)
+        self.max_size = max_size
+
+    @staticmethod
+    def get_key(mzml: str, **extract_params) -> str:
+        """
+        Generate the cache key of one extraction.
+
+        Args:
+            mzml (str): the file path of mzML file
+            **extract_params: all parameters used by extract_mzml
+
+        Returns:
+            key (str): sha1 hex digest
+
+        """
+
+        mzml_stat = os.stat(mzml)
+        key_dct = {'mzml': os.path.abspath(mzml), 'size': mzml_stat.st_size, 'mtime': mzml_stat.st_mtime}
+        key_dct.update(extract_params)
+        key_str = json.dumps(key_dct, sort_keys=True, default=str)
+
+        return hashlib.sha1(key_str.encode('utf-8')).hexdigest()
+
+    def load(self, key: str) -> Union[Tuple[pd.DataFrame, SpectraStore, pd.DataFrame], bool]:
+        """
+        Load cached extraction.
+
+        Args:
+            key (str): the cache key from get_key()
+
+        Returns:
+            scan_info_df (pd.DataFrame), spec_store (SpectraStore), ms1_xic_df (pd.DataFrame) or False if not cached
+
+        """
+
+        key_folder = os.path.join(self.cache_folder, key)
+        if not os.path.isfile(os.path.join(key_folder, 'info.json')):
+            return False
+
+        try:
+            arr_dct = {}
+            for _arr in STORE_ARR_LST:
+                arr_dct[_arr] = np.load(os.path.join(key_folder, '%s.npy' % _arr), mmap_mode='r')
+            scan_info_dct = {}
+            for _col in SCAN_INFO_COL_LST + ['index']:
+                scan_info_dct[_col] = np.load(os.path.join(key_folder, 'scan_info_%s.npy' % _col))
+        except (IOError, OSError, ValueError) as _e:
+            print('[WARNING] !!! Failed to load spectra cache, the cache is removed ...', _e)
+            shutil.rmtree(key_folder, ignore_errors=True)
+            return False
+
+        scan_info_df = pd.DataFrame(data={_col: scan_info_dct[_col] for _col in SCAN_INFO_COL_LST},
+                                    columns=SCAN_INFO_COL_LST, index=scan_info_dct['index'])
+        spec_store = SpectraStore(arr_dct['spec_index'], arr_dct['mz'], arr_dct['i'], arr_dct['offsets'],
+                                  arr_dct['rt'], arr_dct['ms_level'], scan_info_df=scan_info_df)
+        ms1_xic_df = spec_store.get_ms1_xic_df()
+
+        # update the modification time to track the last usage
+        os.utime(os.path.join(key_folder, 'info.json'))
+        print('[INFO] --> Spectra loaded from cache: %s' % key_folder)
+
+        return scan_info_df, spec_store, ms1_xic_df
+
+    def save(self, key: str, scan_info_df: pd.DataFrame, spec_store: SpectraStore, info_dct: dict = None):
+        """
+        Save one extraction to the cache and remove old extractions if the cache is too large.
+
+        Args:
+            key (str): the cache key from get_key()
+            scan_info_df (pd.DataFrame): the scan info from extract_mzml
+            spec_store (SpectraStore): the spectra from extract_mzml
+            info_dct (dict): additional information to save, e.g. the mzML file path
+
+        """
+
+        key_folder = os.path.join(self.cache_folder, key)
+        # write to a temp folder first, unfinished cache will never be loaded
+        tmp_folder = os.path.join(self.cache_folder, '%s_tmp%i' % (key, os.getpid()))
+
+        try:
+            os.makedirs(tmp_folder, exist_ok=True)
+            for _arr in STORE_ARR_LST:
+                np.save(os.path.join(tmp_folder, '%s.npy' % _arr), getattr(spec_store, _arr))
+            for _col in SCAN_INFO_COL_LST:
+                np.save(os.path.join(tmp_folder, 'scan_info_%s.npy' % _col), scan_info_df[_col].values)
+            np.save(os.path.join(tmp_folder, 'scan_info_index.npy'), scan_info_df.index.values)
+            if info_dct is None:
+                info_dct = {}
+            info_dct['created'] = time.strftime("%Y-%m-%d_%H-%M-%S", time.localtime())
+            with open(os.path.join(tmp_folder, 'info.json'), 'w') as _info_obj:
+                json.dump(info_dct, _info_obj, default=str)
+            if os.path.isdir(key_folder):
+                shutil.rmtree(key_folder, ignore_errors=True)
+            os.rename(tmp_folder, key_folder)
+            print('[OUTPUT] ==> Spectra saved to cache: %s' % key_folder)
+        except (IOError, OSError) as _e:
+            print('[WARNING] !!! Failed to save spectra cache ...', _e)
+            shutil.rmtree(tmp_folder, ignore_errors=True)
+            return False
+
+        self.evict(keep_key=key)
+
+        return True
+
+    def get_entries(self) -> list:
+        """
+        Get all cached extractions.
+
+        Returns:
+            entry_lst (list): list of (last used time, size in bytes, folder path), the least recently used first
+
+        """
+
+        entry_lst = []
+        if os.path.isdir(self.cache_folder):
+            for _key in os.listdir(self.cache_folder):
+                _key_folder = os.path.join(self.cache_folder, _key)
+                _info_file = os.path.join(_key_folder, 'info.json')
+                if os.path.isfile(_info_file):
+                    _size = sum([os.path.getsize(os.path.join(_key_folder, _f)) for _f in os.listdir(_key_folder)])
+                    entry_lst.append((os.path.getmtime(_info_file), _size, _key_folder))
+        entry_lst.sort()
+
+        return entry_lst
+
+    def evict(self, keep_key: str = ''):
+        """
+        Remove the least recently used extractions until the cache is smaller than max_size.
+
+        Args:
+            keep_key (str): the key of the extraction that should not be removed
+
+        """
+
+        max_bytes = self.max_size * 1024 ** 3
+        entry_lst = self.get_entries()
+        tot_bytes = sum([_entry[1] for _entry in entry_lst])
+        for _time, _size, _key_folder in entry_lst:
+            if tot_bytes <= max_bytes:
+                break
+            if os.path.basename(_key_folder) == keep_key:
+                continue
+            shutil.rmtree(_key_folder, ignore_errors=True)
+            tot_bytes -= _size
+            print('[INFO] --> %s cache removed: %s' % (self.cache_name, _key_folder))
+
+    def clear(self):
+        """
+        Remove all cached extractions.
+
+        """
+
+        if os.path.isdir(self.cache_folder):
+            shutil.rmtree(self.cache_folder, ignore_errors=True)
+            print('[INFO] --> %s cache cleared: %s' % (self.cache_name, self.cache_folder))
@@ -17,22 +17,48 @@
 #     Developer Zhixu Ni zhixu.ni@uni-leipzig.de
 #     Developer Georgia Angelidou georgia.angelidou@uni-leipzig.de
 
+import os
 import re
 from typing import Any, Dict, Tuple, Union
 
+import numpy as np
 import pandas as pd
 import pymzml
 
 from LibLipidHunter.ParallelFunc import ppm_window_para
+from LibLipidHunter.SpectraCache import SpectraCache
+from LibLipidHunter.SpectraStore import DDAIndex, SpectraStore
+
+
+def sort_peaks_by_i(mz_arr: np.ndarray, i_arr: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sort peaks by intensity from high to low.
+    Peaks with same intensity keep the same order as DataFrame.sort_values(by='i', ascending=False)
+
+    Args:
+        mz_arr (np.ndarray): mz of the peaks
+        i_arr (np.ndarray): i of the peaks
+
+    Returns:
+        mz_arr (np.ndarray): sorted mz
+        i_arr (np.ndarray): sorted i
+
+    """
+
+    _rev_idx_arr = np.arange(len(i_arr))[::-1]
+    sort_idx_arr = _rev_idx_arr[i_arr[::-1].argsort(kind='quicksort')][::-1]
+
+    return mz_arr[sort_idx_arr], i_arr[sort_idx_arr]
 
 
 def extract_mzml(mzml: str, rt_range: list, dda_top: int = 6,
                  ms1_threshold: int = 1000, ms2_threshold: int = 10,
                  ms1_precision: float = 50e-6, ms2_precision: float = 500e-6,
-                 min_spec_peaks: int = 3, vendor: str = 'waters', ms1_max: int = 0) \
-        -> Tuple[pd.DataFrame, Dict[int, pd.DataFrame], pd.DataFrame]:
+                 min_spec_peaks: int = 3, vendor: str = 'waters', ms1_max: int = 0, max_ram: int = 0,
+                 spectra_cache: SpectraCache = None) \
+        -> Tuple[pd.DataFrame, SpectraStore, pd.DataFrame]:
     """
-    Extract mzML to a scan info DataFrame and a pandas panel for spectra DataFrame of mz and i
+    Extract mzML to a scan info DataFrame and a SpectraStore of all spectra
     pymzml 2.2.5 is used
 
     Args:
@@ -46,10 +72,17 @@ def extract_mzml(mzml: str, rt_range: list, dda_top: int = 6,
         min_spec_peaks (int): minimum peaks a spectrum must have to be used for identification, default = 3
         vendor (str): MS vendor abbreviations use lower case in list ['agilent', 'sciex', 'thermo', 'waters']
         ms1_max (int): Max of MS1 intensity, use to search for low intensity signals, set 0 to disable by default
+        max_ram (int): Max RAM in GB, the extracted peaks can use up to half of it. Set 0 to disable by default
+        spectra_cache (SpectraCache): load the extracted spectra from this cache if the same mzML was extracted with
+            the same parameters, otherwise save the extracted spectra to it. Set None to disable by default
+
+    Raises:
+        MemoryError: if the extracted peaks exceed the RAM limit defined by max_ram
 
     Returns:
         scan_info_df (pd.DataFrame):
-        spec_pl (pd.Panel):
+        spec_store (SpectraStore): can be used as dict of {spec_index: pd.DataFrame of mz and i},
+            the DDA event lookup tables of scan_info_df are available as spec_store.dda_index
         ms1_xic_df (pd.DataFrame):
 
     """
@@ -79,6 +112,16 @@ def extract_mzml(mzml: str, rt_range: list, dda_top: int = 6,
     rt_start = rt_range[0]
     rt_end = rt_range[1]
 
+    cache_key = ''
+    if isinstance(spectra_cache, SpectraCache):
+        cache_key = spectra_cache.get_key(mzml, rt_range=[rt_start, rt_end], dda_top=dda_top,
+                                          ms1_threshold=ms1_threshold, ms2_threshold=ms2_threshold,
+                                          ms1_precision=ms1_precision, ms2_precision=ms2_precision,
+                                          min_spec_peaks=min_spec_peaks, vendor=vendor, ms1_max=ms1_max)
+        cached_results = spectra_cache.load(cache_key)
+        if cached_results is not False:
+            return cached_results
+
     print('[STATUS] >>> Start to process file: %s' % mzml)
     print('[INFO] --> Processing RT: %.2f -> %.2f with DDA Top % i' % (rt_start, rt_end, dda_top))
     try:
@@ -105,11 +148,18 @@ def extract_mzml(mzml: str, rt_range: list, dda_top: int = 6,
     scan_info_dct = {'spec_index': spec_idx_lst, 'scan_time': rt_lst, 'dda_event_idx': dda_event_lst,
                      'DDA_rank': dda_rank_lst, 'scan_number': scan_id_lst, 'MS2_PR_mz': pr_mz_lst}
 
-    spec_dct = {}  # Type: Dict[pd.DataFrame]
+    # peaks of each scan are collected as arrays and merged into the SpectraStore at the end
+    spec_mz_arr_lst = []
+    spec_i_arr_lst = []
+    ms_level_lst = []
 
     ms2_function_range_lst = list(range(2, dda_top + 1))
 
-    ms1_xic_df = pd.DataFrame()
+    if max_ram > 0:
+        max_peak_bytes = max_ram * 0.5 * 1024 ** 3
+    else:
+        max_peak_bytes = 0
+    peak_bytes = 0
 
     print('Instrument vendor: %s' % vendor)
 
@@ -147,23 +197,25 @@ def extract_mzml(mzml: str, rt_range: list, dda_top: int = 6,
                     print(_spectrum.ms_level)
                     ms_level = -1
 
-                _raw_tmp_spec_df = pd.DataFrame(data={'mz': _spectrum.mz, 'i': _spectrum.i})
-                _tmp_spec_df = pd.DataFrame()
+                _raw_mz_arr = _spectrum.mz
+                _raw_i_arr = _spectrum.i
+                _tmp_mz_arr = np.array([])
+                _tmp_i_arr = np.array([])
                 if ms_level == 1 and _scan_id > 0:
                     dda_event_idx += 1  # a new set of DDA start from this new MS1
                     dda_rank_idx = 0  # set the DDA rank back to 0 for the survey MS1 scan
                     # use ms1_threshold * 0.1 to keep isotope patterns
                     if ms1_max > ms1_threshold:
-                        _tmp_spec_df = _raw_tmp_spec_df.query('%f <= i <= %f' %
-                                                              ((ms1_threshold * 0.1), ms1_max)).copy()
+                        _i_mask = (_raw_i_arr >= ms1_threshold * 0.1) & (_raw_i_arr <= ms1_max)
                     else:
-                        _tmp_spec_df = _raw_tmp_spec_df.query('%f <= i' % (ms1_threshold * 0.1)).copy()
-
-                    if not _tmp_spec_df.empty:
-                        _tmp_spec_df = _tmp_spec_df.sort_values(by='i', ascending=False)
-                        _tmp_spec_df = _tmp_spec_df.reset_index(drop=True)
-                        _tmp_spec_df.loc[:, 'rt'] = _scan_rt
-                        ms1_xic_df = ms1_xic_df.append(_tmp_spec_df)
+                        _i_mask = _raw_i_arr >= ms1_threshold * 0.1
+                    _tmp_mz_arr = _raw_mz_arr[_i_mask]
+                    _tmp_i_arr = _raw_i_arr[_i_mask]
+
+                    if _tmp_i_arr.size > 0:
+                        _tmp_mz_arr, _tmp_i_arr = sort_peaks_by_i(_tmp_mz_arr, _tmp_i_arr)
+                        # MS1 peaks are stored in both spectra and XIC table
+                        peak_bytes += 2 * (_tmp_mz_arr.nbytes + _tmp_i_arr.nbytes) + 8 * _tmp_i_arr.size
                     else:
                         print('empty_MS1_spectrum --> index = ', spec_idx)
 
@@ -177,8 +229,10 @@ def extract_mzml(mzml: str, rt_range: list, dda_top: int = 6,
                     except (KeyError, AttributeError):
                         pr_mz = -1
                     if pr_mz > 0:
-                        _tmp_spec_df = _raw_tmp_spec_df.query('i >= %f' % ms2_threshold)
-                        if _tmp_spec_df.shape[0] > min_spec_peaks:
+                        _i_mask = _raw_i_arr >= ms2_threshold
+                        _tmp_mz_arr = _raw_mz_arr[_i_mask]
+                        _tmp_i_arr = _raw_i_arr[_i_mask]
+                        if _tmp_i_arr.size > min_spec_peaks:
                             pass
                         else:
                             print('empty_MS2_spectrum --> index = ', spec_idx)
@@ -193,8 +247,18 @@ def extract_mzml(mzml: str, rt_range: list, dda_top: int = 6,
                 else:
                     print(f'[ERROR] Can not read the spectrum # {spec_idx} @ {_scan_rt:.3f} min - ms_level {ms_level}')
 
-                if not _tmp_spec_df.empty:
-                    spec_dct[spec_idx] = _tmp_spec_df
+                if ms_level != 1:
+                    peak_bytes += _tmp_mz_arr.nbytes + _tmp_i_arr.nbytes
+
+                if 0 < max_peak_bytes < peak_bytes:
+                    raise MemoryError('Extracted peaks exceed %.1f GB, the half of max RAM setting %i GB. '
+                                      'Please use higher MS1/MS2 threshold or smaller RT range.'
+                                      % (peak_bytes / 1024 ** 3, max_ram))
+
+                if _tmp_i_arr.size > 0:
+                    spec_mz_arr_lst.append(_tmp_mz_arr)
+                    spec_i_arr_lst.append(_tmp_i_arr)
+                    ms_level_lst.append(ms_level)
                     spec_idx_lst.append(spec_idx)
                     dda_event_lst.append(dda_event_idx)
                     rt_lst.append(_scan_rt)
@@ -202,7 +266,6 @@ def extract_mzml(mzml: str, rt_range: list, dda_top: int = 6,
                     scan_id_lst.append(_scan_id)
                     pr_mz_lst.append(pr_mz)
 
-                del _raw_tmp_spec_df
             else:  # rt not in defined range, skip.
                 pass
                 # print(f'[INFO] Skip spectrum # {spec_idx} @ {_scan_rt:.3f} min - ms_level {ms_level}')
@@ -217,14 +280,22 @@ def extract_mzml(mzml: str, rt_range: list, dda_top: int = 6,
     scan_info_df = scan_info_df.round({'MS2_PR_mz': 6})
     int_col_lst = ['dda_event_idx', 'spec_index', 'DDA_rank', 'scan_number']
     scan_info_df[int_col_lst] = scan_info_df[int_col_lst].astype(int)
-    # spec_pl = pd.Panel(data=spec_dct)
+    # the DDAIndex of scan_info_df is generated together with the store
+    spec_store = SpectraStore.from_lists(spec_idx_lst, spec_mz_arr_lst, spec_i_arr_lst, rt_lst, ms_level_lst,
+                                         scan_info_df=scan_info_df, dda_index=DDAIndex(scan_info_df))
+    del spec_mz_arr_lst, spec_i_arr_lst
+    # the MS1 XIC table is generated from all MS1 spectra in one step
+    ms1_xic_df = spec_store.get_ms1_xic_df()
+
+    if cache_key:
+        spectra_cache.save(cache_key, scan_info_df, spec_store, info_dct={'mzml': os.path.abspath(mzml)})
     print('=== ==> --> mzML extracted')
 
-    return scan_info_df, spec_dct, ms1_xic_df
+    return scan_info_df, spec_store, ms1_xic_df
 
 
 def get_spectra(mz, mz_lib, func_id, ms2_scan_id, ms1_obs_mz_lst,
-                scan_info_df, spectra_dct, dda_top=12, ms1_precision=50e-6, vendor='waters'):
+                scan_info_df, spectra_dct, dda_top=12, ms1_precision=50e-6, vendor='waters', dda_index=None):
     ms1_df = pd.DataFrame()
     ms2_df = pd.DataFrame()
     ms1_spec_idx = 0
@@ -236,80 +307,82 @@ def get_spectra(mz, mz_lib, func_id, ms2_scan_id, ms1_obs_mz_lst,
     ms1_pr_ppm = 0
     function_max = dda_top + 1
 
-    if mz in scan_info_df['MS2_PR_mz'].values.tolist():
-        _tmp_mz_scan_info_df = scan_info_df.query('MS2_PR_mz == %.6f and DDA_rank == %f and scan_number == %f'
-                                                  % (mz, func_id, ms2_scan_id)).copy()
-        # _tmp_mz_scan_info_df.is_copy = False
-
-        if _tmp_mz_scan_info_df.shape[0] == 1:
-            ms2_spec_idx = _tmp_mz_scan_info_df.at[_tmp_mz_scan_info_df.index[0], 'spec_index']
-            ms2_dda_idx = _tmp_mz_scan_info_df.at[_tmp_mz_scan_info_df.index[0], 'dda_event_idx']
-            ms2_function = _tmp_mz_scan_info_df.at[_tmp_mz_scan_info_df.index[0], 'DDA_rank']
-            ms2_scan_id = _tmp_mz_scan_info_df.at[_tmp_mz_scan_info_df.index[0], 'scan_number']
-            ms2_rt = _tmp_mz_scan_info_df.at[_tmp_mz_scan_info_df.index[0], 'scan_time']
-
-            print('%.6f @ DDA#: %.0f | Total scan id: %.0f | DDA_Rank: %.0f | Scan ID: %.0f | RT: %.4f'
-                  % (mz, ms2_dda_idx, ms2_spec_idx, ms2_function, ms2_scan_id, ms2_rt))
-
-            # get spectra_df of corresponding MS survey scan
-            tmp_ms1_info_df = scan_info_df.query('dda_event_idx == %i and DDA_rank == 0' % ms2_dda_idx)
-
-            if not tmp_ms1_info_df.empty and ms2_function <= function_max:
-                ms1_spec_idx = tmp_ms1_info_df['spec_index'].values.tolist()[0]
-                ms1_rt = tmp_ms1_info_df['scan_time'].values.tolist()[0]
-                if ms1_spec_idx in spectra_dct:
-                    ms1_df = spectra_dct[ms1_spec_idx]
-                    ms1_df = ms1_df.query('i > 0')
-                    ms1_df = ms1_df.sort_values(by='i', ascending=False).reset_index(drop=True)
-                    ms1_delta = mz_lib * ms1_precision
-                    if vendor == 'thermo':
-                        ms1_pr_query = '%.7f <= mz <= %.7f' % (mz_lib - ms1_delta, mz_lib + ms1_delta)
-                    else:
-                        ms1_pr_query = '%.6f <= mz <= %.6f' % (mz_lib - ms1_delta, mz_lib + ms1_delta)
+    if not isinstance(dda_index, DDAIndex):
+        if isinstance(spectra_dct, SpectraStore) and isinstance(spectra_dct.dda_index, DDAIndex):
+            dda_index = spectra_dct.dda_index
+        else:
+            dda_index = DDAIndex(scan_info_df)
+
+    _ms2_row = dda_index.get_scan_row(ms2_scan_id, func_id, mz)
+    if _ms2_row >= 0:
+        ms2_spec_idx = dda_index.spec_index[_ms2_row]
+        ms2_dda_idx = dda_index.dda_event_idx[_ms2_row]
+        ms2_function = dda_index.dda_rank[_ms2_row]
+        ms2_scan_id = dda_index.scan_number[_ms2_row]
+        ms2_rt = dda_index.scan_time[_ms2_row]
+
+        print('%.6f @ DDA#: %.0f | Total scan id: %.0f | DDA_Rank: %.0f | Scan ID: %.0f | RT: %.4f'
+              % (mz, ms2_dda_idx, ms2_spec_idx, ms2_function, ms2_scan_id, ms2_rt))
+
+        # get spectra_df of corresponding MS survey scan
+        _ms1_row = dda_index.get_ms1_row(ms2_dda_idx)
+
+        if _ms1_row >= 0 and ms2_function <= function_max:
+            ms1_spec_idx = dda_index.spec_index[_ms1_row]
+            ms1_rt = dda_index.scan_time[_ms1_row]
+            if ms1_spec_idx in spectra_dct:
+                ms1_df = spectra_dct[ms1_spec_idx]
+                ms1_df = ms1_df.query('i > 0')
+                ms1_df = ms1_df.sort_values(by='i', ascending=False).reset_index(drop=True)
+                ms1_delta = mz_lib * ms1_precision
+                if vendor == 'thermo':
+                    ms1_pr_query = '%.7f <= mz <= %.7f' % (mz_lib - ms1_delta, mz_lib + ms1_delta)
+                else:
+                    ms1_pr_query = '%.6f <= mz <= %.6f' % (mz_lib - ms1_delta, mz_lib + ms1_delta)
+
+                ms1_pr_df = ms1_df.query(ms1_pr_query).copy()
+                # ms1_pr_df.is_copy = False
 
-                    ms1_pr_df = ms1_df.query(ms1_pr_query).copy()
-                    # ms1_pr_df.is_copy = False
+                if not ms1_pr_df.empty:
+                    # ms1_pr_df.loc[:, 'mz_xic'] = ms1_pr_df['mz'].round(4)
+                    ms1_pr_df['mz'] = ms1_pr_df['mz'].round(6)
 
                     if not ms1_pr_df.empty:
-                        # ms1_pr_df.loc[:, 'mz_xic'] = ms1_pr_df['mz'].round(4)
-                        ms1_pr_df['mz'] = ms1_pr_df['mz'].round(6)
-
-                        if not ms1_pr_df.empty:
-                            # print('Number of MS1 pr mz in list:', ms1_pr_df.shape[0])
-                            ms1_pr_df['ppm'] = abs(1e6 * (ms1_pr_df['mz'] - mz_lib) / mz_lib)
-                            # select best intensity in the precursor ppm range. Priority: i > ppm
-                            # ms1_pr_df = ms1_pr_df.sort_values(by=['i', 'ppm'], ascending=[False, True])
-                            ms1_pr_df = ms1_pr_df.sort_values(by='i', ascending=False)
-                            # print('ms1_pr_df')
-                            # print(ms1_pr_df)
-                            ms1_pr_se = ms1_pr_df.iloc[0]
-                            ms1_mz = ms1_pr_se['mz']
-                            ms1_i = ms1_pr_se['i']
-                            ms1_pr_ppm = 1e6 * (ms1_mz - mz_lib) / mz_lib
-                            # get spectra_df of corresponding MS2 DDA scan
-                            if ms2_spec_idx in spectra_dct:
-                                ms2_df = spectra_dct[ms2_spec_idx]
-                                ms2_df = ms2_df.query('i > 0').copy()
-                                # ms2_df.is_copy = False
-                                ms2_df.sort_values(by='i', ascending=False, inplace=True)
-                                ms2_df.reset_index(drop=True, inplace=True)
-                                try:
-                                    ms2_df.drop('rt', axis=1, inplace=True)
-                                except (KeyError, ValueError):
-                                    # print('[INFO] !!! MS2_df do not have rt column...')
-                                    pass
-                            else:
-                                print('[WARNING] !!! MS2 spectra not in the list ...')
+                        # print('Number of MS1 pr mz in list:', ms1_pr_df.shape[0])
+                        ms1_pr_df['ppm'] = abs(1e6 * (ms1_pr_df['mz'] - mz_lib) / mz_lib)
+                        # select best intensity in the precursor ppm range. Priority: i > ppm
+                        # ms1_pr_df = ms1_pr_df.sort_values(by=['i', 'ppm'], ascending=[False, True])
+                        ms1_pr_df = ms1_pr_df.sort_values(by='i', ascending=False)
+                        # print('ms1_pr_df')
+                        # print(ms1_pr_df)
+                        ms1_pr_se = ms1_pr_df.iloc[0]
+                        ms1_mz = ms1_pr_se['mz']
+                        ms1_i = ms1_pr_se['i']
+                        ms1_pr_ppm = 1e6 * (ms1_mz - mz_lib) / mz_lib
+                        # get spectra_df of corresponding MS2 DDA scan
+                        if ms2_spec_idx in spectra_dct:
+                            ms2_df = spectra_dct[ms2_spec_idx]
+                            ms2_df = ms2_df.query('i > 0').copy()
+                            # ms2_df.is_copy = False
+                            ms2_df.sort_values(by='i', ascending=False, inplace=True)
+                            ms2_df.reset_index(drop=True, inplace=True)
+                            try:
+                                ms2_df.drop('rt', axis=1, inplace=True)
+                            except (KeyError, ValueError):
+                                # print('[INFO] !!! MS2_df do not have rt column...')
+                                pass
                         else:
-                            print('[WARNING] !!! Precursor m/z in MS1 not in the list ...')
+                            print('[WARNING] !!! MS2 spectra not in the list ...')
                     else:
                         print('[WARNING] !!! Precursor m/z in MS1 not in the list ...')
                 else:
-                    print('[WARNING] !!! MS1 spectra not in the list ...')
+                    print('[WARNING] !!! Precursor m/z in MS1 not in the list ...')
+            else:
+                print('[WARNING] !!! MS1 spectra not in the list ...')
 
-                print('[INFO] --> MS1 @ DDA#:%.0f | Total scan id:%.0f' % (ms2_dda_idx, ms1_spec_idx))
-                print('[INFO] --> MS2 @ DDA#:%.0f | Total scan id:%.0f' % (ms2_dda_idx, ms2_spec_idx))
-                # print('--------------- NEXT _idx')
+            print('[INFO] --> MS1 @ DDA#:%.0f | Total scan id:%.0f' % (ms2_dda_idx, ms1_spec_idx))
+            print('[INFO] --> MS2 @ DDA#:%.0f | Total scan id:%.0f' % (ms2_dda_idx, ms2_spec_idx))
+            # print('--------------- NEXT _idx')
 
     else:
         print('[WARNING] !!! DO NOT have this precursor pr_mz == %f and func_id == %f and scan_id == %f !!!'
@@ -321,42 +394,80 @@ def get_spectra(mz, mz_lib, func_id, ms2_scan_id, ms1_obs_mz_lst,
     return spec_info_dct
 
 
-def get_xic_from_pl(xic_ms1_lst: list, ms1_xic_df, xic_ppm, os_type='windows', queue=None):
+def get_xic_from_pl(xic_ms1_lst: list, ms1_xic_df: pd.DataFrame, xic_ppm: int, os_type: str = 'windows',
+                    queue=None) -> Dict[float, pd.DataFrame]:
     """
+    Extract the XIC of all precursor m/z from the MS1 XIC table in one pass.
+    The MS1 XIC table is sorted by mz once and all m/z windows are located by searchsorted.
+    For each retention time only the best peak is kept, sorted by intensity then by abs ppm.
 
     Args:
-        xic_ms1_lst (list):
-        ms1_xic_df:
-        xic_ppm:
-        os_type:
-        queue:
+        xic_ms1_lst (list): list of precursor m/z for XIC, m/z <= 0 are ignored
+        ms1_xic_df (pd.DataFrame): the MS1 XIC table from extract_mzml with columns ['mz', 'i', 'rt']
+        xic_ppm (int): ppm window of the XIC
+        os_type (str): 'windows', 'linux_single' or 'linux_multi'
+        queue (multiprocessing.Queue): put the results to the queue for 'linux_multi'
 
     Returns:
+        ms1_xic_dct (dict): {xic_mz: pd.DataFrame} with columns ['mz', 'i', 'rt', 'ppm']
 
     """
 
     ms1_xic_dct = {}
 
-    # use numba parallel processing to calculate all range faster
-    xic_ms1_l_lst = ppm_window_para(xic_ms1_lst, -1 * xic_ppm)
-    xic_ms1_h_lst = ppm_window_para(xic_ms1_lst, xic_ppm)
-    xic_ms_info_lst = list(zip(xic_ms1_lst, xic_ms1_l_lst, xic_ms1_h_lst))
-
-    for _xic_mz_info in xic_ms_info_lst:
-        _xic_mz = _xic_mz_info[0]
-        ms1_low = _xic_mz_info[1]
-        ms1_high = _xic_mz_info[2]
-        if _xic_mz > 0:
-            ms1_query = f'{ms1_low} <= mz <= {ms1_high}'
-            _found_ms1_df = ms1_xic_df.query(ms1_query).copy()
-            # There may be many peaks fit the requirements
-            # sort the best fit by intensity and abs_ppm
-            _found_ms1_df.loc[:, 'ppm'] = 1e6 * (_found_ms1_df['mz'] - _xic_mz) / _xic_mz
-            _found_ms1_df.loc[:, 'ppm'] = _found_ms1_df['ppm'].abs()
-            _found_ms1_df.loc[:, 'mz'] = _xic_mz
-            _found_ms1_df.sort_values(by=['rt', 'i', 'ppm'], ascending=[True, False, True], inplace=True)
-            _found_ms1_df.drop_duplicates(subset=['rt'], keep='first', inplace=True)
-            ms1_xic_dct[_xic_mz] = _found_ms1_df
+    xic_mz_lst = [_xic_mz for _xic_mz in xic_ms1_lst if _xic_mz > 0]
+    if xic_mz_lst:
+        # use numba parallel processing to calculate all range faster
+        xic_mz_arr = np.array(xic_mz_lst, dtype=np.float64)
+        xic_ms1_l_arr = ppm_window_para(xic_mz_arr, -1 * xic_ppm)
+        xic_ms1_h_arr = ppm_window_para(xic_mz_arr, xic_ppm)
+
+        # peaks with the same mz keep the original order
+        if ms1_xic_df['mz'].is_monotonic_increasing:
+            sorted_pos_arr = np.arange(ms1_xic_df.shape[0])
+        else:
+            sorted_pos_arr = np.argsort(ms1_xic_df['mz'].values, kind='mergesort')
+        mz_arr = ms1_xic_df['mz'].values
+        i_arr = ms1_xic_df['i'].values
+        rt_arr = ms1_xic_df['rt'].values
+        sorted_mz_arr = mz_arr[sorted_pos_arr]
+
+        # the windows are compared in the dtype of mz column as in DataFrame.query
+        start_arr = np.searchsorted(sorted_mz_arr, xic_ms1_l_arr.astype(mz_arr.dtype), side='left')
+        end_arr = np.searchsorted(sorted_mz_arr, xic_ms1_h_arr.astype(mz_arr.dtype), side='right')
+        len_arr = np.maximum(end_arr - start_arr, 0)
+        xic_idx_arr = np.repeat(np.arange(len(xic_mz_lst)), len_arr)
+        peak_pos_arr = sorted_pos_arr[np.repeat(start_arr, len_arr) + np.arange(len_arr.sum())
+                                      - np.repeat(np.cumsum(len_arr) - len_arr, len_arr)]
+
+        # abs ppm in the dtype of mz column
+        peak_mz_arr = mz_arr[peak_pos_arr]
+        peak_xic_arr = xic_mz_arr[xic_idx_arr].astype(peak_mz_arr.dtype)
+        peak_ppm_arr = np.abs(peak_mz_arr.dtype.type(1e6) * (peak_mz_arr - peak_xic_arr) / peak_xic_arr)
+        peak_i_arr = i_arr[peak_pos_arr]
+        peak_rt_arr = rt_arr[peak_pos_arr]
+
+        # sort the best fit by rt, intensity and abs_ppm, keep the first peak of each rt
+        order_arr = np.lexsort((peak_pos_arr, peak_ppm_arr, -peak_i_arr, peak_rt_arr, xic_idx_arr))
+        xic_idx_arr = xic_idx_arr[order_arr]
+        peak_rt_arr = peak_rt_arr[order_arr]
+        keep_arr = np.ones(order_arr.size, dtype=bool)
+        keep_arr[1:] = (xic_idx_arr[1:] != xic_idx_arr[:-1]) | (peak_rt_arr[1:] != peak_rt_arr[:-1])
+        order_arr = order_arr[keep_arr]
+        xic_idx_arr = xic_idx_arr[keep_arr]
+        peak_pos_arr = peak_pos_arr[order_arr]
+        peak_i_arr = peak_i_arr[order_arr]
+        peak_rt_arr = peak_rt_arr[keep_arr]
+        peak_ppm_arr = peak_ppm_arr[order_arr]
+
+        # all XIC in one table, each XIC is a slice of it
+        xic_all_df = pd.DataFrame(data={'mz': xic_mz_arr[xic_idx_arr], 'i': peak_i_arr, 'rt': peak_rt_arr,
+                                        'ppm': peak_ppm_arr},
+                                  columns=['mz', 'i', 'rt', 'ppm'], index=ms1_xic_df.index.values[peak_pos_arr])
+        xic_end_arr = np.searchsorted(xic_idx_arr, np.arange(len(xic_mz_lst)), side='right')
+        xic_start_arr = np.concatenate([[0], xic_end_arr[:-1]])
+        for _xic_idx, _xic_mz in enumerate(xic_mz_lst):
+            ms1_xic_dct[_xic_mz] = xic_all_df.iloc[xic_start_arr[_xic_idx]:xic_end_arr[_xic_idx]]
 
     if os_type == 'linux_multi':
         queue.put(ms1_xic_dct)
@@ -364,8 +475,11 @@ def get_xic_from_pl(xic_ms1_lst: list, ms1_xic_df, xic_ppm, os_type='windows', q
         return ms1_xic_dct
 
 
-def get_spec_info(lpp_all_group_key_lst, checked_info_groups, scans_info_df, os_type='windows', queue=None):
+def get_spec_info(lpp_all_group_key_lst, checked_info_groups, scans_info_df, os_type='windows', queue=None,
+                  dda_index=None):
     lpp_spec_info_dct = {}
+    if not isinstance(dda_index, DDAIndex):
+        dda_index = DDAIndex(scans_info_df)
     # TODO (Dasha: georgia.angelidou@uni-leipzig.de): reduce the table size be checking even and odd number spectra
     for group_key in lpp_all_group_key_lst:
         _subgroup_df = checked_info_groups.get_group(group_key)
@@ -375,9 +489,7 @@ def get_spec_info(lpp_all_group_key_lst, checked_info_groups, scans_info_df, os_
         _usr_ms2_dda_rank = _samemz_se['DDA_rank']
         _usr_ms2_scan_id = _samemz_se['scan_number']
         _usr_mz_lib = _samemz_se['Lib_mz']
-        _tmp_chk_df = scans_info_df.query('MS2_PR_mz == %.6f and DDA_rank == %i and scan_number == %i'
-                                          % (_usr_ms2_pr_mz, _usr_ms2_dda_rank, _usr_ms2_scan_id))
-        if _tmp_chk_df.shape[0] == 1:
+        if dda_index.get_scan_row(_usr_ms2_scan_id, _usr_ms2_dda_rank, _usr_ms2_pr_mz) >= 0:
             _tmp_info_dct = {'MS2_PR_mz': _usr_ms2_pr_mz, 'DDA_rank': _usr_ms2_dda_rank,
                              'scan_number': _usr_ms2_scan_id, 'Lib_mz': _usr_mz_lib}
             lpp_spec_info_dct[group_key] = _tmp_info_dct
@@ -393,9 +505,9 @@ if __name__ == '__main__':
     usr_dda_top = 12
     usr_rt_range = [25, 27]
 
-    usr_scan_info_df, usr_spec_pl, usr_ms1_xic_df = extract_mzml(usr_mzml, usr_rt_range, usr_dda_top, vendor='N/A')
-    usr_scan_info_df, usr_spec_pl, usr_ms1_xic_df = extract_mzml(usr_mzml, usr_rt_range, usr_dda_top)
+    usr_scan_info_df, usr_spec_store, usr_ms1_xic_df = extract_mzml(usr_mzml, usr_rt_range, usr_dda_top, vendor='N/A')
+    usr_scan_info_df, usr_spec_store, usr_ms1_xic_df = extract_mzml(usr_mzml, usr_rt_range, usr_dda_top)
 
     print(usr_scan_info_df.head(5))
-    print(usr_spec_pl.items)
+    print(usr_spec_store.keys())
     print(usr_ms1_xic_df.head(5))
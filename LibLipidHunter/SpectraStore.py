@@ -0,0 +1,486 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2019  SysMedOs_team @ AG Bioanalytik, University of Leipzig:
+# SysMedOs_team: Zhixu Ni, Georgia Angelidou, Mike Lange, Maria Fedorova
+# LipidHunter is Dual-licensed
+#     For academic and non-commercial use: `GPLv2 License` Please read more information by the following link:
+#         [The GNU General Public License version 2] (https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html)
+#     For commercial use:
+#         please contact the SysMedOs_team by email.
+# Please cite our publication in an appropriate form.
+# Ni, Zhixu, Georgia Angelidou, Mike Lange, Ralf Hoffmann, and Maria Fedorova.
+# "LipidHunter identifies phospholipids by high-throughput processing of LC-MS and shotgun lipidomics datasets."
+# Analytical Chemistry (2017).
+# DOI: 10.1021/acs.analchem.7b01126
+#
+# For more info please contact:
+#     Developer Zhixu Ni zhixu.ni@uni-leipzig.de
+#     Developer Georgia Angelidou georgia.angelidou@uni-leipzig.de
+
+import os
+import shutil
+import tempfile
+import weakref
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+SHARED_ARR_LST = ['spec_index', 'offsets', 'rt', 'ms_level', 'mz', 'i']
+
+# {spec_index .npy file: {spec_index: position}} of the shared stores loaded in this process
+_shared_pos_dct = {}
+
+
+def _remove_share_folder(share_folder: str, owner_pid: int):
+    # only the process created the folder can remove it, worker processes may inherit the finalizer by fork
+    if os.getpid() == owner_pid:
+        shutil.rmtree(share_folder, ignore_errors=True)
+
+
+class DDAIndex(object):
+    """
+    Lookup tables of the scan info to find the scans of each DDA event without querying the scan info DataFrame.
+    Rows are the positions in the scan info table, the values of each row are kept as arrays.
+
+    Args:
+        scan_info_df (pd.DataFrame): the scan info table from extract_mzml
+
+    """
+
+    def __init__(self, scan_info_df: pd.DataFrame):
+
+        self.dda_event_idx = scan_info_df['dda_event_idx'].values.astype(np.int64)
+        self.spec_index = scan_info_df['spec_index'].values.astype(np.int64)
+        self.scan_time = scan_info_df['scan_time'].values.astype(np.float64)
+        self.dda_rank = scan_info_df['DDA_rank'].values.astype(np.int64)
+        self.scan_number = scan_info_df['scan_number'].values.astype(np.int64)
+        self.pr_mz = scan_info_df['MS2_PR_mz'].values.astype(np.float64)
+
+        # dda_event_idx --> row of the first MS1 survey scan, -1 if the DDA event has no MS1 scan
+        ms1_row_arr = np.flatnonzero(self.dda_rank == 0)
+        if self.dda_event_idx.size > 0:
+            self.ms1_row = np.full(int(self.dda_event_idx.max()) + 1, -1, dtype=np.int64)
+        else:
+            self.ms1_row = np.array([], dtype=np.int64)
+        if ms1_row_arr.size > 0:
+            _dda_arr, _first_pos_arr = np.unique(self.dda_event_idx[ms1_row_arr], return_index=True)
+            self.ms1_row[_dda_arr] = ms1_row_arr[_first_pos_arr]
+        # dda_event_idx --> spec_index of the MS1 survey scan, -1 if the DDA event has no MS1 scan
+        self.ms1_spec_index = np.where(self.ms1_row >= 0, self.spec_index[self.ms1_row], -1)
+
+        # (scan_number, DDA_rank) --> list of rows
+        self._scan_row_dct = {}
+        for _row, _scan_key in enumerate(zip(self.scan_number.tolist(), self.dda_rank.tolist())):
+            self._scan_row_dct.setdefault(_scan_key, []).append(_row)
+        # spec_index --> row
+        self._spec_row_dct = {_idx: _row for _row, _idx in enumerate(self.spec_index.tolist())}
+
+    def __len__(self) -> int:
+        return self.spec_index.size
+
+    def get_ms1_row(self, dda_event_idx: int) -> int:
+        """
+        Get the row of the MS1 survey scan of one DDA event.
+
+        Args:
+            dda_event_idx (int): the DDA event index
+
+        Returns:
+            row (int): the row in the scan info table, -1 if not found
+
+        """
+
+        dda_event_idx = int(dda_event_idx)
+        if 0 <= dda_event_idx < self.ms1_row.size:
+            return int(self.ms1_row[dda_event_idx])
+        else:
+            return -1
+
+    def get_ms1_spec_index(self, dda_event_idx: int) -> int:
+        """
+        Get the spec_index of the MS1 survey scan of one DDA event.
+
+        Args:
+            dda_event_idx (int): the DDA event index
+
+        Returns:
+            spec_index (int): -1 if not found
+
+        """
+
+        _row = self.get_ms1_row(dda_event_idx)
+        if _row >= 0:
+            return int(self.spec_index[_row])
+        else:
+            return -1
+
+    def get_ms1_spec_index_arr(self, dda_event_idx_arr: np.ndarray) -> np.ndarray:
+        """
+        Get the spec_index of the MS1 survey scans of many DDA events at once.
+
+        Args:
+            dda_event_idx_arr (np.ndarray): the DDA event indexes
+
+        Returns:
+            spec_index_arr (np.ndarray): -1 for the ones not found
+
+        """
+
+        dda_event_idx_arr = np.asarray(dda_event_idx_arr).astype(np.int64)
+        spec_index_arr = np.full(dda_event_idx_arr.size, -1, dtype=np.int64)
+        _valid_arr = (dda_event_idx_arr >= 0) & (dda_event_idx_arr < self.ms1_spec_index.size)
+        spec_index_arr[_valid_arr] = self.ms1_spec_index[dda_event_idx_arr[_valid_arr]]
+
+        return spec_index_arr
+
+    def get_scan_row(self, scan_number: int, dda_rank: int, pr_mz: float = None) -> int:
+        """
+        Get the row of one scan by scan_number and DDA_rank.
+        If pr_mz is set, only the scan with MS2_PR_mz equal to the pr_mz in 6 decimals is returned.
+
+        Args:
+            scan_number (int): the scan_number
+            dda_rank (int): the DDA_rank
+            pr_mz (float): the MS2 precursor m/z
+
+        Returns:
+            row (int): the row in the scan info table, -1 if not found or not unique
+
+        """
+
+        _row_lst = self._scan_row_dct.get((int(scan_number), int(dda_rank)), [])
+        if pr_mz is not None:
+            pr_mz = float('%.6f' % pr_mz)
+            _row_lst = [_row for _row in _row_lst if self.pr_mz[_row] == pr_mz]
+
+        if len(_row_lst) == 1:
+            return _row_lst[0]
+        else:
+            return -1
+
+    def get_spec_row(self, spec_index: int) -> int:
+        """
+        Get the row of one scan by spec_index.
+
+        Args:
+            spec_index (int): the spec_index
+
+        Returns:
+            row (int): the row in the scan info table, -1 if not found
+
+        """
+
+        return self._spec_row_dct.get(int(spec_index), -1)
+
+
+class SpectraStore(object):
+    """
+    Columnar storage of all spectra extracted from one mzML file.
+    The peaks of all scans are kept in two contiguous arrays of mz and i, the peaks of each scan are located by the
+    offsets array. Per scan access returns views on the arrays, no data is copied.
+    The store can be used in place of the dict of spectra DataFrames {spec_index: pd.DataFrame}, the DataFrame of
+    one scan is only generated on request by store[spec_index].
+    After share(), all arrays are memory mapped from .npy files. A shared store is sent to worker processes as
+    file paths and the positions of the selected scans only, all workers map the same files instead of receiving
+    copies. The scan info table and its DDAIndex are not sent with a shared store, the workers receive them once as
+    static data of the HunterPool.
+
+    Args:
+        spec_idx_arr (np.ndarray): spec_index of each stored scan
+        mz_arr (np.ndarray): mz of all peaks
+        i_arr (np.ndarray): i of all peaks
+        offset_arr (np.ndarray): position of the first peak of each scan, has one element more than spec_idx_arr
+        rt_arr (np.ndarray): scan time of each stored scan in minutes
+        ms_level_arr (np.ndarray): MS level of each stored scan
+        scan_info_df (pd.DataFrame): the scan info table of the same mzML
+        dda_index (DDAIndex): lookup tables of scan_info_df, generated from scan_info_df if not set
+
+    """
+
+    def __init__(self, spec_idx_arr: np.ndarray, mz_arr: np.ndarray, i_arr: np.ndarray, offset_arr: np.ndarray,
+                 rt_arr: np.ndarray, ms_level_arr: np.ndarray, scan_info_df: pd.DataFrame = None,
+                 dda_index: DDAIndex = None):
+
+        self.spec_index = np.asarray(spec_idx_arr, dtype=np.int64)
+        self.mz = mz_arr
+        self.i = i_arr
+        self.offsets = np.asarray(offset_arr, dtype=np.int64)
+        self.rt = np.asarray(rt_arr, dtype=np.float64)
+        self.ms_level = np.asarray(ms_level_arr, dtype=np.int8)
+        if isinstance(scan_info_df, pd.DataFrame):
+            self.scan_info = scan_info_df
+        else:
+            self.scan_info = pd.DataFrame()
+        if isinstance(dda_index, DDAIndex):
+            self.dda_index = dda_index
+        elif not self.scan_info.empty:
+            self.dda_index = DDAIndex(self.scan_info)
+        else:
+            self.dda_index = None
+
+        self._pos_dct = {_idx: _pos for _pos, _idx in enumerate(self.spec_index.tolist())}
+        self._share_file_dct = {}
+
+    @classmethod
+    def from_lists(cls, spec_idx_lst: List[int], mz_arr_lst: List[np.ndarray], i_arr_lst: List[np.ndarray],
+                   rt_lst: List[float], ms_level_lst: List[int], scan_info_df: pd.DataFrame = None,
+                   dda_index: DDAIndex = None):
+        """
+        Build the store from the peak arrays collected scan by scan. All peaks are concatenated only once.
+
+        Args:
+            spec_idx_lst (list): spec_index of each scan
+            mz_arr_lst (list): list of mz arrays, one per scan
+            i_arr_lst (list): list of i arrays, one per scan
+            rt_lst (list): scan time of each scan
+            ms_level_lst (list): MS level of each scan
+            scan_info_df (pd.DataFrame): the scan info table of the same mzML
+            dda_index (DDAIndex): lookup tables of scan_info_df
+
+        Returns:
+            SpectraStore
+
+        """
+
+        offset_arr = np.zeros(len(spec_idx_lst) + 1, dtype=np.int64)
+        if spec_idx_lst:
+            offset_arr[1:] = np.cumsum([len(_mz_arr) for _mz_arr in mz_arr_lst])
+            mz_arr = np.concatenate(mz_arr_lst)
+            i_arr = np.concatenate(i_arr_lst)
+        else:
+            mz_arr = np.array([], dtype=np.float64)
+            i_arr = np.array([], dtype=np.float64)
+
+        return cls(spec_idx_lst, mz_arr, i_arr, offset_arr, rt_lst, ms_level_lst, scan_info_df=scan_info_df,
+                   dda_index=dda_index)
+
+    def __getstate__(self) -> dict:
+        state_dct = self.__dict__.copy()
+        if self.is_shared:
+            # shared arrays are sent as file paths, the selected scans as positions or None for all scans
+            for _arr in self._share_file_dct:
+                state_dct[_arr] = None
+            if len(self._pos_dct) == self.spec_index.size:
+                state_dct['_pos_dct'] = None
+            else:
+                state_dct['_pos_dct'] = self._get_pos_arr()
+            state_dct['scan_info'] = None
+            state_dct['dda_index'] = None
+
+        return state_dct
+
+    def __setstate__(self, state_dct: dict):
+        self.__dict__.update(state_dct)
+        if self.is_shared:
+            for _arr, _arr_file in self._share_file_dct.items():
+                setattr(self, _arr, np.load(_arr_file, mmap_mode='r'))
+            _spec_index_file = self._share_file_dct['spec_index']
+            if _spec_index_file not in _shared_pos_dct:
+                # only the store of the current run is kept
+                _shared_pos_dct.clear()
+                _shared_pos_dct[_spec_index_file] = {_idx: _pos for _pos, _idx in enumerate(self.spec_index.tolist())}
+            if self._pos_dct is None:
+                self._pos_dct = _shared_pos_dct[_spec_index_file]
+            else:
+                self._pos_dct = {int(self.spec_index[_pos]): _pos for _pos in self._pos_dct.tolist()}
+            self.scan_info = pd.DataFrame()
+
+    def __len__(self) -> int:
+        return len(self._pos_dct)
+
+    def __contains__(self, spec_idx) -> bool:
+        return spec_idx in self._pos_dct
+
+    def __iter__(self):
+        return iter(self._pos_dct)
+
+    def __getitem__(self, spec_idx) -> pd.DataFrame:
+        if spec_idx in self._pos_dct:
+            return self.get_spec_df(spec_idx)
+        else:
+            raise KeyError(spec_idx)
+
+    def keys(self) -> List[int]:
+        return list(self._pos_dct.keys())
+
+    def items(self):
+        for _spec_idx in self._pos_dct:
+            yield _spec_idx, self.get_spec_df(_spec_idx)
+
+    def get(self, spec_idx, default=None) -> Union[pd.DataFrame, None]:
+        if spec_idx in self._pos_dct:
+            return self.get_spec_df(spec_idx)
+        else:
+            return default
+
+    @property
+    def peak_count(self) -> int:
+        pos_arr = self._get_pos_arr()
+        return int((self.offsets[pos_arr + 1] - self.offsets[pos_arr]).sum())
+
+    @property
+    def is_shared(self) -> bool:
+        return len(self._share_file_dct) > 0
+
+    def _get_pos_arr(self) -> np.ndarray:
+        return np.array(sorted(self._pos_dct.values()), dtype=np.int64)
+
+    def share(self, share_folder: str = None) -> dict:
+        """
+        Publish the arrays as memory mapped .npy files, so that the store can be sent to worker processes
+        without copying the peaks. Arrays already mapped from .npy files, e.g. loaded from SpectraCache, are used
+        directly. A temporary folder is used by default and removed together with this store.
+
+        Args:
+            share_folder (str): folder to save the .npy files
+
+        Returns:
+            share_file_dct (dict): {array name: .npy file path}
+
+        """
+
+        if self.is_shared:
+            return self._share_file_dct
+
+        share_file_dct = {}
+        for _arr in SHARED_ARR_LST:
+            _np_arr = getattr(self, _arr)
+            _arr_file = getattr(_np_arr, 'filename', None)
+            if isinstance(_np_arr, np.memmap) and _arr_file and _arr_file.endswith('.npy'):
+                share_file_dct[_arr] = _arr_file
+
+        if len(share_file_dct) < len(SHARED_ARR_LST):
+            if share_folder is None:
+                share_folder = tempfile.mkdtemp(prefix='lipidhunter_spectra_')
+                weakref.finalize(self, _remove_share_folder, share_folder, os.getpid())
+            else:
+                os.makedirs(share_folder, exist_ok=True)
+            for _arr in SHARED_ARR_LST:
+                if _arr not in share_file_dct:
+                    _arr_file = os.path.join(share_folder, '%s.npy' % _arr)
+                    np.save(_arr_file, getattr(self, _arr))
+                    share_file_dct[_arr] = _arr_file
+
+        for _arr, _arr_file in share_file_dct.items():
+            setattr(self, _arr, np.load(_arr_file, mmap_mode='r'))
+        self._share_file_dct = share_file_dct
+
+        return share_file_dct
+
+    def get_arrays(self, spec_idx: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the peaks of one scan as views of the stored arrays, the peaks keep the order of extract_mzml.
+        The returned arrays must not be modified.
+
+        Args:
+            spec_idx (int): spec_index of the scan
+
+        Returns:
+            mz_arr (np.ndarray): view of mz
+            i_arr (np.ndarray): view of i
+
+        """
+
+        _pos = self._pos_dct[spec_idx]
+        _start = self.offsets[_pos]
+        _end = self.offsets[_pos + 1]
+
+        return self.mz[_start:_end], self.i[_start:_end]
+
+    def get_rt(self, spec_idx: int) -> float:
+        return float(self.rt[self._pos_dct[spec_idx]])
+
+    def get_ms_level(self, spec_idx: int) -> int:
+        return int(self.ms_level[self._pos_dct[spec_idx]])
+
+    def get_spec_df(self, spec_idx: int) -> pd.DataFrame:
+        """
+        Generate the spectrum DataFrame of one scan in the same format as in the former spectra dict.
+        MS1 spectra have columns ['mz', 'i', 'rt'], MS2 spectra have columns ['mz', 'i'].
+
+        Args:
+            spec_idx (int): spec_index of the scan
+
+        Returns:
+            spec_df (pd.DataFrame)
+
+        """
+
+        _pos = self._pos_dct[spec_idx]
+        mz_arr, i_arr = self.get_arrays(spec_idx)
+        if self.ms_level[_pos] == 1:
+            spec_df = pd.DataFrame(data={'mz': mz_arr, 'i': i_arr}, columns=['mz', 'i'])
+            spec_df.loc[:, 'rt'] = self.rt[_pos]
+        else:
+            spec_df = pd.DataFrame(data={'mz': mz_arr, 'i': i_arr}, columns=['mz', 'i'])
+
+        return spec_df
+
+    def subset(self, spec_idx_lst: List[int]):
+        """
+        Get a new SpectraStore with the selected scans only, e.g. to send part of the spectra to a worker.
+        The subset of a shared store is a view on the same memory mapped arrays.
+
+        Args:
+            spec_idx_lst (list): list of spec_index, the ones not in this store are ignored
+
+        Returns:
+            SpectraStore
+
+        """
+
+        sel_idx_lst = [_idx for _idx in spec_idx_lst if _idx in self._pos_dct]
+        if self.is_shared:
+            sub_store = SpectraStore(self.spec_index, self.mz, self.i, self.offsets, self.rt, self.ms_level,
+                                     scan_info_df=self.scan_info, dda_index=self.dda_index)
+            sub_store._pos_dct = {_idx: self._pos_dct[_idx] for _idx in sel_idx_lst}
+            sub_store._share_file_dct = self._share_file_dct
+            return sub_store
+
+        sel_pos_lst = [self._pos_dct[_idx] for _idx in sel_idx_lst]
+        mz_arr_lst = []
+        i_arr_lst = []
+        for _idx in sel_idx_lst:
+            _mz_arr, _i_arr = self.get_arrays(_idx)
+            mz_arr_lst.append(_mz_arr)
+            i_arr_lst.append(_i_arr)
+
+        sub_store = SpectraStore.from_lists(sel_idx_lst, mz_arr_lst, i_arr_lst, self.rt[sel_pos_lst].tolist(),
+                                            self.ms_level[sel_pos_lst].tolist(), scan_info_df=self.scan_info,
+                                            dda_index=self.dda_index)
+
+        return sub_store
+
+    def get_ms1_xic_df(self) -> pd.DataFrame:
+        """
+        Merge all MS1 spectra into one table of mz, i and rt for XIC extraction.
+        The table is sorted by mz, peaks with the same mz keep the order of scans.
+        The index of each spectrum is kept as in the spectrum DataFrame.
+
+        Returns:
+            ms1_xic_df (pd.DataFrame)
+
+        """
+
+        ms1_pos_arr = self._get_pos_arr()
+        ms1_pos_arr = ms1_pos_arr[self.ms_level[ms1_pos_arr] == 1]
+        if ms1_pos_arr.size == 0:
+            return pd.DataFrame()
+
+        start_arr = self.offsets[ms1_pos_arr]
+        len_arr = self.offsets[ms1_pos_arr + 1] - start_arr
+        peak_pos_arr = np.arange(len_arr.sum()) - np.repeat(np.cumsum(len_arr) - len_arr, len_arr)
+        peak_idx_arr = np.repeat(start_arr, len_arr) + peak_pos_arr
+        mz_order_arr = np.argsort(self.mz[peak_idx_arr], kind='mergesort')
+        peak_idx_arr = peak_idx_arr[mz_order_arr]
+        peak_pos_arr = peak_pos_arr[mz_order_arr]
+
+        ms1_xic_df = pd.DataFrame(data={'mz': self.mz[peak_idx_arr], 'i': self.i[peak_idx_arr],
+                                        'rt': np.repeat(self.rt[ms1_pos_arr], len_arr)[mz_order_arr]},
+                                  columns=['mz', 'i', 'rt'], index=peak_pos_arr)
+
+        return ms1_xic_df
+
+    def to_dict(self) -> Dict[int, pd.DataFrame]:
+        return {_spec_idx: self.get_spec_df(_spec_idx) for _spec_idx in self._pos_dct}
@@ -28,14 +28,27 @@ import configparser
 # required to perform multiprocessing
 import multiprocessing
 
-from LibLipidHunter.Hunter_Core import huntlipids
+from LibLipidHunter.Hunter_Core import huntlipids, huntlipids_multi
+from LibLipidHunter.LipidMasterCache import LipidMasterCache
+from LibLipidHunter.PanelPlotter import find_plot_params, render_plot_params
+from LibLipidHunter.SpectraCache import SpectraCache
 
 
 def main(argv):
     """
     To run LipidHunter from command line, please generate one configuration file by GUI mode and use it as a template.
     You can load each time one configuration file only.
+    To identify several lipid classes from the same mzML in one run, add hunt_targets to the configuration file.
+    e.g. hunt_targets = TG:[M+NH4]+; TG:[M+Na]+
+         score_cfg_tg = ./ConfigurationFiles/2-Score_weight_TG.xlsx
+         score_cfg_tg_na = ./ConfigurationFiles/2-Score_weight_TG_Na.xlsx
     :param argv: -i <input LipidHunter configuration file in .txt format>
+                 --no-cache to parse the mzML and compose the lipid master table without using the caches
+                 --clear-cache to remove all cached spectra and lipid master tables
+                 --lazy-img to save the plot inputs of each image instead of the image
+                 --preview-img to save low resolution preview images and the plot inputs of each image
+                 --render <output folder or .plot.npz plot input file> to render the images saved by --lazy-img
+                          or the full resolution images of --preview-img, the plot inputs are loaded without pickle
     """
 
     is_successful = False
@@ -46,13 +59,21 @@ def main(argv):
     i_type_key_lst = ['ms_th', 'ms2_th', 'hg_th', 'ms_ppm', 'ms2_ppm', 'hg_ppm', 'dda_top', 'sn_ratio',
                       'core_number', 'max_ram', 'img_dpi', 'ms_max']
     f_type_key_lst = ['rt_start', 'rt_end', 'mz_start', 'mz_end', 'pr_window', 'ms2_infopeak_threshold',
-                      'ms2_hginfopeak_threshold', 'score_filter', 'isotope_score_filter', 'rank_score_filter']
-    b_type_key_lst = ['rank_score', 'fast_isotope', 'tag_all_sn']
+                      'ms2_hginfopeak_threshold', 'score_filter', 'isotope_score_filter', 'rank_score_filter',
+                      'spectra_cache_size', 'lipid_master_cache_size']
+    b_type_key_lst = ['rank_score', 'fast_isotope', 'tag_all_sn', 'spectra_cache', 'lipid_master_cache',
+                      'lazy_img', 'preview_img']
 
     save_img = True
+    use_cache = True
+    clear_cache = False
+    lazy_img = False
+    preview_img = False
+    render_path = ''
 
     try:
-        opts, args = getopt.getopt(argv, 'hi:o:n', ['infile='])
+        opts, args = getopt.getopt(argv, 'hi:o:n', ['infile=', 'no-cache', 'clear-cache', 'lazy-img',
+                                                    'preview-img', 'render='])
     except getopt.GetoptError:
         print('Error: cmd_lipidhunter.py -i <input LipidHunter configuration file in .txt format>')
         return is_successful
@@ -61,11 +82,44 @@ def main(argv):
         if opt == '-h':
             print('python cmd_lipidhunter.py -i <input LipidHunter configuration file in .txt format>')
             print('Use -n to skip output image generation (not recommended).')
+            print('Use --no-cache to parse the mzML and compose the lipid master table without using the caches.')
+            print('Use --clear-cache to remove all cached spectra and lipid master tables.')
+            print('Use --lazy-img to save only the plot inputs of each image and render the images later.')
+            print('Use --preview-img to save low resolution preview images and render the full images later.')
+            print('Use --render <output folder or .plot.npz plot input file> to render the images saved by '
+                  '--lazy-img or the full resolution images of --preview-img.')
             return is_successful
         elif opt in ('-i', '--infile'):
             _cfg_file = arg
         elif opt == '-n':
             save_img = False
+        elif opt == '--no-cache':
+            use_cache = False
+        elif opt == '--clear-cache':
+            clear_cache = True
+        elif opt == '--lazy-img':
+            lazy_img = True
+        elif opt == '--preview-img':
+            preview_img = True
+        elif opt == '--render':
+            render_path = arg
+
+    if render_path:
+        plot_params_path_lst = find_plot_params(render_path)
+        if plot_params_path_lst:
+            img_count = render_plot_params(plot_params_path_lst)
+            print('[OUTPUT] ==> %i images rendered from %s' % (img_count, render_path))
+            is_successful = True
+        else:
+            print('Error: No plot inputs found in %s' % render_path)
+        return is_successful
+
+    if clear_cache:
+        SpectraCache().clear()
+        LipidMasterCache().clear()
+        if not _cfg_file:
+            is_successful = True
+            return is_successful
 
     if isinstance(_cfg_file, str) and len(_cfg_file) > 0:
         print('Input LipidHunter configuration file : ', _cfg_file)
@@ -96,6 +150,17 @@ def main(argv):
                                 cfg_params_dct[param] = False
                         else:
                             cfg_params_dct[param] = _val
+                    if lazy_img is True:
+                        cfg_params_dct['lazy_img'] = True
+                    if preview_img is True:
+                        cfg_params_dct['preview_img'] = True
+                    if use_cache is False:
+                        cfg_params_dct['spectra_cache'] = False
+                        cfg_params_dct['lipid_master_cache'] = False
+                    if clear_cache and 'spectra_cache_folder' in cfg_params_dct:
+                        SpectraCache(cfg_params_dct['spectra_cache_folder']).clear()
+                    if clear_cache and 'lipid_master_cache_folder' in cfg_params_dct:
+                        LipidMasterCache(cfg_params_dct['lipid_master_cache_folder']).clear()
                     print('Load configuration file... Passed ...')
                 else:
                     print('Error: Load configuration file FAILED !!! Configuration file content error !!!')
@@ -141,7 +206,16 @@ def main(argv):
                 except IOError:
                     print('!! Failed to create output folder !!')
         print('Start to process... ', start_time_str)
-        t, log_lst, export_df = huntlipids(cfg_params_dct, error_lst=[], save_fig=save_img)
+        if 'hunt_targets' in cfg_params_dct:
+            target_lst = []
+            for _target_str in cfg_params_dct['hunt_targets'].split(';'):
+                if ':' in _target_str:
+                    _lipid_class, _charge = _target_str.split(':', 1)
+                    target_lst.append((_lipid_class.strip(), _charge.strip()))
+            print('Lipid classes to identify: ', target_lst)
+            t, log_lst, export_dct = huntlipids_multi(cfg_params_dct, target_lst, error_lst=[], save_fig=save_img)
+        else:
+            t, log_lst, export_df = huntlipids(cfg_params_dct, error_lst=[], save_fig=save_img)
         if len(log_lst) > 0:
             for err in log_lst:
                 print('Error:', err)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2019  SysMedOs_team @ AG Bioanalytik, University of Leipzig:
+# SysMedOs_team: Zhixu Ni, Georgia Angelidou, Mike Lange, Maria Fedorova
+# LipidHunter is Dual-licensed
+#     For academic and non-commercial use: `GPLv2 License` Please read more information by the following link:
+#         [The GNU General Public License version 2] (https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html)
+#     For commercial use:
+#         please contact the SysMedOs_team by email.
+# Please cite our publication in an appropriate form.
+# Ni, Zhixu, Georgia Angelidou, Mike Lange, Ralf Hoffmann, and Maria Fedorova.
+# "LipidHunter identifies phospholipids by high-throughput processing of LC-MS and shotgun lipidomics datasets."
+# Analytical Chemistry (2017).
+# DOI: 10.1021/acs.analchem.7b01126
+#
+# For more info please contact:
+#     Developer Zhixu Ni zhixu.ni@uni-leipzig.de
+#     Developer Georgia Angelidou georgia.angelidou@uni-leipzig.de
+
+import logging
+import os
+import sys
+import unittest
+
+hunterPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, hunterPath + '/../')
+
+from LibLipidHunter.AbbrElemCalc import ElemCalc, ELEM_CALC, LIPID_HG_ELEM_DCT, calc_exactmass, get_elem_info
+
+log_level = logging.DEBUG
+logging.basicConfig(format='%(asctime)s-%(levelname)s - %(message)s', datefmt='%b-%d@%H:%M:%S', level=log_level)
+logger = logging.getLogger('log')
+
+
+class TestCase_AbbrElemCalc(unittest.TestCase):
+
+    def setUp(self):
+        logger.debug('SETUP TESTS... TestCase_AbbrElemCalc')
+        self.elem_calc = ElemCalc()
+
+    def test_decode_abbr(self):
+        logger.debug('Test decode_abbr...')
+        pl_info_dct = self.elem_calc.decode_abbr('PC(O-36:3)')
+        assert (pl_info_dct['TYPE'], pl_info_dct['LINK'], pl_info_dct['C'], pl_info_dct['DB']) == ('PC', 'O-A-', 36, 3)
+        tg_info_dct = self.elem_calc.decode_abbr('TG(P-52:2)')
+        assert (tg_info_dct['TYPE'], tg_info_dct['LINK']) == ('TG', 'P-A-A-')
+        assert (tg_info_dct['C'], tg_info_dct['DB']) == (52, 2)
+        # FA with and without the 'FA' prefix
+        assert self.elem_calc.decode_abbr('FA18:1') == self.elem_calc.decode_abbr('18:1')
+        assert self.elem_calc.decode_abbr('O-16:0')['LINK'] == 'O-'
+
+    def test_get_formula(self):
+        logger.debug('Test get_formula...')
+        formula, elem_dct = self.elem_calc.get_formula('PE(36:1)', charge='[M-H]-')
+        assert formula == 'C41H79NO8P-'
+        assert elem_dct == {'C': 41, 'H': 79, 'O': 8, 'P': 1, 'N': 1}
+        assert round(self.elem_calc.get_exactmass(elem_dct), 4) == 744.5543
+
+    def test_elem_info_cache(self):
+        logger.debug('Test elem info cache...')
+        get_elem_info.cache_clear()
+        elem_info = self.elem_calc.get_elem_info('PC(36:3)', charge='[M+HCOO]-')
+        assert self.elem_calc.get_elem_info('PC(36:3)', charge='[M+HCOO]-') is elem_info
+        assert get_elem_info.cache_info().hits == 1
+        assert get_elem_info.cache_info().misses == 1
+        assert isinstance(elem_info.elem, tuple)
+        assert elem_info.exactmass == self.elem_calc.get_exactmass(dict(elem_info.elem))
+
+        # the dict from get_formula can be changed without changing the cached result
+        formula, elem_dct = self.elem_calc.get_formula('PC(36:3)', charge='[M+HCOO]-')
+        elem_dct['C'] += 1
+        assert self.elem_calc.get_formula('PC(36:3)', charge='[M+HCOO]-')[1]['C'] == elem_dct['C'] - 1
+
+    def test_get_elem_info_lst(self):
+        logger.debug('Test get_elem_info_lst...')
+        abbr_lst = ['PE(36:1)', 'PE(O-36:1)', 'PE(36:1)', 'PE(P-36:1)']
+        elem_info_lst = self.elem_calc.get_elem_info_lst(abbr_lst, charge='[M-H]-')
+        assert [_info.formula for _info in elem_info_lst] == [self.elem_calc.get_formula(_abbr, charge='[M-H]-')[0]
+                                                              for _abbr in abbr_lst]
+        assert elem_info_lst[0] is elem_info_lst[2]
+
+    def test_shared_tables(self):
+        logger.debug('Test shared tables...')
+        assert self.elem_calc.lipid_hg_elem_dct is ELEM_CALC.lipid_hg_elem_dct is LIPID_HG_ELEM_DCT
+        with self.assertRaises(TypeError):
+            LIPID_HG_ELEM_DCT['PE']['C'] += 1
+        # the neutral lipid is calculated from a copy of the shared head group
+        self.elem_calc.get_neutral_elem('PE(36:1)')['C'] += 1
+        assert LIPID_HG_ELEM_DCT['PE']['C'] == 2
+
+        neutral_elem_dct = dict(get_elem_info('PE(36:1)').elem)
+        for _charge, _elem_delta_dct in [('[M-H]-', {'H': -1}), ('[M+HCOO]-', {'H': 1, 'C': 1, 'O': 2}),
+                                         ('[M+NH4]+', {'N': 1, 'H': 4}), ('[M+Na]+', {'Na': 1})]:
+            _charged_elem_dct = dict(get_elem_info('PE(36:1)', _charge).elem)
+            for _elem in _charged_elem_dct:
+                assert _charged_elem_dct[_elem] == neutral_elem_dct.get(_elem, 0) + _elem_delta_dct.get(_elem, 0)
+        assert calc_exactmass(neutral_elem_dct) == get_elem_info('PE(36:1)').exactmass
+
+    def tearDown(self):
+        logger.debug('TestCase_AbbrElemCalc TEST PASSED!')
+
+
+if __name__ == '__main__':
+    unittest.main()
+    logger.info('TESTS FINISHED!')
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2019  SysMedOs_team @ AG Bioanalytik, University of Leipzig:
+# SysMedOs_team: Zhixu Ni, Georgia Angelidou, Mike Lange, Maria Fedorova
+# LipidHunter is Dual-licensed
+#     For academic and non-commercial use: `GPLv2 License` Please read more information by the following link:
+#         [The GNU General Public License version 2] (https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html)
+#     For commercial use:
+#         please contact the SysMedOs_team by email.
+# Please cite our publication in an appropriate form.
+# Ni, Zhixu, Georgia Angelidou, Mike Lange, Ralf Hoffmann, and Maria Fedorova.
+# "LipidHunter identifies phospholipids by high-throughput processing of LC-MS and shotgun lipidomics datasets."
+# Analytical Chemistry (2017).
+# DOI: 10.1021/acs.analchem.7b01126
+#
+# For more info please contact:
+#     Developer Zhixu Ni zhixu.ni@uni-leipzig.de
+#     Developer Georgia Angelidou georgia.angelidou@uni-leipzig.de
+
+import logging
+import os
+import sys
+import time
+import unittest
+
+import pandas as pd
+
+hunterPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, hunterPath + '/../')
+
+from LibLipidHunter.HunterPool import HunterPool, split_tasks
+
+log_level = logging.DEBUG
+logging.basicConfig(format='%(asctime)s-%(levelname)s - %(message)s', datefmt='%b-%d@%H:%M:%S', level=log_level)
+logger = logging.getLogger('log')
+
+
+def sum_fa(fa_df, fa_lst, offset=0):
+    return fa_df.loc[fa_lst, 'mass'].sum() + offset, os.getpid()
+
+
+def wait_sum_fa(fa_df, fa_lst, wait_time=0.0):
+    time.sleep(wait_time)
+    return fa_df.loc[fa_lst, 'mass'].sum()
+
+
+class TestCase_HunterPool(unittest.TestCase):
+
+    def setUp(self):
+        logger.debug('SETUP TESTS... TestCase_HunterPool')
+        self.fa_df = pd.DataFrame({'mass': [256.24, 282.26, 280.24]}, index=['16:0', '18:1', '18:2'])
+
+    def test_hunter_pool(self):
+        logger.debug('Test HunterPool...')
+        with HunterPool(2) as hunter_pool:
+            with self.assertRaises(ValueError):
+                hunter_pool.submit(sum_fa, {'fa_lst': ['16:0']}, static_key_lst=['fa_df'])
+
+            hunter_pool.set_static({'fa_df': self.fa_df})
+            result_lst = [hunter_pool.submit(sum_fa, {'fa_lst': ['16:0', '18:1'], 'offset': _i},
+                                             static_key_lst=['fa_df']) for _i in range(6)]
+            sum_lst = [_result.get()[0] for _result in result_lst]
+            assert sum_lst == [256.24 + 282.26 + _i for _i in range(6)]
+            # the same worker processes are used by all tasks
+            worker_pid_set = set([_worker.pid for _worker in hunter_pool._pool._pool])
+            assert set([_result.get()[1] for _result in result_lst]).issubset(worker_pid_set)
+
+            # new static data of the next run
+            hunter_pool.set_static({'fa_df': self.fa_df * 2})
+            result = hunter_pool.submit(sum_fa, {'fa_lst': ['18:2']}, static_key_lst=['fa_df']).get()
+            assert result[0] == 560.48
+            assert result[1] in worker_pid_set
+
+            static_folder = hunter_pool._static_folder
+        assert not os.path.isdir(static_folder)
+
+    def test_split_tasks(self):
+        logger.debug('Test split_tasks...')
+        key_lst = ['a', 'b', 'c', 'd', 'e', 'f']
+        task_lst, task_cost_lst = split_tasks(key_lst, [1, 1, 100, 1, 1, 2], 3)
+        # the keys stay in order and the heavy key is planned as its own task
+        assert [_k for _task in task_lst for _k in _task] == key_lst
+        assert ['c'] in task_lst
+        assert sum(task_cost_lst) == 106
+        assert split_tasks(key_lst, [1] * 6, 3) == ([['a', 'b'], ['c', 'd'], ['e', 'f']], [2, 2, 2])
+        assert split_tasks(key_lst, [1] * 6, 10)[0] == [[_k] for _k in key_lst]
+        assert split_tasks([], [], 4) == ([], [])
+
+    def test_submit_all(self):
+        logger.debug('Test HunterPool.submit_all...')
+        with HunterPool(2) as hunter_pool:
+            hunter_pool.set_static({'fa_df': self.fa_df})
+            kwargs_lst = [{'fa_lst': ['16:0']}, {'fa_lst': ['18:1']}, {'fa_lst': ['18:2']}]
+            result_lst = hunter_pool.submit_all(sum_fa, kwargs_lst, cost_lst=[1, 5, 3], static_key_lst=['fa_df'])
+            # results are returned in the same order as the tasks
+            assert [_result.get()[0] for _result in result_lst] == [256.24, 282.26, 280.24]
+
+    def test_submit_all_unordered(self):
+        logger.debug('Test HunterPool.submit_all_unordered...')
+        with HunterPool(2) as hunter_pool:
+            hunter_pool.set_static({'fa_df': self.fa_df})
+            kwargs_lst = [{'fa_lst': ['16:0'], 'wait_time': 1.0}, {'fa_lst': ['18:1'], 'wait_time': 0.1},
+                          {'fa_lst': ['20:4']}]
+            done_lst = []
+            for task_idx, result in hunter_pool.submit_all_unordered(wait_sum_fa, kwargs_lst,
+                                                                     static_key_lst=['fa_df']):
+                assert result.ready()
+                if task_idx == 2:
+                    # the error of a failed task is raised by get()
+                    with self.assertRaises(KeyError):
+                        result.get()
+                else:
+                    done_lst.append((task_idx, result.get()))
+            # the results are received as soon as each task is finished
+            assert done_lst == [(1, 282.26), (0, 256.24)]
+
+    def tearDown(self):
+        logger.debug('TestCase_HunterPool TEST PASSED!')
+
+
+if __name__ == '__main__':
+    unittest.main()
+    logger.info('TESTS FINISHED!')
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2019  SysMedOs_team @ AG Bioanalytik, University of Leipzig:
+# SysMedOs_team: Zhixu Ni, Georgia Angelidou, Mike Lange, Maria Fedorova
+# LipidHunter is Dual-licensed
+#     For academic and non-commercial use: `GPLv2 License` Please read more information by the following link:
+#         [The GNU General Public License version 2] (https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html)
+#     For commercial use:
+#         please contact the SysMedOs_team by email.
+# Please cite our publication in an appropriate form.
+# Ni, Zhixu, Georgia Angelidou, Mike Lange, Ralf Hoffmann, and Maria Fedorova.
+# "LipidHunter identifies phospholipids by high-throughput processing of LC-MS and shotgun lipidomics datasets."
+# Analytical Chemistry (2017).
+# DOI: 10.1021/acs.analchem.7b01126
+#
+# For more info please contact:
+#     Developer Zhixu Ni zhixu.ni@uni-leipzig.de
+#     Developer Georgia Angelidou georgia.angelidou@uni-leipzig.de
+
+import logging
+import os
+import sys
+import unittest
+
+import numpy as np
+from numpy.polynomial.polynomial import Polynomial
+import pandas as pd
+
+hunterPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, hunterPath + '/../')
+
+from LibLipidHunter import IsotopeHunter as isotope_module
+from LibLipidHunter.IsotopeHunter import IsotopeHunter, SortedSpectrum, calc_isotope_ratio
+
+log_level = logging.DEBUG
+logging.basicConfig(format='%(asctime)s-%(levelname)s - %(message)s', datefmt='%b-%d@%H:%M:%S', level=log_level)
+logger = logging.getLogger('log')
+
+
+class TestCase_IsotopeHunter(unittest.TestCase):
+
+    def setUp(self):
+        logger.debug('SETUP TESTS... TestCase_IsotopeHunter')
+        self.iso_hunter = IsotopeHunter()
+        self.formula = 'C41H79NO8P-'  # PE(36:1)-H
+
+    def test_get_isotope_mz(self):
+        logger.debug('Test get_isotope_mz...')
+        elem_dct = self.iso_hunter.get_elements(self.formula)
+        isotope_pattern_df = self.iso_hunter.get_isotope_mz(elem_dct, only_c=False, isotope_number=3)
+        assert isotope_pattern_df.columns.tolist() == ['mz', 'ratio']
+        assert isotope_pattern_df.shape[0] == 4
+        assert abs(isotope_pattern_df.at[0, 'mz'] - self.iso_hunter.get_mono_mz(elem_dct)) < 1e-9
+
+        ploy = (Polynomial((0.9893, 0.0107)) ** 41 * Polynomial((0.999885, 0.0001157)) ** 79
+                * Polynomial((0.99757, 0.00038, 0.00205)) ** 8 * Polynomial((0.99632, 0.00368)))
+        ratio_lst = [round(_coef / ploy.coef[0], 2) for _coef in ploy.coef[:4]]
+        assert isotope_pattern_df['ratio'].tolist() == ratio_lst
+
+    def test_isotope_ratio_cache(self):
+        logger.debug('Test isotope pattern cache...')
+        elem_dct = self.iso_hunter.get_elements(self.formula)
+        calc_isotope_ratio.cache_clear()
+        ratio_tpl = self.iso_hunter.get_isotope_ratio(elem_dct, only_c=True, isotope_number=2)
+        # same composition in another order is taken from the cache
+        rev_elem_dct = dict(reversed(list(elem_dct.items())))
+        assert self.iso_hunter.get_isotope_ratio(rev_elem_dct, only_c=True, isotope_number=2) == ratio_tpl
+        assert calc_isotope_ratio.cache_info().hits == 1
+        assert calc_isotope_ratio.cache_info().misses == 1
+        self.iso_hunter.get_isotope_ratio(elem_dct, only_c=False, isotope_number=2)
+        assert calc_isotope_ratio.cache_info().misses == 2
+
+    def test_precompute_isotope_ratio(self):
+        logger.debug('Test precompute_isotope_ratio...')
+        isotope_ratio_dct = self.iso_hunter.precompute_isotope_ratio([self.formula, self.formula, 'C39H75NO8P-'])
+        # M-2, M+0 with 2 and 3 isotopes and M+2H of each formula
+        assert len(isotope_ratio_dct) == 8
+        elem_dct = self.iso_hunter.get_elements(self.formula)
+        ratio_key = (tuple(sorted(elem_dct.items())), False, 2)
+        assert isotope_ratio_dct[ratio_key] == calc_isotope_ratio(*ratio_key)
+
+        # the table is used before the LRU cache
+        IsotopeHunter.load_isotope_ratio({ratio_key: (1.0, 0.5, 0.2)})
+        try:
+            assert self.iso_hunter.get_isotope_mz(elem_dct)['ratio'].tolist() == [1.0, 0.5, 0.2]
+        finally:
+            IsotopeHunter.load_isotope_ratio({})
+
+    def test_load_isotope_ratio(self):
+        logger.debug('Test load_isotope_ratio...')
+        elem_dct = self.iso_hunter.get_elements(self.formula)
+        ratio_key = (tuple(sorted(elem_dct.items())), False, 2)
+        other_elem_dct = self.iso_hunter.get_elements('C39H75NO8P-')
+        other_ratio_key = (tuple(sorted(other_elem_dct.items())), False, 2)
+
+        # the table of the next run replaces the table of the previous run
+        IsotopeHunter.load_isotope_ratio({ratio_key: (1.0, 0.5, 0.2)})
+        try:
+            assert self.iso_hunter.get_isotope_ratio(elem_dct) == (1.0, 0.5, 0.2)
+            IsotopeHunter.load_isotope_ratio({other_ratio_key: (1.0, 0.4, 0.1)})
+            assert self.iso_hunter.get_isotope_ratio(other_elem_dct) == (1.0, 0.4, 0.1)
+            assert self.iso_hunter.get_isotope_ratio(elem_dct) == calc_isotope_ratio(*ratio_key)
+            assert isotope_module._isotope_ratio_table == {other_ratio_key: (1.0, 0.4, 0.1)}
+        finally:
+            IsotopeHunter.load_isotope_ratio({})
+
+    def test_sorted_spectrum(self):
+        logger.debug('Test SortedSpectrum...')
+        spec_df = pd.DataFrame({'mz': [500.3, 500.1, 500.2, 500.25, 600.0],
+                                'i': [3000.0, 2000.0, 3000.0, 100.0, 50.0]}, dtype='f4')
+        sorted_spec = SortedSpectrum(spec_df)
+        assert sorted_spec.mz_arr.tolist() == sorted(spec_df['mz'].tolist())
+        start, end = sorted_spec.get_window(500.15, 500.3)
+        assert sorted(sorted_spec.mz_arr[start:end].tolist()) == sorted(spec_df.query('500.15 <= mz <= 500.3')['mz'])
+        # the first peak in spec_df is used if the intensity is the same
+        top_i, top_mz = sorted_spec.get_top_peak(500.0, 500.5)
+        assert top_i == 3000 and top_mz == np.float32(500.3)
+        assert sorted_spec.get_max_i(500.0, 500.22) == 3000
+        assert sorted_spec.get_top_peak(700, 800) is None
+        assert sorted_spec.get_max_i(700, 800) is None
+
+    def test_get_isotope_score(self):
+        logger.debug('Test get_isotope_score...')
+        elem_dct = self.iso_hunter.get_elements(self.formula)
+        isotope_pattern_df = self.iso_hunter.get_isotope_mz(elem_dct, only_c=False, isotope_number=3)
+        mono_mz = isotope_pattern_df.at[0, 'mz']
+        rs = np.random.RandomState(1)
+        spec_df = pd.DataFrame({'mz': np.concatenate([isotope_pattern_df['mz'].values, rs.uniform(600, 900, 500)]),
+                                'i': np.concatenate([1e6 * isotope_pattern_df['ratio'].values,
+                                                     rs.uniform(1e3, 1e4, 500)])}, dtype='f4')
+        spec_df = spec_df.sort_values('i', ascending=False).reset_index(drop=True)
+
+        isotope_score_info_dct = self.iso_hunter.get_isotope_score(mono_mz, 1e6, self.formula, spec_df, 1,
+                                                                   ms1_precision=10e-6, score_filter=75)
+        assert isotope_score_info_dct['isotope_score'] > 99
+        isotope_checker_dct = isotope_score_info_dct['isotope_checker_dct']
+        assert sorted(isotope_checker_dct.keys()) == [0, 1, 2]
+        for _i in range(3):
+            assert isotope_checker_dct[_i]['obs_mz'] == np.float32(isotope_pattern_df.at[_i, 'mz'])
+            assert isotope_checker_dct[_i]['obs_i'] == np.float32(1e6 * isotope_pattern_df.at[_i, 'ratio'])
+        assert isotope_score_info_dct['obs_pr_mz'] == np.float32(mono_mz)
+        # M+2 and M+3 of the precursor are removed from the next isotope peaks
+        assert isotope_score_info_dct['deconv_lst'][:2] == [0, 0]
+        assert isotope_score_info_dct['deconv_lst'][2:] == [np.float32(1e6) * isotope_pattern_df.at[2, 'ratio'],
+                                                            np.float32(1e6) * isotope_pattern_df.at[3, 'ratio']]
+
+        # M+1 as precursor is an isotope peak
+        m1_info_dct = self.iso_hunter.get_isotope_score(isotope_pattern_df.at[1, 'mz'], spec_df['i'].iloc[1],
+                                                        self.formula, spec_df, 1, ms1_precision=10e-6)
+        assert m1_info_dct['isotope_score'] == 0
+        assert m1_info_dct['isotope_checker_dct'] == {}
+
+        # peak top check with the same spectrum as SortedSpectrum
+        assert (IsotopeHunter.peak_top_checker(mono_mz, spec_df, ms1_precision=10e-6)
+                == IsotopeHunter.peak_top_checker(mono_mz, SortedSpectrum(spec_df), ms1_precision=10e-6)
+                == (True, 1e6))
+
+    def tearDown(self):
+        logger.debug('TestCase_IsotopeHunter TEST PASSED!')
+
+
+if __name__ == '__main__':
+    unittest.main()
+    logger.info('TESTS FINISHED!')
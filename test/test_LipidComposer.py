@@ -19,13 +19,20 @@
 
 import logging
 import os
+import shutil
 import sys
+import tempfile
 import unittest
 
+import pandas as pd
+
 hunterPath = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, hunterPath + '/../')
 
+from LibLipidHunter.AbbrElemCalc import ElemCalc
 from LibLipidHunter.LipidComposer import LipidComposer
+from LibLipidHunter import LipidMasterCache as lm_cache_module
+from LibLipidHunter.LipidMasterCache import LipidMasterCache
 
 log_level = logging.DEBUG
 logging.basicConfig(format='%(asctime)s-%(levelname)s - %(message)s', datefmt='%b-%d@%H:%M:%S', level=log_level)
@@ -125,6 +132,81 @@ class TestCaseLipidComposer(unittest.TestCase):
         is_sucessful = self.get_lipidmaster(self.tg_param_dct)
         assert is_sucessful is True
 
+    def test_compose_columns(self):
+        composer = LipidComposer()
+        lipid_master_df = composer.compose_lipid(param_dct=self.pe_param_dct, ms2_ppm=30)
+        elem_calc = ElemCalc()
+        nl_water = 2 * 1.0078250321 + 15.9949146221
+        for _idx, _lipid_se in lipid_master_df.sample(n=10, random_state=1).iterrows():
+            _formula, _elem_dct = elem_calc.get_formula(_lipid_se['BULK_ABBR'])
+            assert _lipid_se['FORMULA'] == _formula
+            assert _lipid_se['EXACTMASS'] == elem_calc.get_exactmass(_elem_dct)
+            assert _lipid_se['M_C'] == _elem_dct['C']
+            _chg_formula, _chg_elem_dct = elem_calc.get_formula(_lipid_se['BULK_ABBR'], charge='[M-H]-')
+            assert _lipid_se['[M-H]-_FORMULA'] == _chg_formula
+            assert _lipid_se['[M-H]-_MZ'] == elem_calc.get_exactmass(_chg_elem_dct)
+            _lyso_mz = _lipid_se['EXACTMASS'] - (_lipid_se['FA2_EXACTMASS'] - nl_water) - 1.0078250321
+            assert _lipid_se['[LPL(FA1)-H]-_MZ'] == round(_lyso_mz, 6)
+            assert _lipid_se['[LPL(FA2)-H2O-H]-_ABBR'] == '[LPE(%s)-H2O-H]-' % _lipid_se['FA2'].strip('FA')
+
+    def test_exact_position(self):
+        composer = LipidComposer()
+        tg_param_dct = self.tg_param_dct.copy()
+        tg_param_dct['exact_position'] = 'TRUE'
+        lipid_master_df = composer.compose_lipid(param_dct=tg_param_dct, ms2_ppm=30)
+        assert not lipid_master_df.empty
+        assert lipid_master_df['DISCRETE_ABBR'].is_unique
+        assert (lipid_master_df['M_DB'] == (lipid_master_df['FA1_DB'] + lipid_master_df['FA2_DB']
+                                            + lipid_master_df['FA3_DB'])).all()
+
+    def test_lipid_master_cache(self):
+        composer = LipidComposer()
+        lipid_master_df = composer.compose_lipid(param_dct=self.pe_param_dct, ms2_ppm=30)
+        fa_df = composer.calc_fa_query('PE', self.fa_lst_file, ms2_ppm=30)
+        with tempfile.TemporaryDirectory() as cache_folder:
+            lm_cache = LipidMasterCache(os.path.join(cache_folder, 'lm_cache'))
+            key = lm_cache.get_key(self.fa_lst_file, lipid_class='PE', charge_mode='[M-H]-', exact_position='FALSE',
+                                   ms2_ppm=30)
+            assert lm_cache.load(key) is False
+            assert lm_cache.save(key, lipid_master_df, fa_df) is True
+            c_lipid_master_df, c_fa_df = lm_cache.load(key)
+            pd.testing.assert_frame_equal(c_lipid_master_df, lipid_master_df)
+            pd.testing.assert_frame_equal(c_fa_df, fa_df)
+            # the tables are saved without pickle
+            assert sorted(os.listdir(os.path.join(cache_folder, 'lm_cache', key))) == [
+                'fa_info.json', 'fa_info.npz', 'info.json', 'lipid_master.json', 'lipid_master.npz']
+
+            # the key is based on the content of the FA whitelist and not on the file path
+            fa_copy_file = os.path.join(cache_folder, 'FA_Whitelist_copy.xlsx')
+            shutil.copy(self.fa_lst_file, fa_copy_file)
+            assert lm_cache.get_key(fa_copy_file, lipid_class='PE', charge_mode='[M-H]-', exact_position='FALSE',
+                                    ms2_ppm=30) == key
+            ppm_key = lm_cache.get_key(fa_copy_file, lipid_class='PE', charge_mode='[M-H]-', exact_position='FALSE',
+                                       ms2_ppm=20)
+            assert ppm_key != key
+
+            # the key is changed with the cache format version and the lipid class definitions in the code
+            lm_cache_module.LM_CACHE_VERSION += 1
+            try:
+                assert lm_cache.get_key(self.fa_lst_file, lipid_class='PE', charge_mode='[M-H]-',
+                                        exact_position='FALSE', ms2_ppm=30) != key
+            finally:
+                lm_cache_module.LM_CACHE_VERSION -= 1
+            code_file_lst = lm_cache_module.LM_CODE_FILE_LST
+            lm_cache_module.LM_CODE_FILE_LST = code_file_lst + [fa_copy_file]
+            try:
+                assert lm_cache.get_key(self.fa_lst_file, lipid_class='PE', charge_mode='[M-H]-',
+                                        exact_position='FALSE', ms2_ppm=30) != key
+            finally:
+                lm_cache_module.LM_CODE_FILE_LST = code_file_lst
+
+            # the least recently used table is removed first
+            lm_cache.save(ppm_key, lipid_master_df, fa_df)
+            assert len(lm_cache.get_entries()) == 2
+            lm_cache.max_size = sum([_entry[1] for _entry in lm_cache.get_entries()]) / 1.5 / 1024 ** 3
+            lm_cache.evict(keep_key=ppm_key)
+            assert [os.path.basename(_entry[2]) for _entry in lm_cache.get_entries()] == [ppm_key]
+
     def tearDown(self):
         logger.debug('Test LipidComposer TEST PASSED!')
 
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2019  SysMedOs_team @ AG Bioanalytik, University of Leipzig:
+# SysMedOs_team: Zhixu Ni, Georgia Angelidou, Mike Lange, Maria Fedorova
+# LipidHunter is Dual-licensed
+#     For academic and non-commercial use: `GPLv2 License` Please read more information by the following link:
+#         [The GNU General Public License version 2] (https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html)
+#     For commercial use:
+#         please contact the SysMedOs_team by email.
+# Please cite our publication in an appropriate form.
+# Ni, Zhixu, Georgia Angelidou, Mike Lange, Ralf Hoffmann, and Maria Fedorova.
+# "LipidHunter identifies phospholipids by high-throughput processing of LC-MS and shotgun lipidomics datasets."
+# Analytical Chemistry (2017).
+# DOI: 10.1021/acs.analchem.7b01126
+#
+# For more info please contact:
+#     Developer Zhixu Ni zhixu.ni@uni-leipzig.de
+#     Developer Georgia Angelidou georgia.angelidou@uni-leipzig.de
+
+import logging
+import os
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+
+hunterPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, hunterPath + '/../')
+
+from LibLipidHunter.LogPageCreator import LogPageCreator
+
+log_level = logging.DEBUG
+logging.basicConfig(format='%(asctime)s-%(levelname)s - %(message)s', datefmt='%b-%d@%H:%M:%S', level=log_level)
+logger = logging.getLogger('log')
+
+
+class TestCase_LogPageCreator(unittest.TestCase):
+
+    def setUp(self):
+        logger.debug('SETUP TESTS... TestCase_LogPageCreator')
+        self.params = {'lipid_class': 'TG', 'charge_mode': '[M+NH4]+', 'hunter_folder': '.', 'rank_score': True,
+                       'fast_isotope': False, 'mzml_path_str': 'test/mzML/TG_Pos_Thermo_Orbi.mzML',
+                       'hunter_start_time': '2019-01-01_00-00-00', 'mz_start': 600.0, 'mz_end': 1000.0,
+                       'rt_start': 20.0, 'rt_end': 25.0, 'ms_th': 1000, 'ms2_th': 10, 'ms_ppm': 10, 'ms2_ppm': 20,
+                       'rank_score_filter': 40.0, 'isotope_score_filter': 75.0}
+        ident_lst = [(868.7394, 22.102, 'TG(52:6)', 'TG(16:0_18:3_18:3)', 80.1),
+                     (868.7394, 22.102, 'TG(52:6)', 'TG(16:1_18:2_18:3)', 60.5),
+                     (816.7081, 22.131, 'TG(48:4)', 'TG(14:0_16:1_18:3)', 72.2),
+                     (894.7551, 22.282, 'TG(54:7)', 'TG(18:2_18:2_18:3)', 55.0),
+                     (816.7081, 22.318, 'TG(48:4)', 'TG(14:0_16:1_18:3)', 70.0)]
+        self.ident_df = pd.DataFrame(ident_lst, columns=['MS1_obs_mz', 'MS2_scan_time', 'Proposed_structures',
+                                                         'DISCRETE_ABBR', 'RANK_SCORE'])
+        self.ident_df['Charge'] = '[M+NH4]+'
+        self.ident_df['Formula_ion'] = 'C55H98NO6+'
+        self.ident_df['DDA#'] = 1
+        self.ident_df['Scan#'] = (self.ident_df['MS2_scan_time'] * 1000).astype(int)
+        self.ident_df['img_name'] = self.ident_df['Proposed_structures'] + '.png'
+
+    def get_pages(self, output_folder, ident_df_lst):
+        log_pager = LogPageCreator(output_folder, self.params['hunter_start_time'], self.params)
+        for _ident_df in ident_df_lst:
+            log_pager.add_info(_ident_df)
+        log_pager.close_page()
+        page_lst = []
+        for _page in [log_pager.image_lst_page, log_pager.idx_lst_page]:
+            with open(_page) as _page_obj:
+                page_lst.append(_page_obj.read())
+
+        return page_lst
+
+    def test_add_info(self):
+        logger.debug('Test streaming the results to the report...')
+        with tempfile.TemporaryDirectory() as output_folder:
+            os.makedirs(os.path.join(output_folder, 'LipidHunter_Results_Figures_%s'
+                                     % self.params['hunter_start_time']))
+            log_pager = LogPageCreator(output_folder, self.params['hunter_start_time'], self.params)
+            log_pager.add_info(self.ident_df.iloc[2:])
+            # the entries are readable before the report is finished
+            with open(log_pager.image_lst_page) as _page_obj:
+                img_page_str = _page_obj.read()
+            assert img_page_str.count('<hr>') == 3
+            assert img_page_str.index('TG(48:4)') < img_page_str.index('TG(54:7)')
+
+            log_pager.add_info(self.ident_df.iloc[:2])
+            with open(log_pager.idx_lst_page) as _page_obj:
+                assert _page_obj.read().count('<tr>') == 4
+            assert log_pager.entry_count == 4
+
+            # the finished report is the same as the report of all results at once
+            stream_page_lst = self.get_pages(output_folder, [self.ident_df.iloc[2:], self.ident_df.iloc[:2]])
+            all_page_lst = self.get_pages(output_folder, [self.ident_df])
+            assert stream_page_lst == all_page_lst
+            img_page_str = all_page_lst[0]
+            assert img_page_str.index('TG(48:4)') < img_page_str.index('TG(52:6)') < img_page_str.index('TG(54:7)')
+            assert img_page_str.count('<a name="') == 4
+            assert '<a name="4"><h3><a href="TG(54:7).png"' in img_page_str
+
+    def tearDown(self):
+        logger.debug('TestCase_LogPageCreator TEST PASSED!')
+
+
+if __name__ == '__main__':
+    unittest.main()
+    logger.info('TESTS FINISHED!')
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2019  SysMedOs_team @ AG Bioanalytik, University of Leipzig:
+# SysMedOs_team: Zhixu Ni, Georgia Angelidou, Mike Lange, Maria Fedorova
+# LipidHunter is Dual-licensed
+#     For academic and non-commercial use: `GPLv2 License` Please read more information by the following link:
+#         [The GNU General Public License version 2] (https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html)
+#     For commercial use:
+#         please contact the SysMedOs_team by email.
+# Please cite our publication in an appropriate form.
+# Ni, Zhixu, Georgia Angelidou, Mike Lange, Ralf Hoffmann, and Maria Fedorova.
+# "LipidHunter identifies phospholipids by high-throughput processing of LC-MS and shotgun lipidomics datasets."
+# Analytical Chemistry (2017).
+# DOI: 10.1021/acs.analchem.7b01126
+#
+# For more info please contact:
+#     Developer Zhixu Ni zhixu.ni@uni-leipzig.de
+#     Developer Georgia Angelidou georgia.angelidou@uni-leipzig.de
+
+import logging
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+hunterPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, hunterPath + '/../')
+
+from LibLipidHunter.PanelPlotter import dump_plot_params, get_peak_envelope, get_plot_cost, load_plot_params
+
+log_level = logging.DEBUG
+logging.basicConfig(format='%(asctime)s-%(levelname)s - %(message)s', datefmt='%b-%d@%H:%M:%S', level=log_level)
+logger = logging.getLogger('log')
+
+
+class TestCase_PanelPlotter(unittest.TestCase):
+
+    def setUp(self):
+        logger.debug('SETUP TESTS... TestCase_PanelPlotter')
+        rs = np.random.RandomState(1)
+        self.mz_lst = np.sort(rs.uniform(400, 1000, 5000)).tolist()
+        self.i_lst = rs.uniform(10, 1000, 5000).tolist()
+
+    def test_sparse_spectrum(self):
+        logger.debug('Test get_peak_envelope with less peaks than pixel columns...')
+        mz_lst, i_lst = get_peak_envelope(self.mz_lst[:100], self.i_lst[:100], (400, 1000), 600)
+        assert mz_lst == self.mz_lst[:100]
+        assert i_lst == self.i_lst[:100]
+
+    def test_stem_envelope(self):
+        logger.debug('Test get_peak_envelope for stems...')
+        mz_lst, i_lst = get_peak_envelope(self.mz_lst, self.i_lst, (400, 1000), 600)
+        assert len(mz_lst) <= 602
+        assert mz_lst[0] == self.mz_lst[0] and mz_lst[-1] == self.mz_lst[-1]
+        # the highest peak of each pixel column is kept
+        col_arr = (np.array(self.mz_lst) - 400).astype(int)
+        for _col in range(0, 600, 50):
+            _i_arr = np.array(self.i_lst)[col_arr == _col]
+            assert _i_arr.max() in i_lst
+
+    def test_profile_envelope(self):
+        logger.debug('Test get_peak_envelope for a profile line...')
+        mz_lst, i_lst = get_peak_envelope(self.mz_lst, self.i_lst, (400, 1000), 600, keep_profile=True)
+        assert len(mz_lst) <= 4 * 600
+        assert mz_lst == sorted(mz_lst)
+        col_arr = (np.array(self.mz_lst) - 400).astype(int)
+        for _col in range(0, 600, 50):
+            _i_arr = np.array(self.i_lst)[col_arr == _col]
+            assert _i_arr.max() in i_lst and _i_arr.min() in i_lst
+
+    def test_out_of_range(self):
+        logger.debug('Test get_peak_envelope with peaks outside of the panel...')
+        mz_lst, i_lst = get_peak_envelope(self.mz_lst, self.i_lst, (500, 900), 100)
+        out_range_lst = [_mz for _mz in self.mz_lst if _mz < 500 or _mz > 900]
+        assert [_mz for _mz in mz_lst if _mz < 500 or _mz > 900] == out_range_lst
+        assert len(mz_lst) <= len(out_range_lst) + 100
+
+    def test_plot_cost(self):
+        logger.debug('Test get_plot_cost...')
+        ms1_df = pd.DataFrame({'mz': self.mz_lst, 'i': self.i_lst})
+        ms2_df = pd.DataFrame({'mz': self.mz_lst[:100], 'i': self.i_lst[:100]})
+        assert get_plot_cost({'spec_info_dct': {'ms1_df': ms1_df, 'ms2_df': ms2_df}}) == 5100
+
+    def test_plot_params(self):
+        logger.debug('Test dump_plot_params and load_plot_params...')
+        ms2_df = pd.DataFrame({'mz': np.array(self.mz_lst[:5], dtype='f4'), 'i': np.arange(5, dtype='f4'),
+                               'LABEL': ['PE:140', 'PR', 'PR', 'PE:140', 'PE:-141']}, index=[2, 4, 6, 8, 10])
+        ident_df = pd.DataFrame({'i': [1.5, 2.5]},
+                                index=pd.MultiIndex.from_tuples([('a', 'b'), ('c', 'd')], names=['frag', 'abbr']))
+        mz_se = pd.Series([np.float64(716.5226), 716.523, 'TG(52:6)'], index=['MS2_PR_mz', 'Lib_mz', 'BULK_ABBR'])
+        plot_params_dct = {'img_param_dct': {'abbr': 'TG(52:6)', 'mz_se': mz_se, 'ms2_df': ms2_df,
+                                             'ident_df': ident_df, 'empty_df': pd.DataFrame(columns=['TYPE']),
+                                             'deconv_lst': [1, np.float64(0.5)], 'checker_dct': {0: np.float32(1.1)},
+                                             'charge': None},
+                           'dpi': 300, 'ms1_precision': 50e-6, 'preview': False}
+        with tempfile.TemporaryDirectory() as output_folder:
+            plot_params_path = os.path.join(output_folder, 'TG[52-6].plot.npz')
+            dump_plot_params(plot_params_path, plot_params_dct)
+            load_dct = load_plot_params(plot_params_path)
+            load_param_dct = load_dct['img_param_dct']
+            assert load_dct['dpi'] == 300 and load_dct['ms1_precision'] == 50e-6 and load_dct['preview'] is False
+            pd.testing.assert_frame_equal(load_param_dct['ms2_df'], ms2_df, check_exact=True)
+            pd.testing.assert_frame_equal(load_param_dct['ident_df'], ident_df, check_exact=True)
+            pd.testing.assert_frame_equal(load_param_dct['empty_df'], plot_params_dct['img_param_dct']['empty_df'])
+            pd.testing.assert_series_equal(load_param_dct['mz_se'], mz_se)
+            # the types of the values are kept
+            assert [type(_val) for _val in load_param_dct['mz_se']] == [np.float64, float, str]
+            assert [type(_val) for _val in load_param_dct['deconv_lst']] == [int, np.float64]
+            assert list(load_param_dct['checker_dct'].keys()) == [0]
+            assert type(load_param_dct['checker_dct'][0]) == np.float32
+            assert load_param_dct['charge'] is None
+
+            # arrays that need to be unpickled are not loaded
+            with open(plot_params_path, 'wb') as plot_params_obj:
+                np.savez(plot_params_obj, plot_params=np.frombuffer(b'{"arr": 0}', dtype=np.uint8),
+                         arr_0=np.array([mz_se], dtype=object))
+            with self.assertRaises(ValueError):
+                load_plot_params(plot_params_path)
+
+    def tearDown(self):
+        logger.debug('TestCase_PanelPlotter TEST PASSED!')
+
+
+if __name__ == '__main__':
+    unittest.main()
+    logger.info('TESTS FINISHED!')
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2019  SysMedOs_team @ AG Bioanalytik, University of Leipzig:
+# SysMedOs_team: Zhixu Ni, Georgia Angelidou, Mike Lange, Maria Fedorova
+# LipidHunter is Dual-licensed
+#     For academic and non-commercial use: `GPLv2 License` Please read more information by the following link:
+#         [The GNU General Public License version 2] (https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html)
+#     For commercial use:
+#         please contact the SysMedOs_team by email.
+# Please cite our publication in an appropriate form.
+# Ni, Zhixu, Georgia Angelidou, Mike Lange, Ralf Hoffmann, and Maria Fedorova.
+# "LipidHunter identifies phospholipids by high-throughput processing of LC-MS and shotgun lipidomics datasets."
+# Analytical Chemistry (2017).
+# DOI: 10.1021/acs.analchem.7b01126
+#
+# For more info please contact:
+#     Developer Zhixu Ni zhixu.ni@uni-leipzig.de
+#     Developer Georgia Angelidou georgia.angelidou@uni-leipzig.de
+
+import logging
+import os
+import sys
+import unittest
+
+import numpy as np
+
+hunterPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, hunterPath + '/../')
+
+from LibLipidHunter.ParallelFunc import ppm_calc_para
+from LibLipidHunter.PrecursorHunter import match_ms1_peaks
+from LibLipidHunter.SpectraReader import sort_peaks_by_i
+
+log_level = logging.DEBUG
+logging.basicConfig(format='%(asctime)s-%(levelname)s - %(message)s', datefmt='%b-%d@%H:%M:%S', level=log_level)
+logger = logging.getLogger('log')
+
+
+class TestCase_PrecursorHunter(unittest.TestCase):
+
+    def setUp(self):
+        logger.debug('SETUP TESTS... TestCase_PrecursorHunter')
+        rs = np.random.RandomState(1)
+        # few intensity levels to have peaks with the same intensity in the windows
+        self.mz_arr = np.round(rs.uniform(800, 802, 300), 3).astype(np.float32)
+        self.i_arr = rs.choice([1000, 5000, 6000, 7000, 900000], 300).astype(np.float32)
+        self.lib_mz_arr = rs.uniform(800, 802, 40)
+        self.low_arr = self.lib_mz_arr * (1 - 10e-6)
+        self.high_arr = self.lib_mz_arr * (1 + 10e-6)
+
+    def get_best_peak(self, win_idx, ms1_th, ms1_max):
+        # the former matching of one window
+        _mz_order_arr = np.argsort(self.mz_arr, kind='mergesort')
+        _mz_sorted_arr = self.mz_arr[_mz_order_arr]
+        _start = np.searchsorted(_mz_sorted_arr, np.float32(self.low_arr[win_idx]), side='left')
+        _end = np.searchsorted(_mz_sorted_arr, np.float32(self.high_arr[win_idx]), side='right')
+        _peak_pos_arr = np.sort(_mz_order_arr[_start:_end])
+        _peak_i_arr = self.i_arr[_peak_pos_arr]
+        if ms1_max > ms1_th:
+            _peak_pos_arr = _peak_pos_arr[(ms1_th <= _peak_i_arr) & (_peak_i_arr <= ms1_max)]
+        else:
+            _peak_pos_arr = _peak_pos_arr[ms1_th <= _peak_i_arr]
+        _ppm_arr = ppm_calc_para(self.mz_arr[_peak_pos_arr], self.lib_mz_arr[win_idx])
+        _peak_pos_arr = _peak_pos_arr[np.abs(_ppm_arr) <= 10]
+        _ppm_arr = _ppm_arr[np.abs(_ppm_arr) <= 10]
+        if _peak_pos_arr.size == 0:
+            return None, None
+        _best_idx = sort_peaks_by_i(np.arange(_peak_pos_arr.size), self.i_arr[_peak_pos_arr])[0][0]
+
+        return float(self.mz_arr[_peak_pos_arr[_best_idx]]), float(_ppm_arr[_best_idx])
+
+    def test_match_ms1_peaks(self):
+        logger.debug('Test match_ms1_peaks against the matching of each window...')
+        for ms1_max in [0, 8000]:
+            best_mz_arr, best_ppm_arr = match_ms1_peaks(self.mz_arr, self.i_arr, self.low_arr, self.high_arr,
+                                                        self.lib_mz_arr, 5000, ms1_max, 10)
+            assert np.count_nonzero(~np.isnan(best_mz_arr)) > 0
+            for _win_idx in range(self.lib_mz_arr.size):
+                _best_mz, _best_ppm = self.get_best_peak(_win_idx, 5000, ms1_max)
+                if _best_mz is None:
+                    assert np.isnan(best_mz_arr[_win_idx]) and np.isnan(best_ppm_arr[_win_idx])
+                else:
+                    assert best_mz_arr[_win_idx] == _best_mz and best_ppm_arr[_win_idx] == _best_ppm
+
+    def test_no_peaks(self):
+        logger.debug('Test match_ms1_peaks with an empty spectrum...')
+        best_mz_arr, best_ppm_arr = match_ms1_peaks(np.array([], dtype=np.float32), np.array([], dtype=np.float32),
+                                                    self.low_arr, self.high_arr, self.lib_mz_arr, 5000, 0, 10)
+        assert best_mz_arr.size == self.lib_mz_arr.size and np.isnan(best_mz_arr).all()
+
+    def tearDown(self):
+        logger.debug('TestCase_PrecursorHunter TEST PASSED!')
+
+
+if __name__ == '__main__':
+    unittest.main()
+    logger.info('TESTS FINISHED!')
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2019  SysMedOs_team @ AG Bioanalytik, University of Leipzig:
+# SysMedOs_team: Zhixu Ni, Georgia Angelidou, Mike Lange, Maria Fedorova
+# LipidHunter is Dual-licensed
+#     For academic and non-commercial use: `GPLv2 License` Please read more information by the following link:
+#         [The GNU General Public License version 2] (https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html)
+#     For commercial use:
+#         please contact the SysMedOs_team by email.
+# Please cite our publication in an appropriate form.
+# Ni, Zhixu, Georgia Angelidou, Mike Lange, Ralf Hoffmann, and Maria Fedorova.
+# "LipidHunter identifies phospholipids by high-throughput processing of LC-MS and shotgun lipidomics datasets."
+# Analytical Chemistry (2017).
+# DOI: 10.1021/acs.analchem.7b01126
+#
+# For more info please contact:
+#     Developer Zhixu Ni zhixu.ni@uni-leipzig.de
+#     Developer Georgia Angelidou georgia.angelidou@uni-leipzig.de
+
+import configparser
+import logging
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+import pytest
+
+hunterPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, hunterPath + '/../')
+
+from LibLipidHunter.Hunter_Core import huntlipids
+from LibLipidHunter.LipidComposer import LipidComposer
+from LibLipidHunter.ScoreHunter import compile_key_frag, get_all_fa_nl, get_specific_peaks, get_spec_fa_nl
+from LibLipidHunter.ScoreHunter import prep_rankscore, rank_obs_peaks
+
+log_level = logging.DEBUG
+logging.basicConfig(format='%(asctime)s-%(levelname)s - %(message)s', datefmt='%b-%d@%H:%M:%S', level=log_level)
+logger = logging.getLogger('log')
+
+
+class TestCase_ScoreHunter(unittest.TestCase):
+
+    def setUp(self):
+        logger.debug('SETUP TESTS... TestCase_ScoreHunter')
+        cwd = os.getcwd()
+        if cwd.endswith('test') or cwd.endswith('test/') or cwd.endswith('test\\'):
+            logger.info('change to folder above..')
+            os.chdir('..')
+        logger.info(os.getcwd())
+        self.fa_lst_file = r'ConfigurationFiles/1-FA_Whitelist.xlsx'
+        self.pe_fa_df = LipidComposer().calc_fa_query('PE', self.fa_lst_file, ms2_ppm=20)
+        self.pe_peak_type_lst = ['[FA-H]-', '[LPE-H]-', '[LPE-H2O-H]-']
+
+    @staticmethod
+    def match_fa_nl(fa_df, ms2_df, peak_type_lst):
+        # reference: match each FA and peak type separately by the m/z window
+        match_lst = []
+        for _fa_abbr, _fa_se in fa_df.iterrows():
+            for peak_typ in peak_type_lst:
+                _low = np.float32(_fa_se['%s_MZ_LOW' % peak_typ])
+                _high = np.float32(_fa_se['%s_MZ_HIGH' % peak_typ])
+                _match_df = ms2_df[(ms2_df['mz'] >= _low) & (ms2_df['mz'] <= _high)]
+                for _idx, _peak_se in _match_df.iterrows():
+                    _ppm = int(1e6 * (_peak_se['mz'] - _fa_se['%s_MZ' % peak_typ]) / _fa_se['%s_MZ' % peak_typ])
+                    match_lst.append((_fa_se['%s_ABBR' % peak_typ], _peak_se['i'], abs(_ppm), _fa_abbr))
+        return match_lst
+
+    def test_get_all_fa_nl(self):
+        logger.debug('Test get_all_fa_nl...')
+        rs = np.random.RandomState(1)
+        lib_mz_arr = np.concatenate([self.pe_fa_df['%s_MZ' % _typ].values for _typ in self.pe_peak_type_lst])
+        match_mz_arr = rs.choice(lib_mz_arr, 40) * (1 + rs.uniform(-1e-5, 1e-5, 40))
+        mz_arr = np.concatenate([match_mz_arr, rs.uniform(100, 900, 80), match_mz_arr[:5]])
+        i_arr = rs.choice([100.0, 200.0, 500.0, 1000.0], len(mz_arr))
+        ms2_df = pd.DataFrame({'mz': mz_arr.astype('f4'), 'i': i_arr.astype('f4')})
+        ms2_df = ms2_df.sort_values('i', ascending=False)
+
+        obs_peaks_df = get_all_fa_nl(self.pe_fa_df, ms2_df, self.pe_peak_type_lst, 'PE')
+        match_lst = self.match_fa_nl(self.pe_fa_df, ms2_df, self.pe_peak_type_lst)
+        assert obs_peaks_df['obs_rank'].tolist() == list(range(1, min(10, len(set(m[0] for m in match_lst))) + 1))
+        assert obs_peaks_df['obs_abbr'].is_unique
+
+        # each obs_abbr use the most intense peak with the lowest ppm, ranked by intensity
+        best_dct = {}
+        for _abbr, _i, _ppm, _fa_abbr in match_lst:
+            if _abbr not in best_dct or (-_i, _ppm) < (-best_dct[_abbr][0], best_dct[_abbr][1]):
+                best_dct[_abbr] = (_i, _ppm, _fa_abbr)
+        rank_i_lst = sorted([_best[0] for _best in best_dct.values()], reverse=True)[:10]
+        assert obs_peaks_df['i'].tolist() == rank_i_lst
+        for _idx, _obs_se in obs_peaks_df.iterrows():
+            _i, _ppm, _fa_abbr = best_dct[_obs_se['obs_abbr']]
+            assert _obs_se['i'] == _i
+            assert _obs_se['obs_ppm_abs'] == _ppm
+            assert _obs_se['fa_abbr'] == _fa_abbr
+            assert _obs_se['obs_i_r'] == round(100 * _i / ms2_df['i'].max(), 1)
+
+        # no peaks in the windows
+        assert get_all_fa_nl(self.pe_fa_df, pd.DataFrame({'mz': [50.0], 'i': [100.0]}),
+                             self.pe_peak_type_lst, 'PE').empty
+
+    def test_get_spec_fa_nl(self):
+        logger.debug('Test get_spec_fa_nl...')
+        lib_mz_arr = self.pe_fa_df['[FA-H]-_MZ'].values[:5]
+        ms2_df = pd.DataFrame({'mz': lib_mz_arr.astype('f4'), 'i': np.arange(5, 0, -1, dtype='f4') * 100})
+        fa_nl_cache_dct = {}
+        obs_fa_df = get_spec_fa_nl(self.pe_fa_df, ms2_df, ['[FA-H]-'], 'PE', 10, fa_nl_cache_dct)
+        pd.testing.assert_frame_equal(obs_fa_df, get_all_fa_nl(self.pe_fa_df, ms2_df, ['[FA-H]-'], 'PE'))
+        assert list(fa_nl_cache_dct.keys()) == [(10, ('[FA-H]-',))]
+
+        # the cached result is used for the same scan and can not be changed by the caller
+        obs_fa_df['TYPE'] = 'FA'
+        cached_fa_df = get_spec_fa_nl(self.pe_fa_df, pd.DataFrame(), ['[FA-H]-'], 'PE', 10, fa_nl_cache_dct)
+        assert 'TYPE' not in cached_fa_df.columns
+        assert cached_fa_df.shape[0] == 5
+        get_spec_fa_nl(self.pe_fa_df, ms2_df, ['[LPE-H]-'], 'PE', 10, fa_nl_cache_dct)
+        assert len(fa_nl_cache_dct) == 2
+
+    def test_get_specific_peaks(self):
+        logger.debug('Test get_specific_peaks...')
+        key_frag_df = pd.DataFrame({'CLASS': ['PE', 'PE', 'PE', 'PC', 'PC'], 'TYPE': ['FRAG', 'NL', 'NL', 'FRAG', 'NL'],
+                                    'EXACTMASS': [140.011272, 141.019097, 0.0, 168.0458, 183.066047],
+                                    'LABEL': ['PE:140', 'PE:-141', 'PR', 'PC:168', 'PC:-183']})
+        key_frag_dct = {'target_frag_df': key_frag_df.iloc[[0]], 'target_nl_df': key_frag_df.iloc[[1, 2]],
+                        'other_frag_df': key_frag_df.iloc[[3]], 'other_nl_df': key_frag_df.iloc[[4]]}
+        mz_lib = 716.523
+        ms2_df = pd.DataFrame({'mz': [140.0112, 140.0115, 575.5039, 575.5042, 716.5226, 300.0],
+                               'i': [500.0, 800.0, 1000.0, 1000.0, 200.0, 400.0]}, dtype='f4')
+
+        specific_ion_dct = get_specific_peaks(compile_key_frag(key_frag_dct, ms2_ppm=20), mz_lib, ms2_df, ms2_ppm=20)
+        assert list(specific_ion_dct.keys()) == ['TARGET_FRAG', 'TARGET_NL']
+        # the most intense peak in each window, the first one if the intensity is the same
+        assert specific_ion_dct['TARGET_FRAG'].index.tolist() == [1]
+        assert specific_ion_dct['TARGET_FRAG']['PE:140'].tolist() == [80.0]
+        target_nl_df = specific_ion_dct['TARGET_NL']
+        assert target_nl_df.index.tolist() == [2, 4]
+        assert target_nl_df['LABEL'].tolist() == ['PE:-141', 'PR']
+        assert target_nl_df['PE:-141'].tolist()[0] == 100 and np.isnan(target_nl_df['PE:-141'].tolist()[1])
+        assert target_nl_df['PE:-141'].dtype == target_nl_df['PR'].dtype == np.float64
+
+        # compiled for another ms2_ppm
+        assert get_specific_peaks(compile_key_frag(key_frag_dct, ms2_ppm=20), mz_lib, ms2_df,
+                                  ms2_ppm=0.1).keys() == get_specific_peaks(key_frag_dct, mz_lib, ms2_df,
+                                                                            ms2_ppm=0.1).keys()
+        assert get_specific_peaks(key_frag_dct, mz_lib, ms2_df.iloc[:0], ms2_ppm=20) == {}
+
+    def test_rank_obs_peaks(self):
+        logger.debug('Test rank_obs_peaks...')
+        i_arr = np.array([1000.0, 800.0, 600.0, 600.0], dtype='f4')
+        ppm_abs_arr = np.array([5, 2, 3, 1])
+        match_arr = np.array([[False, True, False, False], [False, True, False, True], [True, False, False, False]])
+        order_arr = np.repeat(np.arange(4)[np.newaxis, :], 3, axis=0)
+        rank_order_arr, i_mod_arr, div_peak_arr = rank_obs_peaks(i_arr, ppm_abs_arr, match_arr,
+                                                                 np.array([1, 2, 3]), order_arr)
+        # only the first matched peak of each candidate is divided
+        assert div_peak_arr.tolist() == [1, 1, 0]
+        assert i_mod_arr.dtype == i_arr.dtype
+        assert i_mod_arr.tolist() == [[1000, 800, 600, 600], [1000, 400, 600, 600],
+                                      [np.float32(1000 / 3), 800, 600, 600]]
+        # same intensity is ranked by the abs ppm
+        assert rank_order_arr.tolist() == [[0, 1, 3, 2], [0, 3, 2, 1], [1, 3, 2, 0]]
+
+    def test_prep_rankscore(self):
+        logger.debug('Test prep_rankscore...')
+        obs_df = pd.DataFrame({'i': [1000.0, 800.0, 500.0], 'obs_i_r': [100.0, 80.0, 50.0],
+                               'obs_ppm_abs': [1, 2, 1], 'fa_abbr': ['FA16:0', 'FA18:1', 'FA20:4'],
+                               'obs_abbr': ['[FA16:0-H]-', '[FA18:1-H]-', '[FA20:4-H]-'],
+                               'obs_type': ['[FA-H]-', '[FA-H]-', '[FA-H]-']})
+        obs_dct = {'[FA-H]-': [obs_df, {'FA1': 'FA1_[FA-H]-', 'FA2': 'FA2_[FA-H]-'}]}
+        weight_dct = {'FA1_[FA-H]-': {'Weight': 10}, 'FA2_[FA-H]-': {'Weight': 20}}
+        sliced_info_df = pd.DataFrame({'DISCRETE_ABBR': ['PE(16:0_18:1)', 'PE(18:1_18:1)', 'PE(18:0_18:1)'],
+                                       'FA1_ABBR': ['FA16:0', 'FA18:1', 'FA18:0'],
+                                       'FA2_ABBR': ['FA18:1', 'FA18:1', 'FA18:1']}, index=[3, 5, 8])
+        origin_info_df = pd.DataFrame({'DISCRETE_ABBR': ['PE(16:0_18:1)', 'PE(18:1_18:1)', 'PE(18:0_18:1)'],
+                                       'RANK_SCORE': 0.0, 'OBS_RESIDUES': 0}, index=[3, 5, 8])
+
+        ident_peak_df, score_df = prep_rankscore(obs_dct, origin_info_df, sliced_info_df, weight_dct, 'PE')
+        # (11 - rank) * 0.1 * weight, the intensity of FA18:1 at both sn is divided by 2 and ranked after FA20:4
+        assert score_df['RANK_SCORE'].tolist() == [10 * 0.1 * 10 + 9 * 0.1 * 20, 8 * 0.1 * 10 + 8 * 0.1 * 20,
+                                                   9 * 0.1 * 20]
+        assert score_df['OBS_RESIDUES'].tolist() == [2, 2, 1]
+        assert score_df['OBS_PEAKS'].tolist() == [2, 2, 1]
+        assert score_df['FA1_[FA-H]-_i'].tolist()[:2] == [1000, 400]
+        assert np.isnan(score_df['FA1_[FA-H]-_i'].tolist()[2])
+        assert score_df['FA2_[FA-H]-_RANK'].tolist() == [2, 3, 2]
+        assert ident_peak_df['discrete_abbr'].tolist() == ['PE(16:0_18:1)', 'PE(16:0_18:1)', 'PE(18:1_18:1)',
+                                                           'PE(18:1_18:1)', 'PE(18:0_18:1)']
+        # the FA of a structure are in the order of a set
+        assert sorted(ident_peak_df['i_mod'].tolist()[:2]) == [800, 1000]
+        assert ident_peak_df['i_mod'].tolist()[2:] == [400, 400, 800]
+        assert ident_peak_df.index.names == ['fragment_abbr', 'lipid_discrete_abbr']
+        # the columns of each fragment in the order of the sn positions, OBS_PEAKS last
+        assert score_df.columns.tolist()[3:] == ['FA1_[FA-H]-_i', 'FA1_[FA-H]-_i_per', 'FA1_[FA-H]-_RANK',
+                                                 'FA1_[FA-H]-_SCORE', 'FA2_[FA-H]-_i', 'FA2_[FA-H]-_i_per',
+                                                 'FA2_[FA-H]-_RANK', 'FA2_[FA-H]-_SCORE', 'OBS_PEAKS']
+
+        # the weight factor of FA2 is missing in the weight factor file
+        with pytest.raises(KeyError, match=r'FA2_\[FA-H\]- for PE'):
+            prep_rankscore(obs_dct, origin_info_df, sliced_info_df, {'FA1_[FA-H]-': {'Weight': 10}}, 'PE')
+
+        # no FA of the structures observed
+        empty_df, score_df = prep_rankscore(obs_dct, origin_info_df, sliced_info_df.iloc[:0], weight_dct, 'PE')
+        assert empty_df.empty
+
+    @staticmethod
+    def get_rank_score_df(cfg_path, score_cfg, output_folder):
+        # run the identification without images and keep the rank score columns of all discrete structures
+        config = configparser.ConfigParser()
+        config.read(cfg_path)
+        param_dct = {}
+        for _param, _val in config.items('parameters'):
+            if _param in ['dda_top', 'ms_th', 'ms2_th', 'ms_ppm', 'ms2_ppm', 'ms_max', 'max_ram', 'img_dpi']:
+                param_dct[_param] = int(_val)
+            elif _param in ['rt_start', 'rt_end', 'mz_start', 'mz_end', 'pr_window', 'ms2_infopeak_threshold',
+                            'rank_score_filter', 'score_filter', 'isotope_score_filter']:
+                param_dct[_param] = float(_val)
+            elif _val in ['True', 'False']:
+                param_dct[_param] = _val == 'True'
+            else:
+                param_dct[_param] = _val
+        param_dct.update({'score_cfg': score_cfg, 'core_number': 1, 'img_output_folder_str': output_folder,
+                          'xlsx_output_path_str': os.path.join(output_folder, 'rank_score.xlsx'),
+                          'spectra_cache': False, 'lipid_master_cache': False})
+        tot_run_time, error_lst, output_df = huntlipids(param_dct, [], save_fig=False)
+        rank_col_lst = sorted([_col for _col in output_df.columns.tolist() if _col == 'RANK_SCORE'
+                               or _col.endswith('_RANK') or (_col.endswith('_i') and _col != 'MS1_obs_i')])
+        rank_df = output_df[['Scan#', 'DISCRETE_ABBR'] + rank_col_lst]
+
+        return rank_df.sort_values(by=['Scan#', 'DISCRETE_ABBR']).reset_index(drop=True)
+
+    def test_rank_score_regression(self):
+        logger.debug('Test rank score against the baseline results of the TG test data...')
+        for charge, score_cfg in [('NH4', r'ConfigurationFiles/2-Score_weight_TG.xlsx'),
+                                  ('Na', r'ConfigurationFiles/2-Score_weight_TG_Na.xlsx')]:
+            with tempfile.TemporaryDirectory() as output_folder:
+                rank_df = self.get_rank_score_df(r'test/test_batch_cfg/test_TG_%s_cfg.txt' % charge, score_cfg,
+                                                 output_folder)
+            baseline_df = pd.read_csv(r'test/test_baseline/test_TG_%s_rankscore.csv' % charge,
+                                      float_precision='round_trip')
+            logger.info('[M+%s]+ %i discrete structures compared' % (charge, baseline_df.shape[0]))
+            pd.testing.assert_frame_equal(rank_df, baseline_df, check_dtype=False, check_exact=True)
+
+    def tearDown(self):
+        logger.debug('TestCase_ScoreHunter TEST PASSED!')
+
+
+if __name__ == '__main__':
+    unittest.main()
+    logger.info('TESTS FINISHED!')
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016-2019  SysMedOs_team @ AG Bioanalytik, University of Leipzig:
+# SysMedOs_team: Zhixu Ni, Georgia Angelidou, Mike Lange, Maria Fedorova
+# LipidHunter is Dual-licensed
+#     For academic and non-commercial use: `GPLv2 License` Please read more information by the following link:
+#         [The GNU General Public License version 2] (https://www.gnu.org/licenses/old-licenses/gpl-2.0.en.html)
+#     For commercial use:
+#         please contact the SysMedOs_team by email.
+# Please cite our publication in an appropriate form.
+# Ni, Zhixu, Georgia Angelidou, Mike Lange, Ralf Hoffmann, and Maria Fedorova.
+# "LipidHunter identifies phospholipids by high-throughput processing of LC-MS and shotgun lipidomics datasets."
+# Analytical Chemistry (2017).
+# DOI: 10.1021/acs.analchem.7b01126
+#
+# For more info please contact:
+#     Developer Zhixu Ni zhixu.ni@uni-leipzig.de
+#     Developer Georgia Angelidou georgia.angelidou@uni-leipzig.de
+
+import gc
+import logging
+import os
+import pickle
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+hunterPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, hunterPath + '/../')
+
+from LibLipidHunter.SpectraCache import SpectraCache
+from LibLipidHunter.SpectraReader import extract_mzml, get_xic_from_pl
+from LibLipidHunter.SpectraStore import DDAIndex, SpectraStore
+
+log_level = logging.DEBUG
+logging.basicConfig(format='%(asctime)s-%(levelname)s - %(message)s', datefmt='%b-%d@%H:%M:%S', level=log_level)
+logger = logging.getLogger('log')
+
+
+class TestCase_SpectraReader(unittest.TestCase):
+
+    def setUp(self):
+        logger.debug('SETUP TESTS... TestCase_SpectraReader')
+        cwd = os.getcwd()
+        if cwd.endswith('test') or cwd.endswith('test/') or cwd.endswith('test\\'):
+            logger.info('change to folder above..')
+            os.chdir('..')
+        logger.info(os.getcwd())
+        self.mzml = r'test/mzML/TG_Pos_Thermo_Orbi.mzML'
+        self.rt_range = [22.0, 23.0]
+        self.dda_top = 10
+
+    def test_spectra_store(self):
+        logger.debug('Test SpectraStore...')
+        mz_arr_lst = [np.array([100.1, 200.2, 300.3]), np.array([150.5, 250.5])]
+        i_arr_lst = [np.array([3000.0, 2000.0, 1000.0]), np.array([50.0, 20.0])]
+        spec_store = SpectraStore.from_lists([3, 5], mz_arr_lst, i_arr_lst, [1.0, 1.01], [1, 2])
+
+        assert len(spec_store) == 2
+        assert 3 in spec_store and 5 in spec_store and 4 not in spec_store
+        assert spec_store.keys() == [3, 5]
+        assert spec_store.peak_count == 5
+
+        ms1_df = spec_store[3]
+        assert ms1_df.columns.tolist() == ['mz', 'i', 'rt']
+        assert ms1_df['rt'].tolist() == [1.0, 1.0, 1.0]
+        ms2_df = spec_store[5]
+        assert ms2_df.columns.tolist() == ['mz', 'i']
+        assert ms2_df['mz'].tolist() == [150.5, 250.5]
+
+        # per scan arrays are views on the store
+        mz_arr, i_arr = spec_store.get_arrays(5)
+        assert np.shares_memory(mz_arr, spec_store.mz)
+        assert i_arr.tolist() == [50.0, 20.0]
+
+        sub_store = spec_store.subset([5, 7])
+        assert sub_store.keys() == [5]
+        assert sub_store.get(3) is None
+
+    def test_spectra_store_share(self):
+        logger.debug('Test shared SpectraStore...')
+        mz_arr_lst = [np.array([100.1, 200.2, 300.3]), np.array([150.5, 250.5]), np.array([400.4])]
+        i_arr_lst = [np.array([3000.0, 2000.0, 1000.0]), np.array([50.0, 20.0]), np.array([10.0])]
+        scan_info_df = pd.DataFrame({'dda_event_idx': [0, 0, 0], 'spec_index': [3, 5, 6],
+                                     'scan_time': [1.0, 1.01, 1.02], 'DDA_rank': [0, 1, 2], 'scan_number': [3, 5, 6],
+                                     'MS2_PR_mz': [0.0, 150.5, 400.4]})
+        spec_store = SpectraStore.from_lists([3, 5, 6], mz_arr_lst, i_arr_lst, [1.0, 1.01, 1.02], [1, 2, 2],
+                                             scan_info_df=scan_info_df)
+        share_file_dct = spec_store.share()
+        share_folder = os.path.dirname(share_file_dct['mz'])
+        assert spec_store.is_shared
+        assert isinstance(spec_store.mz, np.memmap)
+
+        # the subset is a view on the same arrays
+        sub_store = spec_store.subset([5, 6])
+        assert sub_store.keys() == [5, 6]
+        assert sub_store.peak_count == 3
+        assert np.shares_memory(sub_store.get_arrays(5)[0], spec_store.mz)
+
+        # only the file paths are pickled
+        pkl_str = pickle.dumps(sub_store)
+        assert len(pkl_str) < len(pickle.dumps(spec_store.to_dict()))
+        pkl_store = pickle.loads(pkl_str)
+        assert pkl_store.keys() == [5, 6]
+        pd.testing.assert_frame_equal(pkl_store[5], spec_store[5])
+        assert pkl_store.get(3) is None
+
+        # the scan info table and the DDAIndex are sent to the workers as static data, not with each store
+        assert pkl_store.dda_index is None and pkl_store.scan_info.empty
+        pkl_store = pickle.loads(pickle.dumps(spec_store))
+        assert pkl_store.keys() == [3, 5, 6]
+        assert pkl_store.get_rt(5) == 1.01 and pkl_store.get_ms_level(3) == 1
+        assert spec_store.dda_index.get_ms1_spec_index(0) == 3
+
+        # the temporary files are removed with the store
+        del spec_store, sub_store, pkl_store
+        gc.collect()
+        assert not os.path.isdir(share_folder)
+
+    def test_extract_mzml(self):
+        logger.debug('Test extract_mzml...')
+        scan_info_df, spec_store, ms1_xic_df = extract_mzml(self.mzml, self.rt_range, dda_top=self.dda_top,
+                                                            ms1_threshold=5000, ms2_threshold=10, vendor='thermo')
+        assert isinstance(spec_store, SpectraStore)
+        assert len(spec_store) == scan_info_df.shape[0]
+        assert sorted(spec_store.keys()) == sorted(scan_info_df['spec_index'].values.tolist())
+
+        ms1_info_df = scan_info_df[scan_info_df['DDA_rank'] == 0]
+        ms1_xic_count = 0
+        for _idx, _ms1_se in ms1_info_df.iterrows():
+            ms1_df = spec_store[_ms1_se['spec_index']]
+            assert ms1_df['i'].min() >= 500
+            # MS1 spectra are sorted by intensity
+            assert ms1_df['i'].is_monotonic_decreasing
+            ms1_xic_count += ms1_df.shape[0]
+        assert ms1_xic_count == ms1_xic_df.shape[0]
+
+        ms2_info_df = scan_info_df[scan_info_df['DDA_rank'] > 0]
+        for _idx, _ms2_se in ms2_info_df.iterrows():
+            ms2_df = spec_store[_ms2_se['spec_index']]
+            assert isinstance(ms2_df, pd.DataFrame)
+            assert ms2_df['i'].min() >= 10
+
+    def test_dda_index(self):
+        logger.debug('Test DDA event lookup tables...')
+        scan_info_df, spec_store, ms1_xic_df = extract_mzml(self.mzml, self.rt_range, dda_top=self.dda_top,
+                                                            ms1_threshold=5000, ms2_threshold=10, vendor='thermo')
+        dda_index = spec_store.dda_index
+        assert isinstance(dda_index, DDAIndex)
+        assert len(dda_index) == scan_info_df.shape[0]
+        # the subset shares the same lookup tables
+        assert spec_store.subset(spec_store.keys()[:5]).dda_index is dda_index
+
+        for _row, (_idx, _scan_se) in enumerate(scan_info_df.iterrows()):
+            ms1_info_df = scan_info_df.query('dda_event_idx == %i and DDA_rank == 0' % _scan_se['dda_event_idx'])
+            if ms1_info_df.empty:
+                assert dda_index.get_ms1_spec_index(_scan_se['dda_event_idx']) == -1
+            else:
+                assert dda_index.get_ms1_spec_index(_scan_se['dda_event_idx']) == ms1_info_df['spec_index'].values[0]
+            chk_df = scan_info_df.query('MS2_PR_mz == %.6f and DDA_rank == %i and scan_number == %i'
+                                        % (_scan_se['MS2_PR_mz'], _scan_se['DDA_rank'], _scan_se['scan_number']))
+            if chk_df.shape[0] == 1:
+                assert dda_index.get_scan_row(_scan_se['scan_number'], _scan_se['DDA_rank'],
+                                              _scan_se['MS2_PR_mz']) == _row
+            assert dda_index.get_spec_row(_scan_se['spec_index']) == _row
+
+        assert dda_index.get_ms1_spec_index(-1) == -1
+        assert dda_index.get_scan_row(-1, 1) == -1
+        assert dda_index.get_spec_row(-1) == -1
+
+    def test_get_xic_from_pl(self):
+        logger.debug('Test get_xic_from_pl...')
+        scan_info_df, spec_store, ms1_xic_df = extract_mzml(self.mzml, self.rt_range, dda_top=self.dda_top,
+                                                            ms1_threshold=5000, ms2_threshold=10, vendor='thermo')
+        assert ms1_xic_df['mz'].is_monotonic_increasing
+        xic_ppm = 10
+        ms1_xic_mz_lst = sorted(set(ms1_xic_df['mz'].round(4).values.tolist()[::500]))
+        xic_dct = get_xic_from_pl(ms1_xic_mz_lst + [0], ms1_xic_df, xic_ppm)
+        assert sorted(xic_dct.keys()) == ms1_xic_mz_lst
+
+        for _xic_mz in ms1_xic_mz_lst:
+            xic_df = xic_dct[_xic_mz]
+            assert xic_df.columns.tolist() == ['mz', 'i', 'rt', 'ppm']
+            assert xic_df['rt'].is_monotonic_increasing and xic_df['rt'].is_unique
+            _low = np.float32(_xic_mz * (1 - 1e-6 * xic_ppm))
+            _high = np.float32(_xic_mz * (1 + 1e-6 * xic_ppm))
+            found_df = ms1_xic_df[(ms1_xic_df['mz'] >= _low) & (ms1_xic_df['mz'] <= _high)]
+            assert xic_df['rt'].tolist() == sorted(found_df['rt'].unique().tolist())
+            # the most intense peak of each scan is used
+            assert xic_df['i'].tolist() == found_df.groupby('rt')['i'].max().tolist()
+
+    def test_extract_mzml_max_ram(self):
+        logger.debug('Test extract_mzml with RAM limit...')
+        with self.assertRaises(MemoryError):
+            extract_mzml(self.mzml, self.rt_range, dda_top=self.dda_top, ms1_threshold=5000, ms2_threshold=10,
+                         vendor='thermo', max_ram=1e-6)
+
+    def test_spectra_cache(self):
+        logger.debug('Test extract_mzml with spectra cache...')
+        with tempfile.TemporaryDirectory() as cache_folder:
+            spectra_cache = SpectraCache(cache_folder)
+            scan_info_df, spec_store, ms1_xic_df = extract_mzml(self.mzml, self.rt_range, dda_top=self.dda_top,
+                                                                ms1_threshold=5000, ms2_threshold=10,
+                                                                vendor='thermo', spectra_cache=spectra_cache)
+            assert len(spectra_cache.get_entries()) == 1
+            c_scan_info_df, c_spec_store, c_ms1_xic_df = extract_mzml(self.mzml, self.rt_range,
+                                                                      dda_top=self.dda_top, ms1_threshold=5000,
+                                                                      ms2_threshold=10, vendor='thermo',
+                                                                      spectra_cache=spectra_cache)
+            pd.testing.assert_frame_equal(c_scan_info_df, scan_info_df)
+            pd.testing.assert_frame_equal(c_ms1_xic_df, ms1_xic_df)
+            assert c_spec_store.keys() == spec_store.keys()
+            for _spec_idx in spec_store.keys():
+                pd.testing.assert_frame_equal(c_spec_store[_spec_idx], spec_store[_spec_idx])
+
+            # different parameters are saved as new cache, the old one is removed if the cache is too large
+            extract_mzml(self.mzml, self.rt_range, dda_top=self.dda_top, ms1_threshold=8000, ms2_threshold=10,
+                         vendor='thermo', spectra_cache=spectra_cache)
+            assert len(spectra_cache.get_entries()) == 2
+            spectra_cache.max_size = 1e-6
+            spectra_cache.evict()
+            assert len(spectra_cache.get_entries()) == 0
+
+    def tearDown(self):
+        logger.debug('TestCase_SpectraReader TEST PASSED!')
+
+
+if __name__ == '__main__':
+    unittest.main()
+    logger.info('TESTS FINISHED!')
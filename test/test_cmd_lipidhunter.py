@@ -17,18 +17,23 @@
 #     Developer Zhixu Ni zhixu.ni@uni-leipzig.de
 #     Developer Georgia Angelidou georgia.angelidou@uni-leipzig.de
 
+import glob
 import logging
 import os
+import shutil
 import sys
 import subprocess
+import tempfile
 import unittest
 
+import matplotlib.image as mpimg
 import pytest
 
 hunterPath = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, hunterPath + '/../')
 
 import cmd_lipidhunter
+from LibLipidHunter.PanelPlotter import PLOT_PARAMS_EXT, render_plot_params
 
 log_level = logging.DEBUG
 logging.basicConfig(format='%(asctime)s-%(levelname)s - %(message)s', datefmt='%b-%d@%H:%M:%S', level=log_level)
@@ -57,16 +62,44 @@ class TestCase_cmd_lipidhunter(unittest.TestCase):
         tg_H_cfg_path = r'test/test_batch_cfg/test_TG_H_cfg.txt'
         bad_cfg_path = r'badtest/test_batch_cfg/test_bad_cfg.txt'
 
-        self.pass_params_lpc = ['-i', lpc_cfg_path]
-        self.pass_params_lpe = ['-i', lpe_cfg_path]
-        self.pass_params_pc = ['-i', pc_cfg_path]
-        self.pass_params_pe = ['-i', pe_cfg_path]
-        self.pass_params_dg = ['-i', dg_cfg_path]
-        self.pass_params_tg_NH4 = ['-i', tg_NH4_cfg_path]
-        self.pass_params_tg_Na = ['-i', tg_Na_cfg_path]
-        self.pass_params_tg_H = ['-i', tg_H_cfg_path]
+        # the caches are written to a temp folder, so each test parses the mzML and composes the lipid master table
+        # and never uses or changes the caches in ~/.lipidhunter
+        self.cache_folder = tempfile.mkdtemp()
+
+        self.pass_params_lpc = ['-i', self.get_test_cfg(lpc_cfg_path)]
+        self.pass_params_lpe = ['-i', self.get_test_cfg(lpe_cfg_path)]
+        self.pass_params_pc = ['-i', self.get_test_cfg(pc_cfg_path)]
+        self.pass_params_pe = ['-i', self.get_test_cfg(pe_cfg_path)]
+        self.pass_params_dg = ['-i', self.get_test_cfg(dg_cfg_path)]
+        self.pass_params_tg_NH4 = ['-i', self.get_test_cfg(tg_NH4_cfg_path)]
+        self.pass_params_tg_Na = ['-i', self.get_test_cfg(tg_Na_cfg_path)]
+        self.pass_params_tg_H = ['-i', self.get_test_cfg(tg_H_cfg_path)]
         self.fail_input_params = ['-i', bad_cfg_path]
 
+    def get_test_cfg(self, cfg_path, output_folder=None):
+        """
+        Copy one configuration file to the temp cache folder with the cache folders set to the temp cache folder.
+        The results are saved to output_folder instead of test/results if defined.
+        """
+        if not os.path.isfile(cfg_path):
+            # the test data of some lipid classes are not available and their tests are skipped
+            return cfg_path
+        test_cfg_path = os.path.join(self.cache_folder, os.path.basename(cfg_path))
+        if output_folder is not None:
+            test_cfg_path = os.path.join(output_folder, os.path.basename(cfg_path))
+        with open(cfg_path) as cfg_obj:
+            cfg_str = cfg_obj.read()
+        if output_folder is not None:
+            cfg_str = cfg_str.replace('test/results', output_folder.replace('\\', '/'))
+        cache_folder = self.cache_folder.replace('\\', '/')
+        cfg_str = cfg_str.rstrip('\n') + ('\nspectra_cache_folder = %s/spectra'
+                                          '\nlipid_master_cache_folder = %s/lipid_master\n'
+                                          % (cache_folder, cache_folder))
+        with open(test_cfg_path, 'w') as test_cfg_obj:
+            test_cfg_obj.write(cfg_str)
+
+        return test_cfg_path
+
     def test_help(self):
         logger.debug('Test help...')
         assert cmd_lipidhunter.main(['-h']) is False
@@ -116,7 +149,41 @@ class TestCase_cmd_lipidhunter(unittest.TestCase):
         logger.debug('Test sample data ... TG [M+H]+')
         assert cmd_lipidhunter.main(self.pass_params_tg_H) is True
 
+    def test_lazy_img(self):
+        logger.debug('Test sample data ... TG [M+NH4]+ with lazy image rendering')
+        with tempfile.TemporaryDirectory() as output_folder:
+            lazy_cfg_path = self.get_test_cfg(r'test/test_batch_cfg/test_TG_NH4_cfg.txt', output_folder=output_folder)
+            assert cmd_lipidhunter.main(['-i', lazy_cfg_path, '--lazy-img']) is True
+            plot_params_lst = glob.glob(os.path.join(output_folder, '*', '*' + PLOT_PARAMS_EXT))
+            assert len(plot_params_lst) > 0
+            assert glob.glob(os.path.join(output_folder, '*', '*.png')) == []
+
+            # render one image on demand, then all the others
+            assert cmd_lipidhunter.main(['--render', plot_params_lst[0]]) is True
+            assert len(glob.glob(os.path.join(output_folder, '*', '*.png'))) == 1
+            assert cmd_lipidhunter.main(['--render', output_folder]) is True
+            assert len(glob.glob(os.path.join(output_folder, '*', '*.png'))) == len(plot_params_lst)
+
+    def test_preview_img(self):
+        logger.debug('Test sample data ... TG [M+NH4]+ with preview images')
+        with tempfile.TemporaryDirectory() as output_folder:
+            preview_cfg_path = self.get_test_cfg(r'test/test_batch_cfg/test_TG_NH4_cfg.txt',
+                                                 output_folder=output_folder)
+            assert cmd_lipidhunter.main(['-i', preview_cfg_path, '--preview-img']) is True
+            plot_params_lst = glob.glob(os.path.join(output_folder, '*', '*' + PLOT_PARAMS_EXT))
+            img_lst = glob.glob(os.path.join(output_folder, '*', '*.png'))
+            assert len(plot_params_lst) > 0
+            assert len(img_lst) == len(plot_params_lst)
+            # A4 landscape at 72 dpi
+            assert mpimg.imread(img_lst[0]).shape[1] == 841
+
+            # the previews are replaced by the images with img_dpi = 150 of the configuration
+            assert cmd_lipidhunter.main(['--render', output_folder]) is True
+            assert mpimg.imread(img_lst[0]).shape[1] == 1753
+            assert render_plot_params(plot_params_lst) == 0
+
     def tearDown(self):
+        shutil.rmtree(self.cache_folder, ignore_errors=True)
         logger.debug('TestCase_cmd_lipidhunter TEST PASSED!')
 
 